@@ -1,5 +1,6 @@
 """Application entry point and initialization."""
 
+import multiprocessing
 import sys
 import threading
 import queue
@@ -109,6 +110,8 @@ def check_update_in_background(notification_manager: NotificationManager, tray_m
 
 def main() -> None:
     """应用程序主入口点"""
+    # 打包后的程序中，图片优化进程池的子进程也从这里启动
+    multiprocessing.freeze_support()
     try:
         # 设置 DPI 感知（尽早调用）
         set_dpi_awareness()
@@ -3,10 +3,16 @@
 from ..core.state import app_state
 from ..config.loader import ConfigLoader
 from ..service.notification.manager import NotificationManager
-from ..app.workflows import execute_paste_workflow
+from ..app.workflows import (
+    collected_count,
+    discard_collection,
+    execute_paste_workflow,
+    finish_collection,
+)
 from ..presentation.tray.menu import TrayMenuManager
 from ..presentation.tray.run import TrayRunner
 from ..presentation.hotkey.run import HotkeyRunner
+from ..i18n import t
 
 
 class Container:
@@ -55,6 +61,17 @@ class Container:
             self.hotkey_runner.get_hotkey_manager().resume(on_hotkey_resumed)
         
         self.tray_menu_manager.set_resume_hotkey_callback(resume_hotkey)
+        
+        # 收集模式：完成是显式操作，不做防抖；与热键任务互斥，忙时提示用户
+        def finish():
+            if not self.hotkey_runner.debounce_manager.run_exclusive(finish_collection):
+                self.notification_manager.notify("PasteMD", t("workflow.collector.busy"), ok=False)
+
+        self.tray_menu_manager.set_collector_callbacks(
+            finish,
+            discard_collection,
+            collected_count,
+        )
     
     def get_workflow_router(self):
         """返回工作流路由函数"""
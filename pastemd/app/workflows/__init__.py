@@ -1,5 +1,15 @@
 """Business workflows."""
 
-from .router import execute_paste_workflow
+from .router import (
+    collected_count,
+    discard_collection,
+    execute_paste_workflow,
+    finish_collection,
+)
 
-__all__ = ["execute_paste_workflow"]
+__all__ = [
+    "execute_paste_workflow",
+    "finish_collection",
+    "discard_collection",
+    "collected_count",
+]
@@ -6,6 +6,7 @@ from ...service.notification.manager import NotificationManager
 from ...service.document import DocumentGenerator
 from ...service.spreadsheet import SpreadsheetGenerator
 from ...service.preprocessor import HtmlPreprocessor, MarkdownPreprocessor
+from ...utils.docx_session import SessionDocument, resolve_session_path
 from ...utils.logging import log
 
 
@@ -67,6 +68,24 @@ class BaseWorkflow(ABC):
         """通知错误"""
         self.notification_manager.notify("PasteMD", msg, ok=False)
     
+    def _append_to_session(self, docx_bytes: bytes) -> str | None:
+        """
+        会话文档模式下把结果追加到会话文档
+        
+        Returns:
+            会话文档路径；未开启或追加失败（如文件被占用）时返回 None，由调用方按原方式保存
+        """
+        path = resolve_session_path(self.config)
+        if path is None:
+            return None
+        try:
+            SessionDocument(path).append(docx_bytes)
+            log(f"Appended to session document: {path}")
+            return path
+        except Exception as e:
+            log(f"Failed to append to session document, saving separately: {e}")
+            return None
+    
     def _log(self, msg: str):
         """记录日志"""
         log(msg)
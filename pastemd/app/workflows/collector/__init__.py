@@ -0,0 +1,6 @@
+"""Collector workflow (queue snippets, convert once on finish)."""
+
+from .collector_workflow import CollectorWorkflow
+from .snippets import Snippet, SnippetQueue
+
+__all__ = ["CollectorWorkflow", "Snippet", "SnippetQueue"]
@@ -0,0 +1,236 @@
+"""Collector workflow - queue clipboard snippets and convert them in one pass."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from ..base import BaseWorkflow
+from ..fallback.output_executor import OutputExecutor
+from .snippets import Snippet, SnippetQueue, join_html_snippets, join_markdown_snippets
+from pastemd.core.errors import ClipboardError, PandocError, PandocResourceLimitError
+from pastemd.core.state import app_state
+from pastemd.i18n import t
+from pastemd.utils.clipboard import (
+    get_clipboard_html,
+    get_clipboard_text,
+    is_clipboard_empty,
+    read_markdown_files_from_clipboard,
+)
+from pastemd.utils.fs import generate_output_path
+from pastemd.utils.html_analyzer import is_plain_html_fragment
+from pastemd.utils.markdown_utils import merge_markdown_contents
+
+
+class CollectorWorkflow(BaseWorkflow):
+    """
+    收集模式工作流
+
+    收集模式下每次热键只把剪贴板内容追加到内存队列（不启动 Pandoc）；
+    完成时把全部片段用分隔符拼接，只调用一次 Pandoc，然后整体插入或输出。
+    """
+
+    def __init__(self, queue: Optional[SnippetQueue] = None):
+        super().__init__()
+        self.queue = queue or SnippetQueue()
+        self.output_executor = OutputExecutor(self.notification_manager)
+
+    @property
+    def settings(self) -> dict:
+        settings = self.config.get("snippet_collector")
+        return settings if isinstance(settings, dict) else {}
+
+    def execute(self) -> None:
+        """热键入口：收集当前剪贴板内容"""
+        try:
+            snippet = self._read_snippet()
+        except ClipboardError as e:
+            self._log(f"Collector clipboard error: {e}")
+            self._notify_error(t("workflow.clipboard.empty"))
+            return
+        count = self.queue.add(snippet)
+        kind = "html" if snippet.html is not None else "markdown"
+        self._log(f"Collected snippet #{count} ({kind}, {len(snippet.markdown)} chars)")
+        self._notify_success(t("workflow.collector.collected", count=count))
+
+    def finish(self, target_workflow=None) -> None:
+        """
+        完成收集：一次转换全部片段并插入/输出，随后退出收集模式
+
+        Args:
+            target_workflow: 当前前台应用的 Word/WPS 工作流（有 placer）；
+                macOS WPS 粘贴富文本，其余插入 DOCX；为 None 时按 no_app_action 输出
+        """
+        snippets = self.queue.drain()
+        app_state.collecting = False
+        if not snippets:
+            self._notify_error(t("workflow.collector.empty"))
+            return
+
+        content_type: str | None = None
+        try:
+            if target_workflow is not None and target_workflow.pastes_rich_text:
+                content_type = self._content_type(snippets)
+                ok = self._insert_rich_text(target_workflow, snippets, content_type)
+            else:
+                content_type, content, docx_bytes = self._convert(snippets)
+                if target_workflow is not None:
+                    ok = self._insert(target_workflow, docx_bytes, len(snippets))
+                else:
+                    ok = self._output(docx_bytes, content_type, content)
+            if not ok:
+                # 输出失败时保留片段，可以再次完成
+                self.queue.restore(snippets)
+        except PandocResourceLimitError as e:
+            self.queue.restore(snippets)
+            self._log(f"Pandoc resource limit: {e}")
+            self._notify_error(t("workflow.pandoc.resource_limit"))
+        except PandocError as e:
+            self.queue.restore(snippets)
+            self._log(f"Pandoc error: {e}")
+            if content_type == "html":
+                self._notify_error(t("workflow.html.convert_failed_generic"))
+            else:
+                self._notify_error(t("workflow.markdown.convert_failed"))
+        except Exception as e:
+            self.queue.restore(snippets)
+            self._log(f"Collector finish failed: {e}")
+            import traceback
+            traceback.print_exc()
+            self._notify_error(t("workflow.generic.failure"))
+
+    def discard(self) -> int:
+        """丢弃已收集的片段，返回丢弃的数量"""
+        count = self.queue.clear()
+        self._log(f"Discarded {count} collected snippets")
+        return count
+
+    def _read_snippet(self) -> Snippet:
+        """
+        读取剪贴板：MD 文件优先，其次文本；HTML 富文本作为可选的第二种格式一并保存
+        """
+        found, files_data, _ = read_markdown_files_from_clipboard()
+        if found:
+            return Snippet(merge_markdown_contents(files_data))
+
+        if is_clipboard_empty():
+            raise ClipboardError("剪贴板为空")
+        markdown = get_clipboard_text()
+
+        html = None
+        try:
+            clipboard_html = get_clipboard_html(self.config)
+            if not is_plain_html_fragment(clipboard_html):
+                html = clipboard_html
+        except ClipboardError:
+            pass
+        return Snippet(markdown, html)
+
+    def _convert(self, snippets: list[Snippet]) -> tuple[str, str, bytes]:
+        """
+        拼接并转换全部片段（只调用一次 Pandoc）
+
+        全部片段都有 HTML 时按 HTML 转换，否则统一使用 Markdown。
+        Markdown 片段单独预处理（来源识别按片段进行）后再拼接；HTML 片段先拼接，
+        再整体预处理一次（预处理会补全为完整文档）。
+
+        Returns:
+            (内容类型, 拼接后的内容, DOCX 字节流)
+        """
+        separator = str(self.settings.get("separator", "---"))
+        if self._content_type(snippets) == "html":
+            content = join_html_snippets([s.html for s in snippets], separator)  # type: ignore[misc]
+            document = self.html_preprocessor.process(content, self.config)
+            self._log(f"Converting {len(snippets)} collected snippets as HTML ({len(content)} chars)")
+            return "html", content, self.doc_generator.convert_html_to_docx_bytes(document, self.config)
+
+        parts = [self.markdown_preprocessor.process(s.markdown, self.config) for s in snippets]
+        content = join_markdown_snippets(parts, separator)
+        self._log(f"Converting {len(snippets)} collected snippets as Markdown ({len(content)} chars)")
+        return "markdown", content, self.doc_generator.convert_markdown_to_docx_bytes(content, self.config)
+
+    @staticmethod
+    def _content_type(snippets: list[Snippet]) -> str:
+        """全部片段都有 HTML 时为 html，否则为 markdown"""
+        return "html" if all(snippet.html is not None for snippet in snippets) else "markdown"
+
+    def _insert_rich_text(self, target_workflow, snippets: list[Snippet], content_type: str) -> bool:
+        """
+        插入到通过剪贴板粘贴富文本的应用（macOS WPS）
+
+        与 WPSWorkflow 相同：拼接后的内容转为 Markdown，再由 Pandoc 生成 HTML 交给 placer。
+        """
+        config = target_workflow.rich_text_config()
+        separator = str(self.settings.get("separator", "---"))
+        if content_type == "html":
+            content = join_html_snippets([s.html for s in snippets], separator)  # type: ignore[misc]
+            document = self.html_preprocessor.process(content, config)
+            md_text = self.doc_generator.convert_html_to_markdown_text(document, config)
+        else:
+            parts = [self.markdown_preprocessor.process(s.markdown, config) for s in snippets]
+            md_text = join_markdown_snippets(parts, separator)
+        self._log(f"Converting {len(snippets)} collected snippets to rich text ({len(md_text)} chars)")
+        html_text = target_workflow.markdown_to_rich_html(md_text, config)
+
+        result = target_workflow.placer.place(
+            None, self.config, _plain_text=md_text, _rtf_bytes=None, _html_text=html_text
+        )
+        if not result.success:
+            self._notify_error(result.error or t("workflow.generic.failure"))
+            return False
+        self._notify_success(
+            t("workflow.collector.insert_success", count=len(snippets), app=target_workflow.app_name)
+        )
+        return True
+
+    def _insert(self, target_workflow, docx_bytes: bytes, count: int) -> bool:
+        """插入到前台 Word/WPS"""
+        result = target_workflow.placer.place(docx_bytes, self.config)
+        if not result.success:
+            self._notify_error(result.error or t("workflow.generic.failure"))
+            return False
+        if result.method:
+            self._log(f"Insert method: {result.method}")
+        self._notify_success(
+            t("workflow.collector.insert_success", count=count, app=target_workflow.app_name)
+        )
+        if self.config.get("keep_file", False):
+            self._save_docx(docx_bytes)
+        return True
+
+    def _output(self, docx_bytes: bytes, content_type: str, content: str) -> bool:
+        """没有可插入的应用时按 no_app_action 输出"""
+        action = self.config.get("no_app_action", "open")
+        if action == "none":
+            # 完成收集是显式操作，不能丢弃结果：至少保存文件
+            action = "save"
+        if action == "save":
+            session_path = self._append_to_session(docx_bytes)
+            if session_path:
+                self._notify_success(t("workflow.session.appended", path=session_path))
+                return True
+        output_path = generate_output_path(
+            keep_file=(action == "save"),
+            save_dir=self.config.get("save_dir", ""),
+            md_text=content if content_type == "markdown" else "",
+        )
+        return self.output_executor.execute_docx(
+            action=action,
+            docx_bytes=docx_bytes,
+            output_path=output_path,
+            from_html=(content_type == "html"),
+        )
+
+    def _save_docx(self, docx_bytes: bytes) -> None:
+        if self._append_to_session(docx_bytes):
+            return
+        try:
+            output_path = generate_output_path(
+                keep_file=True,
+                save_dir=self.config.get("save_dir", ""),
+                md_text="",
+            )
+            with open(output_path, "wb") as f:
+                f.write(docx_bytes)
+            self._log(f"Saved DOCX to: {output_path}")
+        except Exception as e:
+            self._log(f"Failed to save DOCX: {e}")
@@ -0,0 +1,84 @@
+"""In-memory snippet queue for collector mode."""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# 分隔符为 Markdown 分隔线（--- / *** / ___）时，HTML 中使用 <hr />
+_THEMATIC_BREAK_RE = re.compile(r"^\s*([-*_])(?:\s*\1){2,}\s*$")
+
+
+@dataclass(frozen=True)
+class Snippet:
+    """
+    收集到的一段剪贴板内容
+
+    Attributes:
+        markdown: 剪贴板文本 / MD 文件内容（始终存在）
+        html: 剪贴板 HTML 富文本；纯文本片段或来自 MD 文件时为 None
+        collected_at: 收集时间（time.time()）
+    """
+    markdown: str
+    html: Optional[str] = None
+    collected_at: float = field(default_factory=time.time)
+
+
+class SnippetQueue:
+    """线程安全的片段队列（热键线程追加，托盘线程完成/丢弃）"""
+
+    def __init__(self) -> None:
+        self._items: List[Snippet] = []
+        self._lock = threading.Lock()
+
+    def add(self, snippet: Snippet) -> int:
+        """追加片段，返回追加后的片段数"""
+        with self._lock:
+            self._items.append(snippet)
+            return len(self._items)
+
+    def drain(self) -> List[Snippet]:
+        """取出并清空全部片段"""
+        with self._lock:
+            items, self._items = self._items, []
+            return items
+
+    def clear(self) -> int:
+        """丢弃全部片段，返回丢弃的数量"""
+        return len(self.drain())
+
+    def restore(self, snippets: List[Snippet]) -> None:
+        """输出失败时放回片段（排在新收集的片段之前）"""
+        with self._lock:
+            self._items[:0] = snippets
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+
+def join_markdown_snippets(parts: List[str], separator: str) -> str:
+    """
+    用分隔符拼接 Markdown 片段
+
+    分隔符前后各留一个空行，避免与相邻的段落/列表/表格粘连；分隔符为空时只用空行分隔。
+    """
+    separator = separator.strip()
+    glue = f"\n\n{separator}\n\n" if separator else "\n\n"
+    return glue.join(part.strip("\n") for part in parts)
+
+
+def join_html_snippets(parts: List[str], separator: str) -> str:
+    """用分隔符拼接 HTML 片段（分隔线转为 <hr />，其他文本作为段落）"""
+    separator = separator.strip()
+    if not separator:
+        glue = "\n"
+    elif _THEMATIC_BREAK_RE.match(separator):
+        glue = "\n<hr />\n"
+    else:
+        glue = f"\n<p>{html_lib.escape(separator)}</p>\n"
+    return glue.join(parts)
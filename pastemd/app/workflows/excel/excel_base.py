@@ -8,11 +8,13 @@ from pastemd.app.workflows.base import BaseWorkflow
 from pastemd.core.errors import ClipboardError
 from pastemd.i18n import t
 from pastemd.service.spreadsheet import SpreadsheetGenerator
-from pastemd.service.spreadsheet.parser import parse_markdown_table
-from pastemd.utils.clipboard import get_clipboard_text, is_clipboard_empty
+from pastemd.service.spreadsheet.html_table import parse_html_table
+from pastemd.service.spreadsheet.parser import parse_markdown_table_from_index
+from pastemd.utils.clipboard import get_clipboard_html, get_clipboard_text, is_clipboard_empty
 from pastemd.utils.fs import generate_output_path
 from pastemd.utils.clipboard import read_markdown_files_from_clipboard
 from pastemd.utils.markdown_utils import merge_markdown_contents
+from pastemd.utils.md_index import build_markdown_index
 
 
 class ExcelBaseWorkflow(BaseWorkflow, ABC):
@@ -71,13 +73,25 @@ class ExcelBaseWorkflow(BaseWorkflow, ABC):
         found, files_data, _ = read_markdown_files_from_clipboard()
         if found:
             markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
+        # 块索引可在不逐行解析的情况下排除非表格内容
+        table_data = parse_markdown_table_from_index(build_markdown_index(markdown_text))
+        if not table_data and not found:
+            # 网页复制的表格：直接从 HTML 提取，不经过 Pandoc
+            table_data = self._read_clipboard_html_table()
 
         if not table_data:
-            raise ClipboardError("剪贴板中无有效 Markdown 表格")
+            raise ClipboardError("剪贴板中无有效 Markdown 或 HTML 表格")
 
         return table_data
 
+    def _read_clipboard_html_table(self) -> list | None:
+        """剪贴板 HTML 中的第一个表格；没有 HTML 或表格时返回 None"""
+        try:
+            html = get_clipboard_html(self.config)
+        except ClipboardError:
+            return None
+        return parse_html_table(html)
+
     def _save_xlsx(self, table_data: list) -> None:
         try:
             xlsx_bytes = SpreadsheetGenerator.generate_xlsx_bytes(
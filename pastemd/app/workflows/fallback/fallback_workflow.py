@@ -7,10 +7,13 @@ from pastemd.utils.clipboard import (
     read_markdown_files_from_clipboard
 )
 from pastemd.utils.html_analyzer import is_plain_html_fragment
+from pastemd.utils.html_document import HtmlDocument
 from pastemd.utils.markdown_utils import merge_markdown_contents
-from pastemd.service.spreadsheet.parser import parse_markdown_table
+from pastemd.service.document.batch import BatchConverter
+from pastemd.service.spreadsheet.parser import parse_markdown_table_from_index
+from pastemd.utils.md_index import MarkdownIndex, build_markdown_index
 from pastemd.utils.fs import generate_output_path
-from pastemd.core.errors import ClipboardError, PandocError
+from pastemd.core.errors import ClipboardError, PandocError, PandocResourceLimitError
 from pastemd.i18n import t
 
 
@@ -36,14 +39,17 @@ class FallbackWorkflow(BaseWorkflow):
             no_app_action = self.config.get("no_app_action", "open")
             self._log(f"No app detected, executing action: {no_app_action}")
             
-            # 1. 检测剪贴板内容类型
-            content_type = self._detect_content_type()
+            # 1. 检测剪贴板内容类型（Markdown 只读取一次，块索引供后续步骤共用）
+            md_index, files_data = self._read_markdown_index()
+            content_type, html_doc = self._detect_content_type(md_index)
             
             # 2. 根据内容类型处理
             if content_type == "table":
-                self._handle_table(no_app_action)
+                self._handle_table(no_app_action, md_index)
+            elif content_type == "markdown" and self._use_batch(files_data):
+                self._handle_markdown_batch(no_app_action, files_data)
             else:
-                self._handle_document(no_app_action, content_type)
+                self._handle_document(no_app_action, content_type, md_index, html_doc)
         
         except ClipboardError as e:
             self._log(f"Clipboard error: {e}")
@@ -52,6 +58,9 @@ class FallbackWorkflow(BaseWorkflow):
                 self._notify_error(t("workflow.clipboard.empty"))
             else:
                 self._notify_error(t("workflow.clipboard.read_failed"))
+        except PandocResourceLimitError as e:
+            self._log(f"Pandoc resource limit: {e}")
+            self._notify_error(t("workflow.pandoc.resource_limit"))
         except PandocError as e:
             self._log(f"Pandoc error: {e}")
             if content_type == "html":
@@ -64,43 +73,54 @@ class FallbackWorkflow(BaseWorkflow):
             traceback.print_exc()
             self._notify_error(t("workflow.generic.failure"))
     
-    def _detect_content_type(self) -> str:
+    def _read_markdown_index(self) -> tuple[MarkdownIndex, list[tuple[str, str]]]:
         """
-        检测剪贴板内容类型
+        读取剪贴板 Markdown（MD 文件优先）并构建块索引
         
         Returns:
-            "table" | "html" | "markdown"
+            (合并内容的 MarkdownIndex（原文见 index.text）, 剪贴板中的 MD 文件 [(filename, content), ...])
         """
         if is_clipboard_empty():
             raise ClipboardError("剪贴板为空")
         
-        # 检查是否为表格
         markdown_text = get_clipboard_text()
         found, files_data, _ = read_markdown_files_from_clipboard()
         if found:
             markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
+        else:
+            files_data = []
+        return build_markdown_index(markdown_text), files_data
+    
+    def _detect_content_type(self, md_index: MarkdownIndex) -> tuple[str, HtmlDocument | None]:
+        """
+        检测剪贴板内容类型
+        
+        Args:
+            md_index: 剪贴板 Markdown 的块索引
+        
+        Returns:
+            ("table" | "html" | "markdown", HTML 内容的 HtmlDocument（仅 "html" 时非 None，
+            预处理与转换共享同一次解析）)
+        """
+        # 检查是否为表格
+        table_data = parse_markdown_table_from_index(md_index)
         if table_data:
-            return "table"
+            return "table", None
         
         # 检查是否为 HTML
         try:
-            html = get_clipboard_html(self.config)
+            html = HtmlDocument(get_clipboard_html(self.config))
             if not is_plain_html_fragment(html):
-                return "html"
+                return "html", html
         except ClipboardError:
             pass
         
         # 默认为 Markdown
-        return "markdown"
+        return "markdown", None
     
-    def _handle_table(self, action: str):
-        """处理表格内容"""
-        markdown_text = get_clipboard_text()
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
+    def _handle_table(self, action: str, md_index: MarkdownIndex):
+        """处理表格内容（复用检测阶段的解析结果）"""
+        table_data = parse_markdown_table_from_index(md_index)
         
         # 生成输出路径
         output_path = generate_output_path(
@@ -121,37 +141,82 @@ class FallbackWorkflow(BaseWorkflow):
         if not success:
             self._log(f"XLSX output failed with action: {action}")
     
-    def _handle_document(self, action: str, content_type: str):
+    def _use_batch(self, files_data: list[tuple[str, str]]) -> bool:
+        """多个 MD 文件且开启 batch_conversion 时逐个文件转换，而不是合并为一个文档"""
+        settings = self.config.get("batch_conversion")
+        return (
+            len(files_data) > 1
+            and isinstance(settings, dict)
+            and bool(settings.get("enabled", False))
+        )
+    
+    def _handle_markdown_batch(self, action: str, files_data: list[tuple[str, str]]):
+        """逐个文件并发转换为独立的 DOCX，转换完成一个输出一个"""
+        converter = BatchConverter(self.doc_generator, self.markdown_preprocessor)
+        conversion_failures: list[tuple[str, str]] = []
+        
+        def completed_items():
+            for result in converter.convert_markdown_files(files_data, self.config):
+                if not result.ok:
+                    conversion_failures.append((result.source_filename, result.error or ""))
+                    continue
+                output_path = generate_output_path(
+                    keep_file=(action == "save"),
+                    save_dir=self.config.get("save_dir", ""),
+                    source_filename=result.source_filename,
+                )
+                yield result.docx_bytes, output_path, result.source_filename
+        
+        outcome = self.output_executor.execute_docx_batch(
+            action,
+            completed_items(),
+            from_md_file=True,
+            pre_failures=conversion_failures,
+        )
+        
+        if not outcome["success_paths"]:
+            self._log(f"DOCX batch produced no output: {outcome['failures']}")
+            self._notify_error(t("workflow.markdown.convert_failed"))
+    
+    def _handle_document(
+        self, action: str, content_type: str, md_index: MarkdownIndex,
+        html_doc: HtmlDocument | None = None,
+    ):
         """处理文档内容（HTML 或 Markdown）"""
         # 1. 读取内容
         if content_type == "html":
-            html = get_clipboard_html(self.config)
+            # 复用检测阶段读取的 HtmlDocument，不再重新读取剪贴板
+            html = html_doc or HtmlDocument(get_clipboard_html(self.config))
             html = self.html_preprocessor.process(html, self.config)
             docx_bytes = self.doc_generator.convert_html_to_docx_bytes(
                 html, self.config
             )
             from_html = True
         else:
-            # Markdown
-            content = get_clipboard_text()
-            found, files_data, _ = read_markdown_files_from_clipboard()
-            if found:
-                content = merge_markdown_contents(files_data)
+            # Markdown（检测阶段已读取）
+            content = md_index.text
             # 预处理
             content = self.markdown_preprocessor.process(content, self.config)
             docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
-                content, self.config
+                content, self.config, md_index=md_index
             )
             from_html = False
         
-        # 2. 生成输出路径
+        # 2. 会话文档模式：保存动作追加到同一个文档
+        if action == "save":
+            session_path = self._append_to_session(docx_bytes)
+            if session_path:
+                self._notify_success(t("workflow.session.appended", path=session_path))
+                return
+        
+        # 3. 生成输出路径（Markdown 按索引中的标题命名）
         output_path = generate_output_path(
             keep_file=(action == "save"),
             save_dir=self.config.get("save_dir", ""),
-            md_text=""
+            md_index=None if from_html else md_index,
         )
         
-        # 3. 执行输出
+        # 4. 执行输出
         success = self.output_executor.execute_docx(
             action=action,
             docx_bytes=docx_bytes,
@@ -1,7 +1,7 @@
 """Output executor - unified handler for document and spreadsheet output actions."""
 
 import os
-from typing import List, Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
 
 from pastemd.utils.clipboard import copy_files_to_clipboard
 from pastemd.utils.logging import log
@@ -95,7 +95,7 @@ class OutputExecutor:
     def execute_docx_batch(
         self,
         action: str,
-        items: List[Tuple[bytes, str, str]],
+        items: Iterable[Tuple[bytes, str, str]],
         *,
         from_md_file: bool = False,
         from_html: bool = False,
@@ -104,46 +104,29 @@ class OutputExecutor:
         """
         批量执行 DOCX 输出（仅用于无应用多文件分支）
 
+        items 可以是生成器：每一项产出后立即写入并执行动作，不必等待全部转换完成。
+
         Args:
             action: 输出动作 ("open" | "save" | "clipboard")
-            items: [(docx_bytes, output_path, source_filename), ...]
+            items: [(docx_bytes, output_path, source_filename), ...] 或按完成顺序产出的可迭代对象
             from_md_file: 是否来源于 MD 文件（影响通知文案）
             from_html: 是否来源于 HTML（影响通知文案）
-            pre_failures: 生成阶段已失败的 [(filename, error), ...]
+            pre_failures: 生成阶段已失败的 [(filename, error), ...]；
+                items 为生成器时可在迭代过程中追加，在 items 耗尽后读取
 
         Returns:
             {"success_paths": [...], "failures": [(filename, error), ...]}
         """
-        if not items:
-            return {"success_paths": [], "failures": list(pre_failures or [])}
-
         # 确保批内输出路径唯一，避免同名覆盖
         seen_paths: set[str] = set()
-        normalized_items: List[Tuple[bytes, str, str]] = []
-        for docx_bytes, output_path, source_filename in items:
-            unique_path = output_path
-
-            if unique_path in seen_paths:
-                base_dir = os.path.dirname(unique_path)
-                stem, ext = os.path.splitext(os.path.basename(unique_path))
-                idx = 1
-                candidate = unique_path
-                while candidate in seen_paths or os.path.exists(candidate):
-                    candidate = os.path.join(base_dir, f"{stem}_batch{idx}{ext}")
-                    idx += 1
-                unique_path = candidate
-            else:
-                unique_path = generate_unique_path(unique_path)
-                while unique_path in seen_paths or os.path.exists(unique_path):
-                    unique_path = generate_unique_path(unique_path)
-
-            seen_paths.add(unique_path)
-            normalized_items.append((docx_bytes, unique_path, source_filename))
-
         success_paths: List[str] = []
-        failures: List[Tuple[str, str]] = list(pre_failures or [])
+        item_failures: List[Tuple[str, str]] = []
+        item_count = 0
 
-        for docx_bytes, output_path, source_filename in normalized_items:
+        for docx_bytes, output_path, source_filename in items:
+            item_count += 1
+            output_path = self._unique_batch_path(output_path, seen_paths)
+            seen_paths.add(output_path)
             try:
                 with open(output_path, "wb") as f:
                     f.write(docx_bytes)
@@ -164,7 +147,7 @@ class OutputExecutor:
                 if ok:
                     success_paths.append(output_path)
                 else:
-                    failures.append((source_filename, f"action_failed:{action}"))
+                    item_failures.append((source_filename, f"action_failed:{action}"))
             except Exception as e:
                 log(f"DOCX batch item failed ({source_filename}): {e}")
                 # 逐项失败通知保持旧语义
@@ -184,7 +167,11 @@ class OutputExecutor:
                     self.notification_manager.notify(
                         "PasteMD", t("workflow.document.generate_failed"), ok=False
                     )
-                failures.append((source_filename, str(e)))
+                item_failures.append((source_filename, str(e)))
+
+        failures: List[Tuple[str, str]] = list(pre_failures or []) + item_failures
+        if not item_count:
+            return {"success_paths": [], "failures": failures}
 
         # clipboard 动作：末尾一次性写入剪贴板（CF_HDROP 多路径）
         if action == "clipboard" and success_paths:
@@ -199,7 +186,7 @@ class OutputExecutor:
                 return {"success_paths": success_paths, "failures": failures}
 
         # 多文件批量成功通知收敛为 1 条
-        total_attempted = len(items) + len(pre_failures or [])
+        total_attempted = item_count + len(pre_failures or [])
         if total_attempted > 1 and success_paths:
             action_name = (
                 t(f"action.{action}")
@@ -225,6 +212,24 @@ class OutputExecutor:
 
         return {"success_paths": success_paths, "failures": failures}
 
+    @staticmethod
+    def _unique_batch_path(output_path: str, seen_paths: set[str]) -> str:
+        """返回批内唯一且磁盘上不存在的输出路径"""
+        if output_path in seen_paths:
+            base_dir = os.path.dirname(output_path)
+            stem, ext = os.path.splitext(os.path.basename(output_path))
+            idx = 1
+            candidate = output_path
+            while candidate in seen_paths or os.path.exists(candidate):
+                candidate = os.path.join(base_dir, f"{stem}_batch{idx}{ext}")
+                idx += 1
+            return candidate
+
+        unique_path = generate_unique_path(output_path)
+        while unique_path in seen_paths or os.path.exists(unique_path):
+            unique_path = generate_unique_path(unique_path)
+        return unique_path
+
     def execute_xlsx(
         self,
         action: str,
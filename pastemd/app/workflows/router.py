@@ -1,13 +1,18 @@
 """Workflow router - main entry point."""
 
+from __future__ import annotations
+
+from ...core.state import app_state
 from ...utils.detector import detect_active_app
 from ...utils.logging import log
 from ...service.notification.manager import NotificationManager
 from ...i18n import t
 
 from .word import WordWorkflow, WPSWorkflow
+from .word.word_base import WordBaseWorkflow
 from .excel import ExcelWorkflow, WPSExcelWorkflow
 from .fallback import FallbackWorkflow
+from .collector import CollectorWorkflow
 
 
 class WorkflowRouter:
@@ -32,6 +37,7 @@ class WorkflowRouter:
             "wps_excel": WPSExcelWorkflow(),
             "": FallbackWorkflow(),  # 空字符串表示无应用
         }
+        self.collector = CollectorWorkflow()
         
         self.notification_manager = NotificationManager()
         self._initialized = True
@@ -40,6 +46,11 @@ class WorkflowRouter:
     def route(self) -> None:
         """主入口：检测应用 → 路由到工作流"""
         try:
+            # 收集模式：收集片段，或在 Word/WPS 中完成收集
+            if app_state.collecting:
+                self._route_collecting()
+                return
+
             # 检测目标应用
             target_app = detect_active_app()
             log(f"Detected target app: {target_app}")
@@ -54,6 +65,39 @@ class WorkflowRouter:
             traceback.print_exc()
             self.notification_manager.notify("PasteMD", t("workflow.generic.failure"), ok=False)
 
+    def _route_collecting(self) -> None:
+        """
+        收集模式下的热键
+
+        已有片段且前台为 Word/WPS 时完成收集并插入到该文档（finish_in_word），
+        否则只收集片段，不检测应用、不转换。托盘中的“完成并输出”由托盘获得焦点，
+        检测不到用户的文档，因此在文档中按热键是插入的主要方式。
+        """
+        if self.collector.settings.get("finish_in_word", True) and len(self.collector.queue):
+            target = self._document_workflow(detect_active_app())
+            if target is not None:
+                log(f"Finishing collection in {target.app_name} via hotkey")
+                self.collector.finish(target)
+                return
+        self.collector.execute()
+
+    def _document_workflow(self, target_app: str) -> WordBaseWorkflow | None:
+        """能插入 DOCX 的 Word/WPS 工作流；表格应用和无应用时为 None"""
+        workflow = self.workflows.get(target_app)
+        return workflow if isinstance(workflow, WordBaseWorkflow) else None
+
+    def finish_collection(self) -> None:
+        """完成收集：前台为 Word/WPS 时插入，否则按 no_app_action 输出"""
+        try:
+            target_app = detect_active_app()
+            log(f"Finishing collection, detected target app: {target_app}")
+            self.collector.finish(self._document_workflow(target_app))
+        except Exception as e:
+            log(f"Finish collection failed: {e}")
+            import traceback
+            traceback.print_exc()
+            self.notification_manager.notify("PasteMD", t("workflow.generic.failure"), ok=False)
+
 
 # 全局单例
 router = WorkflowRouter()
@@ -62,3 +106,18 @@ router = WorkflowRouter()
 def execute_paste_workflow():
     """热键入口函数"""
     router.route()
+
+
+def finish_collection():
+    """托盘入口：完成收集并输出"""
+    router.finish_collection()
+
+
+def discard_collection() -> int:
+    """托盘入口：丢弃已收集的片段"""
+    return router.collector.discard()
+
+
+def collected_count() -> int:
+    """已收集的片段数"""
+    return len(router.collector.queue)
@@ -5,7 +5,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 
 from pastemd.app.workflows.base import BaseWorkflow
-from pastemd.core.errors import ClipboardError, PandocError
+from pastemd.core.errors import ClipboardError, PandocError, PandocResourceLimitError
 from pastemd.i18n import t
 from pastemd.utils.clipboard import (
     get_clipboard_html,
@@ -15,7 +15,9 @@ from pastemd.utils.clipboard import (
 )
 from pastemd.utils.fs import generate_output_path
 from pastemd.utils.html_analyzer import is_plain_html_fragment
+from pastemd.utils.html_document import HtmlDocument
 from pastemd.utils.markdown_utils import merge_markdown_contents
+from pastemd.utils.md_index import MarkdownIndex, build_markdown_index
 
 
 class WordBaseWorkflow(BaseWorkflow, ABC):
@@ -29,16 +31,24 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
     @abstractmethod
     def placer(self): ...
 
+    @property
+    def pastes_rich_text(self) -> bool:
+        """placer 是否通过剪贴板粘贴 HTML 富文本（而不是插入 DOCX）"""
+        return False
+
     def execute(self) -> None:
         content_type: str | None = None
         from_md_file = False
         md_file_count = 0
+        md_index: MarkdownIndex | None = None
 
         try:
             content_type, content, from_md_file, md_file_count = self._read_clipboard()
             self._log(f"Clipboard content type: {content_type}")
 
             if content_type == "markdown":
+                # 同一作业内共享：代价规划与文件命名都读这一份索引
+                md_index = build_markdown_index(content)
                 content = self.markdown_preprocessor.process(content, self.config)
             elif content_type == "html":
                 # 预处理 HTML，清理 LaTeX 公式块中的 br 标签等
@@ -50,7 +60,7 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
                 )
             else:
                 docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
-                    content, self.config
+                    content, self.config, md_index=md_index
                 )
 
             result = self.placer.place(docx_bytes, self.config)
@@ -78,11 +88,14 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
                 self._notify_error(result.error or t("workflow.generic.failure"))
 
             if result.success and self.config.get("keep_file", False):
-                self._save_docx(docx_bytes)
+                self._save_docx(docx_bytes, md_index)
 
         except ClipboardError as e:
             self._log(f"Clipboard error: {e}")
             self._notify_error(t("workflow.clipboard.read_failed"))
+        except PandocResourceLimitError as e:
+            self._log(f"Pandoc resource limit: {e}")
+            self._notify_error(t("workflow.pandoc.resource_limit"))
         except PandocError as e:
             self._log(f"Pandoc error: {e}")
             if content_type == "html":
@@ -96,12 +109,14 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
             traceback.print_exc()
             self._notify_error(t("workflow.generic.failure"))
 
-    def _read_clipboard(self) -> tuple[str, str, bool, int]:
+    def _read_clipboard(self) -> tuple[str, str | HtmlDocument, bool, int]:
         """
         读取剪贴板,返回 (类型, 内容, 是否来自 MD 文件, MD 文件数量)
+
+        HTML 内容以 HtmlDocument 返回，预处理与转换共享同一次解析
         """
         try:
-            html = get_clipboard_html(self.config)
+            html = HtmlDocument(get_clipboard_html(self.config))
             if not is_plain_html_fragment(html):
                 return ("html", html, False, 0)
         except ClipboardError:
@@ -117,12 +132,14 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
 
         raise ClipboardError("剪贴板为空或无有效内容")
 
-    def _save_docx(self, docx_bytes: bytes) -> None:
+    def _save_docx(self, docx_bytes: bytes, md_index: MarkdownIndex | None = None) -> None:
+        if self._append_to_session(docx_bytes):
+            return
         try:
             output_path = generate_output_path(
                 keep_file=True,
                 save_dir=self.config.get("save_dir", ""),
-                md_text="",
+                md_index=md_index,
             )
             with open(output_path, "wb") as f:
                 f.write(docx_bytes)
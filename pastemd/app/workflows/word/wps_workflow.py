@@ -3,7 +3,7 @@ from pastemd.app.workflows.word.word_base import WordBaseWorkflow
 from pastemd.service.document import WPSPlacer
 from pastemd.i18n import t
 
-from pastemd.core.errors import ClipboardError, PandocError
+from pastemd.core.errors import ClipboardError, PandocError, PandocResourceLimitError
 from pastemd.utils.system_detect import is_windows
 from pastemd.utils.html_formatter import postprocess_pandoc_html_macwps, clean_html_for_wps
 
@@ -23,6 +23,25 @@ class WPSWorkflow(WordBaseWorkflow):
     def placer(self):
         return self._placer
 
+    @property
+    def pastes_rich_text(self) -> bool:
+        # macOS WPS 通过剪贴板粘贴 HTML 富文本，不接受 DOCX
+        return not is_windows()
+
+    def rich_text_config(self) -> dict:
+        """macOS 富文本转换使用的配置"""
+        config = self.config.copy()
+        config["Keep_original_formula"] = True  # 保留公式为 LaTeX 文本
+        # 富文本输出要自包含：图片保持 data URI，不移到 blob 目录
+        config["image_blob_store"] = {"enabled": False}
+        return config
+
+    def markdown_to_rich_html(self, md_text: str, config: dict) -> str:
+        """Markdown 转为 macOS WPS 粘贴用的 HTML"""
+        html_text = self.doc_generator.convert_markdown_to_html_text(md_text, config)
+        # 后处理 Pandoc 输出的 HTML，修复代码块格式等问题
+        return postprocess_pandoc_html_macwps(html_text)
+
     def execute(self) -> None:
         """
         macOS WPS：
@@ -39,8 +58,7 @@ class WPSWorkflow(WordBaseWorkflow):
         try:
             content_type, content, from_md_file, md_file_count = self._read_clipboard()
             self._log(f"Clipboard content type: {content_type}")
-            config = self.config.copy()
-            config["Keep_original_formula"] = True  # 保留公式为 LaTeX 文本
+            config = self.rich_text_config()
             if content_type == "html":
                 content = self.html_preprocessor.process(content, config)
                 md_text = self.doc_generator.convert_html_to_markdown_text(
@@ -50,11 +68,7 @@ class WPSWorkflow(WordBaseWorkflow):
                 # markdown
                 md_text = self.markdown_preprocessor.process(content, config)
 
-            html_text = self.doc_generator.convert_markdown_to_html_text(
-                md_text, config
-            )
-            # 后处理 Pandoc 输出的 HTML，修复代码块格式等问题
-            html_text = postprocess_pandoc_html_macwps(html_text)
+            html_text = self.markdown_to_rich_html(md_text, config)
             # 内容落地由 placer 负责（写剪贴板 + Cmd+V）
             result = self.placer.place(
                 None,
@@ -84,6 +98,9 @@ class WPSWorkflow(WordBaseWorkflow):
         except ClipboardError as e:
             self._log(f"Clipboard error: {e}")
             self._notify_error(t("workflow.clipboard.read_failed"))
+        except PandocResourceLimitError as e:
+            self._log(f"Pandoc resource limit: {e}")
+            self._notify_error(t("workflow.pandoc.resource_limit"))
         except PandocError as e:
             self._log(f"Pandoc error: {e}")
             self._notify_error(t("workflow.markdown.convert_failed"))
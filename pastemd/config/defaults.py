@@ -54,6 +54,27 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "hotkey": "<ctrl>+<shift>+b",
     "pandoc_path": find_pandoc(),
     "reference_docx": None,
+    "slim_reference_docx": True,  # 使用去除正文/嵌入字体/图片的参考模板精简副本（按内容哈希缓存）
+    # 粘贴内容中的 base64 图片（data URI）按内容哈希保存到缓存目录，Pandoc 通过 --resource-path 读取
+    # max_age_days: 保存天数；max_total_mb: 目录总大小上限（超出时删除最旧的）
+    "image_blob_store": {
+        "enabled": True,
+        "max_age_days": 7,
+        "max_total_mb": 512,
+    },
+    # 图片优化（默认关闭；Pillow，进程池并行）：转换前处理引用的本地图片，转换后处理 DOCX 中的图片
+    # 按 EXIF 方向旋转后，宽度超过 max_width_px 的等比缩小；JPEG 保持 JPEG，PNG 重新压缩，
+    # 不透明的照片类内容明显更小时改用 JPEG
+    # min_kb 以下的图片不处理；max_workers 为 0 时按 CPU 核数（最多 4）；结果按内容哈希缓存
+    "image_optimization": {
+        "enabled": False,
+        "max_width_px": 1600,
+        "jpeg_quality": 85,
+        "min_kb": 64,
+        "max_workers": 0,
+        "max_age_days": 30,
+        "max_total_mb": 512,
+    },
     "save_dir": get_default_save_dir(),
     "keep_file": False,
     "notify": True,
@@ -62,13 +83,80 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "no_app_action": "open",  # 无应用检测时的动作：open=自动打开, save=仅保存, clipboard=复制到剪贴板, none=无操作
     "md_disable_first_para_indent": True,
     "html_disable_first_para_indent": True,
+    # 为插入内容添加“不检查拼写和语法”标记，避免大段粘贴后 Word/WPS 因校对而卡顿
+    # code=代码块与行内代码，tables=表格，math=公式，all=全部内容
+    "docx_no_proof": {
+        "enabled": False,
+        "code": True,
+        "tables": True,
+        "math": True,
+        "all": False,
+    },
     "html_formatting": {
         "strikethrough_to_del": True,
     },
+    # 预处理阶段：order 中列出的阶段排在前面（其余按默认顺序），disabled 中的阶段不执行
+    # 阶段名：markdown.normalize / markdown.latex / markdown.images / html.flatten_code / html.remove_svg /
+    # html.externalize_images / html.katex_br_cleanup / html.collapse_math / html.strikethrough / html.minify
+    "preprocess_stages": {
+        "order": {"markdown": [], "html": []},
+        "disabled": [],
+    },
+    # 来源指纹：识别 ChatGPT/Claude/Gemini/智谱清言/Notion/Obsidian，只执行该来源需要的预处理阶段
+    # overrides 示例：{"claude": {"markdown": ["normalize", "latex"]}}
+    "source_profiles": {
+        "enabled": True,
+        "overrides": {},
+    },
+    # HTML 大小分级：超过 large 阈值（字节数或估算节点数）时不按来源裁剪阶段（总会精简并折叠代码高亮），跳过装饰性阶段
+    # 超过 huge 阈值时另外关闭代码高亮与首段缩进后处理，并拆分为约 chunk_kb 的块并发转换后合并
+    # large 输入精简后仍超过 chunk_kb 时同样分块；含脚注时不分块；max_workers 为同时转换的块数，0 表示按 CPU 核数（最多 4 个）
+    "html_size_tiers": {
+        "enabled": True,
+        "large_kb": 1024,
+        "large_nodes": 20000,
+        "huge_mb": 20,
+        "huge_nodes": 400000,
+        "chunk_kb": 2048,
+        "max_workers": 0,
+    },
     "move_cursor_to_end": True,
     "Keep_original_formula": False,
     "language": "zh",
     "enable_latex_replacements": True,
     "fix_single_dollar_block": True,
     "pandoc_filters": [],
+    # Pandoc 进程的资源限制：max_memory_mb 为 Pandoc 自身的堆上限（+RTS -M，所有平台，不限制 Filter 进程）
+    # max_cpu_seconds（Filter 子进程同样继承）与 nice 仅在 Linux/macOS 等 POSIX 系统生效
+    # 按作业类别配置：interactive=热键粘贴，batch=批量转换
+    "pandoc_resource_limits": {
+        "enabled": True,
+        "interactive": {"max_memory_mb": 2048, "max_cpu_seconds": 60, "nice": 0},
+        "batch": {"max_memory_mb": 2048, "max_cpu_seconds": 300, "nice": 10},
+    },
+    # 无应用场景下粘贴多个 MD 文件时，逐个文件并发转换为独立的 DOCX（关闭时合并为一个文档）
+    # max_workers：同时运行的 Pandoc 进程数，0 表示按 CPU 核数
+    "batch_conversion": {
+        "enabled": False,
+        "max_workers": 0,
+    },
+    # 会话文档：保存（keep_file / 无应用 save 动作）时追加到 save_dir 中的同一个 DOCX，而不是每次新建文件
+    # filename 支持 strftime 格式，默认每天一个文档
+    "session_document": {
+        "enabled": False,
+        "filename": "PasteMD_session_%Y%m%d.docx",
+    },
+    # 收集模式（托盘菜单开启）：完成时各片段之间插入的分隔内容，Markdown 分隔线在 HTML 中转为 <hr />，留空则只空一行
+    "snippet_collector": {
+        "separator": "---",
+        "finish_in_word": True,  # 已有片段时在 Word/WPS 中按热键：完成收集并插入到该文档
+    },
+    # 热键粘贴的延迟目标（默认关闭）：按历史转换耗时预测，超出目标时关闭代码高亮、跳过 DOCX 样式后处理
+    # 只在降级后能达到目标或至少节省 min_saving 比例的耗时时才降级
+    "latency_slo": {
+        "enabled": False,
+        "target_ms": 1000,
+        "min_samples": 5,  # 积累到这么多次转换后才开始预测
+        "min_saving": 0.3,
+    },
 }
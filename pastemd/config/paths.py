@@ -56,6 +56,13 @@ def ensure_user_data_dir():
     return data_dir
 
 
+def get_cache_dir(*parts: str) -> str:
+    """获取（并创建）用户缓存目录，可传入子目录名"""
+    cache_dir = os.path.join(ensure_user_data_dir(), "cache", *parts)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
 def get_config_path() -> str:
     """获取配置文件路径"""
     data_dir = ensure_user_data_dir()
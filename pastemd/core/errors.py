@@ -16,6 +16,11 @@ class PandocError(PasteMDError):
     pass
 
 
+class PandocResourceLimitError(PandocError):
+    """Pandoc 进程超出内存/CPU 资源限制"""
+    pass
+
+
 class InsertError(PasteMDError):
     """文档插入异常"""
     pass
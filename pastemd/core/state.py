@@ -13,6 +13,8 @@ class AppState:
     ui_block_hotkeys: bool = False
     last_fire: float = 0.0
     last_ok: bool = True
+    # 收集模式：热键只收集片段，完成时统一转换
+    collecting: bool = False
     hotkey_str: str = "<ctrl>+<shift>+b"
     config: Dict[str, Any] = field(default_factory=dict)
 
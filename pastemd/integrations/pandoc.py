@@ -2,14 +2,21 @@
 
 import os
 import re
+import signal
 import subprocess
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Union
 
+try:
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
+
+from ..utils.html_document import HtmlDocument, as_html_text
 from ..utils.html_formatter import protect_task_list_brackets
 
 from ..config.paths import resource_path
 
-from ..core.errors import PandocError
+from ..core.errors import PandocError, PandocResourceLimitError
 from ..utils.logging import log
 
 LUA_KEEP_ORIGINAL_FORMULA = resource_path("lua/keep-latex-math.lua")
@@ -19,20 +26,27 @@ LUA_LATEX_REPLACEMENTS = resource_path("lua/latex-replacements.lua")
 if not os.path.isfile(LUA_LATEX_REPLACEMENTS):
     LUA_LATEX_REPLACEMENTS = resource_path("pastemd/lua/latex-replacements.lua")
 
+# 作业类别：interactive=热键粘贴，batch=批量/多文件
+JOB_CLASSES = ("interactive", "batch")
+
+# 资源超限时 Pandoc / GHC 运行时或 Filter 常见的 stderr 关键字
+_OOM_MARKERS = (
+    "heap exhausted",
+    "out of memory",
+    "cannot allocate memory",
+    "memoryerror",
+    "failed to allocate",
+)
+
 
 class PandocIntegration:
     """Pandoc 工具集成"""
     
-    def __init__(self, pandoc_path: str = "pandoc"):
+    def __init__(self, pandoc_path: str = "pandoc", resource_limits: Optional[Dict[str, Any]] = None):
         # 测试 Pandoc 可执行文件路径
         cmd = [pandoc_path, "--version"]
         try:
-            startupinfo = None
-            creationflags = 0
-            if os.name == "nt":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                creationflags = subprocess.CREATE_NO_WINDOW
+            startupinfo, creationflags = self._startup_options()
             
             result = subprocess.run(
                 cmd,
@@ -51,6 +65,192 @@ class PandocIntegration:
         except Exception as e:
             raise PandocError(f"Pandoc Error: {e}")
         self.pandoc_path = pandoc_path
+        self.resource_limits: Dict[str, Any] = resource_limits or {}
+
+    def set_resource_limits(self, resource_limits: Optional[Dict[str, Any]]) -> None:
+        """
+        更新按作业类别划分的资源限制（结构见 DEFAULT_CONFIG["pandoc_resource_limits"]）
+        """
+        self.resource_limits = resource_limits or {}
+
+    @staticmethod
+    def _startup_options():
+        """Windows 下隐藏控制台窗口，返回 (startupinfo, creationflags)"""
+        startupinfo = None
+        creationflags = 0
+        if os.name == "nt":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            creationflags = subprocess.CREATE_NO_WINDOW
+        return startupinfo, creationflags
+
+    def _get_job_limits(self, job_class: str) -> Dict[str, Any]:
+        """
+        获取指定作业类别的资源限制，未知类别按 interactive 处理
+
+        Returns:
+            {"max_memory_mb": int, "max_cpu_seconds": int, "nice": int}，未启用时为空字典
+        """
+        limits = self.resource_limits or {}
+        if not limits.get("enabled", True):
+            return {}
+        job_limits = limits.get(job_class)
+        if not isinstance(job_limits, dict):
+            job_limits = limits.get("interactive")
+        return job_limits if isinstance(job_limits, dict) else {}
+
+    @staticmethod
+    def _apply_job_limits(cmd: List[str], job_limits: Dict[str, Any]) -> List[str]:
+        """
+        按作业限制改写命令行（不使用 preexec_fn：批量/分块转换从线程池启动 Pandoc，
+        fork 之后在子进程中执行 Python 代码可能死锁）
+
+        - 内存：以 GHC 运行时参数 +RTS -M 限制 Pandoc 自身的堆大小（所有平台），
+          Filter 子进程不受影响（mermaid-filter 等 Node/Chromium 进程需要远大于
+          此值的地址空间）
+        - CPU 时间与 nice（仅 POSIX）：通过 /bin/sh 的 ulimit 与 nice 设置后 exec Pandoc
+        """
+        if not job_limits:
+            return cmd
+
+        try:
+            max_memory_mb = int(job_limits.get("max_memory_mb") or 0)
+            max_cpu_seconds = int(job_limits.get("max_cpu_seconds") or 0)
+            nice = int(job_limits.get("nice") or 0)
+        except (TypeError, ValueError):
+            log(f"Invalid pandoc resource limits, ignored: {job_limits}")
+            return cmd
+
+        if max_memory_mb > 0:
+            cmd = [cmd[0], "+RTS", f"-M{max_memory_mb}m", "-RTS", *cmd[1:]]
+
+        if os.name != "posix" or (max_cpu_seconds <= 0 and nice <= 0):
+            return cmd
+
+        script = []
+        if max_cpu_seconds > 0:
+            soft, hard = max_cpu_seconds, max_cpu_seconds + 5
+            if resource is not None:
+                # 不能超过当前进程的硬上限，否则 ulimit 会失败
+                _, current_hard = resource.getrlimit(resource.RLIMIT_CPU)
+                if current_hard != resource.RLIM_INFINITY:
+                    soft, hard = min(soft, current_hard), min(hard, current_hard)
+            # 软限制触发 SIGXCPU，留出余量后硬限制触发 SIGKILL；设置失败时不限制
+            # 先降软限制再降硬限制（硬限制不能低于当前软限制）
+            script.append(f"ulimit -S -t {soft} 2>/dev/null; ulimit -H -t {hard} 2>/dev/null;")
+        if nice > 0:
+            script.append(f'exec nice -n {nice} "$0" "$@"')
+        else:
+            script.append('exec "$0" "$@"')
+        # 限制值都是整数，命令行参数经 "$0" "$@" 原样传递，不经过 shell 解析
+        return ["/bin/sh", "-c", " ".join(script), *cmd]
+
+    @staticmethod
+    def _children_cpu_seconds() -> Optional[float]:
+        """已回收子进程累计的 CPU 时间（用户态 + 内核态，秒）；非 POSIX 系统返回 None"""
+        if resource is None:
+            return None
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def _describe_limit_breach(
+        returncode: int, stderr_text: str, job_limits: Dict[str, Any], cpu_seconds: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        根据退出码与 stderr 判断是否因资源限制被终止
+
+        Args:
+            cpu_seconds: 本次运行消耗的 CPU 时间（无法获取时为 None）。SIGKILL 也可能来自
+                系统 OOM killer 或用户，只有 CPU 时间达到上限时才视为超出 CPU 限制
+
+        Returns:
+            超限描述文本；不是资源超限时返回 None
+        """
+        if not job_limits:
+            return None
+
+        max_memory_mb = job_limits.get("max_memory_mb") or 0
+        max_cpu_seconds = job_limits.get("max_cpu_seconds") or 0
+
+        if returncode < 0 and max_cpu_seconds:
+            sig = -returncode
+            sigxcpu = getattr(signal, "SIGXCPU", None)
+            sigkill = getattr(signal, "SIGKILL", None)
+            if sig == sigxcpu or (
+                sig == sigkill and cpu_seconds is not None and cpu_seconds >= max_cpu_seconds
+            ):
+                return f"exceeded the CPU time limit ({max_cpu_seconds}s)"
+
+        if max_memory_mb:
+            lowered = stderr_text.lower()
+            if any(marker in lowered for marker in _OOM_MARKERS):
+                return f"exceeded the memory limit ({max_memory_mb} MB)"
+
+        return None
+
+    def _run_pandoc(
+        self,
+        cmd: List[str],
+        input_bytes: bytes,
+        *,
+        cwd: Optional[str] = None,
+        job_class: str = "interactive",
+        error_label: str = "Pandoc error",
+        default_error: str = "Pandoc conversion failed",
+    ) -> bytes:
+        """
+        运行 Pandoc 进程：stdin 输入字节，返回 stdout 字节
+
+        Args:
+            cmd: 完整命令行
+            input_bytes: 写入 stdin 的内容
+            cwd: 工作目录（不存在时自动创建）
+            job_class: 作业类别，决定资源限制与优先级
+            error_label: 失败时的日志前缀
+            default_error: stderr 为空时的异常文本
+
+        Raises:
+            PandocResourceLimitError: 超出内存/CPU 限制被终止时
+            PandocError: 其他转换失败
+        """
+        startupinfo, creationflags = self._startup_options()
+
+        # 确保工作目录存在且可写
+        if cwd:
+            cwd = os.path.expandvars(cwd)
+            os.makedirs(cwd, exist_ok=True)
+
+        job_limits = self._get_job_limits(job_class)
+        cpu_before = self._children_cpu_seconds()
+
+        # 关键：input 直接传 UTF-8 字节；text=False 以得到二进制 stdout
+        result = subprocess.run(
+            self._apply_job_limits(cmd, job_limits),
+            input=input_bytes,
+            capture_output=True,
+            text=False,
+            shell=False,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            cwd=cwd,
+        )
+        if result.returncode != 0:
+            # stderr 可能是字节，转成字符串便于日志查看
+            err = (result.stderr or b"").decode("utf-8", "ignore")
+            # 并发转换时包含同时结束的其他 Pandoc 进程，只会偏大
+            cpu_after = self._children_cpu_seconds()
+            cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+            breach = self._describe_limit_breach(result.returncode, err, job_limits, cpu_seconds)
+            if breach:
+                log(f"{error_label}: {job_class} job {breach} (exit code {result.returncode}): {err}")
+                raise PandocResourceLimitError(f"Pandoc {job_class} job {breach}")
+            if result.returncode < 0 and not err:
+                err = f"Pandoc was killed by signal {-result.returncode}"
+            log(f"{error_label}: {err}")
+            raise PandocError(err or default_error)
+
+        return result.stdout
 
     def _build_filter_args(self, custom_filters: Optional[List[str]] = None) -> List[str]:
         """
@@ -88,9 +288,21 @@ class PandocIntegration:
         
         return filter_args
 
-    def _convert_html_to_md(self, html_text: str) -> str:
+    @staticmethod
+    def _build_resource_path_args(resource_paths: Optional[List[str]] = None) -> List[str]:
+        """
+        构建 --resource-path 参数：在默认的工作目录（"."）之后追加额外的查找目录
+        （如 blob 目录，存放从 data URI 提取出的图片）
+        """
+        if not resource_paths:
+            return []
+        return ["--resource-path", os.pathsep.join([".", *resource_paths])]
+
+    def _convert_html_to_md(self, html_text: Union[str, HtmlDocument], job_class: str = "interactive") -> str:
         """
         使用 Pandoc 将 HTML 转换为 Markdown。
+
+        传入 HtmlDocument 时在其已有解析树上保护任务列表标记，不再重复解析。
         """
         html_text = protect_task_list_brackets(html_text)
         cmd = [
@@ -101,29 +313,16 @@ class PandocIntegration:
             "--wrap", "none",   # 不自动换行，方便你后处理
         ]
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        result = subprocess.run(
+        stdout = self._run_pandoc(
             cmd,
-            input=html_text.encode("utf-8"),  # 显式用 UTF-8 编码
-            capture_output=True,
-            text=False,                       # 二进制模式
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            html_text.encode("utf-8"),  # 显式用 UTF-8 编码
+            job_class=job_class,
+            error_label="Pandoc HTML to MD error",
+            default_error="Pandoc HTML to Markdown conversion failed",
         )
-        if result.returncode != 0:
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc HTML to MD error: {err}")
-            raise PandocError(err or "Pandoc HTML to Markdown conversion failed")
 
         # stdout 也是 bytes，自行按 UTF-8 解码
-        md = result.stdout.decode("utf-8", "ignore")
+        md = stdout.decode("utf-8", "ignore")
         md = md.replace('\r\n', '\n').replace('\r', '\n')  # 统一换行符
         md = re.sub(r'```\s*math\s*\n(.*?)\n\s*```', r'$$\n\1\n$$', md, flags=re.DOTALL)
         md = re.sub(r'\$\s*`([^`]+)`\s*\$', r'$\1$', md)
@@ -134,11 +333,11 @@ class PandocIntegration:
         md = md.replace("{{TASK_CHECKED}}", "[x]").replace("{{TASK_UNCHECKED}}", "[ ]")
         return md
 
-    def convert_html_to_markdown_text(self, html_text: str) -> str:
+    def convert_html_to_markdown_text(self, html_text: Union[str, HtmlDocument], job_class: str = "interactive") -> str:
         """
         将 HTML 转换为 Markdown 文本（保留 $...$ 数学语法）。
         """
-        return self._convert_html_to_md(html_text)
+        return self._convert_html_to_md(html_text, job_class=job_class)
 
     def convert_markdown_to_html_text(
         self,
@@ -148,6 +347,7 @@ class PandocIntegration:
         enable_latex_replacements: bool = True,
         custom_filters: Optional[List[str]] = None,
         cwd: Optional[str] = None,
+        job_class: str = "interactive",
     ) -> str:
         """
         将 Markdown 转换为 HTML 文本（用于富文本粘贴）。
@@ -170,34 +370,15 @@ class PandocIntegration:
             cmd += ["--lua-filter", LUA_KEEP_ORIGINAL_FORMULA]
         cmd += self._build_filter_args(custom_filters)
 
-        # 确保工作目录存在且可写
-        if cwd:
-            cwd = os.path.expandvars(cwd)
-            os.makedirs(cwd, exist_ok=True)
-
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        result = subprocess.run(
+        stdout = self._run_pandoc(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
             cwd=cwd,
+            job_class=job_class,
+            error_label="Pandoc Markdown to HTML error",
+            default_error="Pandoc Markdown to HTML conversion failed",
         )
-        if result.returncode != 0:
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc Markdown to HTML error: {err}")
-            raise PandocError(err or "Pandoc Markdown to HTML conversion failed")
-
-        return result.stdout.decode("utf-8", "ignore")
+        return stdout.decode("utf-8", "ignore")
 
     def convert_markdown_to_rtf_bytes(
         self,
@@ -207,6 +388,7 @@ class PandocIntegration:
         enable_latex_replacements: bool = True,
         custom_filters: Optional[List[str]] = None,
         cwd: Optional[str] = None,
+        job_class: str = "interactive",
     ) -> bytes:
         """
         将 Markdown 转换为 RTF 字节（用于富文本粘贴兜底）。
@@ -224,36 +406,16 @@ class PandocIntegration:
             cmd += ["--lua-filter", LUA_KEEP_ORIGINAL_FORMULA]
         cmd += self._build_filter_args(custom_filters)
 
-        # 确保工作目录存在且可写
-        if cwd:
-            cwd = os.path.expandvars(cwd)
-            os.makedirs(cwd, exist_ok=True)
-
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        result = subprocess.run(
+        return self._run_pandoc(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
             cwd=cwd,
+            job_class=job_class,
+            error_label="Pandoc Markdown to RTF error",
+            default_error="Pandoc Markdown to RTF conversion failed",
         )
-        if result.returncode != 0:
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc Markdown to RTF error: {err}")
-            raise PandocError(err or "Pandoc Markdown to RTF conversion failed")
-
-        return result.stdout
 
-    def convert_to_docx_bytes(self, md_text: str, reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, cwd: Optional[str] = None) -> bytes:
+    def convert_to_docx_bytes(self, md_text: str, reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, cwd: Optional[str] = None, job_class: str = "interactive", highlight: bool = True, resource_paths: Optional[List[str]] = None) -> bytes:
         """
         用 stdin 喂入 Markdown，直接把 DOCX 从 stdout 读到内存（无任何输入文件写盘）
         
@@ -264,6 +426,9 @@ class PandocIntegration:
             enable_latex_replacements: 是否启用 LaTeX 替换
             custom_filters: 自定义 Filter 列表
             cwd: Pandoc 进程的工作目录，用于 Filter 创建临时文件（如 mermaid-filter.err）
+            job_class: 作业类别（interactive/batch），决定资源限制与优先级
+            highlight: 是否对代码块做语法高亮（关闭可加快大量代码块的转换）
+            resource_paths: 除工作目录外查找图片等资源的目录
             
         Returns:
             DOCX 文件的字节流
@@ -273,8 +438,8 @@ class PandocIntegration:
             "-f", "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
             "-t", "docx",
             "-o", "-",
-            "--highlight-style", "tango",
         ]
+        cmd += ["--highlight-style", "tango"] if highlight else ["--no-highlight"]
         if enable_latex_replacements:
             cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
         if Keep_original_formula:
@@ -283,49 +448,31 @@ class PandocIntegration:
         cmd += self._build_filter_args(custom_filters)
         if reference_docx:
             cmd += ["--reference-doc", reference_docx]
+        cmd += self._build_resource_path_args(resource_paths)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        # 确保工作目录存在且可写
-        if cwd:
-            cwd = os.path.expandvars(cwd)
-            os.makedirs(cwd, exist_ok=True)
-
-        # 关键：input 直接传 UTF-8 字节；text=False 以得到二进制 stdout
-        result = subprocess.run(
+        return self._run_pandoc(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
             cwd=cwd,
+            job_class=job_class,
+            error_label="Pandoc error",
+            default_error="Pandoc conversion failed",
         )
-        if result.returncode != 0:
-            # stderr 可能是字节，转成字符串便于日志查看
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc error: {err}")
-            raise PandocError(err or "Pandoc conversion failed")
 
-        return result.stdout
-
-    def convert_html_to_docx_bytes(self, html_text: str, reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, cwd: Optional[str] = None) -> bytes:
+    def convert_html_to_docx_bytes(self, html_text: Union[str, HtmlDocument], reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, cwd: Optional[str] = None, job_class: str = "interactive", highlight: bool = True, resource_paths: Optional[List[str]] = None) -> bytes:
         """
         用 stdin 喂入 HTML，直接把 DOCX 从 stdout 读到内存（无任何输入文件写盘）
         
         Args:
-            html_text: HTML 文本内容
+            html_text: HTML 文本内容（或本次作业共享的 HtmlDocument，按需序列化）
             reference_docx: 可选的参考文档模板路径
             Keep_original_formula: 是否保留原始公式
             enable_latex_replacements: 是否启用 LaTeX 替换
             custom_filters: 自定义 Filter 列表
             cwd: Pandoc 进程的工作目录，某些 Filter 可能会在此目录下创建临时文件（如 mermaid-filter.err）
+            job_class: 作业类别（interactive/batch），决定资源限制与优先级
+            highlight: 是否对代码块做语法高亮（关闭可加快大量代码块的转换）
+            resource_paths: 除工作目录外查找图片等资源的目录
             
         Returns:
             DOCX 文件的字节流
@@ -334,7 +481,7 @@ class PandocIntegration:
             PandocError: 转换失败时
         """
         if Keep_original_formula:
-            md = self._convert_html_to_md(html_text)
+            md = self._convert_html_to_md(html_text, job_class=job_class)
             return self.convert_to_docx_bytes(
                     md_text=md,
                     reference_docx=reference_docx,
@@ -342,6 +489,9 @@ class PandocIntegration:
                     enable_latex_replacements=enable_latex_replacements,
                     custom_filters=custom_filters,
                     cwd=cwd,
+                    job_class=job_class,
+                    highlight=highlight,
+                    resource_paths=resource_paths,
                 )
         
         cmd = [
@@ -349,42 +499,21 @@ class PandocIntegration:
             "-f", "html+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
             "-t", "docx",
             "-o", "-",
-            "--highlight-style", "tango",
         ]
+        cmd += ["--highlight-style", "tango"] if highlight else ["--no-highlight"]
         if enable_latex_replacements:
             cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
         # 添加自定义 Filter
         cmd += self._build_filter_args(custom_filters)
         if reference_docx:
             cmd += ["--reference-doc", reference_docx]
+        cmd += self._build_resource_path_args(resource_paths)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        # 确保工作目录存在且可写
-        if cwd:
-            cwd = os.path.expandvars(cwd)
-            os.makedirs(cwd, exist_ok=True)
-
-        # 关键：input 直接传 UTF-8 字节；text=False 以得到二进制 stdout
-        result = subprocess.run(
+        return self._run_pandoc(
             cmd,
-            input=html_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            as_html_text(html_text).encode("utf-8"),
             cwd=cwd,
+            job_class=job_class,
+            error_label="Pandoc HTML conversion error",
+            default_error="Pandoc HTML conversion failed",
         )
-        if result.returncode != 0:
-            # stderr 可能是字节，转成字符串便于日志查看
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc HTML conversion error: {err}")
-            raise PandocError(err or "Pandoc HTML conversion failed")
-
-        return result.stdout
@@ -39,6 +39,9 @@ class TrayMenuManager:
         self.restart_hotkey_callback = None  # 将由外部设置
         self.pause_hotkey_callback = None  # 暂停热键监听
         self.resume_hotkey_callback = None  # 恢复热键监听
+        self.finish_collection_callback = None  # 完成收集并输出
+        self.discard_collection_callback = None  # 丢弃已收集片段，返回数量
+        self.collected_count_callback = None  # 查询已收集片段数
         self.version_checker = None  # 将由外部设置或按需创建
         self.latest_version = None  # 存储最新版本号
         self.latest_release_url = None  # 存储最新版本的下载链接
@@ -57,6 +60,12 @@ class TrayMenuManager:
         """设置恢复热键的回调函数"""
         self.resume_hotkey_callback = callback
     
+    def set_collector_callbacks(self, finish, discard, count):
+        """设置收集模式的回调函数（完成、丢弃、查询数量）"""
+        self.finish_collection_callback = finish
+        self.discard_collection_callback = discard
+        self.collected_count_callback = count
+    
     def build_menu(self) -> pystray.Menu:
         """构建托盘菜单"""
         config = app_state.config
@@ -116,6 +125,7 @@ class TrayMenuManager:
 
         return pystray.Menu(
             *normal_menu_items,
+            self._build_collector_menu(),
             self._build_no_app_action_menu(),
             self._build_html_formatting_menu(),
             pystray.Menu.SEPARATOR,
@@ -404,6 +414,62 @@ class TrayMenuManager:
             ),
         )
 
+    def _build_collector_menu(self) -> pystray.MenuItem:
+        """构建收集模式子菜单"""
+        return pystray.MenuItem(
+            t("tray.menu.collector"),
+            pystray.Menu(
+                pystray.MenuItem(
+                    t("tray.menu.collector_toggle"),
+                    self._on_toggle_collector,
+                    checked=lambda item: app_state.collecting,
+                ),
+                pystray.MenuItem(
+                    t("tray.menu.collector_finish"),
+                    self._on_finish_collection,
+                    enabled=lambda item: self._collected_count() > 0,
+                ),
+                pystray.MenuItem(
+                    t("tray.menu.collector_discard"),
+                    self._on_discard_collection,
+                    enabled=lambda item: self._collected_count() > 0,
+                ),
+            ),
+        )
+
+    def _collected_count(self) -> int:
+        if self.collected_count_callback is None:
+            return 0
+        try:
+            return self.collected_count_callback()
+        except Exception as e:
+            log(f"Failed to get collected snippet count: {e}")
+            return 0
+
+    def _on_toggle_collector(self, icon, item):
+        """切换收集模式（关闭时保留已收集的片段）"""
+        app_state.collecting = not app_state.collecting
+        icon.menu = self.build_menu()
+        if app_state.collecting:
+            status = t("tray.status.collector_on")
+        else:
+            status = t("tray.status.collector_off", count=self._collected_count())
+        self.notification_manager.notify("PasteMD", status, ok=True)
+
+    def _on_finish_collection(self, icon, item):
+        """完成收集：一次转换全部片段并插入/输出"""
+        if self.finish_collection_callback:
+            self.finish_collection_callback()
+        icon.menu = self.build_menu()
+
+    def _on_discard_collection(self, icon, item):
+        """丢弃已收集的片段"""
+        count = self.discard_collection_callback() if self.discard_collection_callback else 0
+        icon.menu = self.build_menu()
+        self.notification_manager.notify(
+            "PasteMD", t("tray.status.collector_discarded", count=count), ok=True
+        )
+
     def _build_no_app_action_menu(self) -> pystray.MenuItem:
         """构建无应用时动作子菜单"""
         return pystray.MenuItem(
@@ -0,0 +1,135 @@
+"""Batch conversion of multiple Markdown files into separate DOCX documents."""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ...utils.logging import log
+from ..preprocessor import MarkdownPreprocessor
+from .generator import DocumentGenerator
+
+
+@dataclass
+class BatchResult:
+    """
+    单个文件的转换结果
+
+    Attributes:
+        index: 在输入列表中的序号
+        source_filename: 来源文件名
+        docx_bytes: 转换结果；失败时为 None
+        error: 失败原因；成功时为 None
+        elapsed_ms: 预处理 + 转换耗时
+    """
+    index: int
+    source_filename: str
+    docx_bytes: Optional[bytes] = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.docx_bytes is not None
+
+
+def resolve_batch_workers(config: dict, file_count: int) -> int:
+    """
+    计算并发转换数：batch_conversion.max_workers 为 0 时按 CPU 核数，且不超过文件数
+    """
+    settings = config.get("batch_conversion")
+    max_workers = settings.get("max_workers", 0) if isinstance(settings, dict) else 0
+    try:
+        max_workers = int(max_workers)
+    except (TypeError, ValueError):
+        max_workers = 0
+    if max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(max_workers, file_count))
+
+
+class BatchConverter:
+    """
+    多文件批量转换
+
+    每个文件单独预处理并转换为 DOCX，在线程池中并发执行（每个线程驱动一个
+    Pandoc 进程），按完成顺序产出结果，调用方可边转换边输出。
+    """
+
+    def __init__(
+        self,
+        doc_generator: Optional[DocumentGenerator] = None,
+        preprocessor: Optional[MarkdownPreprocessor] = None,
+    ) -> None:
+        self._doc_generator = doc_generator or DocumentGenerator()
+        self._preprocessor = preprocessor or MarkdownPreprocessor()
+
+    def convert_markdown_files(
+        self, files_data: List[Tuple[str, str]], config: dict
+    ) -> Iterator[BatchResult]:
+        """
+        并发转换多个 Markdown 文件
+
+        Args:
+            files_data: [(filename, content), ...]
+            config: 配置字典
+
+        Yields:
+            BatchResult，按完成顺序；提前结束迭代时取消尚未开始的转换
+        """
+        if not files_data:
+            return
+
+        workers = resolve_batch_workers(config, len(files_data))
+        total = len(files_data)
+        log(f"Batch converting {total} Markdown files with {workers} workers")
+        start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="md-batch")
+        try:
+            pending: Dict[Future, int] = {
+                executor.submit(self._convert_one, index, filename, content, config): index
+                for index, (filename, content) in enumerate(files_data)
+            }
+            done_count = 0
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                    result = future.result()
+                    done_count += 1
+                    if result.ok:
+                        log(
+                            f"Batch item {done_count}/{total} converted: "
+                            f"{result.source_filename} ({result.elapsed_ms:.0f}ms)"
+                        )
+                    else:
+                        log(
+                            f"Batch item {done_count}/{total} failed: "
+                            f"{result.source_filename}: {result.error}"
+                        )
+                    yield result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            log(f"Batch conversion finished in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def _convert_one(self, index: int, filename: str, content: str, config: dict) -> BatchResult:
+        """转换单个文件；异常转为失败结果，不影响其他文件"""
+        start = time.perf_counter()
+        try:
+            md_text = self._preprocessor.process(content, config)
+            docx_bytes = self._doc_generator.convert_markdown_to_docx_bytes(
+                md_text, config, job_class="batch"
+            )
+            return BatchResult(
+                index, filename, docx_bytes=docx_bytes,
+                elapsed_ms=(time.perf_counter() - start) * 1000,
+            )
+        except Exception as e:
+            return BatchResult(
+                index, filename, error=str(e) or type(e).__name__,
+                elapsed_ms=(time.perf_counter() - start) * 1000,
+            )
@@ -0,0 +1,323 @@
+"""Latency cost model for DOCX conversions.
+
+Learns from past conversions how long Pandoc and DOCX post-processing take
+for a given input, and picks cheaper options for hotkey pastes that would
+otherwise miss the configured latency target.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from ...config.paths import get_cache_dir
+from ...utils.logging import log
+from ...utils.md_index import BLOCK_FENCE, BLOCK_MATH, BLOCK_TABLE, MarkdownIndex, build_markdown_index
+
+# 特征顺序：常数项、输入大小(KB)、表格数、公式数、代码块数、Filter 数、是否高亮
+FEATURE_NAMES = ("bias", "size_kb", "tables", "math", "code_blocks", "filters", "highlight")
+
+# 降级手段，按对输出质量的影响从小到大排列
+DEGRADE_SKIP_HIGHLIGHT = "skip_highlight"
+DEGRADE_SKIP_POSTPROCESS = "skip_postprocess"
+
+_HTML_TABLE_RE = re.compile(r"<table\b", re.IGNORECASE)
+_HTML_CODE_RE = re.compile(r"<pre\b", re.IGNORECASE)
+_HTML_MATH_RE = re.compile(
+    r"<math\b|class=\"[^\"]*\b(?:katex|math|MathJax)\b|type=\"math/tex", re.IGNORECASE
+)
+
+# 遗忘因子：让模型跟随机器负载/Pandoc 版本的变化
+_FORGETTING = 0.98
+# 模型写盘的最短间隔（秒）
+_SAVE_INTERVAL_S = 30.0
+# 岭回归正则项，避免样本较少时方程组奇异
+_RIDGE = 1e-3
+
+
+def extract_features(
+    text: str,
+    source_format: str,
+    filter_count: int,
+    highlight: bool,
+    md_index: Optional[MarkdownIndex] = None,
+) -> List[float]:
+    """
+    从输入文本提取代价特征
+
+    Args:
+        text: Markdown 或 HTML 文本
+        source_format: "markdown" 或 "html"
+        filter_count: 本次转换使用的 Lua/自定义 Filter 数量
+        highlight: 是否启用代码高亮
+        md_index: Markdown 的块索引（可选，未提供时现场构建）
+
+    Returns:
+        与 FEATURE_NAMES 顺序一致的特征向量
+    """
+    size_kb = len(text.encode("utf-8", errors="ignore")) / 1024.0
+    if source_format == "html":
+        tables = len(_HTML_TABLE_RE.findall(text))
+        code_blocks = len(_HTML_CODE_RE.findall(text))
+        math = len(_HTML_MATH_RE.findall(text))
+    else:
+        if md_index is None:
+            md_index = build_markdown_index(text)
+        tables = md_index.counts[BLOCK_TABLE]
+        code_blocks = md_index.counts[BLOCK_FENCE]
+        math = md_index.counts[BLOCK_MATH] + md_index.inline_math
+    return [
+        1.0,
+        size_kb,
+        float(tables),
+        float(math),
+        float(code_blocks),
+        float(filter_count),
+        1.0 if highlight else 0.0,
+    ]
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> Optional[List[float]]:
+    """高斯消元求解线性方程组，奇异时返回 None"""
+    n = len(vector)
+    a = [row[:] + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(col + 1, n):
+            factor = a[r][col] / a[col][col]
+            if factor:
+                for c in range(col, n + 1):
+                    a[r][c] -= factor * a[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (a[r][n] - sum(a[r][c] * x[c] for c in range(r + 1, n))) / a[r][r]
+    return x
+
+
+class _OnlineRegression:
+    """带遗忘因子的在线最小二乘（累积正规方程）"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.xtx = [[0.0] * dim for _ in range(dim)]
+        self.xty = [0.0] * dim
+        self.samples = 0
+        # 各特征取值为 0 的样本数：开关类特征只取过一个值时，其系数与常数项无法区分
+        self.zero_samples = [0] * dim
+        self._weights: Optional[List[float]] = None
+
+    def update(self, features: Sequence[float], value: float) -> None:
+        for i in range(self.dim):
+            self.xty[i] = self.xty[i] * _FORGETTING + features[i] * value
+            row = self.xtx[i]
+            for j in range(self.dim):
+                row[j] = row[j] * _FORGETTING + features[i] * features[j]
+            if not features[i]:
+                self.zero_samples[i] += 1
+        self.samples += 1
+        self._weights = None
+
+    def identified(self, index: int, min_samples: int) -> bool:
+        """开关类特征的两种取值是否都已有至少 min_samples 个样本"""
+        zeros = self.zero_samples[index]
+        return zeros >= min_samples and self.samples - zeros >= min_samples
+
+    def predict(self, features: Sequence[float]) -> Optional[float]:
+        if self._weights is None:
+            regularized = [
+                [v + (_RIDGE if i == j else 0.0) for j, v in enumerate(row)]
+                for i, row in enumerate(self.xtx)
+            ]
+            self._weights = _solve(regularized, self.xty)
+        if self._weights is None:
+            return None
+        return max(0.0, sum(w * f for w, f in zip(self._weights, features)))
+
+    def to_dict(self) -> Dict:
+        return {"xtx": self.xtx, "xty": self.xty, "samples": self.samples, "zero_samples": self.zero_samples}
+
+    @classmethod
+    def from_dict(cls, dim: int, data: Dict) -> "_OnlineRegression":
+        model = cls(dim)
+        xtx, xty = data.get("xtx"), data.get("xty")
+        if (
+            isinstance(xtx, list) and len(xtx) == dim and all(isinstance(r, list) and len(r) == dim for r in xtx)
+            and isinstance(xty, list) and len(xty) == dim
+        ):
+            model.xtx = [[float(v) for v in row] for row in xtx]
+            model.xty = [float(v) for v in xty]
+            model.samples = int(data.get("samples", 0))
+            # 旧版本的模型没有记录：按从未观察到 0 处理
+            zero_samples = data.get("zero_samples")
+            if isinstance(zero_samples, list) and len(zero_samples) == dim:
+                model.zero_samples = [int(v) for v in zero_samples]
+        return model
+
+
+@dataclass
+class ConversionPlan:
+    """一次转换的执行计划"""
+    features: List[float]
+    highlight: bool = True
+    postprocess: bool = True
+    predicted_ms: Optional[float] = None
+    degradations: List[str] = field(default_factory=list)
+
+
+class ConversionCostModel:
+    """
+    转换耗时代价模型
+
+    分别学习 Pandoc 转换耗时与 DOCX 后处理耗时，模型持久化在用户缓存目录，
+    重启后继续沿用。
+    """
+
+    def __init__(self, model_path: Optional[str] = None):
+        self._model_path = model_path
+        self._lock = threading.Lock()
+        self._pandoc = _OnlineRegression(len(FEATURE_NAMES))
+        self._postprocess = _OnlineRegression(len(FEATURE_NAMES))
+        self._loaded = False
+        # 模型按间隔写盘，未写入的更新在退出时保存
+        self._dirty = False
+        self._last_save: Optional[float] = None
+        atexit.register(self.flush)
+
+    @property
+    def model_path(self) -> str:
+        if self._model_path is None:
+            self._model_path = os.path.join(get_cache_dir(), "cost_model.json")
+        return self._model_path
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.model_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("features") == list(FEATURE_NAMES):
+                dim = len(FEATURE_NAMES)
+                self._pandoc = _OnlineRegression.from_dict(dim, data.get("pandoc", {}))
+                self._postprocess = _OnlineRegression.from_dict(dim, data.get("postprocess", {}))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log(f"Failed to load conversion cost model: {e}")
+
+    def _save(self) -> None:
+        """写盘（调用方持有锁）"""
+        self._dirty = False
+        self._last_save = time.monotonic()
+        data = {
+            "features": list(FEATURE_NAMES),
+            "pandoc": self._pandoc.to_dict(),
+            "postprocess": self._postprocess.to_dict(),
+        }
+        try:
+            tmp_path = f"{self.model_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.model_path)
+        except Exception as e:
+            log(f"Failed to save conversion cost model: {e}")
+
+    def plan(
+        self,
+        features: List[float],
+        target_ms: float,
+        min_samples: int,
+        allow_postprocess_skip: bool = True,
+        min_saving: float = 0.3,
+    ) -> ConversionPlan:
+        """
+        预测耗时，超出目标时选择影响最小的降级方案
+
+        降级后预测能达到目标，或至少比完整质量节省 min_saving 比例时才降级；
+        样本不足时不做预测，按完整质量执行。关闭高亮的转换积累到 min_samples 次之前，
+        高亮的耗时无法从常数项中区分出来，不提供关闭高亮的降级。
+        """
+        plan = ConversionPlan(features=list(features))
+        with self._lock:
+            self._ensure_loaded()
+            if self._pandoc.samples < min_samples:
+                return plan
+
+            def predict(highlight: bool, postprocess: bool) -> Optional[float]:
+                x = list(features)
+                x[FEATURE_NAMES.index("highlight")] = 1.0 if highlight else 0.0
+                pandoc_ms = self._pandoc.predict(x)
+                if pandoc_ms is None:
+                    return None
+                post_ms = self._postprocess.predict(x) if postprocess else 0.0
+                return pandoc_ms + (post_ms or 0.0)
+
+            full_ms = predict(True, True)
+            plan.predicted_ms = full_ms
+            if full_ms is None or full_ms <= target_ms:
+                return plan
+
+            # 候选降级按对质量的影响从小到大排列：
+            # 1. 关闭代码高亮（仅在有代码块且高亮的耗时已可估计时） 2. 再跳过 DOCX 样式后处理
+            candidates = []
+            highlight = True
+            if (
+                features[FEATURE_NAMES.index("code_blocks")] > 0
+                and self._pandoc.identified(FEATURE_NAMES.index("highlight"), min_samples)
+            ):
+                highlight = False
+                candidates.append((False, True, [DEGRADE_SKIP_HIGHLIGHT]))
+            if allow_postprocess_skip:
+                degradations = [DEGRADE_SKIP_HIGHLIGHT] if not highlight else []
+                candidates.append((highlight, False, degradations + [DEGRADE_SKIP_POSTPROCESS]))
+
+            # 只在降级后能达到目标，或至少节省 min_saving 比例的耗时时才降级；
+            # 否则降级只会损失质量而仍然达不到目标
+            predicted = [(predict(h, p), h, p, d) for h, p, d in candidates]
+            chosen = next(
+                (c for c in predicted if c[0] is not None and c[0] <= target_ms), None
+            ) or next(
+                (c for c in predicted if c[0] is not None and c[0] <= full_ms * (1 - min_saving)), None
+            )
+            if chosen is not None:
+                plan.predicted_ms, plan.highlight, plan.postprocess, plan.degradations = (
+                    chosen[0], chosen[1], chosen[2], list(chosen[3])
+                )
+
+        return plan
+
+    def predict_pandoc_ms(self, features: List[float], min_samples: int) -> Optional[float]:
+        """预测 Pandoc 转换耗时；样本不足时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._pandoc.samples < min_samples:
+                return None
+            return self._pandoc.predict(features)
+
+    def record(self, plan: ConversionPlan, pandoc_ms: float, postprocess_ms: Optional[float]) -> None:
+        """记录一次实际耗时，更新模型"""
+        x = list(plan.features)
+        x[FEATURE_NAMES.index("highlight")] = 1.0 if plan.highlight else 0.0
+        with self._lock:
+            self._ensure_loaded()
+            self._pandoc.update(x, pandoc_ms)
+            if postprocess_ms is not None:
+                self._postprocess.update(x, postprocess_ms)
+            self._dirty = True
+            if self._last_save is None or time.monotonic() - self._last_save >= _SAVE_INTERVAL_S:
+                self._save()
+
+    def flush(self) -> None:
+        """保存尚未写盘的模型更新"""
+        with self._lock:
+            if self._dirty:
+                self._save()
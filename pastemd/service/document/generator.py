@@ -1,15 +1,38 @@
 """Document generator - centralized DOCX generation and conversion."""
 
-from typing import Optional
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 
 from ...integrations.pandoc import PandocIntegration
+from ...utils.blob_store import blob_store_settings, get_blob_store
 from ...utils.docx_processor import DocxProcessor
+from ...utils.docx_session import merge_docx_documents
+from ...utils.html_document import HtmlDocument, as_html_text
+from ...utils.md_index import MarkdownIndex
+from ...utils.image_optimizer import (
+    ImageOptimizeOptions,
+    get_image_optimizer,
+    image_optimization_settings,
+    replace_markdown_image_targets,
+    resolve_local_image,
+)
+from ...utils.reference_docx import ReferenceDocxCache
+from .cost_model import ConversionCostModel, ConversionPlan, extract_features
+from ..preprocessor.tiers import TIER_HUGE, TIER_SMALL, html_tier_settings
 from ...utils.logging import log
+from ...utils.perf import StageSample, record_stage
 from ...core.state import app_state
 from ...core.errors import PandocError
 from ...config.defaults import DEFAULT_CONFIG
 from ...config.loader import ConfigLoader
 
+# html_size_tiers.max_workers 为 0 时同时转换的块数上限
+_DEFAULT_CHUNK_WORKERS = 4
+
 
 class DocumentGenerator:
     """
@@ -26,21 +49,47 @@ class DocumentGenerator:
     
     def __init__(self) -> None:
         self._pandoc_integration: Optional[PandocIntegration] = None
+        # 批量转换时多个线程可能同时触发初始化
+        self._init_lock = threading.Lock()
+        self._reference_cache = ReferenceDocxCache()
+        self._cost_model = ConversionCostModel()
+
+    def _resolve_reference_docx(self, config: dict) -> Optional[str]:
+        """
+        获取传给 Pandoc 的参考文档路径
+
+        启用 slim_reference_docx 时使用按内容哈希缓存的精简副本，
+        模板修改后会自动重新生成。
+        """
+        reference_docx = config.get("reference_docx")
+        if reference_docx and config.get("slim_reference_docx", True):
+            return self._reference_cache.resolve(reference_docx)
+        return reference_docx
     
-    def _ensure_pandoc_integration(self) -> None:
+    def _ensure_pandoc_integration(self, config: Optional[dict] = None) -> None:
         """
         确保 Pandoc 集成已初始化
         
         优先使用 app_state.config["pandoc_path"]，
         失败后回退到 DEFAULT_CONFIG["pandoc_path"]，
         并回写 app_state.config["pandoc_path"] 并保存配置。
+        每次调用都会按 config 刷新资源限制，使配置修改实时生效。
         
         Raises:
             PandocError: 如果 Pandoc 初始化失败
         """
-        if self._pandoc_integration is not None:
-            return
-        
+        if self._pandoc_integration is None:
+            with self._init_lock:
+                if self._pandoc_integration is None:
+                    self._init_pandoc_integration()
+
+        limits = (config or app_state.config).get("pandoc_resource_limits")
+        self._pandoc_integration.set_resource_limits(  # type: ignore[union-attr]
+            limits if isinstance(limits, dict) else None
+        )
+
+    def _init_pandoc_integration(self) -> None:
+        """创建 PandocIntegration，失败时回退到默认路径"""
         pandoc_path = app_state.config.get("pandoc_path", "pandoc")
         try:
             self._pandoc_integration = PandocIntegration(pandoc_path)
@@ -60,13 +109,18 @@ class DocumentGenerator:
                 self._pandoc_integration = None
                 raise PandocError(f"Pandoc initialization failed: {e2}")
     
-    def convert_markdown_to_docx_bytes(self, md_text: str, config: dict) -> bytes:
+    def convert_markdown_to_docx_bytes(
+        self, md_text: str, config: dict, *, job_class: str = "interactive",
+        md_index: Optional[MarkdownIndex] = None,
+    ) -> bytes:
         """
         将 Markdown 文本转换为 DOCX 字节流
         
         Args:
             md_text: 预处理后的 Markdown 文本
             config: 配置字典
+            job_class: 作业类别（interactive/batch），决定 Pandoc 资源限制
+            md_index: 调用方已构建的块索引（用于代价特征，避免重复扫描）
             
         Returns:
             DOCX 文件的字节流
@@ -77,34 +131,20 @@ class DocumentGenerator:
         Note:
             调用方应该先使用 MarkdownPreprocessor 处理 md_text
         """
-        # 1. 转换为 DOCX 字节流
-        self._ensure_pandoc_integration()
-        docx_bytes = self._pandoc_integration.convert_to_docx_bytes(
-            md_text=md_text,
-            reference_docx=config.get("reference_docx"),
-            Keep_original_formula=config.get("Keep_original_formula", False),
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=config.get("pandoc_filters", []),
-            cwd=config.get("save_dir"),
+        return self._convert_to_docx(
+            md_text, "markdown", config, job_class, "md_disable_first_para_indent", md_index
         )
-        
-        # 2. 处理 DOCX 样式
-        if config.get("md_disable_first_para_indent", True):
-            docx_bytes = DocxProcessor.apply_custom_processing(
-                docx_bytes,
-                disable_first_para_indent=True,
-                target_style="Body Text"
-            )
-        
-        return docx_bytes
     
-    def convert_html_to_docx_bytes(self, html_text: str, config: dict) -> bytes:
+    def convert_html_to_docx_bytes(
+        self, html_text: Union[str, HtmlDocument], config: dict, *, job_class: str = "interactive"
+    ) -> bytes:
         """
         将 HTML 文本转换为 DOCX 字节流
         
         Args:
-            html_text: HTML 文本
+            html_text: HTML 文本，或预处理返回的 HtmlDocument（复用其解析树，按需序列化）
             config: 配置字典
+            job_class: 作业类别（interactive/batch），决定 Pandoc 资源限制
             
         Returns:
             DOCX 文件的字节流
@@ -112,35 +152,318 @@ class DocumentGenerator:
         Raises:
             PandocError: 转换失败时
         """
+        return self._convert_to_docx(
+            html_text, "html", config, job_class, "html_disable_first_para_indent"
+        )
+
+    @staticmethod
+    def _blob_resource_paths(config: dict) -> Optional[List[str]]:
+        """预处理把 data URI 图片移到 blob 目录时，让 Pandoc 也在该目录查找图片"""
+        if not blob_store_settings(config).get("enabled", True):
+            return None
+        return [get_blob_store().directory]
+
+    @staticmethod
+    def _cleanup_caches(config: dict) -> None:
+        """按保存期限与总大小清理 blob 目录与图片优化缓存（节流，转换完成后执行）"""
+        for settings, store, default_enabled in (
+            (blob_store_settings(config), get_blob_store, True),
+            (image_optimization_settings(config), lambda: get_image_optimizer().cache, False),
+        ):
+            if not settings.get("enabled", default_enabled):
+                continue
+            try:
+                store().maybe_cleanup(
+                    float(settings.get("max_age_days", 7)),
+                    float(settings.get("max_total_mb", 512)),
+                )
+            except Exception as e:
+                log(f"Cache cleanup failed: {e}")
+
+    @staticmethod
+    def _filter_count(config: dict) -> int:
+        """本次转换使用的 Lua 过滤器数量（代价特征之一）"""
+        return (
+            int(bool(config.get("enable_latex_replacements", True)))
+            + int(bool(config.get("Keep_original_formula", False)))
+            + len(config.get("pandoc_filters") or [])
+        )
+
+    def _plan_conversion(
+        self, text: Union[str, HtmlDocument], source_format: str, config: dict, job_class: str,
+        allow_postprocess_skip: bool, md_index: Optional[MarkdownIndex] = None,
+    ) -> Optional[ConversionPlan]:
+        """
+        按延迟目标（latency_slo）规划热键粘贴的转换选项
+
+        仅对 interactive 作业生效；关闭 latency_slo 时返回 None（始终完整质量）。
+        md_index 为预处理前原文的索引：预处理不增删表格、代码块与公式，计数可直接沿用。
+        """
+        slo = config.get("latency_slo")
+        if job_class != "interactive" or not isinstance(slo, dict) or not slo.get("enabled", False):
+            return None
+
+        features = extract_features(
+            as_html_text(text), source_format, self._filter_count(config), highlight=True, md_index=md_index
+        )
+        target_ms = float(slo.get("target_ms", 500))
+        plan = self._cost_model.plan(
+            features,
+            target_ms=target_ms,
+            min_samples=int(slo.get("min_samples", 5)),
+            min_saving=float(slo.get("min_saving", 0.3)),
+            allow_postprocess_skip=allow_postprocess_skip,
+        )
+        if plan.degradations:
+            log(
+                f"Latency SLO: predicted {plan.predicted_ms:.0f}ms for target {target_ms:.0f}ms, "
+                f"applied degradations: {', '.join(plan.degradations)}"
+            )
+        return plan
+
+    def _convert_to_docx(
+        self, text: Union[str, HtmlDocument], source_format: str, config: dict, job_class: str, postprocess_key: str,
+        md_index: Optional[MarkdownIndex] = None,
+    ) -> bytes:
+        """Markdown/HTML → DOCX 公共流程：规划 → Pandoc 转换 → 样式后处理 → 记录耗时"""
+        first_para = bool(config.get(postprocess_key, True))
+        no_proof = config.get("docx_no_proof")
+        if not isinstance(no_proof, dict) or not no_proof.get("enabled", False):
+            no_proof = None
+        tier = text.tier if isinstance(text, HtmlDocument) else TIER_SMALL
+        if tier == TIER_HUGE:
+            # 超大输入直接降级：关闭代码高亮与首段缩进后处理，不参与延迟规划
+            plan = None
+            first_para = False
+            highlight = False
+            log("Huge HTML input: code highlighting and first paragraph post-processing disabled")
+        else:
+            # 开启 no-proof 时不允许跳过后处理：大段粘贴正是最需要它的场景
+            plan = self._plan_conversion(
+                text, source_format, config, job_class, first_para and no_proof is None, md_index
+            )
+            if plan is not None and not plan.postprocess:
+                first_para = False
+            highlight = plan.highlight if plan else True
+
+        # 0. 优化引用的本地图片（含从 data URI 提取到 blob 目录的图片）
+        resource_paths = self._blob_resource_paths(config)
+        image_settings = image_optimization_settings(config)
+        optimize_images = bool(image_settings.get("enabled", False))
+        if optimize_images:
+            text, resource_paths = self._optimize_referenced_images(
+                text, source_format, config, image_settings, resource_paths
+            )
+
         # 1. 转换为 DOCX 字节流
-        self._ensure_pandoc_integration()
-        docx_bytes = self._pandoc_integration.convert_html_to_docx_bytes(
-            html_text=html_text,
-            reference_docx=config.get("reference_docx"),
+        self._ensure_pandoc_integration(config)
+        convert = (
+            self._pandoc_integration.convert_html_to_docx_bytes  # type: ignore[union-attr]
+            if source_format == "html"
+            else self._pandoc_integration.convert_to_docx_bytes  # type: ignore[union-attr]
+        )
+        options = dict(
+            reference_docx=self._resolve_reference_docx(config),
             Keep_original_formula=config.get("Keep_original_formula", False),
             enable_latex_replacements=config.get("enable_latex_replacements", True),
             custom_filters=config.get("pandoc_filters", []),
             cwd=config.get("save_dir"),
+            job_class=job_class,
+            highlight=highlight,
+            resource_paths=resource_paths,
         )
-        
+        chunks = self._html_chunks(text, config) if isinstance(text, HtmlDocument) else None
+        start = time.perf_counter()
+        if chunks:
+            docx_bytes = self._convert_html_chunks(convert, chunks, options, config)
+            # 分块并发转换的耗时不代表单次 Pandoc 调用，不用于更新代价模型
+            plan = None
+        else:
+            docx_bytes = convert(text, **options)
+        pandoc_ms = (time.perf_counter() - start) * 1000
+        if isinstance(text, HtmlDocument) and text.minified:
+            self._record_minify_savings(text, config, highlight)
+
         # 2. 处理 DOCX 样式
-        if config.get("html_disable_first_para_indent", True):
+        postprocess_ms: Optional[float] = None
+        if first_para or no_proof:
+            start = time.perf_counter()
             docx_bytes = DocxProcessor.apply_custom_processing(
                 docx_bytes,
-                disable_first_para_indent=True,
-                target_style="Body Text"
+                disable_first_para_indent=first_para,
+                target_style="Body Text",
+                no_proof=no_proof,
             )
-        
+            postprocess_ms = (time.perf_counter() - start) * 1000
+
+        # 3. 优化 DOCX 中的图片（Pandoc 从其他来源嵌入的图片）
+        if optimize_images:
+            start = time.perf_counter()
+            size_in = len(docx_bytes)
+            docx_bytes = get_image_optimizer().optimize_docx_media(
+                docx_bytes,
+                ImageOptimizeOptions.from_settings(image_settings),
+                int(image_settings.get("max_workers", 0)),
+            )
+            record_stage(StageSample(
+                "docx", "optimize_images", (time.perf_counter() - start) * 1000, size_in, len(docx_bytes)
+            ))
+        self._cleanup_caches(config)
+
+        # 4. 用实际耗时更新代价模型
+        if plan is not None:
+            self._cost_model.record(plan, pandoc_ms, postprocess_ms)
+
         return docx_bytes
 
-    def convert_html_to_markdown_text(self, html_text: str, config: dict) -> str:
+    @staticmethod
+    def _html_chunks(document: HtmlDocument, config: dict) -> Optional[List[str]]:
+        """
+        large/huge 输入在预处理后仍超过 chunk_kb 时拆分为多个 HTML 块；否则返回 None
+
+        huge 输入总是分块：单个 Pandoc 进程处理几十 MB 的 HTML 会长时间占用 worker，
+        分块后每块都受 Pandoc 资源限制约束，总耗时有上界。含脚注时不分块：脚注引用与
+        脚注区可能落在不同块中，各块单独转换后引用会失效。
+        """
+        if document.tier == TIER_SMALL:
+            return None
+        chunk_chars = int(float(html_tier_settings(config).get("chunk_kb", 2048)) * 1024)
+        if document.tier != TIER_HUGE and len(document.html) <= chunk_chars:
+            return None
+        if document.has_footnotes():
+            log(f"{document.tier} HTML contains footnotes, converting without chunking")
+            return None
+        start = time.perf_counter()
+        chunks = document.split_chunks(max(chunk_chars, 1))
+        if len(chunks) < 2:
+            return None
+        log(
+            f"Split {document.tier} HTML into {len(chunks)} chunks in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return chunks
+
+    @staticmethod
+    def _convert_html_chunks(convert, chunks: List[str], options: dict, config: dict) -> bytes:
+        """并发转换各 HTML 块（每个线程驱动一个 Pandoc 进程），按原顺序合并为一个 DOCX"""
+        max_workers = int(html_tier_settings(config).get("max_workers", 0))
+        if max_workers <= 0:
+            # 每个 Pandoc 进程的内存上限按单次转换设置，默认并发数不随核数无限增长
+            max_workers = min(os.cpu_count() or 1, _DEFAULT_CHUNK_WORKERS)
+        workers = max(1, min(max_workers, len(chunks)))
+
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="html-chunk")
+        try:
+            # 任一块失败时抛出其异常，尚未开始的块被取消
+            results = list(executor.map(lambda chunk: convert(chunk, **options), chunks))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        convert_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        docx_bytes = merge_docx_documents(results)
+        merge_ms = (time.perf_counter() - start) * 1000
+        size_in = sum(len(chunk) for chunk in chunks)
+        record_stage(StageSample("docx", "chunked_convert", convert_ms, size_in, sum(len(r) for r in results)))
+        record_stage(StageSample("docx", "merge_chunks", merge_ms, len(results), len(docx_bytes)))
+        log(
+            f"Converted {len(chunks)} HTML chunks with {workers} workers in {convert_ms:.0f}ms, "
+            f"merged in {merge_ms:.0f}ms"
+        )
+        return docx_bytes
+
+    def _optimize_referenced_images(
+        self,
+        text: Union[str, HtmlDocument],
+        source_format: str,
+        config: dict,
+        settings: dict,
+        resource_paths: Optional[List[str]],
+    ) -> Tuple[Union[str, HtmlDocument], Optional[List[str]]]:
+        """
+        转换前优化引用的本地图片
+
+        按 Pandoc 的查找顺序（工作目录、再到 resource_paths）解析图片引用，优化后的图片
+        保存在缓存目录，引用改为其中的文件名，并把缓存目录加入资源路径。
+
+        Returns:
+            (改写后的内容, 资源路径)
+        """
+        source = text.source if isinstance(text, HtmlDocument) else text
+        if "![" not in source and not re.search(r"<img\b", source, re.IGNORECASE):
+            return text, resource_paths
+
+        save_dir = config.get("save_dir")
+        search_dirs = [os.path.expandvars(save_dir) if save_dir else os.getcwd(), *(resource_paths or [])]
+        optimizer = get_image_optimizer()
+        options = ImageOptimizeOptions.from_settings(settings)
+        workers = int(settings.get("max_workers", 0))
+
+        if source_format == "html":
+            document = HtmlDocument.wrap(text)
+            images = [
+                (img, resolve_local_image(img.get("src", ""), search_dirs))
+                for img in document.tree.iter("img")
+            ]
+            images = [(img, path) for img, path in images if path]
+            optimized = optimizer.optimize_files([path for _, path in images], options, workers)
+            if optimized:
+                document.edit()
+                for img, path in images:
+                    if path in optimized:
+                        img.set("src", os.path.basename(optimized[path]))
+            text = document
+        else:
+            targets: dict = {}
+
+            def collect(target: str) -> None:
+                path = resolve_local_image(target, search_dirs)
+                if path:
+                    targets[target] = path
+
+            replace_markdown_image_targets(text, collect)  # type: ignore[arg-type]
+            optimized = optimizer.optimize_files(list(targets.values()), options, workers)
+            def optimized_name(target: str) -> Optional[str]:
+                path = targets.get(target)
+                return os.path.basename(optimized[path]) if path in optimized else None
+
+            if optimized:
+                text = replace_markdown_image_targets(text, optimized_name)  # type: ignore[arg-type]
+
+        if optimized:
+            resource_paths = [*(resource_paths or []), optimizer.cache.directory]
+        return text, resource_paths
+
+    def _record_minify_savings(self, document: HtmlDocument, config: dict, highlight: bool) -> None:
+        """
+        用代价模型估算 minify 阶段节省的 Pandoc 耗时（按精简前后的特征各预测一次）
+
+        模型样本不足时只记录体积变化。
+        """
+        minified = document.html
+        filter_count = self._filter_count(config)
+        slo = config.get("latency_slo")
+        min_samples = int(slo.get("min_samples", 5)) if isinstance(slo, dict) else 5
+        before = self._cost_model.predict_pandoc_ms(
+            extract_features(document.source, "html", filter_count, highlight), min_samples
+        )
+        after = self._cost_model.predict_pandoc_ms(
+            extract_features(minified, "html", filter_count, highlight), min_samples
+        )
+        saved_ms = max(0.0, before - after) if before is not None and after is not None else 0.0
+        record_stage(StageSample("html", "minify_pandoc_saved", saved_ms, len(document.source), len(minified)))
+        if before is not None and after is not None:
+            log(f"HTML minify: {len(document.source)} -> {len(minified)} chars, estimated Pandoc time saved {saved_ms:.0f}ms")
+
+    def convert_html_to_markdown_text(self, html_text: Union[str, HtmlDocument], config: dict) -> str:
         """
         将 HTML 文本转换为 Markdown 文本（用于富文本粘贴/公式保留链路）。
 
         Raises:
             PandocError: 转换失败时
         """
-        self._ensure_pandoc_integration()
+        self._ensure_pandoc_integration(config)
         return self._pandoc_integration.convert_html_to_markdown_text(html_text)  # type: ignore[union-attr]
 
     def convert_markdown_to_html_text(self, md_text: str, config: dict) -> str:
@@ -150,7 +473,7 @@ class DocumentGenerator:
         Notes:
             - 通过 Keep_original_formula=True 可把数学节点改成普通文本 `$...$` / `$$...$$`
         """
-        self._ensure_pandoc_integration()
+        self._ensure_pandoc_integration(config)
         return self._pandoc_integration.convert_markdown_to_html_text(  # type: ignore[union-attr]
             md_text,
             Keep_original_formula=config.get("Keep_original_formula", True),
@@ -163,7 +486,7 @@ class DocumentGenerator:
         """
         将 Markdown 文本转换为 RTF 字节流（用于富文本粘贴兜底）。
         """
-        self._ensure_pandoc_integration()
+        self._ensure_pandoc_integration(config)
         return self._pandoc_integration.convert_markdown_to_rtf_bytes(  # type: ignore[union-attr]
             md_text,
             Keep_original_formula=config.get("Keep_original_formula", True),
@@ -34,15 +34,38 @@ class DebounceManager:
         if app_state.is_running():
             return
         
-        # 启动后台线程执行实际工作
+        self._start(callback)
+
+    def run_exclusive(self, callback: Callable[[], None]) -> bool:
+        """
+        异步执行回调，只做互斥不做防抖（托盘菜单等显式操作）
+
+        Args:
+            callback: 要执行的回调函数
+
+        Returns:
+            已有任务在运行、未执行时返回 False
+        """
+        if app_state.is_running():
+            return False
+        self._start(callback)
+        return True
+
+    @staticmethod
+    def _start(callback: Callable[[], None]) -> None:
+        """启动后台线程执行实际工作（先在调用线程置为运行中，避免两次触发同时通过互斥检查）"""
+        app_state.set_running(True)
+
         def worker():
-            app_state.set_running(True)
             try:
                 callback()
             except Exception as e:
                 log(f"Callback execution failed: {e}")
             finally:
                 app_state.set_running(False)
-        
-        thread = threading.Thread(target=worker, daemon=True)
-        thread.start()
+
+        try:
+            threading.Thread(target=worker, daemon=True).start()
+        except Exception:
+            app_state.set_running(False)
+            raise
@@ -1,50 +1,103 @@
 """HTML content preprocessor."""
 
-from bs4 import BeautifulSoup
+import time
+from typing import Dict, Union
+
 from .base import BasePreprocessor
-from ...utils.html_formatter import clean_html_content, convert_strikethrough_to_del
+from .sources import resolve_profile
+from .stages import TextScan, resolve_stages
+from .tiers import classify_html
+from ...utils.html_document import HtmlDocument
+from ...utils.html_transform import apply_transforms
 from ...utils.logging import log
+from ...utils.perf import StageSample, report_stages
 
 
 class HtmlPreprocessor(BasePreprocessor):
     """HTML 内容预处理器（无状态）"""
 
-    def process(self, html: str, config: dict) -> str:
+    def process(self, html: Union[str, HtmlDocument], config: dict) -> HtmlDocument:
         """
         预处理 HTML 内容
 
-        处理步骤:
-        1. 清理无效元素（SVG等）
-        2. 转换删除线标记
-        3. 清理 LaTeX 公式块中的 br 标签
-        4. 其他自定义处理...
+        处理步骤（见 stages.py，顺序与启用状态由 config["preprocess_stages"] 决定，
+        并按来源指纹只执行该来源需要的阶段，见 sources.py）:
+        1. flatten_code: 把代码块中的高亮 token span 折叠为纯文本
+        2. remove_svg: 清理无效元素（SVG等）
+        3. katex_br_cleanup: 清理 LaTeX 公式块中的 br 标签
+        4. collapse_math: 把 KaTeX/MathJax 渲染树折叠为 TeX 源码
+        5. strikethrough: 转换删除线标记
+        6. minify: 删除 Pandoc 不使用的属性、注释与脚本（记录精简前后的大小）
+        7. 其他自定义处理...
+
+        输入先按大小分级（见 tiers.py）：large/huge 输入不按来源裁剪阶段（精简与代码
+        高亮折叠总会执行），并跳过装饰性阶段；分级结果记录在 document.tier 上，
+        转换阶段据此决定是否分块转换。
+
+        所有阶段都不适用时不解析 HTML，直接使用原文；内容分析阶段已解析过时
+        复用同一棵树，不再重复解析。
 
         Args:
-            html: 原始 HTML 内容
+            html: 原始 HTML 内容或本次作业共享的 HtmlDocument
             config: 配置字典
 
         Returns:
-            预处理后的 HTML 内容
+            预处理后的 HtmlDocument（传入 HtmlDocument 时原地修改并返回同一对象）
         """
         log("Preprocessing HTML content")
+        start = time.perf_counter()
+        document = HtmlDocument.wrap(html)
+        source = document.source
+
+        tier = classify_html(source, config)
+        document.tier = tier.name
+        # 大输入不按来源裁剪：minify、flatten_code 等缩小输入的阶段只要适用就执行
+        profile = None if tier.reduced else resolve_profile(source, "html", config)
+
+        scan = TextScan(source)
+        samples = []
+        active = []
+        for stage in resolve_stages("html", config, profile):
+            if tier.reduced and stage.cosmetic:
+                samples.append(StageSample("html", stage.name, skipped=True))
+            elif stage.applies(scan):
+                active.append(stage)
+            else:
+                samples.append(StageSample("html", stage.name, skipped=True))
+
+        if active:
+            if not document.parsed:
+                stage_start = time.perf_counter()
+                document.tree  # 触发解析，单独计时
+                samples.append(StageSample(
+                    "html", "parse", (time.perf_counter() - stage_start) * 1000, len(source), len(source)
+                ))
+
+            # 所有阶段作为访问者在同一次树遍历中执行：各阶段记录自己回调的耗时，
+            # 遍历本身的开销单独记为 traverse。阶段共享一棵树，大小只在解析/序列化时测量
+            timings: Dict[str, float] = {}
+            stage_start = time.perf_counter()
+            apply_transforms(document.edit(), [stage.transform for stage in active], timings)
+            traverse_ms = (time.perf_counter() - stage_start) * 1000 - sum(timings.values())
+            for stage in active:
+                samples.append(StageSample("html", stage.name, timings.get(stage.transform.name, 0.0)))
+            samples.append(StageSample("html", "traverse", max(traverse_ms, 0.0)))
+
+        # 仅在 HTML 不包含 DOCTYPE 时才添加（序列化推迟到转换阶段需要字符串时）
+        document.ensure_doctype()
+
+        if any(stage.name == "minify" for stage in active):
+            # 精简后的大小需要序列化才能得知；结果被缓存，转换阶段直接复用
+            stage_start = time.perf_counter()
+            size_out = len(document.html)
+            samples.append(StageSample(
+                "html", "serialize", (time.perf_counter() - stage_start) * 1000, len(source), size_out
+            ))
+            document.minified = True
+            log(
+                f"HTML minified: {len(source)} -> {size_out} chars "
+                f"({(1 - size_out / max(len(source), 1)) * 100:.0f}% smaller)"
+            )
 
-        # 使用 html_formatter 进行清理
-        soup = BeautifulSoup(html, "html.parser")
-        clean_html_content(soup, config)
-
-        html_formatting = config.get("html_formatting") or config.get("Html_formatting") or {}
-        if not isinstance(html_formatting, dict):
-            html_formatting = {}
-        if html_formatting.get("strikethrough_to_del", True):
-            convert_strikethrough_to_del(soup)
-
-        # unwrap_li_paragraphs(soup)
-        # remove_empty_paragraphs(soup)
-
-        html_output = str(soup)
-        
-        # 仅在 HTML 不包含 DOCTYPE 时才添加
-        if "<!DOCTYPE" not in html_output.upper():
-            html_output = f"<!DOCTYPE html>\n<meta charset='utf-8'>\n{html_output}"
-        
-        return html_output
+        report_stages("html", samples, (time.perf_counter() - start) * 1000)
+        return document
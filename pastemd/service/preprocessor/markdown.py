@@ -1,9 +1,13 @@
 """Markdown content preprocessor."""
 
+import time
+
 from .base import BasePreprocessor
-from ...utils.md_normalizer import normalize_markdown
-from ...utils.latex import convert_latex_delimiters
+from .sources import resolve_profile
+from .stages import StageProbe, TextScan, resolve_stages
+from ...utils.md_pipeline import run_line_pipeline
 from ...utils.logging import log
+from ...utils.perf import StageSample, report_stages
 
 
 class MarkdownPreprocessor(BasePreprocessor):
@@ -13,9 +17,10 @@ class MarkdownPreprocessor(BasePreprocessor):
         """
         预处理 Markdown 内容
 
-        处理步骤:
-        1. 标准化 Markdown 语法
-        2. 处理 LaTeX 数学公式
+        处理步骤（见 stages.py，顺序与启用状态由 config["preprocess_stages"] 决定，
+        并按来源指纹只执行该来源需要的阶段，见 sources.py）:
+        1. normalize: 标准化 Markdown 语法
+        2. latex: 处理 LaTeX 数学公式
         3. 其他自定义处理...
 
         Args:
@@ -26,16 +31,38 @@ class MarkdownPreprocessor(BasePreprocessor):
             预处理后的 Markdown 文本
         """
         log("Preprocessing Markdown content")
+        start = time.perf_counter()
 
-        # 1. 标准化 Markdown
-        if config.get("normalize_markdown", True):
-            markdown = normalize_markdown(markdown)
+        scan = TextScan(markdown)
+        samples = []
+        line_stages = []
+        # 探针放在各阶段之间：source 探针记录输入，之后每个阶段后一个探针
+        source_probe = StageProbe()
+        line_stages.append(source_probe.wrap)
+        probes = []
+        for stage in resolve_stages("markdown", config, resolve_profile(markdown, "markdown", config)):
+            if not stage.applies(scan):
+                samples.append(StageSample("markdown", stage.name, skipped=True))
+                continue
+            probe = StageProbe()
+            line_stages.extend(stage.line_stages(config))
+            line_stages.append(probe.wrap)
+            probes.append((stage.name, probe))
 
-        # 2. 处理 LaTeX
-        if config.get("latex_support", True):
-            fix_single_dollar_block = config.get("fix_single_dollar_block", True)
-            markdown = convert_latex_delimiters(markdown, fix_single_dollar_block)
+        # 各阶段作为行流阶段串联：整篇文本只切分、拼接一次
+        if probes:
+            markdown = run_line_pipeline(markdown, line_stages)
 
-        # 未来可扩展其他处理...
+        previous = source_probe
+        for name, probe in probes:
+            samples.append(StageSample(
+                "markdown",
+                name,
+                elapsed_ms=(probe.elapsed - previous.elapsed) * 1000,
+                size_in=previous.text_size,
+                size_out=probe.text_size,
+            ))
+            previous = probe
 
+        report_stages("markdown", samples, (time.perf_counter() - start) * 1000)
         return markdown
@@ -0,0 +1,268 @@
+"""Source-dialect fingerprinting for clipboard content.
+
+Pastes come from a handful of known sources, each with its own quirks. A
+cheap fingerprint on the head of the raw Markdown/HTML picks the likely
+source, and the source's profile limits preprocessing to the stages that
+source actually needs. Unknown content uses the generic profile, which runs
+every stage.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Pattern, Tuple, Union
+
+from ...utils.logging import log
+
+SOURCE_GENERIC = "generic"
+SOURCE_CHATGPT = "chatgpt"
+SOURCE_CLAUDE = "claude"
+SOURCE_GEMINI = "gemini"
+SOURCE_ZHIPU = "zhipu"
+SOURCE_NOTION = "notion"
+SOURCE_OBSIDIAN = "obsidian"
+
+# 指纹只看开头部分：各来源的特征在开头就会出现
+_SAMPLE_CHARS = 64 * 1024
+# 得分达到该值才认定来源，否则使用通用配置
+_MIN_SCORE = 2
+
+Marker = Union[str, Pattern[str], "_TagMarker"]
+
+
+@dataclass(frozen=True)
+class SourceProfile:
+    """
+    来源对应的预处理配置
+
+    Attributes:
+        name: 来源名
+        markdown: 需要执行的 Markdown 阶段；None 表示全部
+        html: 需要执行的 HTML 阶段；None 表示全部
+    """
+    name: str
+    markdown: Optional[FrozenSet[str]] = None
+    html: Optional[FrozenSet[str]] = None
+
+    def allows(self, category: str, stage_name: str) -> bool:
+        stages = self.markdown if category == "markdown" else self.html
+        return stages is None or stage_name in stages
+
+
+class _TagMarker:
+    """
+    HTML 标签上的结构标记
+
+    先按子串快速排除（大多数输入不含该子串，与普通字符串标记一样快），
+    含子串时再用正则确认它出现在标签的属性中而不是正文里。
+    """
+
+    def __init__(self, literal: str, pattern: str):
+        self.literal = literal
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+
+    def search(self, sample: str) -> Optional["re.Match[str]"]:
+        if self.literal not in sample:
+            return None
+        return self.pattern.search(sample)
+
+
+def _class_marker(literal: str, name: Optional[str] = None) -> _TagMarker:
+    """class 属性中的类名（name 为正则，需匹配完整类名；默认为 literal 本身）"""
+    return _TagMarker(
+        literal,
+        r"<[A-Za-z][^<>]*?\sclass\s*=\s*[\"']?[^\"'<>]*?(?<![\w-])"
+        + (name or re.escape(literal)) + r"(?![\w-])",
+    )
+
+
+def _attribute_marker(literal: str, name: Optional[str] = None) -> _TagMarker:
+    """标签上的属性名（name 为正则；默认为 literal 本身）"""
+    return _TagMarker(literal, r"<[A-Za-z][^<>]*?\s" + (name or re.escape(literal)) + r"\s*=")
+
+
+# (标记, 权重)：字符串按子串匹配，正则按 search 匹配
+# 标记只取结构特征（HTML 的标签属性、Markdown 的链接目标与特有语法），
+# 正文里提到同样的词（如讨论 Notion 或 Angular 的文章）不会被误判
+_MARKDOWN_FINGERPRINTS: Dict[str, Tuple[Tuple[Marker, int], ...]] = {
+    SOURCE_CHATGPT: (
+        (":contentReference[oaicite:", 3),
+        # 联网搜索的引用标记（cite + turn0search0 之类的编号）
+        (re.compile(r"cite\W?turn\d+[a-z]+\d+"), 3),
+        (re.compile(r"【\d+(?::\d+)?†[^】]*】"), 3),
+        (re.compile(r"^\\\[\s*$", re.MULTILINE), 1),
+        (re.compile(r"\\\(.+?\\\)"), 1),
+    ),
+    SOURCE_GEMINI: (
+        (re.compile(r"(?<![\\$])\$ [^$\n]+ \$(?!\$)"), 1),
+        (re.compile(r"^\*\*\*[^*\n]+\*\*\*$", re.MULTILINE), 1),
+        (re.compile(r"\[cite(?:_start|: ?\d)"), 3),
+    ),
+    SOURCE_ZHIPU: (
+        # 标题紧跟在正文之后、没有空行
+        (re.compile(r"^[^\s#|>`-][^\n]*\n#{1,6}\s", re.MULTILINE), 1),
+        # 单独一行的 $ 块公式
+        (re.compile(r"^\s*\$\s*$", re.MULTILINE), 1),
+        # 指向智谱清言的链接
+        (re.compile(r"\]\(https?://(?:[\w-]+\.)*chatglm\.cn[/)]"), 2),
+    ),
+    SOURCE_NOTION: (
+        # 导出文件名中的 32 位页面 ID
+        (re.compile(r"%20[0-9a-f]{32}(?:\.md|\))"), 3),
+        # 标注块导出为单独一行的 <aside>；指向 Notion 页面的链接。
+        # 聊天回答中也会出现，单独一项不足以认定来源（否则会跳过 normalize）
+        (re.compile(r"^<aside>\s*$", re.MULTILINE), 1),
+        (re.compile(r"\]\(https?://(?:[\w-]+\.)?notion\.(?:so|site)/"), 1),
+    ),
+    SOURCE_OBSIDIAN: (
+        ("![[", 2),
+        (re.compile(r"(?<!!)\[\[[^\]\n]+\]\]"), 2),
+        (re.compile(r"^> \[![A-Za-z-]+\]", re.MULTILINE), 2),
+        (re.compile(r"%%[^%\n]+%%"), 1),
+        (re.compile(r"==[^=\n]+=="), 1),
+    ),
+}
+
+_HTML_FINGERPRINTS: Dict[str, Tuple[Tuple[Marker, int], ...]] = {
+    SOURCE_CHATGPT: (
+        (_attribute_marker("data-message-author-role"), 3),
+        (_attribute_marker("data-start"), 2),
+        (_class_marker("markdown", r"markdown\s+prose"), 2),
+    ),
+    SOURCE_CLAUDE: (
+        (_class_marker("font-claude-", r"font-claude-[\w-]+"), 3),
+        (_class_marker("standard-markdown"), 2),
+        (_class_marker("break-words", r"whitespace-pre-wrap\s+break-words"), 1),
+    ),
+    SOURCE_GEMINI: (
+        # Angular 组件属性：其他 Angular 站点也有，只作辅助
+        (_attribute_marker("_ngcontent-", r"_ngcontent-[\w-]+"), 1),
+        (_class_marker("model-response-text"), 3),
+        (_class_marker("markdown-main-panel"), 3),
+        (_class_marker("math-inline"), 1),
+    ),
+    SOURCE_ZHIPU: (
+        (_class_marker("chatglm", r"chatglm[\w-]*"), 3),
+        (_class_marker("markdown-body"), 1),
+    ),
+    SOURCE_NOTION: (
+        ("<!-- notionvc:", 3),
+        (_class_marker("notion-", r"notion-[\w-]+"), 2),
+    ),
+    SOURCE_OBSIDIAN: (
+        (_class_marker("markdown-preview-view"), 3),
+        (_class_marker("internal-link"), 2),
+        (_class_marker("callout-title"), 2),
+    ),
+}
+
+# 各来源只执行需要的阶段（None 表示全部）
+SOURCE_PROFILES: Dict[str, SourceProfile] = {
+    SOURCE_GENERIC: SourceProfile(SOURCE_GENERIC),
+    # \( \) / \[ \] 公式、紧凑排版都可能出现，保持全部阶段
+    SOURCE_CHATGPT: SourceProfile(SOURCE_CHATGPT),
+    # Markdown 本身规范；HTML 里有图标 SVG 和 KaTeX
+    SOURCE_CLAUDE: SourceProfile(
+        SOURCE_CLAUDE,
+        markdown=frozenset({"latex", "images"}),
+        html=frozenset({
+            "flatten_code", "remove_svg", "externalize_images", "katex_br_cleanup", "collapse_math", "minify",
+        }),
+    ),
+    # 行内公式 $ 两侧常带空格；HTML 公式不是 KaTeX
+    SOURCE_GEMINI: SourceProfile(
+        SOURCE_GEMINI,
+        markdown=frozenset({"normalize", "latex", "images"}),
+        html=frozenset({
+            "flatten_code", "remove_svg", "externalize_images", "strikethrough", "minify",
+        }),
+    ),
+    # 标题/块前后缺空行、单独一行的 $ 块公式
+    SOURCE_ZHIPU: SourceProfile(SOURCE_ZHIPU),
+    # 导出的 Markdown 块间已有空行；HTML 删除线已是 <s>，只需清理图标、折叠 KaTeX 公式与精简属性
+    SOURCE_NOTION: SourceProfile(
+        SOURCE_NOTION,
+        markdown=frozenset({"latex", "images"}),
+        html=frozenset({
+            "flatten_code", "remove_svg", "externalize_images", "collapse_math", "minify",
+        }),
+    ),
+    # 笔记允许标题紧跟正文，Markdown 保持全部阶段；HTML 删除线已是 <del>
+    SOURCE_OBSIDIAN: SourceProfile(
+        SOURCE_OBSIDIAN,
+        html=frozenset({
+            "flatten_code", "remove_svg", "externalize_images", "katex_br_cleanup", "collapse_math", "minify",
+        }),
+    ),
+}
+
+
+def detect_source(text: str, category: str) -> str:
+    """
+    识别内容来源
+
+    Args:
+        text: 原始 Markdown 或 HTML
+        category: "markdown" 或 "html"
+
+    Returns:
+        来源名；无法识别时为 SOURCE_GENERIC
+    """
+    if not text:
+        return SOURCE_GENERIC
+    sample = text[:_SAMPLE_CHARS]
+    fingerprints = _HTML_FINGERPRINTS if category == "html" else _MARKDOWN_FINGERPRINTS
+
+    best, best_score = SOURCE_GENERIC, 0
+    for source, markers in fingerprints.items():
+        score = 0
+        for marker, weight in markers:
+            if isinstance(marker, str):
+                found = marker in sample
+            else:
+                found = marker.search(sample) is not None
+            if found:
+                score += weight
+        if score > best_score:
+            best, best_score = source, score
+    return best if best_score >= _MIN_SCORE else SOURCE_GENERIC
+
+
+def resolve_profile(text: str, category: str, config: dict) -> SourceProfile:
+    """
+    识别来源并返回其预处理配置（受 config["source_profiles"] 控制）
+
+    config["source_profiles"]:
+        enabled: 关闭时始终使用通用配置（执行全部阶段）
+        overrides: {来源: {"markdown": [阶段名], "html": [阶段名]}}，覆盖内置配置
+    """
+    settings = config.get("source_profiles")
+    if not isinstance(settings, dict):
+        settings = {}
+    if not settings.get("enabled", True):
+        return SOURCE_PROFILES[SOURCE_GENERIC]
+
+    source = detect_source(text, category)
+    profile = SOURCE_PROFILES.get(source, SOURCE_PROFILES[SOURCE_GENERIC])
+
+    overrides = settings.get("overrides")
+    override = overrides.get(source) if isinstance(overrides, dict) else None
+    if isinstance(override, dict):
+        profile = SourceProfile(
+            source,
+            markdown=_stage_set(override.get("markdown", profile.markdown)),
+            html=_stage_set(override.get("html", profile.html)),
+        )
+
+    if source != SOURCE_GENERIC:
+        log(f"Detected {category} source: {source}")
+    return profile
+
+
+def _stage_set(value) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(str(name) for name in value)
+    return None
@@ -0,0 +1,281 @@
+"""Preprocessing stage registry.
+
+Each stage has a name, a cheap ``applies`` precheck against a shared text
+scan, and a config-based enablement check. Stage order and enablement come
+from ``config["preprocess_stages"]``; stages whose precheck fails are skipped
+without touching the document.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ...utils.blob_store import DATA_IMAGE_PREFIX, blob_store_settings, externalize_markdown_images
+from ...utils.html_formatter import (
+    COLLAPSE_MATH,
+    EXTERNALIZE_DATA_IMAGES,
+    FLATTEN_CODE_BLOCKS,
+    KATEX_BR_CLEANUP,
+    MINIFY_HTML,
+    REMOVE_SVG,
+    STRIKETHROUGH_TO_DEL,
+)
+from ...utils.html_transform import HtmlTransform
+from ...utils.latex import latex_line_stages
+from ...utils.logging import log
+from ...utils.md_normalizer import NORMALIZE_STAGES
+from ...utils.md_pipeline import LineContext, LineStage, MarkdownLine
+from .sources import SourceProfile
+
+
+class TextScan:
+    """
+    对待处理文本的共享扫描
+
+    各阶段的 applies 预检查通过这里查询标记是否存在；每个标记最多扫描一次全文
+    （C 层 memchr 级别的子串查找），之后的查询都是 O(1)。
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._markers: Dict[Tuple[str, bool], bool] = {}
+
+    def has(self, marker: str, ignore_case: bool = False) -> bool:
+        key = (marker, ignore_case)
+        found = self._markers.get(key)
+        if found is None:
+            if ignore_case:
+                found = re.search(re.escape(marker), self.text, re.IGNORECASE) is not None
+            else:
+                found = marker in self.text
+            self._markers[key] = found
+        return found
+
+
+@dataclass(frozen=True)
+class MarkdownStage:
+    """
+    Markdown 预处理阶段：由一个或多个行流阶段组成，在同一条流水线中执行
+
+    Attributes:
+        name: 阶段名（用于配置与统计）
+        line_stages: 根据配置返回行流阶段列表
+        applies: 预检查，返回 False 时跳过
+        enabled: 兼容旧配置项的开关检查
+    """
+    name: str
+    line_stages: Callable[[dict], Sequence[LineStage]]
+    applies: Callable[[TextScan], bool]
+    enabled: Callable[[dict], bool]
+
+
+@dataclass(frozen=True)
+class HtmlStage:
+    """
+    HTML 预处理阶段：以 HtmlTransform 访问者的形式在共享的 lxml 树上原地修改，
+    所有启用的阶段在一次遍历中执行（见 html_transform.py）
+
+    Attributes:
+        name: 阶段名（用于配置与统计）
+        transform: 阶段对应的 HtmlTransform
+        applies: 预检查，返回 False 时跳过
+        enabled: 兼容旧配置项的开关检查
+        cosmetic: 只影响显示细节的阶段，大输入（见 tiers.py）跳过
+    """
+    name: str
+    transform: HtmlTransform
+    applies: Callable[[TextScan], bool]
+    enabled: Callable[[dict], bool]
+    cosmetic: bool = False
+
+
+Stage = Union[MarkdownStage, HtmlStage]
+
+MARKDOWN_STAGES: Dict[str, MarkdownStage] = {}
+HTML_STAGES: Dict[str, HtmlStage] = {}
+
+_REGISTRIES: Dict[str, Dict[str, Stage]] = {
+    "markdown": MARKDOWN_STAGES,  # type: ignore[dict-item]
+    "html": HTML_STAGES,  # type: ignore[dict-item]
+}
+
+# 默认执行顺序（注册顺序）
+DEFAULT_STAGE_ORDER: Dict[str, List[str]] = {"markdown": [], "html": []}
+
+
+def register_stage(category: str, stage: Stage) -> None:
+    """注册阶段，并追加到该类别的默认顺序末尾"""
+    registry = _REGISTRIES[category]
+    if stage.name not in registry:
+        DEFAULT_STAGE_ORDER[category].append(stage.name)
+    registry[stage.name] = stage
+
+
+def resolve_stages(category: str, config: dict, profile: Optional[SourceProfile] = None) -> List[Stage]:
+    """
+    按配置解析阶段顺序与启用状态；给出来源配置时只保留该来源需要的阶段
+
+    config["preprocess_stages"]:
+        order: {类别: [阶段名, ...]}，列出的阶段按列表顺序排在前面，
+            其余已注册阶段按默认顺序排在后面
+        disabled: ["类别.阶段名", ...]，不执行的阶段
+    """
+    registry = _REGISTRIES[category]
+    configured = config.get("preprocess_stages")
+    if not isinstance(configured, dict):
+        configured = {}
+
+    order = configured.get("order")
+    preferred = order.get(category) if isinstance(order, dict) else None
+    if not isinstance(preferred, list):
+        preferred = []
+    disabled = configured.get("disabled")
+    disabled = set(disabled) if isinstance(disabled, list) else set()
+
+    names: List[str] = []
+    for name in preferred:
+        if name not in registry:
+            log(f"Unknown {category} preprocess stage ignored: {name}")
+        elif name not in names:
+            names.append(name)
+    names.extend(name for name in DEFAULT_STAGE_ORDER[category] if name not in names)
+
+    stages: List[Stage] = []
+    for name in names:
+        stage = registry[name]
+        if f"{category}.{name}" in disabled or not stage.enabled(config):
+            continue
+        if profile is not None and not profile.allows(category, name):
+            continue
+        stages.append(stage)
+    return stages
+
+
+class StageProbe:
+    """记录流经某一点的行流累计耗时与字符数"""
+
+    __slots__ = ("elapsed", "size", "lines")
+
+    def __init__(self) -> None:
+        self.elapsed = 0.0
+        self.size = 0
+        self.lines = 0
+
+    def wrap(self, lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+        """
+        透传行流，累计从上游取行所花的时间（包含所有上游阶段）
+
+        相邻两个探针的耗时差即为两者之间阶段的独占耗时。
+        """
+        perf_counter = time.perf_counter
+        iterator = iter(lines)
+        while True:
+            start = perf_counter()
+            try:
+                line = next(iterator)
+            except StopIteration:
+                self.elapsed += perf_counter() - start
+                return
+            self.elapsed += perf_counter() - start
+            self.size += len(line.text)
+            self.lines += 1
+            yield line
+
+    @property
+    def text_size(self) -> int:
+        """拼接后的字符数（换行符按 1 计）"""
+        return self.size + max(self.lines - 1, 0)
+
+
+def _html_formatting(config: dict) -> dict:
+    html_formatting = config.get("html_formatting") or config.get("Html_formatting") or {}
+    return html_formatting if isinstance(html_formatting, dict) else {}
+
+
+# ---- Markdown 阶段 ----
+
+register_stage("markdown", MarkdownStage(
+    name="normalize",
+    line_stages=lambda config: NORMALIZE_STAGES,
+    applies=lambda scan: bool(scan.text),
+    enabled=lambda config: config.get("normalize_markdown", True),
+))
+
+register_stage("markdown", MarkdownStage(
+    name="latex",
+    line_stages=lambda config: latex_line_stages(config.get("fix_single_dollar_block", True)),
+    # 没有 $ 时所有 LaTeX 修复都不会生效
+    applies=lambda scan: scan.has("$"),
+    enabled=lambda config: config.get("latex_support", True),
+))
+
+register_stage("markdown", MarkdownStage(
+    name="images",
+    line_stages=lambda config: [externalize_markdown_images],
+    applies=lambda scan: scan.has(DATA_IMAGE_PREFIX),
+    enabled=lambda config: blob_store_settings(config).get("enabled", True),
+))
+
+# ---- HTML 阶段 ----
+
+# 排在最前：折叠后其余阶段不再遍历代码高亮的 token span
+register_stage("html", HtmlStage(
+    name="flatten_code",
+    transform=FLATTEN_CODE_BLOCKS,
+    applies=lambda scan: scan.has("<pre", ignore_case=True) or scan.has("<code", ignore_case=True),
+    enabled=lambda config: True,
+))
+
+register_stage("html", HtmlStage(
+    name="remove_svg",
+    transform=REMOVE_SVG,
+    applies=lambda scan: scan.has("svg", ignore_case=True),
+    enabled=lambda config: True,
+))
+
+register_stage("html", HtmlStage(
+    name="externalize_images",
+    transform=EXTERNALIZE_DATA_IMAGES,
+    applies=lambda scan: scan.has(DATA_IMAGE_PREFIX, ignore_case=True),
+    enabled=lambda config: blob_store_settings(config).get("enabled", True),
+))
+
+register_stage("html", HtmlStage(
+    name="katex_br_cleanup",
+    transform=KATEX_BR_CLEANUP,
+    applies=lambda scan: scan.has("katex") and scan.has("<br", ignore_case=True),
+    enabled=lambda config: True,
+    cosmetic=True,
+))
+
+register_stage("html", HtmlStage(
+    name="collapse_math",
+    transform=COLLAPSE_MATH,
+    applies=lambda scan: scan.has("katex") or scan.has("MathJax") or scan.has("mjx-container"),
+    enabled=lambda config: True,
+))
+
+register_stage("html", HtmlStage(
+    name="strikethrough",
+    transform=STRIKETHROUGH_TO_DEL,
+    applies=lambda scan: scan.has("~~"),
+    enabled=lambda config: _html_formatting(config).get("strikethrough_to_del", True),
+))
+
+register_stage("html", HtmlStage(
+    name="minify",
+    transform=MINIFY_HTML,
+    # 没有样式/class/data-*/注释/脚本时已经足够精简
+    applies=lambda scan: (
+        scan.has("style=", ignore_case=True)
+        or scan.has("class=", ignore_case=True)
+        or scan.has("data-")
+        or scan.has("<!--")
+        or scan.has("<script", ignore_case=True)
+        or scan.has("<style", ignore_case=True)
+    ),
+    enabled=lambda config: True,
+))
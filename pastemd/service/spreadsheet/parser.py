@@ -1,7 +1,8 @@
 """Markdown table parser."""
 
-import re
-from typing import List, Optional
+from typing import List, Optional, Sequence
+
+from ...utils.md_index import TABLE_SEPARATOR_RE, MarkdownIndex
 
 
 def _split_table_cells(line: str) -> List[str]:
@@ -52,7 +53,33 @@ def parse_markdown_table(md_text: str) -> Optional[List[List[str]]]:
     lines = md_text.strip().split('\n')
     if len(lines) < 2:
         return None
+    return parse_markdown_table_lines(lines)
+
+
+def parse_markdown_table_from_index(index: MarkdownIndex) -> Optional[List[List[str]]]:
+    """
+    基于块索引解析表格（结果缓存在索引上，同一作业内只解析一次）
+
+    首个非空行不含 | 或全文没有分隔行时直接返回 None，不逐行解析。
+    """
+    def compute(idx: MarkdownIndex) -> Optional[List[List[str]]]:
+        if "|" not in idx.first_content_line or not idx.has_table_separator:
+            return None
+        return parse_markdown_table_lines(idx.lines)
+
+    return index.derived("table_data", compute)
+
+
+def parse_markdown_table_lines(lines: Sequence[str]) -> Optional[List[List[str]]]:
+    """
+    解析已切分的行为二维数组（规则同 parse_markdown_table）
     
+    Args:
+        lines: 文本行
+        
+    Returns:
+        二维数组；如果不是表格则返回 None
+    """
     table_data = []
     separator_found = False
     
@@ -72,7 +99,7 @@ def parse_markdown_table(md_text: str) -> Optional[List[List[str]]]:
             return None
         
         # 检查是否为分隔符行（如 |---|---|）
-        if re.match(r'^\s*\|?\s*[-:]+\s*(\|\s*[-:]+\s*)+\|?\s*$', line):
+        if TABLE_SEPARATOR_RE.match(line):
             separator_found = True
             continue
         
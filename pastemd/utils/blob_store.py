@@ -0,0 +1,256 @@
+"""Content-addressed store for images embedded as base64 data URIs.
+
+Screenshots pasted as ``data:image/...;base64,`` URIs turn the document into
+a string of many megabytes that would otherwise be serialized, encoded and
+piped to Pandoc. The preprocessors decode such payloads in chunks into files
+named by the SHA-256 of their content (so repeated pastes of the same image
+share one file) and rewrite the URI to the bare file name; Pandoc resolves it
+through ``--resource-path``.
+"""
+
+from __future__ import annotations
+
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from ..config.paths import get_cache_dir
+from .logging import log
+from .md_pipeline import LineContext, MarkdownLine
+
+# data URI 中的图片：data:image/<子类型>;base64,<载荷>
+DATA_IMAGE_PREFIX = "data:image/"
+_DATA_IMAGE_RE = re.compile(r"^data:image/([A-Za-z0-9.+-]+)(?:;[^,;]*)*;base64,", re.IGNORECASE)
+# Markdown 行内的 data URI（图片链接目标或内嵌 HTML 的 src 属性值）
+_MARKDOWN_DATA_IMAGE_RE = re.compile(r"data:image/[A-Za-z0-9.+-]+(?:;[^,;\s)\"']*)*;base64,[A-Za-z0-9+/=]+")
+
+# 每次解码的字符数（4 的倍数）
+_DECODE_CHUNK_CHARS = 1024 * 1024
+# 两次清理之间的最短间隔
+_CLEANUP_INTERVAL_S = 600.0
+# 超过该时间的 .part 文件视为写入中断的残留
+_STALE_PART_S = 3600.0
+# 按总大小淘汰时不删除该时间内写入或使用过的文件：本次及并发中的转换仍在引用它们
+_EVICT_MIN_AGE_S = 3600.0
+
+_EXTENSIONS = {
+    "jpeg": "jpg",
+    "pjpeg": "jpg",
+    "svg+xml": "svg",
+    "x-icon": "ico",
+    "vnd.microsoft.icon": "ico",
+}
+
+
+def _extension(subtype: str) -> str:
+    subtype = subtype.lower()
+    return _EXTENSIONS.get(subtype) or re.sub(r"[^a-z0-9]", "", subtype) or "bin"
+
+
+class BlobStore:
+    """
+    按内容哈希存放图片的临时目录
+
+    文件名为 <sha256>.<扩展名>：相同内容只保存一份，重复使用时刷新修改时间，
+    清理时按修改时间淘汰（先删除超过保存期限的，再按总大小从旧到新删除；
+    最近一小时内写入或使用过的文件不按大小淘汰）。
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._last_cleanup: Optional[float] = None
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = get_cache_dir("blobs")
+        else:
+            os.makedirs(self._directory, exist_ok=True)
+        return self._directory
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[str]:
+        """已保存的文件路径（刷新修改时间）；不存在时返回 None"""
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put_bytes(self, name: str, data: bytes) -> str:
+        """以给定文件名原子写入，返回文件路径"""
+        path = self.path(name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def put_data_uri(self, uri: str) -> Optional[str]:
+        """
+        把 base64 图片 data URI 保存为文件
+
+        Returns:
+            文件名（相对于 directory）；不是 base64 图片或解码失败时返回 None
+        """
+        match = _DATA_IMAGE_RE.match(uri)
+        if match is None:
+            return None
+        try:
+            return self._write(uri, match.end(), _extension(match.group(1)))
+        except (binascii.Error, ValueError, OSError) as e:
+            log(f"Failed to store data URI image: {type(e).__name__}: {e}")
+            return None
+
+    def _write(self, uri: str, start: int, extension: str) -> str:
+        """分块解码 base64 载荷并写入临时文件，按内容哈希重命名"""
+        directory = self.directory
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pending = ""
+                for offset in range(start, len(uri), _DECODE_CHUNK_CHARS):
+                    # HTML 属性中的载荷可能折行：先去掉空白再按 4 字符对齐
+                    chunk = pending + "".join(uri[offset:offset + _DECODE_CHUNK_CHARS].split())
+                    aligned = len(chunk) - len(chunk) % 4
+                    pending = chunk[aligned:]
+                    data = binascii.a2b_base64(chunk[:aligned])
+                    digest.update(data)
+                    f.write(data)
+                if pending:
+                    data = binascii.a2b_base64(pending + "=" * (-len(pending) % 4))
+                    digest.update(data)
+                    f.write(data)
+
+            name = f"{digest.hexdigest()}.{extension}"
+            path = os.path.join(directory, name)
+            with self._lock:
+                if os.path.exists(path):
+                    os.remove(tmp_path)
+                    os.utime(path)
+                else:
+                    os.replace(tmp_path, path)
+            return name
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def cleanup(self, max_age_days: float, max_total_mb: float) -> int:
+        """
+        删除超过保存期限的文件，再按修改时间从旧到新删除直到总大小不超过上限
+
+        正在进行的转换引用的文件在写入或 get() 时刷新过修改时间，按大小淘汰时跳过
+        修改时间在 _EVICT_MIN_AGE_S 以内的文件，因此总大小可能暂时超过上限。
+
+        Returns:
+            删除的文件数
+        """
+        now = time.time()
+        entries: List[Tuple[float, int, str]] = []
+        removed = 0
+        with self._lock:
+            self._last_cleanup = time.monotonic()
+            try:
+                scanned = list(os.scandir(self.directory))
+            except OSError:
+                return 0
+            for entry in scanned:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    age = now - stat.st_mtime
+                    if entry.name.endswith(".part"):
+                        # 写入中断残留的临时文件
+                        if age > _STALE_PART_S:
+                            os.remove(entry.path)
+                            removed += 1
+                    elif age > max_age_days * 86400:
+                        os.remove(entry.path)
+                        removed += 1
+                    else:
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                except OSError:
+                    continue
+
+            # 从新到旧累计，超出总大小上限的（最旧的）删除
+            total = 0
+            limit = max_total_mb * 1024 * 1024
+            for mtime, size, path in sorted(entries, reverse=True):
+                if total + size <= limit or now - mtime < _EVICT_MIN_AGE_S:
+                    total += size
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            log(f"Blob store cleanup removed {removed} files")
+        return removed
+
+    def maybe_cleanup(self, max_age_days: float, max_total_mb: float) -> None:
+        """按间隔节流的 cleanup（进程内第一次调用时立即执行）"""
+        if self._last_cleanup is not None and time.monotonic() - self._last_cleanup < _CLEANUP_INTERVAL_S:
+            return
+        self.cleanup(max_age_days, max_total_mb)
+
+
+_default_store: Optional[BlobStore] = None
+_default_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """进程内共享的 BlobStore（位于用户缓存目录 blobs 子目录）"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = BlobStore()
+        return _default_store
+
+
+def blob_store_settings(config: dict) -> dict:
+    """config["image_blob_store"]（缺失或格式错误时为空字典）"""
+    settings = config.get("image_blob_store")
+    return settings if isinstance(settings, dict) else {}
+
+
+def externalize_markdown_images(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+    """
+    行流阶段：把 Markdown 中的 base64 图片 data URI 替换为 blob 文件名，代码块内不处理
+
+    代码块按与 track_code_fences 相同的规则自行跟踪（不修改共享的 ctx 状态，
+    与是否运行了 LaTeX 阶段无关）。
+    """
+    store = get_blob_store()
+
+    def replace(match: "re.Match[str]") -> str:
+        return store.put_data_uri(match.group(0)) or match.group(0)
+
+    fence = ""
+    for line in lines:
+        stripped = line.text.lstrip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            if not fence:
+                fence = stripped[:3]
+            elif stripped.startswith(fence):
+                fence = ""
+        elif not fence and DATA_IMAGE_PREFIX in line.text:
+            line.text = _MARKDOWN_DATA_IMAGE_RE.sub(replace, line.text)
+        yield line
@@ -6,16 +6,101 @@ These utilities don't depend on platform-specific APIs and can be reused by
 both Windows and macOS implementations.
 """
 
+import codecs
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from ..utils.logging import log
 from ..core.errors import ClipboardError
 
 
+# 超过该大小的文件使用内存映射读取，按块增量解码
+MMAP_THRESHOLD = 4 * 1024 * 1024
+# 增量解码的块大小
+_DECODE_CHUNK = 1024 * 1024
+# 并发读取的最大线程数
+_MAX_READ_WORKERS = 8
+
+# BOM -> 编码（先匹配较长的 UTF-32 BOM）
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# 无 BOM 时的尝试顺序（gb2312 是 gbk 的子集，无需单独尝试）
+_FALLBACK_ENCODINGS = ("utf-8", "gbk")
+
+
+def _detect_bom(head: bytes) -> tuple[Optional[str], int]:
+    """根据文件开头检测 BOM，返回 (编码, BOM 长度)"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    return None, 0
+
+
+def _decode_buffer(buffer, encoding: str, start: int) -> str:
+    """
+    从 buffer[start:] 严格解码；大缓冲区按块增量解码，不复制整段字节
+
+    Raises:
+        UnicodeDecodeError: 编码不匹配时
+    """
+    size = len(buffer)
+    if size - start <= _DECODE_CHUNK:
+        return bytes(buffer[start:]).decode(encoding)
+
+    decoder = codecs.getincrementaldecoder(encoding)("strict")
+    parts = []
+    for offset in range(start, size, _DECODE_CHUNK):
+        end = min(offset + _DECODE_CHUNK, size)
+        parts.append(decoder.decode(buffer[offset:end], end == size))
+    return "".join(parts)
+
+
+def decode_text_bytes(buffer) -> tuple[str, str]:
+    """
+    解码文件内容：有 BOM 时按 BOM 解码（并去掉 BOM），否则依次尝试 utf-8、gbk
+
+    与文本模式读取一致，\r\n 与单独的 \r 转换为 \n。
+
+    Args:
+        buffer: bytes 或 mmap 等支持切片的字节缓冲区
+
+    Returns:
+        (内容, 使用的编码)
+
+    Raises:
+        UnicodeDecodeError: 所有编码都失败时
+    """
+    encoding, bom_length = _detect_bom(bytes(buffer[:4]))
+    candidates = (encoding,) if encoding else _FALLBACK_ENCODINGS
+
+    error: Optional[UnicodeDecodeError] = None
+    for candidate in candidates:
+        try:
+            content = _decode_buffer(buffer, candidate, bom_length)
+        except UnicodeDecodeError as e:
+            error = e
+            continue
+        if "\r" in content:
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content, candidate
+    assert error is not None
+    raise error
+
+
 def read_file_with_encoding(file_path: str) -> str:
     """
     读取文件内容，自动检测编码
     
-    尝试顺序：utf-8 -> gbk -> gb2312 -> utf-8-sig
+    文件只读取一次：小文件整体读入，大文件（>= MMAP_THRESHOLD）内存映射后按块增量解码。
+    编码检测顺序：BOM（utf-8/utf-16/utf-32）-> utf-8 -> gbk
     
     Args:
         file_path: 文件路径
@@ -26,25 +111,23 @@ def read_file_with_encoding(file_path: str) -> str:
     Raises:
         ClipboardError: 读取失败时
     """
-    encodings = ["utf-8", "gbk", "gb2312", "utf-8-sig"]
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, "r", encoding=encoding) as f:
-                content = f.read()
-                log(f"Successfully read file '{file_path}' with encoding: {encoding}")
-                return content
-        except UnicodeDecodeError:
-            log(f"Failed to decode '{file_path}' with encoding: {encoding}")
-            continue
-        except Exception as e:
-            log(f"Error reading file '{file_path}' with encoding {encoding}: {e}")
-            continue
-    
-    # 所有编码都失败
-    raise ClipboardError(
-        f"Failed to read file '{file_path}' with any supported encoding: {encodings}"
-    )
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content, encoding = decode_text_bytes(mapped)
+            else:
+                content, encoding = decode_text_bytes(f.read())
+    except UnicodeDecodeError as e:
+        raise ClipboardError(
+            f"Failed to read file '{file_path}' with any supported encoding: {e}"
+        ) from e
+    except OSError as e:
+        raise ClipboardError(f"Failed to read file '{file_path}': {e}") from e
+
+    log(f"Successfully read file '{file_path}' with encoding: {encoding}")
+    return content
 
 
 def filter_markdown_files(file_paths: list[str]) -> list[str]:
@@ -93,17 +176,34 @@ def read_markdown_files(file_paths: list[str]) -> tuple[bool, list[tuple[str, st
     files_data: list[tuple[str, str]] = []
     errors: list[tuple[str, str]] = []
     
-    for file_path in file_paths:
-        filename = os.path.basename(file_path)
-        try:
-            content = read_file_with_encoding(file_path)
+    # 多个文件在线程池中并发读取（I/O 与解码时释放 GIL），结果保持原顺序
+    if len(file_paths) > 1:
+        workers = min(_MAX_READ_WORKERS, len(file_paths))
+        log(f"Reading {len(file_paths)} Markdown files with {workers} threads")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="md-read") as executor:
+            results = list(executor.map(_read_one_markdown_file, file_paths))
+    else:
+        results = [_read_one_markdown_file(file_paths[0])]
+    
+    for filename, content, error_msg in results:
+        if error_msg is None:
             files_data.append((filename, content))
-            log(f"Successfully read MD file: {filename}")
-        except Exception as e:
-            # 记录失败信息，但继续处理其他文件
-            error_msg = str(e)
-            log(f"Failed to read MD file '{filename}': {error_msg}")
+        else:
             errors.append((filename, error_msg))
     
     # found 为 True 当且仅当至少成功读取了一个文件
     return len(files_data) > 0, files_data, errors
+
+
+def _read_one_markdown_file(file_path: str) -> tuple[str, str, Optional[str]]:
+    """读取单个 Markdown 文件，返回 (文件名, 内容, 错误信息)；失败不抛出异常"""
+    filename = os.path.basename(file_path)
+    try:
+        content = read_file_with_encoding(file_path)
+        log(f"Successfully read MD file: {filename}")
+        return filename, content, None
+    except Exception as e:
+        # 记录失败信息，但继续处理其他文件
+        error_msg = str(e)
+        log(f"Failed to read MD file '{filename}': {error_msg}")
+        return filename, "", error_msg
@@ -1,13 +1,366 @@
 """DOCX document post-processing utilities."""
 
 import io
-from docx import Document
+import re
+import zipfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lxml import etree
+
 from ..utils.logging import log
 
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+M_NS = "http://schemas.openxmlformats.org/officeDocument/2006/math"
+DOCUMENT_PART = "word/document.xml"
+STYLES_PART = "word/styles.xml"
+
+_W_BODY = f"{{{W_NS}}}body"
+_W_P = f"{{{W_NS}}}p"
+_W_PPR = f"{{{W_NS}}}pPr"
+_W_PSTYLE = f"{{{W_NS}}}pStyle"
+_W_VAL = f"{{{W_NS}}}val"
+_W_R = f"{{{W_NS}}}r"
+_W_RPR = f"{{{W_NS}}}rPr"
+_W_RSTYLE = f"{{{W_NS}}}rStyle"
+_W_NO_PROOF = f"{{{W_NS}}}noProof"
+_W_TBL = f"{{{W_NS}}}tbl"
+_M_R = f"{{{M_NS}}}r"
+_M_RPR = f"{{{M_NS}}}rPr"
+
+# w:rPr 中排在 w:noProof 之后的元素（CT_RPr 的 schema 顺序）
+_RPR_AFTER_NO_PROOF = {
+    f"{{{W_NS}}}{name}"
+    for name in (
+        "snapToGrid", "vanish", "webHidden", "color", "spacing", "w", "kern",
+        "position", "sz", "szCs", "highlight", "u", "effect", "bdr", "shd",
+        "fitText", "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout",
+        "specVanish", "oMath", "rPrChange",
+    )
+}
+
+_NS_DECL_RE = re.compile(rb'\sxmlns(?::([\w.-]+))?="([^"]*)"')
+_TAG_NAME_RE = re.compile(rb"<([^\s/>]+)")
+_XML_DECLARATION = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+
+
+class DocxPackage:
+    """只读访问 DOCX 包内部件（按需读取并缓存）"""
+
+    def __init__(self, zin: zipfile.ZipFile):
+        self._zin = zin
+        self._names = set(zin.namelist())
+        self._xml_cache: Dict[str, Optional[etree._Element]] = {}
+
+    def has(self, part_name: str) -> bool:
+        return part_name in self._names
+
+    def read_xml(self, part_name: str) -> Optional[etree._Element]:
+        """解析部件为 XML 树，不存在时返回 None"""
+        if part_name not in self._xml_cache:
+            root = None
+            if part_name in self._names:
+                root = etree.fromstring(self._zin.read(part_name))
+            self._xml_cache[part_name] = root
+        return self._xml_cache[part_name]
+
+    def paragraph_style_ids(self) -> Dict[str, str]:
+        """返回段落样式 {小写样式名: 样式 ID}"""
+        return self.style_ids("paragraph")
+
+    def style_ids(self, style_type: str) -> Dict[str, str]:
+        """返回指定类型（paragraph/character/table）的样式 {小写样式名: 样式 ID}"""
+        styles = self.read_xml(STYLES_PART)
+        result: Dict[str, str] = {}
+        if styles is None:
+            return result
+        for style in styles.iter(f"{{{W_NS}}}style"):
+            if style.get(f"{{{W_NS}}}type") != style_type:
+                continue
+            style_id = style.get(f"{{{W_NS}}}styleId")
+            name = style.find(f"{{{W_NS}}}name")
+            if style_id and name is not None and name.get(_W_VAL):
+                result.setdefault(name.get(_W_VAL).lower(), style_id)
+        return result
+
+
+class DocxTransform:
+    """
+    word/document.xml 的流式变换基类
+
+    处理流程：
+        1. prepare(package) 读取样式等辅助部件，返回 False 表示本次无需执行
+        2. apply(block) 对 body 的每个顶层子元素（段落、表格、sectPr 等）调用，
+           原地修改元素，返回修改数量
+        3. finish() 汇总日志
+    """
+
+    name = "transform"
+
+    def __init__(self) -> None:
+        self.modified_count = 0
+
+    def prepare(self, package: DocxPackage) -> bool:
+        return True
+
+    def apply(self, block: etree._Element) -> int:
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        log(f"DOCX transform '{self.name}': {self.modified_count} element(s) modified")
+
+
+class FirstParagraphStyleTransform(DocxTransform):
+    """将正文中的 "First Paragraph" 段落样式替换为目标样式"""
+
+    name = "first_paragraph_style"
+
+    def __init__(self, target_style: str = "Body Text", source_style: str = "First Paragraph"):
+        super().__init__()
+        self.target_style = target_style
+        self.source_style = source_style
+        self._source_id: Optional[str] = None
+        self._target_id: Optional[str] = None
+
+    def prepare(self, package: DocxPackage) -> bool:
+        style_ids = package.paragraph_style_ids()
+        self._source_id = style_ids.get(self.source_style.lower())
+        if not self._source_id:
+            log(f"No '{self.source_style}' style found in document")
+            return False
+
+        self._target_id = style_ids.get(self.target_style.lower())
+        if not self._target_id and self.target_style in style_ids.values():
+            # 允许直接传入样式 ID
+            self._target_id = self.target_style
+        if not self._target_id:
+            log(f"Target style '{self.target_style}' not found, skip '{self.source_style}' replacement")
+            return False
+        return True
+
+    def apply(self, block: etree._Element) -> int:
+        # 与 python-docx 的 document.paragraphs 一致：只处理 body 的顶层段落
+        if block.tag != _W_P:
+            return 0
+        ppr = block.find(_W_PPR)
+        pstyle = ppr.find(_W_PSTYLE) if ppr is not None else None
+        if pstyle is None or pstyle.get(_W_VAL) != self._source_id:
+            return 0
+        pstyle.set(_W_VAL, self._target_id)  # type: ignore[arg-type]
+        return 1
+
+    def finish(self) -> None:
+        if self.modified_count > 0:
+            log(
+                f"Total {self.modified_count} paragraph(s) changed from "
+                f"'{self.source_style}' to '{self.target_style}'"
+            )
+        else:
+            log(f"No '{self.source_style}' paragraph found in document")
+
+
+class NoProofTransform(DocxTransform):
+    """
+    为插入内容的 run 添加 w:noProof，避免 Word/WPS 插入后对大量新内容做拼写/语法检查
+
+    可按元素类型开启：代码（Source Code 段落与 Verbatim Char 行内代码）、
+    表格、公式（OMML 中的 run），或直接标记全部 run。
+    """
+
+    name = "no_proof"
+
+    def __init__(
+        self,
+        code: bool = True,
+        tables: bool = True,
+        math: bool = True,
+        all_runs: bool = False,
+    ):
+        super().__init__()
+        self.code = code
+        self.tables = tables
+        self.math = math
+        self.all_runs = all_runs
+        self._code_para_id: Optional[str] = None
+        self._code_char_id: Optional[str] = None
+
+    def prepare(self, package: DocxPackage) -> bool:
+        if self.code and not self.all_runs:
+            self._code_para_id = package.style_ids("paragraph").get("source code")
+            self._code_char_id = package.style_ids("character").get("verbatim char")
+        return self.all_runs or self.code or self.tables or self.math
+
+    def apply(self, block: etree._Element) -> int:
+        if self.all_runs or (self.tables and block.tag == _W_TBL):
+            return sum(self._mark(run) for run in block.iter(_W_R, _M_R))
+
+        count = 0
+        if self.code:
+            for run in block.iter(_W_R):
+                if self._is_code_run(run):
+                    count += self._mark(run)
+        if self.math:
+            for run in block.iter(_M_R):
+                count += self._mark(run)
+        return count
+
+    def _is_code_run(self, run: etree._Element) -> bool:
+        rpr = run.find(_W_RPR)
+        rstyle = rpr.find(_W_RSTYLE) if rpr is not None else None
+        if rstyle is not None and self._code_char_id and rstyle.get(_W_VAL) == self._code_char_id:
+            return True
+        paragraph = run.getparent()
+        while paragraph is not None and paragraph.tag != _W_P:
+            paragraph = paragraph.getparent()
+        if paragraph is None or not self._code_para_id:
+            return False
+        ppr = paragraph.find(_W_PPR)
+        pstyle = ppr.find(_W_PSTYLE) if ppr is not None else None
+        return pstyle is not None and pstyle.get(_W_VAL) == self._code_para_id
+
+    @staticmethod
+    def _mark(run: etree._Element) -> int:
+        """在 run 的 w:rPr 中按 schema 顺序插入 w:noProof，已存在时不重复添加"""
+        rpr = run.find(_W_RPR)
+        if rpr is None:
+            rpr = etree.Element(_W_RPR)
+            # w:r 中 rPr 必须是第一个子元素；m:r 中排在 m:rPr 之后
+            index = 1 if run.tag == _M_R and len(run) and run[0].tag == _M_RPR else 0
+            run.insert(index, rpr)
+        elif rpr.find(_W_NO_PROOF) is not None:
+            return 0
+
+        no_proof = etree.Element(_W_NO_PROOF)
+        for index, child in enumerate(rpr):
+            if child.tag in _RPR_AFTER_NO_PROOF:
+                rpr.insert(index, no_proof)
+                break
+        else:
+            rpr.append(no_proof)
+        return 1
+
+
+def _strip_inherited_namespaces(fragment: bytes, root_nsmap: Dict[Optional[str], str]) -> bytes:
+    """
+    删除片段首个起始标签里与根元素重复的命名空间声明
+
+    lxml 单独序列化子树时会把作用域内的全部命名空间重新声明一遍，
+    根元素已声明相同绑定时这些声明是冗余的。
+    """
+    end = fragment.find(b">")
+    if end < 0:
+        return fragment
+    head = fragment[:end]
+
+    def _drop(match: "re.Match[bytes]") -> bytes:
+        prefix = match.group(1).decode() if match.group(1) else None
+        if root_nsmap.get(prefix) == match.group(2).decode():
+            return b""
+        return match.group(0)
+
+    return _NS_DECL_RE.sub(_drop, head) + fragment[end:]
+
+
+def _shell_tags(elem: etree._Element, nsmap: Dict[Optional[str], str]) -> Tuple[bytes, bytes]:
+    """序列化元素自身的起始/结束标签（不含子元素），用于包裹流式写出的子元素"""
+    shell = etree.Element(elem.tag, dict(elem.attrib), nsmap=nsmap)
+    empty = etree.tostring(shell, encoding="UTF-8")
+    start = empty[:-2].rstrip() + b">"
+    name = _TAG_NAME_RE.match(start).group(1)  # type: ignore[union-attr]
+    return start, b"</" + name + b">"
+
+
+def _rewrite_document_xml(source, target, transforms: List[DocxTransform]) -> None:
+    """
+    流式重写 document.xml：逐个处理 body 顶层子元素，处理完立即写出并释放
+    """
+    context = etree.iterparse(source, events=("start", "end"), huge_tree=True)
+    end_tags: List[bytes] = []
+    root_nsmap: Dict[Optional[str], str] = {}
+    depth = 0
+
+    target.write(_XML_DECLARATION)
+    for event, elem in context:
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root_nsmap = dict(elem.nsmap)
+                start, end = _shell_tags(elem, root_nsmap)
+            elif depth == 2 and elem.tag == _W_BODY:
+                start, end = _shell_tags(elem, root_nsmap)
+                start = _strip_inherited_namespaces(start, root_nsmap)
+            else:
+                continue
+            target.write(start)
+            end_tags.append(end)
+            continue
+
+        if depth == 1 or (depth == 2 and elem.tag == _W_BODY):
+            target.write(end_tags.pop())
+        elif depth == 2 or (depth == 3 and elem.getparent().tag == _W_BODY):
+            if depth == 3:
+                for transform in transforms:
+                    transform.modified_count += transform.apply(elem)
+            fragment = etree.tostring(elem, encoding="UTF-8", with_tail=False)
+            target.write(_strip_inherited_namespaces(fragment, root_nsmap))
+            # 释放已写出的元素
+            parent = elem.getparent()
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+        depth -= 1
+
 
 class DocxProcessor:
     """DOCX 文档后处理器 - 用于修改已生成的 DOCX 文档样式"""
-    
+
+    @staticmethod
+    def process(docx_bytes: bytes, transforms: Iterable[DocxTransform]) -> bytes:
+        """
+        在一次流式遍历中对 word/document.xml 依次应用多个变换
+
+        其余部件原样复制；没有需要执行的变换时直接返回原字节流。
+
+        Args:
+            docx_bytes: DOCX 文件的字节流
+            transforms: 变换列表，按顺序作用于每个 body 顶层元素
+
+        Returns:
+            处理后的 DOCX 文件字节流（失败时返回原始字节流）
+        """
+        transforms = list(transforms)
+        if not transforms:
+            return docx_bytes
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin:
+                package = DocxPackage(zin)
+                if not package.has(DOCUMENT_PART):
+                    return docx_bytes
+
+                active = [t for t in transforms if t.prepare(package)]
+                if not active:
+                    return docx_bytes
+
+                output = io.BytesIO()
+                with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+                    for info in zin.infolist():
+                        if info.filename != DOCUMENT_PART:
+                            zout.writestr(info, zin.read(info))
+                            continue
+                        target_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                        target_info.compress_type = zipfile.ZIP_DEFLATED
+                        with zin.open(info) as source, zout.open(target_info, "w") as target:
+                            _rewrite_document_xml(source, target, active)
+
+            for transform in active:
+                transform.finish()
+            return output.getvalue()
+
+        except Exception as e:
+            log(f"Failed to process DOCX styles: {type(e).__name__}: {e}")
+            # 如果处理失败，返回原始字节流
+            return docx_bytes
+
     @staticmethod
     def normalize_first_paragraph_style(
         docx_bytes: bytes,
@@ -15,72 +368,48 @@ class DocxProcessor:
     ) -> bytes:
         """
         将 DOCX 文档中的 "First Paragraph" 样式替换为指定样式
-        
+
         Args:
             docx_bytes: DOCX 文件的字节流
             target_style: 目标样式名称，默认为 "Body Text"
-            
+
         Returns:
             修改后的 DOCX 文件字节流
         """
-        try:
-            # 从字节流加载文档
-            doc = Document(io.BytesIO(docx_bytes))
-            
-            # 统计修改的段落数量
-            modified_count = 0
-            
-            # 遍历所有段落
-            for paragraph in doc.paragraphs:
-                # 检查段落样式是否为 "First Paragraph"
-                if paragraph.style and paragraph.style.name == "First Paragraph":
-                    # 修改为目标样式
-                    paragraph.style = target_style
-                    modified_count += 1
-                    log(f"Changed paragraph style from 'First Paragraph' to '{target_style}'")
-            
-            # 如果有修改，记录日志
-            if modified_count > 0:
-                log(f"Total {modified_count} paragraph(s) changed from 'First Paragraph' to '{target_style}'")
-            else:
-                log("No 'First Paragraph' style found in document")
-            
-            # 将修改后的文档保存到字节流
-            output_stream = io.BytesIO()
-            doc.save(output_stream)
-            output_stream.seek(0)
-            
-            return output_stream.read()
-            
-        except Exception as e:
-            log(f"Failed to process DOCX styles: {type(e).__name__}: {e}")
-            # 如果处理失败，返回原始字节流
-            return docx_bytes
-    
+        return DocxProcessor.process(docx_bytes, [FirstParagraphStyleTransform(target_style)])
+
     @staticmethod
     def apply_custom_processing(
         docx_bytes: bytes,
         disable_first_para_indent: bool = False,
-        target_style: str = "Body Text"
+        target_style: str = "Body Text",
+        no_proof: Optional[Dict[str, Any]] = None,
     ) -> bytes:
         """
-        对 DOCX 文档应用自定义后处理
-        
+        对 DOCX 文档应用自定义后处理（所有变换在同一次遍历中完成）
+
         Args:
             docx_bytes: DOCX 文件的字节流
             disable_first_para_indent: 是否禁用第一段特殊格式（替换 First Paragraph 样式）
             target_style: 目标样式名称
-            
+            no_proof: 不检查拼写/语法的元素类型，如 {"code": True, "tables": True,
+                "math": True, "all": False}；为 None 时不处理
+
         Returns:
             处理后的 DOCX 文件字节流
         """
+        transforms: List[DocxTransform] = []
+
         # 如果需要禁用第一段特殊格式
         if disable_first_para_indent:
-            docx_bytes = DocxProcessor.normalize_first_paragraph_style(
-                docx_bytes,
-                target_style
-            )
-        
-        # 可以在这里添加其他后处理逻辑
-        
-        return docx_bytes
+            transforms.append(FirstParagraphStyleTransform(target_style))
+
+        if no_proof:
+            transforms.append(NoProofTransform(
+                code=bool(no_proof.get("code", True)),
+                tables=bool(no_proof.get("tables", True)),
+                math=bool(no_proof.get("math", True)),
+                all_runs=bool(no_proof.get("all", False)),
+            ))
+
+        return DocxProcessor.process(docx_bytes, transforms)
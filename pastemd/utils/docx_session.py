@@ -0,0 +1,1029 @@
+"""Append-only session document assembly.
+
+A session document is one DOCX in ``save_dir`` that every paste is appended
+to. The file is kept in an appendable layout: ``word/document.xml`` is stored
+as a deflate stream whose body prefix ends on a sync-flush boundary, followed
+only by the small parts that change on each append (relationships, content
+types, numbering, footnotes) and the central directory.
+
+An append compresses just the new body fragment and writes it over the old
+tail (final ``sectPr`` and closing tags). Only the changed small parts and the
+central directory are rewritten after it, so the cost depends on the pasted
+content, not on the size of the document. New media entries go into a gap
+reserved in front of ``word/document.xml``. When the gap is too small, the
+compressed body is moved back once as raw bytes and a gap proportional to its
+size is reserved, so moving costs stay proportional to the media written.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from ..config.paths import get_cache_dir
+from .logging import log
+from .docx_processor import _strip_inherited_namespaces
+from .reference_docx import CT_NS, R_NS, W_NS, _resolve_target, _serialize
+
+DOCUMENT_PART = "word/document.xml"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+DOCUMENT_RELS_PART = "word/_rels/document.xml.rels"
+NUMBERING_PART = "word/numbering.xml"
+FOOTNOTES_PART = "word/footnotes.xml"
+FOOTNOTES_RELS_PART = "word/_rels/footnotes.xml.rels"
+
+# 每次追加都可能改写的小部件，始终放在 document.xml 之后
+MUTABLE_PARTS = (
+    CONTENT_TYPES_PART,
+    DOCUMENT_RELS_PART,
+    NUMBERING_PART,
+    FOOTNOTES_PART,
+    FOOTNOTES_RELS_PART,
+)
+
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+_REL_TYPE_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+_NUMBERING_CT = "application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"
+_FOOTNOTES_CT = "application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"
+
+_W_BODY = f"{{{W_NS}}}body"
+_W_SECT_PR = f"{{{W_NS}}}sectPr"
+_W_VAL = f"{{{W_NS}}}val"
+_W_ID = f"{{{W_NS}}}id"
+_W_NUM_ID = f"{{{W_NS}}}numId"
+_W_NUM = f"{{{W_NS}}}num"
+_W_ABSTRACT_NUM = f"{{{W_NS}}}abstractNum"
+_W_ABSTRACT_NUM_ID = f"{{{W_NS}}}abstractNumId"
+_W_NSID = f"{{{W_NS}}}nsid"
+_W_FOOTNOTE = f"{{{W_NS}}}footnote"
+_W_FOOTNOTE_REF = f"{{{W_NS}}}footnoteReference"
+_W_BOOKMARK_START = f"{{{W_NS}}}bookmarkStart"
+_W_BOOKMARK_END = f"{{{W_NS}}}bookmarkEnd"
+_WP_DOC_PR = f"{{{WP_NS}}}docPr"
+_R_PREFIX = f"{{{R_NS}}}"
+
+_RID_RE = re.compile(r"^rId(\d+)$")
+
+# ZIP 结构（不使用数据描述符，不支持 ZIP64）
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_LOCAL_SIG = 0x04034B50
+_CENTRAL_SIG = 0x02014B50
+_END_SIG = 0x06054B50
+_ZIP_VERSION = 20
+_UTF8_FLAG = 0x800
+# 本地文件头中 CRC/大小字段的偏移
+_LOCAL_CRC_OFFSET = 14
+_COMPRESS_LEVEL = 6
+
+_STATE_VERSION = 2
+# document.xml 之前为新媒体预留的空隙：至少这么大，且不小于已压缩正文的一半
+_MIN_MEDIA_GAP = 512 * 1024
+_COPY_CHUNK = 1024 * 1024
+_SPLIT_MARKER = "pastemd-session-split"
+
+# 回滚日志：原文件大小，随后为若干 (偏移, 长度, 原始字节)
+_JOURNAL_SUFFIX = ".pastemd-journal"
+_JOURNAL_MAGIC = b"PMDJ1"
+_JOURNAL_HEADER = struct.Struct("<Q")
+_JOURNAL_SEGMENT = struct.Struct("<QQ")
+
+
+@dataclass
+class SessionState:
+    """
+    会话文档的追加状态（保存在缓存目录的 JSON 中）
+
+    Attributes:
+        doc_header_offset: document.xml 本地文件头偏移
+        gap_offset: 媒体空隙的起始偏移（空隙延伸到 document.xml 的本地文件头，不属于任何部件）
+        prefix_csize: 已压缩正文前缀的字节数（以同步刷新结尾，可直接续写）
+        prefix_size: 正文前缀的未压缩字节数
+        prefix_crc: 正文前缀的 CRC32
+        tail: 末尾的 sectPr 与闭合标签
+        namespaces: 根元素声明的命名空间（默认命名空间的键为空串）
+        next_bookmark_id: 下一个书签 ID
+        next_doc_pr_id: 下一个绘图对象 ID（wp:docPr）
+        next_media: 下一个媒体文件序号
+        file_size / file_mtime_ns: 写入后的文件签名，不一致说明文件被外部修改
+    """
+    doc_header_offset: int
+    gap_offset: int
+    prefix_csize: int
+    prefix_size: int
+    prefix_crc: int
+    tail: str
+    namespaces: Dict[str, str] = field(default_factory=dict)
+    next_bookmark_id: int = 0
+    next_doc_pr_id: int = 1
+    next_media: int = 1
+    file_size: int = 0
+    file_mtime_ns: int = 0
+    version: int = field(default=_STATE_VERSION)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional["SessionState"]:
+        if not isinstance(data, dict) or data.get("version") != _STATE_VERSION:
+            return None
+        try:
+            return cls(**data)
+        except TypeError:
+            return None
+
+
+@dataclass
+class _Entry:
+    """中央目录中的一项"""
+    name: str
+    offset: int
+    crc: int
+    csize: int
+    size: int
+    method: int = zipfile.ZIP_DEFLATED
+    date_time: Tuple[int, int, int, int, int, int] = (1980, 1, 1, 0, 0, 0)
+    flags: int = 0
+    external_attr: int = 0
+
+
+def _dos_time(date_time) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+def _name_bytes(name: str) -> Tuple[bytes, int]:
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), _UTF8_FLAG
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH)
+
+
+def _deflate_open(data: bytes) -> bytes:
+    """压缩为未结束的 deflate 块（同步刷新，按字节对齐），之后可以继续拼接其他块"""
+    compressor = zlib.compressobj(_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _write_local_header(f, name: str, crc: int, csize: int, size: int, date_time) -> _Entry:
+    """在当前位置写本地文件头，返回对应的中央目录项（数据由调用方紧接着写入）"""
+    encoded, flags = _name_bytes(name)
+    dos_time, dos_date = _dos_time(date_time)
+    offset = f.tell()
+    f.write(_LOCAL_HEADER.pack(
+        _LOCAL_SIG, _ZIP_VERSION, flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+        crc, csize, size, len(encoded), 0,
+    ))
+    f.write(encoded)
+    return _Entry(name, offset, crc, csize, size, date_time=date_time, flags=flags)
+
+
+def _write_part(f, name: str, data: bytes, date_time) -> _Entry:
+    compressed = _deflate(data)
+    entry = _write_local_header(f, name, zlib.crc32(data), len(compressed), len(data), date_time)
+    f.write(compressed)
+    return entry
+
+
+def _encoded_size(name: str, compressed: bytes) -> int:
+    """本地文件头加压缩数据的字节数"""
+    return _LOCAL_HEADER.size + len(_name_bytes(name)[0]) + len(compressed)
+
+
+def _move_back(f, src: int, dst: int, length: int) -> None:
+    """把 [src, src + length) 移到 dst（dst > src，区间可以重叠：从末尾开始按块复制）"""
+    end = length
+    while end > 0:
+        start = max(0, end - _COPY_CHUNK)
+        f.seek(src + start)
+        data = f.read(end - start)
+        f.seek(dst + start)
+        f.write(data)
+        end = start
+
+
+def _write_zeros(f, size: int) -> None:
+    while size > 0:
+        chunk = min(size, _COPY_CHUNK)
+        f.write(bytes(chunk))
+        size -= chunk
+
+
+def _write_central_directory(f, entries: List[_Entry]) -> None:
+    start = f.tell()
+    for entry in entries:
+        encoded, utf8_flag = _name_bytes(entry.name)
+        dos_time, dos_date = _dos_time(entry.date_time)
+        f.write(_CENTRAL_HEADER.pack(
+            _CENTRAL_SIG, _ZIP_VERSION, _ZIP_VERSION, entry.flags | utf8_flag, entry.method,
+            dos_time, dos_date, entry.crc, entry.csize, entry.size,
+            len(encoded), 0, 0, 0, 0, entry.external_attr, entry.offset,
+        ))
+        f.write(encoded)
+    end = f.tell()
+    f.write(_END_RECORD.pack(_END_SIG, 0, 0, len(entries), len(entries), end - start, start, 0))
+    f.truncate()
+
+
+def _entry_from_info(info: zipfile.ZipInfo) -> _Entry:
+    return _Entry(
+        info.filename, info.header_offset, info.CRC, info.compress_size, info.file_size,
+        method=info.compress_type, date_time=info.date_time,
+        flags=info.flag_bits & ~_UTF8_FLAG, external_attr=info.external_attr,
+    )
+
+
+def _split_document(xml_bytes: bytes) -> Tuple[bytes, bytes, etree._Element]:
+    """
+    把 document.xml 切分为 (正文前缀, 尾部, 根元素)
+
+    尾部为 body 末尾的 sectPr 与 </w:body></w:document>，追加内容写在两者之间。
+    """
+    root = etree.fromstring(xml_bytes)
+    body = root.find(_W_BODY)
+    if body is None:
+        raise ValueError("document.xml has no body")
+
+    sect_pr = b""
+    if len(body) and body[-1].tag == _W_SECT_PR:
+        fragment = etree.tostring(body[-1], encoding="UTF-8", with_tail=False)
+        sect_pr = _strip_inherited_namespaces(fragment, root.nsmap)
+        body.remove(body[-1])
+
+    # 用注释标记切分点，不依赖命名空间前缀的写法
+    marker = etree.Comment(_SPLIT_MARKER)
+    body.append(marker)
+    serialized = _serialize(root)
+    body.remove(marker)
+    token = f"<!--{_SPLIT_MARKER}-->".encode("ascii")
+    split = serialized.rindex(token)
+    return serialized[:split], sect_pr + serialized[split + len(token):], root
+
+
+def _max_int_attr(root: etree._Element, tag: str, attr: str) -> int:
+    result = -1
+    for elem in root.iter(tag):
+        try:
+            result = max(result, int(elem.get(attr, "")))
+        except ValueError:
+            continue
+    return result
+
+
+class _Relationships:
+    """关系部件（.rels）的编辑器"""
+
+    def __init__(self, xml_bytes: Optional[bytes]):
+        if xml_bytes:
+            self.root = etree.fromstring(xml_bytes)
+        else:
+            self.root = etree.Element(f"{{{PR_NS}}}Relationships", nsmap={None: PR_NS})
+        self.by_id: Dict[str, etree._Element] = {
+            rel.get("Id", ""): rel for rel in self.root
+        }
+        numbers = [int(m.group(1)) for m in map(_RID_RE.match, self.by_id) if m]
+        self._next = max(numbers, default=0) + 1
+        self.modified = False
+
+    def add(self, rel_type: str, target: str, external: bool = False) -> str:
+        while f"rId{self._next}" in self.by_id:
+            self._next += 1
+        rel_id = f"rId{self._next}"
+        self._next += 1
+        rel = etree.SubElement(self.root, f"{{{PR_NS}}}Relationship")
+        rel.set("Id", rel_id)
+        rel.set("Type", rel_type)
+        rel.set("Target", target)
+        if external:
+            rel.set("TargetMode", "External")
+        self.by_id[rel_id] = rel
+        self.modified = True
+        return rel_id
+
+    def find_type(self, suffix: str) -> Optional[etree._Element]:
+        for rel in self.root:
+            if (rel.get("Type") or "").rsplit("/", 1)[-1] == suffix:
+                return rel
+        return None
+
+
+class _ContentTypes:
+    """[Content_Types].xml 的编辑器"""
+
+    def __init__(self, xml_bytes: bytes):
+        self.root = etree.fromstring(xml_bytes)
+        self.defaults = {
+            (elem.get("Extension") or "").lower()
+            for elem in self.root.iter(f"{{{CT_NS}}}Default")
+        }
+        self.overrides = {
+            elem.get("PartName") for elem in self.root.iter(f"{{{CT_NS}}}Override")
+        }
+        self.modified = False
+
+    def ensure_default(self, extension: str, content_type: str) -> None:
+        if extension.lower() in self.defaults:
+            return
+        elem = etree.Element(f"{{{CT_NS}}}Default")
+        elem.set("Extension", extension)
+        elem.set("ContentType", content_type)
+        # Default 必须排在 Override 之前
+        overrides = self.root.findall(f"{{{CT_NS}}}Override")
+        if overrides:
+            overrides[0].addprevious(elem)
+        else:
+            self.root.append(elem)
+        self.defaults.add(extension.lower())
+        self.modified = True
+
+    def ensure_override(self, part_name: str, content_type: str) -> None:
+        part_name = "/" + part_name.lstrip("/")
+        if part_name in self.overrides:
+            return
+        elem = etree.SubElement(self.root, f"{{{CT_NS}}}Override")
+        elem.set("PartName", part_name)
+        elem.set("ContentType", content_type)
+        self.overrides.add(part_name)
+        self.modified = True
+
+
+class _SourcePackage:
+    """新粘贴内容（Pandoc 生成的 DOCX）"""
+
+    def __init__(self, docx_bytes: bytes):
+        self.zin = zipfile.ZipFile(io.BytesIO(docx_bytes))
+        self.names = set(self.zin.namelist())
+        ct_root = etree.fromstring(self.zin.read(CONTENT_TYPES_PART))
+        self.default_types = {
+            (elem.get("Extension") or "").lower(): elem.get("ContentType", "")
+            for elem in ct_root.iter(f"{{{CT_NS}}}Default")
+        }
+        self.override_types = {
+            (elem.get("PartName") or "").lstrip("/"): elem.get("ContentType", "")
+            for elem in ct_root.iter(f"{{{CT_NS}}}Override")
+        }
+        self._xml_cache: Dict[str, Optional[etree._Element]] = {}
+
+    def read_xml(self, part_name: str) -> Optional[etree._Element]:
+        """解析部件（缓存结果；调用方复制元素后再插入其他文档）"""
+        if part_name not in self._xml_cache:
+            root = None
+            if part_name in self.names:
+                root = etree.fromstring(self.zin.read(part_name))
+            self._xml_cache[part_name] = root
+        return self._xml_cache[part_name]
+
+    def rels(self, part_name: str) -> _Relationships:
+        directory, name = posixpath.split(part_name)
+        rels_part = posixpath.join(directory, "_rels", f"{name}.rels")
+        return _Relationships(self.zin.read(rels_part) if rels_part in self.names else None)
+
+
+class _Merger:
+    """把新文档的正文合并进会话文档：重映射关系、编号、脚注、书签与绘图 ID"""
+
+    def __init__(self, source: _SourcePackage, state: SessionState, parts: Dict[str, bytes],
+                 existing_names: set):
+        self.source = source
+        self.state = state
+        self.existing_names = existing_names
+        self.content_types = _ContentTypes(parts[CONTENT_TYPES_PART])
+        self.document_rels = _Relationships(parts.get(DOCUMENT_RELS_PART))
+        self.footnotes_rels = _Relationships(parts.get(FOOTNOTES_RELS_PART))
+        self.numbering = etree.fromstring(parts[NUMBERING_PART]) if NUMBERING_PART in parts else None
+        self.footnotes = etree.fromstring(parts[FOOTNOTES_PART]) if FOOTNOTES_PART in parts else None
+        self.numbering_modified = False
+        self.footnotes_modified = False
+        # 新增的媒体等部件 {部件名: 内容}
+        self.new_parts: Dict[str, bytes] = {}
+        self._copied: Dict[str, str] = {}
+
+    def use_source(self, source: _SourcePackage) -> None:
+        """切换到下一个新文档（合并多个文档时沿用已解析的关系、编号与脚注）"""
+        self.source = source
+        self._copied = {}
+
+    def merge_body(self) -> List[etree._Element]:
+        """返回重映射后的正文块（不含末尾的 sectPr）"""
+        document = self.source.read_xml(DOCUMENT_PART)
+        body = document.find(_W_BODY) if document is not None else None
+        if body is None:
+            return []
+        blocks = list(body)
+        if blocks and blocks[-1].tag == _W_SECT_PR:
+            blocks.pop()
+
+        source_rels = self.source.rels(DOCUMENT_PART)
+        rel_map: Dict[str, str] = {}
+        num_map: Dict[str, str] = {}
+        footnote_map: Dict[str, str] = {}
+        bookmark_map: Dict[str, str] = {}
+        for block in blocks:
+            for elem in block.iter():
+                self._remap_relationships(elem, DOCUMENT_PART, source_rels, self.document_rels, rel_map)
+                tag = elem.tag
+                if tag == _W_NUM_ID:
+                    self._remap_numbering(elem, num_map)
+                elif tag == _W_FOOTNOTE_REF:
+                    self._remap_footnote(elem, footnote_map)
+                elif tag in (_W_BOOKMARK_START, _W_BOOKMARK_END):
+                    old = elem.get(_W_ID)
+                    if old is not None:
+                        if old not in bookmark_map:
+                            bookmark_map[old] = str(self.state.next_bookmark_id)
+                            self.state.next_bookmark_id += 1
+                        elem.set(_W_ID, bookmark_map[old])
+                elif tag == _WP_DOC_PR:
+                    elem.set("id", str(self.state.next_doc_pr_id))
+                    self.state.next_doc_pr_id += 1
+        return blocks
+
+    def _remap_relationships(self, elem, source_part, source_rels, target_rels, rel_map) -> None:
+        for attr, value in elem.attrib.items():
+            if not attr.startswith(_R_PREFIX):
+                continue
+            if value not in rel_map:
+                rel = source_rels.by_id.get(value)
+                if rel is None:
+                    continue
+                rel_map[value] = self._import_relationship(rel, source_part, target_rels)
+            elem.set(attr, rel_map[value])
+
+    def _import_relationship(self, rel, source_part: str, target_rels: _Relationships) -> str:
+        rel_type = rel.get("Type", "")
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            return target_rels.add(rel_type, target, external=True)
+
+        part_name = _resolve_target(source_part, target)
+        new_name = self._copied.get(part_name)
+        if new_name is None:
+            new_name = self._copy_part(part_name)
+            self._copied[part_name] = new_name
+        relative = posixpath.relpath(new_name, posixpath.dirname(source_part))
+        return target_rels.add(rel_type, relative)
+
+    def _copy_part(self, part_name: str) -> str:
+        """复制被引用的部件（图片等），使用会话内唯一的文件名"""
+        directory, name = posixpath.split(part_name)
+        while True:
+            new_name = posixpath.join(directory, f"s{self.state.next_media}_{name}")
+            self.state.next_media += 1
+            if new_name not in self.existing_names and new_name not in self.new_parts:
+                break
+        if part_name in self.source.names:
+            self.new_parts[new_name] = self.source.zin.read(part_name)
+        override = self.source.override_types.get(part_name)
+        if override:
+            self.content_types.ensure_override(new_name, override)
+        else:
+            extension = posixpath.splitext(name)[1].lstrip(".")
+            content_type = self.source.default_types.get(extension.lower())
+            if extension and content_type:
+                self.content_types.ensure_default(extension, content_type)
+        return new_name
+
+    def _remap_numbering(self, elem, num_map: Dict[str, str]) -> None:
+        old = elem.get(_W_VAL)
+        if old is None or old == "0":
+            return
+        if old not in num_map:
+            num_map[old] = self._import_numbering(old) or old
+        elem.set(_W_VAL, num_map[old])
+
+    def _import_numbering(self, num_id: str) -> Optional[str]:
+        source = self.source.read_xml(NUMBERING_PART)
+        if source is None:
+            return None
+        num = next((n for n in source.iter(_W_NUM) if n.get(_W_NUM_ID) == num_id), None)
+        if num is None:
+            return None
+        abstract_ref = num.find(_W_ABSTRACT_NUM_ID)
+        abstract_id = abstract_ref.get(_W_VAL) if abstract_ref is not None else None
+        abstract = next(
+            (a for a in source.iter(_W_ABSTRACT_NUM) if a.get(_W_ABSTRACT_NUM_ID) == abstract_id),
+            None,
+        )
+        if abstract is None:
+            return None
+
+        if self.numbering is None:
+            self.numbering = etree.Element(source.tag, nsmap=source.nsmap)
+            self._ensure_part_link(NUMBERING_PART, "numbering", _NUMBERING_CT)
+        new_abstract_id = str(_max_int_attr(self.numbering, _W_ABSTRACT_NUM, _W_ABSTRACT_NUM_ID) + 1)
+        new_num_id = str(max(_max_int_attr(self.numbering, _W_NUM, _W_NUM_ID) + 1, 1))
+
+        abstract = etree.fromstring(etree.tostring(abstract))
+        abstract.set(_W_ABSTRACT_NUM_ID, new_abstract_id)
+        # nsid 相同的列表会被 Word 视为同一列表，重新生成
+        nsid = abstract.find(_W_NSID)
+        if nsid is not None:
+            nsid.set(_W_VAL, os.urandom(4).hex().upper())
+        num = etree.fromstring(etree.tostring(num))
+        num.set(_W_NUM_ID, new_num_id)
+        num.find(_W_ABSTRACT_NUM_ID).set(_W_VAL, new_abstract_id)  # type: ignore[union-attr]
+
+        # schema 顺序：全部 abstractNum 在 num 之前
+        existing_abstracts = self.numbering.findall(_W_ABSTRACT_NUM)
+        existing_nums = self.numbering.findall(_W_NUM)
+        if existing_abstracts:
+            existing_abstracts[-1].addnext(abstract)
+        elif existing_nums:
+            existing_nums[0].addprevious(abstract)
+        else:
+            self.numbering.append(abstract)
+        if existing_nums:
+            existing_nums[-1].addnext(num)
+        else:
+            abstract.addnext(num)
+        self.numbering_modified = True
+        return new_num_id
+
+    def _remap_footnote(self, elem, footnote_map: Dict[str, str]) -> None:
+        old = elem.get(_W_ID)
+        if old is None:
+            return
+        if old not in footnote_map:
+            footnote_map[old] = self._import_footnote(old) or old
+        elem.set(_W_ID, footnote_map[old])
+
+    def _import_footnote(self, footnote_id: str) -> Optional[str]:
+        source = self.source.read_xml(FOOTNOTES_PART)
+        if source is None:
+            return None
+        footnote = next((f for f in source.iter(_W_FOOTNOTE) if f.get(_W_ID) == footnote_id), None)
+        if footnote is None:
+            return None
+        if self.footnotes is None:
+            self.footnotes = etree.Element(source.tag, nsmap=source.nsmap)
+            # 分隔符脚注（id -1/0）随第一次脚注一并复制
+            for separator in source.iter(_W_FOOTNOTE):
+                if separator.get(f"{{{W_NS}}}type") in ("separator", "continuationSeparator"):
+                    self.footnotes.append(etree.fromstring(etree.tostring(separator)))
+            self._ensure_part_link(FOOTNOTES_PART, "footnotes", _FOOTNOTES_CT)
+
+        new_id = str(max(_max_int_attr(self.footnotes, _W_FOOTNOTE, _W_ID) + 1, 1))
+        footnote = etree.fromstring(etree.tostring(footnote))
+        footnote.set(_W_ID, new_id)
+        source_rels = self.source.rels(FOOTNOTES_PART)
+        rel_map: Dict[str, str] = {}
+        for elem in footnote.iter():
+            self._remap_relationships(elem, FOOTNOTES_PART, source_rels, self.footnotes_rels, rel_map)
+        self.footnotes.append(footnote)
+        self.footnotes_modified = True
+        return new_id
+
+    def _ensure_part_link(self, part_name: str, rel_suffix: str, content_type: str) -> None:
+        if self.document_rels.find_type(rel_suffix) is None:
+            self.document_rels.add(_REL_TYPE_BASE + rel_suffix, posixpath.basename(part_name))
+        self.content_types.ensure_override(part_name, content_type)
+
+    def changed_parts(self) -> Dict[str, bytes]:
+        """返回需要改写的小部件"""
+        changed: Dict[str, bytes] = {}
+        if self.content_types.modified:
+            changed[CONTENT_TYPES_PART] = _serialize(self.content_types.root)
+        if self.document_rels.modified:
+            changed[DOCUMENT_RELS_PART] = _serialize(self.document_rels.root)
+        if self.footnotes_rels.modified:
+            changed[FOOTNOTES_RELS_PART] = _serialize(self.footnotes_rels.root)
+        if self.numbering_modified and self.numbering is not None:
+            changed[NUMBERING_PART] = _serialize(self.numbering)
+        if self.footnotes_modified and self.footnotes is not None:
+            changed[FOOTNOTES_PART] = _serialize(self.footnotes)
+        return changed
+
+
+def _serialize_blocks(blocks: List[etree._Element], namespaces: Dict[str, str]) -> bytes:
+    """序列化正文块；会话文档根元素已声明的命名空间不再重复声明"""
+    root_nsmap = {prefix or None: uri for prefix, uri in namespaces.items()}
+    return b"".join(
+        _strip_inherited_namespaces(etree.tostring(block, encoding="UTF-8", with_tail=False), root_nsmap)
+        for block in blocks
+    )
+
+
+def create_session_docx(path: str, docx_bytes: bytes) -> SessionState:
+    """
+    以可追加布局写出会话文档（首次创建，或文件被外部修改后重建）
+
+    Args:
+        path: 会话文档路径
+        docx_bytes: 文档内容（首次粘贴的结果或现有文件内容）
+
+    Returns:
+        追加状态
+    """
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin:
+        infos = zin.infolist()
+        names = {info.filename for info in infos}
+        if DOCUMENT_PART not in names:
+            raise ValueError("not a DOCX document")
+        prefix, tail, root = _split_document(zin.read(DOCUMENT_PART))
+
+        state = SessionState(
+            doc_header_offset=0, gap_offset=0, prefix_csize=0, prefix_size=len(prefix),
+            prefix_crc=zlib.crc32(prefix), tail=tail.decode("utf-8"),
+            namespaces={prefix or "": uri for prefix, uri in root.nsmap.items()},
+            next_bookmark_id=_max_int_attr(root, _W_BOOKMARK_START, _W_ID) + 1,
+            next_doc_pr_id=max(_max_int_attr(root, _WP_DOC_PR, "id") + 1, 1),
+        )
+        now = time.localtime()[:6]
+        entries: List[_Entry] = []
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for info in infos:
+                if info.filename == DOCUMENT_PART or info.filename in MUTABLE_PARTS:
+                    continue
+                entries.append(_write_part(f, info.filename, zin.read(info), info.date_time))
+
+            compressed_prefix = _deflate_open(prefix)
+            compressed_tail = _deflate(tail)
+            entry = _write_local_header(
+                f, DOCUMENT_PART, zlib.crc32(tail, state.prefix_crc),
+                len(compressed_prefix) + len(compressed_tail), len(prefix) + len(tail), now,
+            )
+            f.write(compressed_prefix)
+            f.write(compressed_tail)
+            entries.append(entry)
+            state.doc_header_offset = state.gap_offset = entry.offset
+            state.prefix_csize = len(compressed_prefix)
+
+            for name in MUTABLE_PARTS:
+                if name in names:
+                    entries.append(_write_part(f, name, zin.read(name), now))
+            _write_central_directory(f, entries)
+        os.replace(tmp_path, path)
+
+    _stamp(path, state)
+    return state
+
+
+def append_session_docx(path: str, state: SessionState, docx_bytes: bytes) -> SessionState:
+    """
+    把新文档的正文追加到会话文档末尾（在最后的 sectPr 之前）
+
+    已有正文既不解压也不解析：只在原尾部位置续写新内容，新媒体写入 document.xml
+    之前的空隙。空隙不足时把已压缩的正文按原始字节后移，并重新预留与正文大小成正比的空隙。
+    原地改写前只把将被覆盖的字节写入回滚日志，失败或中断时恢复原文件。
+
+    Args:
+        path: 会话文档路径
+        state: create_session_docx / 上次追加返回的状态
+        docx_bytes: 新粘贴内容转换得到的 DOCX
+
+    Returns:
+        更新后的追加状态
+    """
+    with zipfile.ZipFile(path) as zin:
+        infos = zin.infolist()
+        existing_names = {info.filename for info in infos}
+        mutable = {name: zin.read(name) for name in MUTABLE_PARTS if name in existing_names}
+    fixed = [
+        _entry_from_info(info) for info in infos
+        if info.filename != DOCUMENT_PART and info.filename not in MUTABLE_PARTS
+    ]
+    doc_date_time = next(info.date_time for info in infos if info.filename == DOCUMENT_PART)
+
+    source = _SourcePackage(docx_bytes)
+    merger = _Merger(source, state, mutable, existing_names)
+    blocks = merger.merge_body()
+    if not blocks:
+        return state
+    mutable.update(merger.changed_parts())
+
+    now = time.localtime()[:6]
+    media = [(name, data, _deflate(data)) for name, data in merger.new_parts.items()]
+    media_size = sum(_encoded_size(name, compressed) for name, _, compressed in media)
+    fragment = _serialize_blocks(blocks, state.namespaces)
+    tail = state.tail.encode("utf-8")
+    compressed_fragment = _deflate_open(fragment)
+    compressed_tail = _deflate(tail)
+    prefix_crc = zlib.crc32(fragment, state.prefix_crc)
+    crc = zlib.crc32(tail, prefix_crc)
+    prefix_size = state.prefix_size + len(fragment)
+    csize = state.prefix_csize + len(compressed_fragment) + len(compressed_tail)
+
+    header_size = _LOCAL_HEADER.size + len(DOCUMENT_PART)
+    doc_data_offset = state.doc_header_offset + header_size
+    moved = media_size > state.doc_header_offset - state.gap_offset
+    if moved:
+        new_gap = max(_MIN_MEDIA_GAP, state.prefix_csize // 2)
+        doc_header_offset = state.gap_offset + media_size + new_gap
+    else:
+        doc_header_offset = state.doc_header_offset
+    crc_offset = state.doc_header_offset + _LOCAL_CRC_OFFSET
+    if moved:
+        # 正文整体后移：从空隙起到文件末尾都会改写
+        ranges = [(state.gap_offset, -1)]
+    else:
+        # 空隙中写入媒体的区间、文件头中的 CRC/大小字段、正文前缀之后的部分
+        ranges = [(crc_offset, crc_offset + 12), (doc_data_offset + state.prefix_csize, -1)]
+        if media_size:
+            ranges.insert(0, (state.gap_offset, state.gap_offset + media_size))
+
+    rollback = _RollbackJournal(path)
+    with open(path, "r+b") as f:
+        rollback.save(f, ranges)
+        try:
+            if moved:
+                _move_back(f, doc_data_offset, doc_header_offset + header_size, state.prefix_csize)
+            f.seek(state.gap_offset)
+            for name, data, compressed in media:
+                fixed.append(_write_local_header(f, name, zlib.crc32(data), len(compressed), len(data), now))
+                f.write(compressed)
+            gap_offset = f.tell()
+            if moved:
+                _write_zeros(f, doc_header_offset - gap_offset)
+                doc_entry = _write_local_header(f, DOCUMENT_PART, crc, csize, prefix_size + len(tail), now)
+            else:
+                f.seek(crc_offset)
+                f.write(struct.pack("<III", crc, csize, prefix_size + len(tail)))
+                doc_entry = _Entry(
+                    DOCUMENT_PART, doc_header_offset, crc, csize, prefix_size + len(tail),
+                    date_time=doc_date_time,
+                )
+            f.seek(doc_header_offset + header_size + state.prefix_csize)
+            f.write(compressed_fragment)
+            f.write(compressed_tail)
+
+            entries = fixed + [doc_entry]
+            for name in MUTABLE_PARTS:
+                if name in mutable:
+                    entries.append(_write_part(f, name, mutable[name], now))
+            _write_central_directory(f, entries)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            rollback.rollback(f)
+            raise
+    rollback.discard()
+
+    state.doc_header_offset = doc_header_offset
+    state.gap_offset = gap_offset
+    state.prefix_csize += len(compressed_fragment)
+    state.prefix_size = prefix_size
+    state.prefix_crc = prefix_crc
+    _stamp(path, state)
+    log(
+        f"Appended {len(fragment)} bytes to session document "
+        f"({len(media)} new part(s), {'body moved' if moved else 'in place'})"
+    )
+    return state
+
+
+class _RollbackJournal:
+    """
+    原地追加的回滚日志
+
+    改写前把将被覆盖的字节与原文件大小写入旁路文件并落盘；写入成功后删除。
+    写入过程中抛出异常时立即按日志恢复；进程崩溃或断电时，下次追加前由
+    recover_session_docx 恢复，会话文档不会停留在半写入的状态。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + _JOURNAL_SUFFIX
+        self.size = os.path.getsize(path)
+        self.segments: List[Tuple[int, bytes]] = []
+
+    def save(self, f, ranges: List[Tuple[int, int]]) -> None:
+        """读取并落盘将被改写的区间 [(起始偏移, 结束偏移)]，结束偏移为 -1 表示到文件末尾"""
+        for start, end in ranges:
+            f.seek(start)
+            self.segments.append((start, f.read(-1 if end < 0 else end - start)))
+        try:
+            with open(self.journal_path, "wb") as j:
+                j.write(_JOURNAL_MAGIC)
+                j.write(_JOURNAL_HEADER.pack(self.size))
+                for offset, data in self.segments:
+                    j.write(_JOURNAL_SEGMENT.pack(offset, len(data)))
+                    j.write(data)
+                j.flush()
+                os.fsync(j.fileno())
+        except BaseException:
+            # 日志未写完时原文件尚未改动
+            self.discard()
+            raise
+
+    def rollback(self, f) -> None:
+        _restore(f, self.size, self.segments)
+        self.discard()
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+
+def _restore(f, size: int, segments: List[Tuple[int, bytes]]) -> None:
+    for offset, data in segments:
+        f.seek(offset)
+        f.write(data)
+    f.truncate(size)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def recover_session_docx(path: str) -> bool:
+    """
+    按遗留的回滚日志恢复上次未完成的追加（日志不完整说明改写尚未开始，直接删除）
+
+    Returns:
+        是否执行了恢复
+    """
+    journal_path = path + _JOURNAL_SUFFIX
+    try:
+        with open(journal_path, "rb") as j:
+            data = j.read()
+    except FileNotFoundError:
+        return False
+
+    segments: List[Tuple[int, bytes]] = []
+    size = -1
+    if data.startswith(_JOURNAL_MAGIC):
+        pos = len(_JOURNAL_MAGIC)
+        if len(data) >= pos + _JOURNAL_HEADER.size:
+            (size,) = _JOURNAL_HEADER.unpack_from(data, pos)
+            pos += _JOURNAL_HEADER.size
+            while pos < len(data):
+                if len(data) < pos + _JOURNAL_SEGMENT.size:
+                    size = -1
+                    break
+                offset, length = _JOURNAL_SEGMENT.unpack_from(data, pos)
+                pos += _JOURNAL_SEGMENT.size
+                if len(data) < pos + length:
+                    size = -1
+                    break
+                segments.append((offset, data[pos:pos + length]))
+                pos += length
+
+    recovered = False
+    if size >= 0 and os.path.exists(path):
+        with open(path, "r+b") as f:
+            _restore(f, size, segments)
+        recovered = True
+        log(f"Rolled back an interrupted session document append: {path}")
+    os.remove(journal_path)
+    return recovered
+
+
+def merge_docx_documents(documents: List[bytes]) -> bytes:
+    """
+    按顺序把多个 DOCX 的正文合并为一个文档（样式、页面设置取第一个文档）
+
+    编号、脚注、书签与媒体的重新映射与会话文档的追加相同，但全部在内存中完成：
+    各文档的正文块依次接在第一个文档的正文之后，最后只写出一次，总耗时与输入总量成正比。
+    """
+    if len(documents) == 1:
+        return documents[0]
+    with zipfile.ZipFile(io.BytesIO(documents[0])) as zin:
+        infos = zin.infolist()
+        names = {info.filename for info in infos}
+        if DOCUMENT_PART not in names:
+            raise ValueError("not a DOCX document")
+        prefix, tail, root = _split_document(zin.read(DOCUMENT_PART))
+        parts = {name: zin.read(name) for name in MUTABLE_PARTS if name in names}
+        fixed = [(info, zin.read(info)) for info in infos
+                 if info.filename != DOCUMENT_PART and info.filename not in MUTABLE_PARTS]
+
+    state = SessionState(
+        doc_header_offset=0, gap_offset=0, prefix_csize=0, prefix_size=0, prefix_crc=0, tail="",
+        namespaces={prefix or "": uri for prefix, uri in root.nsmap.items()},
+        next_bookmark_id=_max_int_attr(root, _W_BOOKMARK_START, _W_ID) + 1,
+        next_doc_pr_id=max(_max_int_attr(root, _WP_DOC_PR, "id") + 1, 1),
+    )
+    fragments = [prefix]
+    merger: Optional[_Merger] = None
+    for docx_bytes in documents[1:]:
+        source = _SourcePackage(docx_bytes)
+        if merger is None:
+            merger = _Merger(source, state, parts, names)
+        else:
+            merger.use_source(source)
+        fragments.append(_serialize_blocks(merger.merge_body(), state.namespaces))
+    fragments.append(tail)
+    parts.update(merger.changed_parts())  # type: ignore[union-attr]
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info, data in fixed:
+            zout.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED)
+        for name, data in merger.new_parts.items():  # type: ignore[union-attr]
+            zout.writestr(name, data)
+        zout.writestr(DOCUMENT_PART, b"".join(fragments))
+        for name in MUTABLE_PARTS:
+            if name in parts:
+                zout.writestr(name, parts[name])
+    return output.getvalue()
+
+
+def _stamp(path: str, state: SessionState) -> None:
+    stat = os.stat(path)
+    state.file_size = stat.st_size
+    state.file_mtime_ns = stat.st_mtime_ns
+
+
+def resolve_session_path(config: dict) -> Optional[str]:
+    """
+    返回会话文档路径；未开启 session_document 时返回 None
+
+    config["session_document"]:
+        enabled: 是否开启
+        filename: 文件名，支持 strftime 格式（如按日期分文件）
+    """
+    settings = config.get("session_document")
+    if not isinstance(settings, dict) or not settings.get("enabled", False):
+        return None
+    filename = time.strftime(str(settings.get("filename") or "PasteMD_session_%Y%m%d.docx"))
+    if not filename.lower().endswith(".docx"):
+        filename += ".docx"
+    save_dir = os.path.expandvars(config.get("save_dir", ""))
+    os.makedirs(save_dir, exist_ok=True)
+    return os.path.join(save_dir, filename)
+
+
+class SessionDocument:
+    """
+    会话文档写入器
+
+    追加状态按文档路径保存在缓存目录；文件签名（大小、mtime）与状态不一致时
+    （在 Word 中编辑保存过、被替换或删除）先按当前内容重建为可追加布局。
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str, state_dir: Optional[str] = None):
+        self.path = os.path.abspath(path)
+        self._state_dir = state_dir
+
+    @property
+    def state_path(self) -> str:
+        state_dir = self._state_dir or get_cache_dir("session_docx")
+        digest = hashlib.sha1(os.path.normcase(self.path).encode("utf-8")).hexdigest()
+        return os.path.join(state_dir, f"{digest}.json")
+
+    def append(self, docx_bytes: bytes) -> None:
+        """
+        追加一次粘贴的转换结果
+
+        Raises:
+            OSError: 文件被占用或无法写入
+            Exception: 内容不是有效 DOCX 等
+        """
+        with self._lock:
+            # 上次追加中断（崩溃、断电）时先恢复原文件；文件签名随之变化，下面会重建
+            recover_session_docx(self.path)
+            state = self._load_state()
+            if state is None:
+                if os.path.exists(self.path):
+                    log(f"Session document changed outside PasteMD, rebuilding: {self.path}")
+                    with open(self.path, "rb") as f:
+                        existing = f.read()
+                    state = create_session_docx(self.path, existing)
+                    state = append_session_docx(self.path, state, docx_bytes)
+                else:
+                    log(f"Creating session document: {self.path}")
+                    state = create_session_docx(self.path, docx_bytes)
+            else:
+                state = append_session_docx(self.path, state, docx_bytes)
+            self._save_state(state)
+
+    def _load_state(self) -> Optional[SessionState]:
+        try:
+            stat = os.stat(self.path)
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = SessionState.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return None
+        if state is None or (state.file_size, state.file_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return state
+
+    def _save_state(self, state: SessionState) -> None:
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(state), f)
+        os.replace(tmp_path, self.state_path)
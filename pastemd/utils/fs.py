@@ -6,8 +6,9 @@ import subprocess
 import tempfile
 import re
 from datetime import datetime
-from typing import Optional, List
-from bs4 import BeautifulSoup
+from typing import Optional, List, Union
+from .html_document import HtmlDocument, visible_text_nodes
+from .md_index import MarkdownIndex, build_markdown_index
 from .system_detect import is_windows, is_macos
 
 
@@ -40,7 +41,8 @@ def open_file(path: str) -> None:
             subprocess.Popen(['xdg-open', path])
 
 
-def extract_title_from_markdown(md_text: str, max_chars: int = 30) -> Optional[str]:
+def extract_title_from_markdown(md_text: str, max_chars: int = 30,
+                                md_index: Optional[MarkdownIndex] = None) -> Optional[str]:
     """
     从 Markdown 文本中提取标题，递减查找
     优先级：H1 → H2 → H3 → H4 → H5 → H6 → 第一句话
@@ -48,28 +50,27 @@ def extract_title_from_markdown(md_text: str, max_chars: int = 30) -> Optional[s
     Args:
         md_text: Markdown 文本
         max_chars: 最大字符数
+        md_index: 已构建的块索引（可选，未提供时现场构建）
         
     Returns:
         标题文本，如果没有则返回第一句话，都没有则返回 None
     """
-    lines = md_text.strip().split('\n')
+    if md_index is None:
+        md_index = build_markdown_index(md_text)
+    headings = md_index.headings
     
-    # 递减查找标题（从 H1 到 H6）
+    # 递减查找标题（从 H1 到 H6），标题来自索引，不再逐级扫描全文
     for heading_level in range(1, 7):
-        heading_marker = '#' * heading_level
-        for line in lines:
-            line = line.strip()
-            # 匹配标题格式（#...后跟空格）
-            match = re.match(rf'^{re.escape(heading_marker)}\s+(.+?)$', line)
-            if match:
-                title = match.group(1).strip()
-                # 清理标题中的特殊字符
-                cleaned = sanitize_filename(title, max_length=max_chars)
-                if cleaned:
-                    return cleaned
+        for heading in headings:
+            if heading.level != heading_level:
+                continue
+            # 清理标题中的特殊字符
+            cleaned = sanitize_filename(heading.text, max_length=max_chars)
+            if cleaned:
+                return cleaned
     
     # 如果没有找到任何标题，尝试使用第一句话
-    for line in lines:
+    for line in md_index.lines:
         line = line.strip()
         # 跳过空行和特殊 Markdown 标记
         if not line or line.startswith('|') or line.startswith('-') or \
@@ -94,37 +95,36 @@ def extract_title_from_markdown(md_text: str, max_chars: int = 30) -> Optional[s
     return None
 
 
-def extract_title_from_html(html_text: str, max_chars: int = 30) -> Optional[str]:
-    """从 HTML 文本中提取合适的标题"""
+def extract_title_from_html(html_text: Union[str, HtmlDocument], max_chars: int = 30) -> Optional[str]:
+    """从 HTML 文本（或已解析的 HtmlDocument）中提取合适的标题"""
     if not html_text:
         return None
 
-    soup = None
     try:
-        soup = BeautifulSoup(html_text, "lxml")
+        root = HtmlDocument.wrap(html_text).tree
     except Exception:
-        try:
-            soup = BeautifulSoup(html_text, "html.parser")
-        except Exception:
-            return None
+        return None
 
-    if soup.title and soup.title.string:
-        candidate = sanitize_filename(soup.title.string.strip(), max_length=max_chars)
+    title = root.find(".//title")
+    if title is not None and len(title) == 0 and title.text:
+        candidate = sanitize_filename(title.text.strip(), max_length=max_chars)
         if candidate:
             return candidate
 
     for heading_level in range(1, 7):
-        for tag in soup.find_all(f"h{heading_level}"):
-            text = tag.get_text(strip=True)
+        for tag in root.iter(f"h{heading_level}"):
+            text = "".join(part.strip() for part in tag.itertext())
             if text:
                 candidate = sanitize_filename(text, max_length=max_chars)
                 if candidate:
                     return candidate
 
-    for text in soup.stripped_strings:
-        candidate = sanitize_filename(text, max_length=max_chars)
-        if candidate:
-            return candidate
+    for text in visible_text_nodes(root):
+        text = text.strip()
+        if text:
+            candidate = sanitize_filename(text, max_length=max_chars)
+            if candidate:
+                return candidate
 
     return None
 
@@ -213,7 +213,9 @@ def generate_unique_path(base_path: str) -> str:
 
 def generate_output_path(keep_file: bool, save_dir: str, md_text: str = "",
                          table_data: Optional[List[List[str]]] = None,
-                         html_text: str = "") -> str:
+                         html_text: Union[str, HtmlDocument] = "",
+                         md_index: Optional[MarkdownIndex] = None,
+                         source_filename: str = "") -> str:
     """
     生成输出文件路径，优先使用内容中提取的名称
     
@@ -223,6 +225,8 @@ def generate_output_path(keep_file: bool, save_dir: str, md_text: str = "",
     md_text: Markdown 文本（用于提取标题）
         table_data: 表格数据（用于提取表名）
     html_text: HTML 富文本（用于提取标题）
+        md_index: md_text 的块索引（可选，避免重复扫描）
+        source_filename: 来源文件名（批量转换时按来源文件命名）
         
     Returns:
         输出文件的完整路径
@@ -236,19 +240,25 @@ def generate_output_path(keep_file: bool, save_dir: str, md_text: str = "",
         if table_name:
             filename = f"{table_name}.{file_ext}"
     
-    # 优先级 2: 如果是 HTML，使用 HTML 标题
+    # 优先级 2: 如果有来源文件，沿用其文件名
+    if filename is None and source_filename:
+        stem = os.path.splitext(os.path.basename(source_filename))[0]
+        if stem:
+            filename = f"{sanitize_filename(stem)}.{file_ext}"
+
+    # 优先级 3: 如果是 HTML，使用 HTML 标题
     if filename is None and html_text:
         html_title = extract_title_from_html(html_text)
         if html_title:
             filename = f"{html_title}.{file_ext}"
 
-    # 优先级 3: 如果是文档，使用标题
-    if filename is None and md_text:
-        title = extract_title_from_markdown(md_text)
+    # 优先级 4: 如果是文档，使用标题
+    if filename is None and (md_text or md_index is not None):
+        title = extract_title_from_markdown(md_text, md_index=md_index)
         if title:
             filename = f"{title}.{file_ext}"
     
-    # 优先级 4: 使用时间戳
+    # 优先级 5: 使用时间戳
     if filename is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"md_paste_{timestamp}.{file_ext}"
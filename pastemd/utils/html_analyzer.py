@@ -2,13 +2,11 @@
 
 from __future__ import annotations
 
-from typing import Iterable, Set
+from typing import Iterable, List, Optional, Set, Union
 
-try:
-    from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
-except Exception:  # pragma: no cover - BeautifulSoup is in requirements
-    BeautifulSoup = None  # type: ignore
-    FeatureNotFound = None  # type: ignore
+from lxml import etree
+
+from .html_document import HtmlDocument
 
 
 # HTML 标签中能提供语义结构的元素集合
@@ -89,27 +87,132 @@ MARKDOWN_HINTS: Iterable[str] = (
 )
 
 
-def _count_semantic_tags(html_soup) -> int:
-    """统计 HTML 中带有语义结构的标签数量。"""
-    body = html_soup.body or html_soup
-    count = 0
-    for tag in body.find_all(True):
-        name = tag.name.lower()
-        if name in SEMANTIC_TAGS:
-            count += 1
-    return count
+# 不计入「只有内联包裹标签」判断的文档骨架标签
+_SKELETON_TAGS = frozenset({"html", "head", "body", "meta", "style"})
+# 文本不计入 Markdown 特征打分的标签（与 visible_text_nodes 一致）
+_INVISIBLE_TEXT_TAGS = frozenset({"script", "style", "template"})
+
+
+# 流式扫描每次喂给解析器的字节数
+_SCAN_CHUNK_BYTES = 8192
+
+
+class _SemanticTagFound(Exception):
+    """流式分类遇到第一个语义标签时中止解析"""
+
+
+class _FragmentScanner:
+    """
+    lxml 解析器的 target：只接收解析事件，不构建树
+
+    - body 内遇到语义标签立即抛出 _SemanticTagFound 结束解析
+    - 记录是否出现内联包裹标签以外的标签（区分 body 内外）
+    - collect_text 为 True 时收集可见文本节点（仅在需要 Markdown 特征打分时）
+
+    判断范围与解析树一致：根元素结束后的事件被忽略（树构建时同样会丢弃），
+    没有 body 时以整个文档为范围。
+    """
+
+    def __init__(self, collect_text: bool = False):
+        self.collect_text = collect_text
+        self.body_seen = False
+        self.semantic_outside_body = False
+        self.non_inline_in_body = False
+        self.non_inline_outside_body = False
+        self.body_texts: List[str] = []
+        self.all_texts: List[str] = []
+        self._depth = 0
+        self._root_closed = False
+        self._in_body = False
+        self._invisible_depth = 0
+        self._pending: List[str] = []
+
+    def start(self, tag: str, attrib) -> None:
+        if self._root_closed:
+            return
+        self._flush()
+        self._depth += 1
+        if tag in SEMANTIC_TAGS:
+            if not self._in_body:
+                self.semantic_outside_body = True
+            elif not self.collect_text:
+                raise _SemanticTagFound(tag)
+        if tag == "body" and self._depth == 2 and not self.body_seen:
+            # 与 tree.find("body") 一致：只有根元素下的第一个 body
+            self.body_seen = True
+            self._in_body = True
+        elif tag not in _SKELETON_TAGS and tag not in INLINE_WRAPPER_TAGS:
+            if self._in_body:
+                self.non_inline_in_body = True
+            else:
+                self.non_inline_outside_body = True
+        if tag in _INVISIBLE_TEXT_TAGS:
+            self._invisible_depth += 1
 
+    def end(self, tag: str) -> None:
+        if self._root_closed:
+            return
+        self._flush()
+        self._depth -= 1
+        self._root_closed = self._depth == 0
+        if tag == "body" and self._depth == 1:
+            self._in_body = False
+        if tag in _INVISIBLE_TEXT_TAGS:
+            self._invisible_depth -= 1
 
-def _only_contains_inline_wrappers(html_soup) -> bool:
-    """判断 HTML 是否只包含 wrapper / inline 标签。"""
-    body = html_soup.body or html_soup
-    for tag in body.find_all(True):
-        name = tag.name.lower()
-        if name in ("html", "head", "body", "meta", "style"):
-            continue
-        if name not in INLINE_WRAPPER_TAGS:
-            return False
-    return True
+    def data(self, data: str) -> None:
+        if self.collect_text and not self._invisible_depth and not self._root_closed:
+            self._pending.append(data)
+
+    def comment(self, text: str) -> None:
+        # 注释把前后文本分成两个文本节点
+        self._flush()
+
+    def pi(self, target: str, data: str) -> None:
+        self._flush()
+
+    def close(self) -> None:
+        self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self.all_texts.append(text)
+        if self._in_body:
+            self.body_texts.append(text)
+
+    @property
+    def has_semantic_tags(self) -> bool:
+        """body 内的语义标签在扫描时已中止；这里只处理没有 body 的文档"""
+        return not self.body_seen and self.semantic_outside_body
+
+    @property
+    def only_inline_wrappers(self) -> bool:
+        return not (self.non_inline_in_body if self.body_seen else self.non_inline_outside_body)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.body_texts if self.body_seen else self.all_texts)
+
+
+def _scan_fragment(source: str, collect_text: bool = False) -> Optional[_FragmentScanner]:
+    """流式扫描 HTML；遇到语义标签时返回 None"""
+    scanner = _FragmentScanner(collect_text)
+    parser = etree.HTMLParser(target=scanner, encoding="utf-8")
+    data = source.encode("utf-8")
+    try:
+        # 分块喂入：libxml2 在一次 feed 内不会因 target 抛出异常而提前停止
+        for offset in range(0, len(data), _SCAN_CHUNK_BYTES):
+            parser.feed(data[offset:offset + _SCAN_CHUNK_BYTES])
+        parser.close()
+    except _SemanticTagFound:
+        return None
+    except etree.ParserError:
+        # 空文档等：按已收到的事件判断
+        pass
+    return scanner
 
 
 def _markdown_hint_score(text: str) -> int:
@@ -121,7 +224,7 @@ def _markdown_hint_score(text: str) -> int:
     return score
 
 
-def is_plain_html_fragment(html: str) -> bool:
+def is_plain_html_fragment(html: Union[str, HtmlDocument]) -> bool:
     """
     判断 HTML 片段是否只是带壳的 Markdown / 纯文本。
 
@@ -129,32 +232,24 @@ def is_plain_html_fragment(html: str) -> bool:
     如果直接走 Pandoc HTML 流程会把 Markdown 符号原样贴进 Word。
     这里通过结构标签数量、内联标签检测、以及 Markdown 语法特征
     来辅助判断是否应该退回 Markdown 流程。
+
+    判断过程不构建解析树（见 _FragmentScanner），结构化 HTML 通常在第一个语义标签处即可确定。
     """
-    if not html or not html.strip():
+    source = html.source if isinstance(html, HtmlDocument) else html
+    if not source or not source.strip():
         return True
 
-    if BeautifulSoup is None:  # pragma: no cover - fallback
-        # 简单兜底：没有解析器时，只要看不到典型结构标签就视为纯文本
-        lowered = html.lower()
-        return not any(tag in lowered for tag in ("<p", "<h1", "<ul", "<table", "<pre", "<code", "<blockquote"))
-
-    try:
-        soup = BeautifulSoup(html, "lxml")
-    except Exception as exc:  # pragma: no cover - depends on env parser
-        if FeatureNotFound is not None and isinstance(exc, FeatureNotFound):
-            soup = BeautifulSoup(html, "html.parser")
-        else:
-            soup = BeautifulSoup(html, "html.parser")
-    semantic_count = _count_semantic_tags(soup)
-
-    if semantic_count > 0:
+    # 流式扫描：不构建树，遇到第一个语义标签即判定为结构化 HTML
+    scanner = _scan_fragment(source)
+    if scanner is None or scanner.has_semantic_tags:
         return False
 
-    if _only_contains_inline_wrappers(soup):
+    if scanner.only_inline_wrappers:
         return True
 
-    body = soup.body or soup
-    text = body.get_text(separator="\n").strip()
+    # 只有需要 Markdown 特征打分时才收集文本（第二遍扫描）
+    scanner = _scan_fragment(source, collect_text=True)
+    text = scanner.text.strip() if scanner is not None else ""
     if not text:
         return True
 
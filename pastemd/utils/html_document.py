@@ -0,0 +1,211 @@
+"""Parse-once HTML document shared by the analyzer, preprocessor and converters."""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+import time
+from typing import List, Optional, Union
+
+import lxml.html
+from lxml import etree
+
+from .logging import log
+
+# 缺少 DOCTYPE 时补全的文档头（Pandoc 据此按 UTF-8 读取）
+HTML_PREAMBLE = "<!DOCTYPE html>\n<meta charset='utf-8'>\n"
+
+_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# 原文是否为完整文档（带 html/body 标签）；片段序列化时不添加解析器补全的外壳
+_DOCUMENT_TAG_RE = re.compile(r"<(?:html|body)[\s>]", re.IGNORECASE)
+
+# 分块转换时可以拆开的纯容器标签（不带 data-custom-style、没有直接文本时才拆）
+_CHUNK_CONTAINER_TAGS = frozenset({"body", "div", "section", "article", "main"})
+
+# 文档顺序的可见文本节点（不含 script/style 内容与注释）
+_VISIBLE_TEXT_XPATH = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+# 脚注的引用或脚注区：Pandoc/markdown-it 的 footnote 类名、DPUB-ARIA 角色、EPUB 语义，
+# 以及指向 #fn / #cite_note（维基百科）的链接
+_FOOTNOTE_XPATH = etree.XPath(
+    ".//*[contains(@class, 'footnote')"
+    " or starts-with(@role, 'doc-noteref') or starts-with(@role, 'doc-endnote') or @role = 'doc-footnote'"
+    " or @*[name() = 'epub:type'][contains(., 'noteref') or contains(., 'footnote')]"
+    " or self::a[starts-with(@href, '#fn') or starts-with(@href, '#cite_note')]][1]"
+)
+
+
+def parse_html(html: str) -> lxml.html.HtmlElement:
+    """
+    用 lxml 解析 HTML，返回根元素（片段会被补全为 html/body 结构）
+
+    以 UTF-8 字节喂给解析器，带 XML 编码声明的文本也能解析；空文档返回空的 html/body。
+    """
+    try:
+        return lxml.html.document_fromstring(html.encode("utf-8"), parser=_PARSER)
+    except etree.ParserError:
+        return lxml.html.document_fromstring(b"<html><body></body></html>", parser=_PARSER)
+
+
+def visible_text_nodes(element: etree._Element) -> List[str]:
+    """返回 element 子树中按文档顺序的可见文本节点"""
+    return [str(text) for text in _VISIBLE_TEXT_XPATH(element)]
+
+
+class HtmlDocument:
+    """
+    单次粘贴作业的 HTML 文档
+
+    原文只用 lxml 解析一次（首次访问 tree 时），分析、预处理、转换各阶段共享同一棵树；
+    只有在某个阶段需要字符串（如喂给 Pandoc）时才序列化，且结果会被缓存，
+    树未被修改时直接返回原文。
+
+    修改树的阶段应通过 edit() 获取根元素，以便下次序列化时重新生成字符串。
+    """
+
+    def __init__(self, source: str):
+        self.source = source or ""
+        self._tree: Optional[lxml.html.HtmlElement] = None
+        self._html: Optional[str] = None
+        self._modified = False
+        self._preamble = ""
+        self.parse_count = 0
+        # 预处理执行了 minify 阶段（source 保留精简前的原文，用于统计节省量）
+        self.minified = False
+        # 预处理给出的大小分级（small/large/huge，见 service/preprocessor/tiers.py）
+        self.tier = "small"
+
+    @classmethod
+    def wrap(cls, html: Union[str, "HtmlDocument"]) -> "HtmlDocument":
+        """字符串包装为 HtmlDocument；已经是 HtmlDocument 时原样返回"""
+        return html if isinstance(html, HtmlDocument) else cls(html)
+
+    @property
+    def parsed(self) -> bool:
+        return self._tree is not None
+
+    @property
+    def tree(self) -> lxml.html.HtmlElement:
+        """只读访问解析树的根元素（首次访问时解析）"""
+        if self._tree is None:
+            start = time.perf_counter()
+            self._tree = parse_html(self.source)
+            self.parse_count += 1
+            log(
+                f"Parsed HTML ({len(self.source)} chars) in "
+                f"{(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+        return self._tree
+
+    @property
+    def body(self) -> lxml.html.HtmlElement:
+        """body 元素（没有时为根元素）"""
+        body = self.tree.find("body")
+        return body if body is not None else self.tree
+
+    def edit(self) -> lxml.html.HtmlElement:
+        """获取用于原地修改的根元素，并使缓存的序列化结果失效"""
+        tree = self.tree
+        self._modified = True
+        self._html = None
+        return tree
+
+    def ensure_doctype(self) -> None:
+        """原文不含 DOCTYPE 时，在序列化结果前补全文档头"""
+        if "<!DOCTYPE" not in self.source.upper():
+            self._preamble = HTML_PREAMBLE
+            self._html = None
+
+    @property
+    def html(self) -> str:
+        """当前 HTML 字符串（树未修改时为原文，否则按需序列化一次）"""
+        if self._html is None:
+            if not self._modified:
+                body = self.source
+            else:
+                body = self._serialize()
+            self._html = self._preamble + body
+        return self._html
+
+    def _serialize(self) -> str:
+        start = time.perf_counter()
+        tree = self.tree
+        if _DOCUMENT_TAG_RE.search(self.source):
+            body = lxml.html.tostring(tree, encoding="unicode")
+            # libxml2 会为没有 DOCTYPE 的文档补一个 HTML 4 的 DOCTYPE：只保留原文自带的
+            doctype = tree.getroottree().docinfo.doctype
+            if doctype and "<!DOCTYPE" in self.source.upper():
+                body = f"{doctype}\n{body}"
+        else:
+            # 片段：按原样输出为片段（被解析器移入 head 的 meta/style 等放在最前）
+            head = tree.find("head")
+            parts = [lxml.html.tostring(child, encoding="unicode") for child in (head if head is not None else ())]
+            container = self.body
+            if container.text:
+                parts.append(html_lib.escape(container.text, quote=False))
+            parts.extend(lxml.html.tostring(child, encoding="unicode") for child in container)
+            body = "".join(parts)
+        log(
+            f"Serialized HTML ({len(body)} chars) in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return body
+
+    def has_footnotes(self) -> bool:
+        """正文是否包含脚注（引用与脚注区拆到不同块时，Pandoc 无法把两者关联起来）"""
+        return bool(_FOOTNOTE_XPATH(self.body))
+
+    def split_chunks(self, max_chars: int) -> List[str]:
+        """
+        按块级元素把正文拆分为若干独立的 HTML 文档（每块约 max_chars 字符）
+
+        超过 max_chars 的纯容器（div/section 等）继续向下拆分其子元素；表格、列表等
+        单个超大元素整体作为一块。每块都带 UTF-8 文档头，可单独交给 Pandoc。
+        """
+        chunks: List[str] = []
+        current: List[str] = []
+        size = 0
+
+        def add(html: str) -> None:
+            nonlocal size
+            if current and size + len(html) > max_chars:
+                chunks.append(HTML_PREAMBLE + "".join(current))
+                current.clear()
+                size = 0
+            current.append(html)
+            size += len(html)
+
+        def walk(container: etree._Element) -> None:
+            if container.text and container.text.strip():
+                add(html_lib.escape(container.text, quote=False))
+            for child in container:
+                if isinstance(child.tag, str):
+                    html = lxml.html.tostring(child, encoding="unicode", with_tail=False)
+                    if (
+                        len(html) > max_chars
+                        and child.tag in _CHUNK_CONTAINER_TAGS
+                        and child.get("data-custom-style") is None
+                        and not (child.text and child.text.strip())
+                    ):
+                        walk(child)
+                    else:
+                        add(html)
+                if child.tail and child.tail.strip():
+                    add(html_lib.escape(child.tail, quote=False))
+
+        walk(self.body)
+        if current:
+            chunks.append(HTML_PREAMBLE + "".join(current))
+        return chunks
+
+    def __str__(self) -> str:
+        return self.html
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+
+def as_html_text(html: Union[str, HtmlDocument]) -> str:
+    """取得 HTML 字符串（HtmlDocument 按需序列化）"""
+    return html.html if isinstance(html, HtmlDocument) else html
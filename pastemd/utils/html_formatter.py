@@ -1,512 +1,733 @@
-"""Utilities for cleaning and formatting HTML fragments before conversion."""
+"""Utilities for cleaning and formatting HTML fragments before conversion.
+
+Every cleanup is declared as an :class:`HtmlTransform` (see html_transform.py)
+so that a pipeline of them runs in a single traversal of the lxml tree.
+"""
 
 from __future__ import annotations
 
 import re
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from lxml import etree
+
+from .blob_store import DATA_IMAGE_PREFIX, get_blob_store
+from .html_document import HtmlDocument
+from .html_transform import (
+    HtmlTransform,
+    TransformContext,
+    apply_transforms,
+    meaningful_children,
+    new_element,
+    remove_element,
+    replace_element,
+    replace_with_text,
+    unwrap_element,
+)
+
+_STRIKETHROUGH_RE = re.compile(r"~~([^~]+?)~~")
+_PANDOC_CODE_ATTR_RE = re.compile(r"^\{[^}]+\}\s*(.+)$", re.DOTALL)
+_PANDOC_FENCED_DIV_RE = re.compile(r"^:+\s*\{[^}]*\}")
+
+# WPS 中加粗+斜体使用的内联样式
+_BOLD_ITALIC_STYLE = "font-weight: bold; font-style: italic;"
+# WPS 中代码块自动换行
+_PRE_WRAP_STYLE = "white-space: pre-wrap;"
+
+
+# ---- 预处理变换（剪贴板 HTML → Pandoc 之前） ----
+
+# 代码块中按行排版的块级元素：行尾补换行
+_CODE_LINE_BREAKS_XPATH = etree.XPath(".//br | .//div | .//p | .//li | .//tr")
+
+
+def _last_text_char(node: etree._Element) -> str:
+    """节点文本序列化（不含 tail）的最后一个字符，没有文本时为空串"""
+    for child in reversed(node):
+        if child.tail:
+            return child.tail[-1]
+        if isinstance(child.tag, str):
+            char = _last_text_char(child)
+            if char:
+                return char
+    return node.text[-1] if node.text else ""
+
+
+def _code_text(element: etree._Element) -> str:
+    """代码块的纯文本：<br> 与按行排版的块级元素转换为换行，注释忽略"""
+    # 逆文档顺序：子节点先补换行，外层块判断结尾时已能看到，不会重复补换行
+    for node in reversed(_CODE_LINE_BREAKS_XPATH(element)):
+        if node.tag == "br" or _last_text_char(node) != "\n":
+            node.tail = "\n" + (node.tail or "")
+    # libxml2 的 text 序列化：只输出文本节点（含 tail），跳过注释
+    return etree.tostring(element, method="text", encoding="unicode", with_tail=False)
+
+
+def _flatten_code(element: etree._Element, ctx: TransformContext) -> bool:
+    if len(element) == 0:
+        return False
+    if element.tag == "pre":
+        code = element.find(".//code")
+        text = _code_text(element)
+        for child in list(element):
+            element.remove(child)
+        if code is not None:
+            # 保留 code 的属性（语言 class）
+            element.text = None
+            element.append(new_element("code", text, **dict(code.attrib)))
+        else:
+            element.text = text
+    elif not ctx.within("pre"):
+        # 行内代码
+        text = _code_text(element)
+        for child in list(element):
+            element.remove(child)
+        element.text = text
+    return False
+
+
+FLATTEN_CODE_BLOCKS = HtmlTransform(
+    name="flatten_code",
+    tags=frozenset({"pre", "code"}),
+    on_enter=_flatten_code,
+)
+"""
+把代码块（<pre>/<code>）的子树折叠为纯文本。
+
+网页中的代码高亮为每个 token 生成一个 <span class=...>，长文件可达数十万个元素，
+而 Pandoc 最终只使用其中的文本。折叠后只保留 pre/code 元素本身（及其语言 class），
+其余变换与 Pandoc 都不再遍历这些 span。
+"""
+
+
+def _remove_svg(element: etree._Element, ctx: TransformContext) -> bool:
+    if element.tag == "svg" or element.get("src", "").lower().endswith(".svg"):
+        remove_element(element)
+        return True
+    return False
+
+
+REMOVE_SVG = HtmlTransform(
+    name="remove_svg",
+    tags=frozenset({"svg", "img"}),
+    on_enter=_remove_svg,
+)
+"""删除 <svg> 元素以及 src 指向 .svg 的 <img>（Pandoc/Word 无法使用）。"""
+
+
+def _externalize_image(element: etree._Element, ctx: TransformContext) -> bool:
+    src = element.get("src")
+    if src and src[:len(DATA_IMAGE_PREFIX)].lower() == DATA_IMAGE_PREFIX:
+        name = get_blob_store().put_data_uri(src)
+        if name:
+            element.set("src", name)
+    return False
+
+
+EXTERNALIZE_DATA_IMAGES = HtmlTransform(
+    name="externalize_images",
+    tags=frozenset({"img"}),
+    on_enter=_externalize_image,
+)
+"""
+把 <img> 中 base64 编码的 data URI 保存到 blob 目录（按内容哈希去重），src 改为文件名。
+
+多 MB 的截图不再随 HTML 序列化并通过 stdin 传给 Pandoc，Pandoc 通过 --resource-path
+找到文件。
+"""
+
+
+def _drop_katex_br(element: etree._Element, ctx: TransformContext) -> bool:
+    if ctx.within_class("katex"):
+        remove_element(element)
+        return True
+    return False
+
+
+KATEX_BR_CLEANUP = HtmlTransform(
+    name="katex_br_cleanup",
+    tags=frozenset({"br"}),
+    on_enter=_drop_katex_br,
+)
+"""
+删除 LaTeX 公式块内的 <br> 标签。
+
+LaTeX 公式块通常包裹在 class 含 katex（katex / katex-display 等）的元素中，
+公式内容的 <br> 标签会破坏 LaTeX 语法。
+"""
+
+
+# KaTeX/MathJax 渲染容器的 class
+_KATEX_CLASSES = frozenset({"katex", "katex-display"})
+_MATHJAX_CLASSES = frozenset({
+    "MathJax", "MathJax_Display", "MathJax_Preview",
+    "MathJax_SVG", "MathJax_SVG_Display", "MathJax_CHTML", "MathJax_CHTML_Display",
+})
+_TEX_ANNOTATION_XPATH = etree.XPath(
+    ".//*[local-name()='annotation'][@encoding='application/x-tex']"
+)
+_MATHML_XPATH = etree.XPath(".//*[local-name()='math']")
+
+
+def _tex_math(tex: str, display: bool) -> etree._Element:
+    """Pandoc 以 TeX 公式读取的元素（MathJax 2 的 <script type="math/tex"> 形式）"""
+    return new_element("script", tex.strip(), type="math/tex; mode=display" if display else "math/tex")
+
+
+def _collapse_render_tree(element: etree._Element, display: bool) -> bool:
+    """
+    用 TeX 源码替换公式渲染树；没有 TeX 注解时退而只保留其中的 MathML
 
-from bs4 import BeautifulSoup, NavigableString, Tag
+    Returns:
+        是否已替换
+    """
+    annotations = _TEX_ANNOTATION_XPATH(element)
+    if annotations and (annotations[0].text or "").strip():
+        replace_element(element, _tex_math(annotations[0].text, display))
+        return True
+    mathml = _MATHML_XPATH(element)
+    if mathml:
+        math = mathml[0]
+        if display:
+            math.set("display", "block")
+        math.getparent().remove(math)
+        replace_element(element, math)
+        return True
+    return False
+
+
+def _is_tex_script(element: Optional[etree._Element]) -> bool:
+    return (
+        element is not None
+        and element.tag == "script"
+        and (element.get("type") or "").lower().startswith("math/tex")
+    )
+
+
+def _collapse_math(element: etree._Element, ctx: TransformContext) -> bool:
+    tag = element.tag
+    if tag == "mjx-container":
+        # MathJax 3
+        return _collapse_render_tree(element, element.get("display") == "true")
+
+    classes = element.get("class")
+    if not classes:
+        return False
+    names = set(classes.split())
+    if names & _KATEX_CLASSES:
+        display = "katex-display" in names or bool(
+            element.xpath(".//*[local-name()='math'][@display='block']")
+        )
+        return _collapse_render_tree(element, display)
+    if names & _MATHJAX_CLASSES:
+        # MathJax 2：渲染结果（及预览）之后紧跟的 TeX 脚本本身就是 Pandoc 可读的公式，渲染结果整个删除
+        following = element.getnext()
+        if "MathJax_Preview" in names and following is not None and not _is_tex_script(following):
+            following = following.getnext()
+        if _is_tex_script(following):
+            remove_element(element)
+            return True
+        return _collapse_render_tree(element, "MathJax_Display" in names)
+    return False
+
+
+COLLAPSE_MATH = HtmlTransform(
+    name="collapse_math",
+    on_enter=_collapse_math,
+)
+"""
+把 KaTeX/MathJax 渲染树折叠为 TeX 源码。
+
+聊天界面复制的公式每个都包含几十层 span 和一份 MathML，Pandoc 需要解析整棵渲染树。
+这里从 <annotation encoding="application/x-tex">（KaTeX、MathJax 3）取出 TeX 源码，
+把整个容器替换为 <script type="math/tex[; mode=display]">，Pandoc 将其读取为 TeX 公式；
+MathJax 2 的页面本身带有这种脚本，只删除其前面的渲染结果。
+没有 TeX 源码时只保留其中的 MathML。
+"""
+
+
+def _split_strikethrough(text: str, ctx: TransformContext):
+    # 代码中的 ~~ 是代码本身（折叠后的代码块文本跨越多行，更不能转换）
+    if ctx.within("code") or ctx.within("pre"):
+        return None
+    if not _STRIKETHROUGH_RE.search(text):
+        return None
+    parts: List[Union[str, etree._Element]] = []
+    last_end = 0
+    for match in _STRIKETHROUGH_RE.finditer(text):
+        if match.start() > last_end:
+            parts.append(text[last_end:match.start()])
+        parts.append(new_element("del", match.group(1)))
+        last_end = match.end()
+    if last_end < len(text):
+        parts.append(text[last_end:])
+    return parts
+
+
+STRIKETHROUGH_TO_DEL = HtmlTransform(
+    name="strikethrough",
+    text_markers=("~~",),
+    on_text=_split_strikethrough,
+)
+"""把文本节点中的 ``~~text~~`` 替换为 ``<del>text</del>``。"""
+
+
+def _protect_task_brackets(text: str, ctx: TransformContext) -> Optional[str]:
+    return text.replace("[x]", "{{TASK_CHECKED}}").replace("[ ]", "{{TASK_UNCHECKED}}")
+
+
+PROTECT_TASK_LIST = HtmlTransform(
+    name="protect_task_list",
+    text_markers=("[x]", "[ ]", "[X]"),
+    on_text=_protect_task_brackets,
+)
+"""
+保护任务列表标记，避免被 Pandoc 转义和误识别为数学公式：
+[x] -> {{TASK_CHECKED}}，[ ] -> {{TASK_UNCHECKED}}
+"""
+
+
+# Pandoc HTML reader 会用到的属性；其余（style/data-*/_ngcontent-*/事件等）一律删除
+_MINIFY_ATTRIBUTES = frozenset({
+    "id", "class", "href", "src", "alt", "title", "lang", "dir",
+    "colspan", "rowspan", "align", "width", "height",
+    "start", "type", "value", "checked", "name", "data-custom-style",
+})
+# 对 Pandoc 有意义的 class（数学公式、下划线/小型大写、任务列表、脚注、代码高亮）
+_MINIFY_CLASSES = frozenset({
+    "math", "inline", "display", "underline", "smallcaps", "mark",
+    "task-list", "contains-task-list", "task-list-item", "footnotes", "footnote-ref", "footnote-back",
+})
+_MINIFY_CLASS_PREFIXES = ("katex", "MathJax", "language-", "lang-", "sourceCode")
+# Pandoc 会读取的 style 属性：表格对齐与列宽、有序列表编号样式、小型大写
+_MINIFY_STYLE_PROPERTIES = {
+    "td": ("text-align",), "th": ("text-align",),
+    "col": ("width",), "colgroup": ("width",),
+    "ol": ("list-style-type",),
+    "span": ("font-variant",),
+}
+# 内容不会出现在文档中的元素
+_MINIFY_DROP_TAGS = frozenset({"script", "style", "noscript", "template"})
+
+
+def _minify_style(style: str, properties: Sequence[str]) -> Optional[str]:
+    kept = [
+        declaration.strip()
+        for declaration in style.split(";")
+        if declaration.split(":", 1)[0].strip().lower() in properties
+    ]
+    return "; ".join(kept) or None
+
+
+def _minify_element(element: etree._Element, ctx: TransformContext) -> bool:
+    if element.tag in _MINIFY_DROP_TAGS and not _is_tex_script(element):
+        remove_element(element)
+        return True
+    for child in list(element):
+        if child.tag is etree.Comment:
+            remove_element(child)
+    # MathML/SVG 的属性本身就是语义，保持原样
+    if element.tag in ("math", "svg") or ctx.within("math") or ctx.within("svg"):
+        return False
+
+    attrib = element.attrib
+    for attr in [name for name in attrib if name not in _MINIFY_ATTRIBUTES]:
+        if attr == "style" and element.tag in _MINIFY_STYLE_PROPERTIES:
+            style = _minify_style(attrib["style"], _MINIFY_STYLE_PROPERTIES[element.tag])
+            if style:
+                attrib["style"] = style
+                continue
+        del attrib[attr]
+
+    classes = attrib.get("class")
+    if classes is not None and element.tag not in ("pre", "code"):
+        # pre/code 的 class 是代码语言，全部保留
+        kept = [
+            name for name in classes.split()
+            if name in _MINIFY_CLASSES or name.startswith(_MINIFY_CLASS_PREFIXES)
+        ]
+        if kept:
+            attrib["class"] = " ".join(kept)
+        else:
+            del attrib["class"]
+    return False
 
 
-def clean_html_content(soup: BeautifulSoup, options: Optional[Dict[str, object]] = None) -> None:
-    """
-    清理 HTML 内容，移除不可用元素，并按配置应用格式化规则。
+MINIFY_HTML = HtmlTransform(
+    name="minify",
+    on_enter=_minify_element,
+)
+"""
+精简剪贴板 HTML，减少 Pandoc 需要解析的体积。
 
-    Args:
-        html: 原始 HTML 内容。
-        options: 可选格式化配置，如 ``{"strikethrough_to_del": True}``。
+网页应用（ChatGPT、Google Docs、Notion 等）复制的 HTML 大部分是内联 style、
+无关 class、data-*、Angular 的 _ngcontent-* 属性、注释以及 <style>/<script>：
+- 删除 <script>/<style>/<noscript>/<template> 元素与注释
+- 只保留 Pandoc 会读取的属性（id、href、src/alt、colspan/rowspan、start/type 等）
+- class 只保留公式、代码、任务列表、脚注等有语义的名称（pre/code 上全部保留）
+- style 只保留 Pandoc 读取的属性：单元格 text-align、列 width、
+  有序列表 list-style-type、span 的 font-variant（小型大写）
+- MathML/SVG 内部不做处理
+"""
 
-    Returns:
-        清理后的 HTML 内容。
-    """
 
-    options = options or {}
+# ---- Pandoc 输出 HTML 的后处理变换（macOS WPS） ----
+
+def unwrap_inside_li(unwrap_tags: Sequence[str] = ("p", "div")) -> HtmlTransform:
+    """
+    创建「清理 li 内部(任意深度)的 p/div」变换：只要在 li 子树里就 unwrap。
 
-    # 删除所有 <svg> 标签
-    for svg in soup.find_all("svg"):
-        svg.decompose()
+    - 包括 ul 下的 li、再嵌套的 ul/li ... 全部处理
+    - 在后序位置处理，天然「从深到浅」，结构变化不会导致漏处理
+    - li 处理完后去掉其头尾多余的空白文本
+    """
+    def handle(element: etree._Element, ctx: TransformContext) -> bool:
+        if element.tag == "li":
+            _trim_whitespace_text_nodes(element)
+            return False
+        if ctx.within("li"):
+            unwrap_element(element)
+            return True
+        return False
+
+    return HtmlTransform(
+        name="unwrap_li_blocks",
+        tags=frozenset(unwrap_tags) | {"li"},
+        on_exit=handle,
+    )
+
+
+def _trim_whitespace_text_nodes(element: etree._Element) -> None:
+    """
+    去掉元素开头/结尾的纯空白文本，避免 unwrap 后出现奇怪空白。
+    """
+    if element.text and not element.text.strip():
+        element.text = None
+    if len(element):
+        last = element[-1]
+        if last.tail and not last.tail.strip():
+            last.tail = None
+
+
+def _del_to_s(element: etree._Element, ctx: TransformContext) -> bool:
+    element.tag = "s"
+    return False
+
+
+DEL_TO_S = HtmlTransform(
+    name="del_to_s",
+    tags=frozenset({"del"}),
+    on_enter=_del_to_s,
+)
+"""将 <del> 标签替换为 <s> 标签（WPS 更兼容删除线），保留内容与属性。"""
+
+
+def _sole_child(element: etree._Element, tag: str) -> Optional[etree._Element]:
+    """元素只包含一个 tag 子元素（忽略空白文本）时返回它"""
+    children, has_text = meaningful_children(element)
+    if not has_text and len(children) == 1 and children[0].tag == tag:
+        return children[0]
+    return None
+
+
+def _bold_italic_span(text: str) -> etree._Element:
+    return new_element("span", text, style=_BOLD_ITALIC_STYLE)
+
+
+def _fix_bold_italic(element: etree._Element, ctx: TransformContext) -> bool:
+    inner = _sole_child(element, "em" if element.tag == "strong" else "strong")
+    if inner is None:
+        return False
+    if element.tag == "em":
+        inner_em = _sole_child(inner, "em")
+        if inner_em is not None:
+            # <em><strong><em>…：<strong><em> 模式优先（与逐类处理的结果一致）
+            replace_element(inner, _bold_italic_span(inner_em.text_content()))
+            return False
+    replace_element(element, _bold_italic_span(inner.text_content()))
+    return True
+
+
+BOLD_ITALIC_TO_SPAN = HtmlTransform(
+    name="bold_italic_to_span",
+    tags=frozenset({"strong", "em"}),
+    on_enter=_fix_bold_italic,
+)
+"""
+修复粗体加斜体的嵌套标签，以兼容 WPS。
+
+将 <strong><em>text</em></strong> 或 <em><strong>text</strong></em>
+转换为 <span style="font-weight: bold; font-style: italic;">text</span>
+
+WPS 对嵌套的 <strong><em> 标签支持不好，只会显示斜体效果。
+使用 inline style 可以确保粗体和斜体效果同时生效。
+"""
+
+
+def _code_block(code_text: str) -> etree._Element:
+    pre = new_element("pre", style=_PRE_WRAP_STYLE)
+    pre.append(new_element("code", code_text))
+    return pre
+
+
+def _fix_pandoc_code_block(element: etree._Element, ctx: TransformContext) -> bool:
+    if element.tag == "div":
+        if "sourceCode" not in (element.get("class") or "").split():
+            return False
+        # Pandoc 生成的 div.sourceCode > pre > code > span... 结构：合并为纯文本代码块
+        pre = element.find(".//pre")
+        code = pre.find(".//code") if pre is not None else None
+        if code is None:
+            return False
+        replace_element(element, _code_block(code.text_content()))
+        return True
+
+    # <p> 只包含一个 <code>，且以 Pandoc 属性标记开头：{.class! attr="value"} actual code here
+    children, has_text = meaningful_children(element)
+    if has_text or len(children) != 1 or children[0].tag != "code":
+        return False
+    code_text = children[0].text_content()
+    if not code_text.strip().startswith("{"):
+        return False
+    match = _PANDOC_CODE_ATTR_RE.match(code_text)
+    if not match:
+        return False
+    # 恢复代码中的换行：Pandoc 将多行代码压缩成单行，用多个空格（4+）代替换行
+    actual_code = re.sub(r"    +", "\n    ", match.group(1))
+    replace_element(element, _code_block(actual_code))
+    return True
+
+
+PANDOC_CODE_BLOCKS = HtmlTransform(
+    name="pandoc_code_blocks",
+    tags=frozenset({"div", "p"}),
+    on_exit=_fix_pandoc_code_block,
+)
+"""
+修复 Pandoc 输出的代码块格式问题。
+
+处理两种情况：
+1. 属性标记格式：<p><code>{.class! attr="value"} actual code here</code></p>
+2. 复杂结构格式：<div class="sourceCode"><pre><code><span>...</span></code></pre></div>
+
+统一转换为简单的 <pre style="white-space: pre-wrap;"><code>actual code here</code></pre>，
+white-space: pre-wrap 确保代码块在 WPS 中可以自动换行。
+"""
+
+
+def _restore_task_checkbox(element: etree._Element, ctx: TransformContext) -> bool:
+    if element.get("type") != "checkbox":
+        return False
+    replace_with_text(element, "[x] " if "checked" in element.attrib else "[ ] ")
+    return True
+
+
+RESTORE_TASK_CHECKBOXES = HtmlTransform(
+    name="restore_task_checkboxes",
+    tags=frozenset({"input"}),
+    on_enter=_restore_task_checkbox,
+)
+"""将 input checkbox 直接替换为 [x] / [ ] 纯文本（WPS 不支持复选框）。"""
+
+
+def attribute_whitelist(allowed_attrs: Dict[str, Sequence[str]], default: Sequence[str]) -> HtmlTransform:
+    """创建「只保留白名单属性」变换：allowed_attrs 按标签指定，其他标签使用 default"""
+    def handle(element: etree._Element, ctx: TransformContext) -> bool:
+        allowed = allowed_attrs.get(element.tag, default)
+        for attr in [name for name in element.attrib if name not in allowed]:
+            del element.attrib[attr]
+        return False
+
+    return HtmlTransform(name="attribute_whitelist", on_enter=handle)
+
+
+CLEAN_PANDOC_ATTRIBUTES = attribute_whitelist(
+    {
+        "a": ["href", "id"],
+        "img": ["src", "alt"],
+        "td": ["colspan", "rowspan"],
+        "th": ["colspan", "rowspan"],
+        "ol": ["type", "start"],
+        "ul": ["type"],
+        # 对于标题和其他标签，只保留 id
+        "h1": ["id"], "h2": ["id"], "h3": ["id"],
+        "h4": ["id"], "h5": ["id"], "h6": ["id"],
+    },
+    default=["id"],
+)
+"""
+清理 Pandoc 输出的 HTML 中的额外属性（style/class/data-* 等），生成纯净的 HTML。
+保留 id、href、src/alt、type/start、colspan/rowspan。
+"""
+
+
+def _drop_fenced_div_text(text: str, ctx: TransformContext) -> Optional[str]:
+    stripped = text.strip()
+    if _PANDOC_FENCED_DIV_RE.match(stripped) or stripped.startswith(":::"):
+        return ""
+    return None
+
+
+CLEAN_PANDOC_FENCED_DIVS = HtmlTransform(
+    name="clean_pandoc_fenced_divs",
+    text_markers=(":",),
+    on_text=_drop_fenced_div_text,
+)
+"""移除 Pandoc fenced divs 扩展语法的残留文本（如 :::::::: {.class}）。"""
+
+
+def _remove_empty_paragraph(element: etree._Element, ctx: TransformContext) -> bool:
+    text = element.text_content().replace("\u00a0", "").strip()
+    # 没有文字，也没有 img/iframe 等「非文本但有意义」的元素
+    has_meaningful_media = next(
+        element.iter("img", "iframe", "video", "audio", "svg"), None
+    ) is not None
+    if not text and not has_meaningful_media:
+        remove_element(element)
+        return True
+    return False
+
+
+REMOVE_EMPTY_PARAGRAPHS = HtmlTransform(
+    name="remove_empty_paragraphs",
+    tags=frozenset({"p"}),
+    on_exit=_remove_empty_paragraph,
+)
+"""删除空 <p>（只有空白或 &nbsp;，且不含 img/iframe 等媒体元素）。"""
+
+
+# Pandoc 输出 → WPS 剪贴板 HTML 的后处理流水线（一次遍历）
+MACWPS_POSTPROCESS_TRANSFORMS = (
+    # 清理列表中的 p/div 包装
+    unwrap_inside_li(),
+    # 替换 del 为 s 标签（WPS 兼容）
+    DEL_TO_S,
+    # 修复粗体加斜体的嵌套标签（WPS 兼容性）
+    BOLD_ITALIC_TO_SPAN,
+    # 修复代码块格式
+    PANDOC_CODE_BLOCKS,
+    # 清理 Pandoc 扩展语法残留（如 ::: 语法块）
+    # CLEAN_PANDOC_FENCED_DIVS,
+    # 清理多余的属性（style, class, data-* 等）
+    # CLEAN_PANDOC_ATTRIBUTES,
+    RESTORE_TASK_CHECKBOXES,
+)
 
-    # 删除 src 指向 .svg 的 <img> 标签
-    for img in soup.find_all("img", src=True):
-        if img["src"].lower().endswith(".svg"):
-            img.decompose()
-    
-    # 清理 LaTeX 公式块中的 <br> 标签
-    _clean_latex_br_tags(soup)
 
+# ---- 便捷函数 ----
 
-def convert_strikethrough_to_del(soup) -> None:
+def clean_html_content(root: etree._Element, options: Optional[Dict[str, object]] = None) -> None:
     """
-    在 BeautifulSoup 解析树中查找文本节点，将 ``~~text~~`` 替换为 ``<del>text</del>``。
+    清理 HTML 内容，移除不可用元素（SVG 等）以及 LaTeX 公式块中的 <br> 标签。
 
     Args:
-        soup: BeautifulSoup 对象，会被原地修改。
+        root: lxml 根元素，会被原地修改。
+        options: 可选格式化配置，如 ``{"strikethrough_to_del": True}``。
     """
-    # 递归处理所有文本节点
-    for element in soup.find_all(text=True):
-        if isinstance(element, NavigableString):
-            if "~~" not in element:
-                continue
-            pattern = r'~~([^~]+?)~~'
-            if not re.search(pattern, element):
-                continue
+    apply_transforms(root, (REMOVE_SVG, KATEX_BR_CLEANUP))
 
-            new_content = []
-            last_end = 0
-            for match in re.finditer(pattern, element):
-                if match.start() > last_end:
-                    new_content.append(element[last_end:match.start()])
 
-                del_tag = soup.new_tag("del")
-                del_tag.string = match.group(1)
-                new_content.append(del_tag)
-                last_end = match.end()
+def remove_svg_elements(root: etree._Element) -> None:
+    """删除 <svg> 元素以及 src 指向 .svg 的 <img>（root 会被原地修改）。"""
+    apply_transforms(root, (REMOVE_SVG,))
 
-            if last_end < len(element):
-                new_content.append(element[last_end:])
 
-            parent = element.parent
-            if not parent:
-                continue
-            index = parent.contents.index(element)
-            element.extract()
-            for i, item in enumerate(new_content):
-                if isinstance(item, str):
-                    parent.insert(index + i, NavigableString(item))
-                else:
-                    parent.insert(index + i, item)
+def convert_strikethrough_to_del(root: etree._Element) -> None:
+    """将文本中的 ``~~text~~`` 替换为 ``<del>text</del>``（root 会被原地修改）。"""
+    apply_transforms(root, (STRIKETHROUGH_TO_DEL,))
 
 
-def _clean_latex_br_tags(soup) -> None:
-    """
-    清理 HTML 中 LaTeX 公式块内的 <br> 标签。
-    
-    LaTeX 公式块通常包裹在 class="katex" 或 class="katex-display" 的元素中，
-    公式内容的 <br> 标签会破坏 LaTeX 语法，需要移除或替换为换行符。
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """  
-    # 查找所有包含 katex 的元素（行内公式和块级公式）
-    katex_elements = soup.find_all(class_=re.compile(r'katex'))
-    
-    for katex_elem in katex_elements:
-        # 在 katex 元素内查找所有 <br> 标签
-        br_tags = katex_elem.find_all('br')
-        
-        for br in br_tags:
-            # 删除 <br> 标签
-            br.replace_with('')
-
-
-def unwrap_all_p_div_inside_li(soup, unwrap_tags=("p", "div")) -> None:
-    """
-    清理所有 li 内部(任意深度)的 p/div：只要在 li 子树里就 unwrap。
-    - 包括 ul 下的 li、再嵌套的 ul/li ... 全部处理
-    - 采用“从深到浅”顺序 unwrap，避免结构变化导致漏处理
-    """
-    # 选中所有在 li 里面的 p/div（包括嵌套 li 内的）
-    wrappers = soup.select(",".join(f"li {t}" for t in unwrap_tags))
-
-    # 从深到浅排序：父链越长越深，先 unwrap 深层更安全
-    wrappers.sort(key=lambda node: len(list(node.parents)), reverse=True)
+def clean_latex_br_tags(root: etree._Element) -> None:
+    """清理 LaTeX 公式块内的 <br> 标签（root 会被原地修改）。"""
+    apply_transforms(root, (KATEX_BR_CLEANUP,))
 
-    for node in wrappers:
-        # node 可能已被前面的 unwrap 影响而脱离树，做个保护
-        if isinstance(node, Tag) and node.parent is not None:
-            node.unwrap()
 
-    # 可选：把每个 li 头尾多余空白文本清一下
-    for li in soup.find_all("li"):
-        _trim_whitespace_text_nodes(li)
+def unwrap_all_p_div_inside_li(root: etree._Element, unwrap_tags: Iterable[str] = ("p", "div")) -> None:
+    """清理所有 li 内部(任意深度)的 p/div（root 会被原地修改）。"""
+    apply_transforms(root, (unwrap_inside_li(tuple(unwrap_tags)),))
 
 
-def remove_empty_paragraphs(soup) -> None:
-    """
-    删除空 <p>：
-      - 只有空白
-      - 或只有 &nbsp; / \u00a0
-      - 或只包含空白的 span/br 等（尽量温和：只在“可判定为空”时删除）
-    """
-    for p in soup.find_all("p"):
-        text = p.get_text(strip=True).replace("\u00a0", "").strip()
-        # 如果完全没内容，并且没有 img/iframe 等“非文本但有意义”的元素
-        has_meaningful_media = bool(p.find(["img", "iframe", "video", "audio", "svg"]))
-        if (not text) and (not has_meaningful_media):
-            p.decompose()
+def remove_empty_paragraphs(root: etree._Element) -> None:
+    """删除空 <p>（root 会被原地修改）。"""
+    apply_transforms(root, (REMOVE_EMPTY_PARAGRAPHS,))
 
 
-def _trim_whitespace_text_nodes(tag) -> None:
-    """
-    去掉某个 tag 开头/结尾的纯空白 NavigableString，避免 unwrap 后出现奇怪空白。
+def postprocess_pandoc_html_macwps(html: Union[str, HtmlDocument]) -> str:
     """
-    # 头部
-    while tag.contents and isinstance(tag.contents[0], NavigableString) and not str(tag.contents[0]).strip():
-        tag.contents[0].extract()
-    # 尾部
-    while tag.contents and isinstance(tag.contents[-1], NavigableString) and not str(tag.contents[-1]).strip():
-        tag.contents[-1].extract()
+    后处理 Pandoc 输出的 HTML，修复格式问题。
 
+    处理内容（MACWPS_POSTPROCESS_TRANSFORMS，一次遍历完成）：
+    1. 清理列表中的 p/div 包装
+    2. 修复粗体斜体嵌套、del → s
+    3. 修复代码块格式（移除属性标记，恢复换行）
+    4. 任务列表复选框恢复为 [x] / [ ] 文本
 
-def postprocess_pandoc_html_macwps(html: str) -> str:
-    """
-    后处理 Pandoc 输出的 HTML，修复格式问题。
-    
-    处理内容：
-    1. 修复代码块格式（移除属性标记，恢复换行）
-    2. 清理所有样式和多余属性（生成纯净 HTML）
-    3. 修复粗体斜体嵌套
-    4. 清理 Pandoc 扩展语法残留
-    
     Args:
-        html: Pandoc 输出的 HTML 文本
-        
+        html: Pandoc 输出的 HTML 文本（或 HtmlDocument）
+
     Returns:
         后处理后的 HTML 文本
     """
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # 清理列表中的 p/div 包装
-    unwrap_all_p_div_inside_li(soup)
+    document = HtmlDocument.wrap(html)
+    apply_transforms(document.edit(), MACWPS_POSTPROCESS_TRANSFORMS)
+    return document.html
 
-    # 替换 del 为 s 标签（WPS 兼容）
-    _replace_del_with_s(soup)
 
-    # 修复粗体加斜体的嵌套标签（WPS 兼容性）
-    _fix_bold_italic_nesting(soup)
-    
-    # 修复代码块格式
-    _fix_pandoc_code_blocks(soup)
-    
-    # 清理 Pandoc 扩展语法残留（如 ::: 语法块）
-    # _clean_pandoc_fenced_divs(soup)
-    
-    # 清理多余的属性（style, class, data-* 等）
-    # _clean_pandoc_attributes(soup)
-
-    _fix_task_list_math_issue(soup)
-    
-    return str(soup)
-
-
-def _fix_bold_italic_nesting(soup) -> None:
-    """
-    修复粗体加斜体的嵌套标签，以兼容 WPS。
-    
-    将 <strong><em>text</em></strong> 或 <em><strong>text</strong></em>
-    转换为 <span style="font-weight: bold; font-style: italic;">text</span>
-    
-    WPS 对嵌套的 <strong><em> 标签支持不好，只会显示斜体效果。
-    使用 inline style 可以确保粗体和斜体效果同时生效。
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 处理 <strong><em>text</em></strong> 模式
-    for strong in soup.find_all('strong'):
-        # 检查 strong 标签是否只包含一个 em 标签
-        children = [c for c in strong.children if c.name or (isinstance(c, NavigableString) and c.strip())]
-        if len(children) == 1 and children[0].name == 'em':
-            em = children[0]
-            text = em.get_text()
-            
-            # 创建新的 span 标签，使用 inline style
-            span = soup.new_tag('span', style='font-weight: bold; font-style: italic;')
-            span.string = text
-            
-            # 替换原来的 strong 标签
-            strong.replace_with(span)
-    
-    # 处理 <em><strong>text</strong></em> 模式
-    for em in soup.find_all('em'):
-        # 检查 em 标签是否只包含一个 strong 标签
-        children = [c for c in em.children if c.name or (isinstance(c, NavigableString) and c.strip())]
-        if len(children) == 1 and children[0].name == 'strong':
-            strong = children[0]
-            text = strong.get_text()
-            
-            # 创建新的 span 标签，使用 inline style
-            span = soup.new_tag('span', style='font-weight: bold; font-style: italic;')
-            span.string = text
-            
-            # 替换原来的 em 标签
-            em.replace_with(span)
-
-
-def _fix_pandoc_code_blocks(soup) -> None:
-    """
-    修复 Pandoc 输出的代码块格式问题。
-    
-    处理两种情况：
-    1. 属性标记格式：<p><code>{.class! attr="value"} actual code here</code></p>
-    2. 复杂结构格式：<div class="sourceCode"><pre><code><span>...</span></code></pre></div>
-    
-    统一转换为简单的：
-    <pre style="white-space: pre-wrap;"><code>actual code here</code></pre>
-    
-    使用 white-space: pre-wrap 确保代码块在 WPS 中可以自动换行。
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 处理 Pandoc 生成的 div.sourceCode 复杂结构
-    for div in soup.find_all('div', class_='sourceCode'):
-        # 查找内部的 pre > code 结构
-        pre = div.find('pre')
-        if pre:
-            code = pre.find('code')
-            if code:
-                # 提取所有文本内容（自动合并所有 span 标签中的文本）
-                code_text = code.get_text()
-                
-                # 创建新的简化 pre > code 结构
-                new_pre = soup.new_tag('pre', style='white-space: pre-wrap;')
-                new_code = soup.new_tag('code')
-                new_code.string = code_text
-                new_pre.append(new_code)
-                
-                # 替换整个 div.sourceCode
-                div.replace_with(new_pre)
-    
-    # 处理 <p> 标签中包含 <code> 的情况（属性标记格式）
-    for p in soup.find_all('p'):
-        # 获取 p 标签的所有子节点（排除纯空白文本节点）
-        meaningful_contents = [
-            c for c in p.contents 
-            if c.name or (isinstance(c, NavigableString) and c.strip())
-        ]
-        
-        # 检查 p 是否只包含一个 code 标签
-        code_tags = p.find_all('code', recursive=False)
-        if len(code_tags) == 1 and len(meaningful_contents) == 1:
-            code = code_tags[0]
-            code_text = code.get_text()
-            
-            # 检查是否包含 Pandoc 属性标记（以 { 开头）
-            if code_text.strip().startswith('{'):
-                # 尝试提取属性和实际代码
-                # 格式：{.class! attr="value"} actual code here
-                match = re.match(r'^\{[^}]+\}\s*(.+)$', code_text, re.DOTALL)
-                if match:
-                    actual_code = match.group(1)
-                    
-                    # 恢复代码中的换行
-                    # Pandoc 将多行代码压缩成单行，用多个空格代替换行
-                    # 检测连续的多个空格（通常是 4+ 空格），替换为换行+缩进
-                    actual_code = re.sub(r'    +', '\n    ', actual_code)
-                    
-                    # 创建新的 pre > code 结构，添加 white-space: pre-wrap
-                    pre = soup.new_tag('pre', style='white-space: pre-wrap;')
-                    new_code = soup.new_tag('code')
-                    new_code.string = actual_code
-                    pre.append(new_code)
-                    
-                    # 替换原来的 p 标签
-                    p.replace_with(pre)
-
-
-def _clean_pandoc_attributes(soup) -> None:
-    """
-    清理 Pandoc 输出的 HTML 中的额外属性，生成纯净的 HTML。
-    
-    移除：
-    - style 属性（所有内联样式）
-    - class 属性（CSS 类名）
-    - data-* 属性（自定义数据属性）
-    - 其他非标准属性
-    
-    保留：
-    - id（锚点）
-    - href（链接）
-    - src, alt（图片）
-    - type（列表类型）
-    - colspan, rowspan（表格）
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 定义需要保留的属性白名单
-    allowed_attrs = {
-        'a': ['href', 'id'],
-        'img': ['src', 'alt'],
-        'td': ['colspan', 'rowspan'],
-        'th': ['colspan', 'rowspan'],
-        'ol': ['type', 'start'],
-        'ul': ['type'],
-        # 对于标题和其他标签，只保留 id
-        'h1': ['id'], 'h2': ['id'], 'h3': ['id'], 
-        'h4': ['id'], 'h5': ['id'], 'h6': ['id'],
-    }
-    
-    for tag in soup.find_all(True):
-        # 获取该标签类型允许的属性
-        allowed = allowed_attrs.get(tag.name, ['id'])
-        
-        # 找出需要删除的属性
-        attrs_to_del = [attr for attr in list(tag.attrs.keys()) if attr not in allowed]
-        
-        # 删除不允许的属性
-        for attr in attrs_to_del:
-            del tag.attrs[attr]
-
-
-def _replace_del_with_s(soup) -> None:
-    """
-    将 <del> 标签替换为 <s> 标签（WPS 更兼容删除线）。
-    保留内容与属性（后续 clean 会清掉 data-*）。
-    """
-    for tag in soup.find_all("del"):
-        tag.name = "s"
+_WPS_ALLOWED_ATTRIBUTES = attribute_whitelist(
+    {
+        "a": ["href", "id", "title"],
+        "img": ["src", "alt", "title"],
+        "td": ["colspan", "rowspan"],
+        "th": ["colspan", "rowspan"],
+        "ol": ["type", "start"],
+        "ul": ["type"],
+        # 对于其他标签，只保留 id 和 title
+    },
+    default=["id", "title"],
+)
 
 
-def _clean_pandoc_fenced_divs(soup) -> None:
-    """
-    清理 Pandoc fenced divs 扩展语法产生的残留文本。
-    
-    Pandoc 在某些情况下会将 ::: 语法块转换为文本，需要清理。
-    例如：:::::::: {.class} -> 应该被移除
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 查找包含 Pandoc 扩展语法的文本节点
-    for text_node in soup.find_all(text=True):
-        if isinstance(text_node, NavigableString):
-            text = str(text_node)
-            # 匹配以 : 开头的 Pandoc 扩展语法
-            if re.match(r'^:+\s*\{[^}]*\}', text.strip()):
-                # 完全移除这类文本
-                text_node.extract()
-            elif text.strip().startswith(':::'):
-                # 移除包含 ::: 的行
-                text_node.extract()
-
-
-def clean_html_for_wps(html: str) -> str:
+def clean_html_for_wps(html: Union[str, HtmlDocument]) -> str:
     """
     弃用
     专门为 WPS 工作流清理输入的 HTML，去除所有样式和扩展属性。
-    
+
     这个函数在 Pandoc 转换之前调用，清理输入 HTML 中的：
     - style 属性（内联样式）
     - class 属性（CSS 类名）
     - 所有 data-* 自定义属性
     - 其他非标准属性（如 path-to-node, _ngcontent-*, hveid, ved 等）
     - 保护任务列表标记，避免被 Pandoc 误识别为数学公式
-    
+
     只保留必要的语义属性（id, href, src, alt 等）。
-    
+
     Args:
-        html: 原始 HTML 字符串
-        
+        html: 原始 HTML 字符串（或 HtmlDocument）
+
     Returns:
         清理后的 HTML 字符串
     """
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # 先保护任务列表标记，避免 Pandoc 将 [x] 转义为 \[x\]，导致被识别为数学公式
-    _protect_task_list_brackets(soup)
-    
-    # 定义需要保留的属性白名单
-    allowed_attrs = {
-        'a': ['href', 'id', 'title'],
-        'img': ['src', 'alt', 'title'],
-        'td': ['colspan', 'rowspan'],
-        'th': ['colspan', 'rowspan'],
-        'ol': ['type', 'start'],
-        'ul': ['type'],
-        # 对于其他标签，只保留 id 和 title
-    }
-    
-    for tag in soup.find_all(True):
-        # 获取该标签类型允许的属性
-        allowed = allowed_attrs.get(tag.name, ['id', 'title'])
-        
-        # 找出需要删除的属性
-        attrs_to_del = [attr for attr in list(tag.attrs.keys()) if attr not in allowed]
-        
-        # 删除不允许的属性
-        for attr in attrs_to_del:
-            del tag.attrs[attr]
-    
-    return str(soup)
-
-
-def protect_task_list_brackets(html: str) -> str:
-    """
-    保护 HTML 中的任务列表标记，避免被 Pandoc 转义和误识别。
-    
-    将 [x] 和 [ ] 替换为特殊标记：
-    - [x] -> {{TASK_CHECKED}}
-    - [ ] -> {{TASK_UNCHECKED}}
-    
-    这些特殊标记不会被 Pandoc 识别为 Markdown 语法或数学公式。
-    
-    Args:
-        html: 原始 HTML 字符串
-        
-    Returns:
-        处理后的 HTML 字符串
-    """
-    soup = BeautifulSoup(html, "html.parser")
-    _protect_task_list_brackets(soup)
-    return str(soup)
+    document = HtmlDocument.wrap(html)
+    apply_transforms(document.edit(), (PROTECT_TASK_LIST, _WPS_ALLOWED_ATTRIBUTES))
+    return document.html
 
 
-def _protect_task_list_brackets(soup) -> None:
+def protect_task_list_brackets(html: Union[str, HtmlDocument]) -> str:
     """
     保护 HTML 中的任务列表标记，避免被 Pandoc 转义和误识别。
-    
+
     将 [x] 和 [ ] 替换为特殊标记：
     - [x] -> {{TASK_CHECKED}}
     - [ ] -> {{TASK_UNCHECKED}}
-    
-    这些特殊标记不会被 Pandoc 识别为 Markdown 语法或数学公式。
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 遍历所有文本节点
-    for text_node in soup.find_all(text=True):
-        if isinstance(text_node, NavigableString):
-            text = str(text_node)
-            # 只处理包含任务列表标记的文本
-            if '[x]' in text or '[ ]' in text or '[X]' in text:
-                # 替换为特殊标记
-                text = text.replace('[x]', '{{TASK_CHECKED}}')
-                text = text.replace('[ ]', '{{TASK_UNCHECKED}}')
-                text_node.replace_with(text)
-
-
-def _restore_task_list_brackets(soup) -> None:
-    """
-    将 HTML 中的 input checkbox 标签直接替换为 [x] 或 [ ] 文本。
-    """
-    # 1. 寻找所有的 input 标签
-    for checkbox in soup.find_all('input'):
-        # 更加鲁棒的判断：如果是 checkbox 或者它带有 checked 属性
-        is_checkbox = checkbox.get('type') == 'checkbox'
-        if is_checkbox:
-            # 判断是否选中
-            is_checked = checkbox.has_attr('checked')
-            replacement_text = "[x] " if is_checked else "[ ] "
-            
-            # 核心修复：使用 NavigableString 确保替换为纯文本
-            checkbox.replace_with(NavigableString(replacement_text))
-
-
-def _fix_task_list_math_issue(soup) -> None:
-    """
-    恢复被保护的任务列表标记。
-    
-    在 clean_html_for_wps 中，任务列表标记被替换为特殊标记以避免被 Pandoc 误识别。
-    这个函数将特殊标记恢复为原始的方括号格式。
-    
-    Args:
-        soup: BeautifulSoup 对象，会被原地修改。
-    """
-    # 恢复任务列表标记
-    _restore_task_list_brackets(soup)
 
+    这些特殊标记不会被 Pandoc 识别为 Markdown 语法或数学公式。
 
+    Args:
+        html: 原始 HTML 字符串，或本次作业共享的 HtmlDocument（复用已有解析树并原地修改）
 
+    Returns:
+        处理后的 HTML 字符串
+    """
+    document = HtmlDocument.wrap(html)
+    apply_transforms(document.edit(), (PROTECT_TASK_LIST,))
+    return document.html
@@ -0,0 +1,326 @@
+"""Single-traversal visitor engine for lxml HTML trees."""
+
+from __future__ import annotations
+
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from lxml import etree
+
+# on_text 的返回值：None 表示不变；str 表示替换文本；序列表示拆分为文本与新元素
+TextResult = Optional[Union[str, Sequence[Union[str, etree._Element]]]]
+
+
+class TransformContext:
+    """
+    遍历上下文：当前元素的祖先栈与祖先标签计数
+
+    Attributes:
+        root: 遍历的根元素
+        ancestors: 从根到当前元素父节点的元素栈
+    """
+
+    def __init__(self, root: etree._Element):
+        self.root = root
+        self.ancestors: List[etree._Element] = []
+        self._open_tags: Counter = Counter()
+
+    def within(self, tag: str) -> bool:
+        """当前元素是否位于 tag 元素之内（任意深度）"""
+        return self._open_tags[tag] > 0
+
+    def within_class(self, fragment: str) -> bool:
+        """当前元素是否有 class 包含 fragment 的祖先（按 class 逐个匹配子串）"""
+        for element in reversed(self.ancestors):
+            classes = element.get("class")
+            if classes and any(fragment in name for name in classes.split()):
+                return True
+        return False
+
+    def _push(self, element: etree._Element) -> None:
+        self.ancestors.append(element)
+        self._open_tags[element.tag] += 1
+
+    def _pop(self) -> None:
+        self._open_tags[self.ancestors.pop().tag] -= 1
+
+
+@dataclass(frozen=True)
+class HtmlTransform:
+    """
+    一个 HTML 变换（访问者）
+
+    变换声明自己关心的标签、class 或文本标记，由 TransformEngine 在一次深度优先
+    遍历中统一分发，而不是各自对整棵树做 find_all。
+
+    Attributes:
+        name: 变换名（用于日志与统计）
+        tags: 关心的标签名；None 表示所有元素
+        classes: 关心的 class（与元素 class 列表有交集才分发）；空表示不限
+        text_markers: 文本节点至少包含其一时才调用 on_text；空表示所有文本
+        on_enter: (element, ctx) -> bool，进入元素时调用（先序）；返回 True 表示
+            元素已被移除/替换，不再遍历其子树
+        on_exit: (element, ctx) -> bool，子树遍历完后调用（后序）；返回 True 表示
+            元素已被移除/替换，后续变换不再处理该元素
+        on_text: (text, ctx) -> TextResult，处理文本节点（元素的 text 与 tail）
+    """
+    name: str
+    tags: Optional[FrozenSet[str]] = None
+    classes: FrozenSet[str] = frozenset()
+    text_markers: Tuple[str, ...] = ()
+    on_enter: Optional[Callable[[etree._Element, TransformContext], bool]] = None
+    on_exit: Optional[Callable[[etree._Element, TransformContext], bool]] = None
+    on_text: Optional[Callable[[str, TransformContext], TextResult]] = None
+
+
+_Handler = Tuple[FrozenSet[str], Callable[[etree._Element, TransformContext], bool]]
+
+
+class TransformEngine:
+    """
+    在一次深度优先遍历中应用多个 HtmlTransform
+
+    同一元素上的处理按变换注册顺序执行；某个处理返回 True（元素已移除/替换）后，
+    其余变换不再处理该元素。文本节点在其所在元素的子节点遍历之前（text）或对应
+    子元素遍历之后（tail）处理。
+
+    传入 timings 时按变换名累计各变换回调的耗时（毫秒），遍历本身的开销不计入
+    任何变换。
+    """
+
+    def __init__(self, transforms: Iterable[HtmlTransform], timings: Optional[Dict[str, float]] = None):
+        self.transforms = list(transforms)
+        self.timings = timings
+        self._enter_by_tag: Dict[str, List[_Handler]] = {}
+        self._enter_any: List[_Handler] = []
+        self._exit_by_tag: Dict[str, List[_Handler]] = {}
+        self._exit_any: List[_Handler] = []
+        self._text: List[Tuple[Tuple[str, ...], Callable[[str, TransformContext], TextResult]]] = []
+        for transform in self.transforms:
+            if transform.on_enter is not None:
+                self._register(transform, self._timed(transform, transform.on_enter),
+                               self._enter_by_tag, self._enter_any)
+            if transform.on_exit is not None:
+                self._register(transform, self._timed(transform, transform.on_exit),
+                               self._exit_by_tag, self._exit_any)
+            if transform.on_text is not None:
+                self._text.append((transform.text_markers, self._timed(transform, transform.on_text)))
+
+    def _timed(self, transform: HtmlTransform, callback: Callable) -> Callable:
+        """需要统计耗时时包装回调，把耗时累计到 timings[变换名]"""
+        timings = self.timings
+        if timings is None:
+            return callback
+        name = transform.name
+        timings.setdefault(name, 0.0)
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                timings[name] += (time.perf_counter() - start) * 1000
+
+        return timed
+
+    @staticmethod
+    def _register(transform, handler, by_tag: Dict[str, List[_Handler]], any_tag: List[_Handler]) -> None:
+        entry = (transform.classes, handler)
+        if transform.tags is None:
+            any_tag.append(entry)
+        else:
+            for tag in transform.tags:
+                by_tag.setdefault(tag, []).append(entry)
+
+    def apply(self, root: etree._Element) -> None:
+        """原地变换以 root 为根的子树（root 本身不会被移除）"""
+        if not self.transforms:
+            return
+        ctx = TransformContext(root)
+        self._visit_children(root, ctx)
+
+    def _handlers(self, element, by_tag, any_tag) -> List[_Handler]:
+        handlers = by_tag.get(element.tag)
+        if handlers and any_tag:
+            return handlers + any_tag
+        return handlers or any_tag
+
+    def _dispatch(self, element: etree._Element, ctx: TransformContext, handlers: List[_Handler]) -> bool:
+        element_classes: Optional[set] = None
+        for classes, handler in handlers:
+            if classes:
+                if element_classes is None:
+                    element_classes = set((element.get("class") or "").split())
+                if not classes & element_classes:
+                    continue
+            if handler(element, ctx):
+                return True
+        return False
+
+    def _visit_children(self, element: etree._Element, ctx: TransformContext) -> None:
+        ctx._push(element)
+        if self._text and element.text:
+            self._rewrite_text(element, ctx)
+        for child in list(element):
+            # tail 属于父元素中的文本：先于子元素处理，子元素被移除/替换时 tail 也已处理
+            if self._text and child.tail:
+                self._rewrite_tail(child, ctx)
+            # 注释、处理指令的 tag 不是字符串，跳过
+            if isinstance(child.tag, str):
+                self._visit(child, ctx)
+        ctx._pop()
+
+    def _visit(self, element: etree._Element, ctx: TransformContext) -> None:
+        handlers = self._handlers(element, self._enter_by_tag, self._enter_any)
+        if handlers and self._dispatch(element, ctx, handlers):
+            return
+        self._visit_children(element, ctx)
+        handlers = self._handlers(element, self._exit_by_tag, self._exit_any)
+        if handlers:
+            self._dispatch(element, ctx, handlers)
+
+    def _transform_text(self, text: str, ctx: TransformContext) -> Optional[List[Union[str, etree._Element]]]:
+        """依次应用 on_text；返回拆分后的片段，没有变化时返回 None"""
+        parts: List[Union[str, etree._Element]] = [text]
+        changed = False
+        for markers, on_text in self._text:
+            next_parts: List[Union[str, etree._Element]] = []
+            for part in parts:
+                if not isinstance(part, str) or (markers and not any(m in part for m in markers)):
+                    next_parts.append(part)
+                    continue
+                result = on_text(part, ctx)
+                if result is None:
+                    next_parts.append(part)
+                elif isinstance(result, str):
+                    next_parts.append(result)
+                    changed = True
+                else:
+                    next_parts.extend(result)
+                    changed = True
+            parts = next_parts
+        return parts if changed else None
+
+    def _rewrite_text(self, element: etree._Element, ctx: TransformContext) -> None:
+        parts = self._transform_text(element.text, ctx)
+        if parts is None:
+            return
+        text, elements = _collapse_parts(parts)
+        element.text = text
+        for index, child in enumerate(elements):
+            element.insert(index, child)
+
+    def _rewrite_tail(self, element: etree._Element, ctx: TransformContext) -> None:
+        parts = self._transform_text(element.tail, ctx)
+        if parts is None:
+            return
+        text, elements = _collapse_parts(parts)
+        element.tail = text
+        anchor = element
+        for child in elements:
+            anchor.addnext(child)
+            anchor = child
+
+
+def _collapse_parts(parts: Sequence[Union[str, etree._Element]]) -> Tuple[Optional[str], List[etree._Element]]:
+    """
+    把 [文本, 元素, 文本, ...] 转为 lxml 形式：开头的文本 + 元素列表（元素后的文本并入其 tail）
+    """
+    leading: List[str] = []
+    elements: List[etree._Element] = []
+    for part in parts:
+        if isinstance(part, str):
+            if elements:
+                elements[-1].tail = (elements[-1].tail or "") + part
+            else:
+                leading.append(part)
+        else:
+            part.tail = None
+            elements.append(part)
+    text = "".join(leading)
+    return (text or None), elements
+
+
+def apply_transforms(
+    root: etree._Element, transforms: Iterable[HtmlTransform], timings: Optional[Dict[str, float]] = None
+) -> None:
+    """用一次遍历把 transforms 应用到 root 子树（timings 见 TransformEngine）"""
+    TransformEngine(transforms, timings).apply(root)
+
+
+# ---- lxml 树操作辅助（保持 tail 文本不丢失） ----
+
+def remove_element(element: etree._Element) -> None:
+    """删除元素及其子树，保留其后的文本（tail）"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    _append_text_before(element, parent, element.tail)
+    parent.remove(element)
+
+
+def replace_element(element: etree._Element, replacement: etree._Element) -> None:
+    """用 replacement 替换 element，保留 element 的 tail"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    replacement.tail = element.tail
+    parent.replace(element, replacement)
+
+
+def replace_with_text(element: etree._Element, text: str) -> None:
+    """用纯文本替换元素（文本与原 tail 合并到前一个节点）"""
+    element.tail = text + (element.tail or "")
+    remove_element(element)
+
+
+def unwrap_element(element: etree._Element) -> None:
+    """去掉元素标签，把其文本与子节点提升到父元素中的原位置"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    children = list(element)
+    _append_text_before(element, parent, element.text)
+    if children:
+        children[-1].tail = ((children[-1].tail or "") + (element.tail or "")) or None
+    else:
+        _append_text_before(element, parent, element.tail)
+    index = parent.index(element)
+    parent[index:index + 1] = children
+
+
+def _append_text_before(element: etree._Element, parent: etree._Element, text: Optional[str]) -> None:
+    """把 text 接到 element 之前的文本位置（前一个兄弟的 tail 或父元素的 text）"""
+    if not text:
+        return
+    previous = element.getprevious()
+    if previous is not None:
+        previous.tail = (previous.tail or "") + text
+    else:
+        parent.text = (parent.text or "") + text
+
+
+def new_element(tag: str, text: Optional[str] = None, **attrs: str) -> etree._Element:
+    """创建 HTML 元素"""
+    element = etree.Element(tag, **attrs)
+    if text:
+        element.text = text
+    return element
+
+
+def meaningful_children(element: etree._Element) -> Tuple[List[etree._Element], bool]:
+    """
+    返回 (子元素列表, 是否有非空白文本直接位于 element 中)
+
+    对应 BeautifulSoup 中「标签或非空白字符串」意义上的有效子节点。
+    """
+    has_text = bool(element.text and element.text.strip())
+    children = []
+    for child in element:
+        if isinstance(child.tag, str):
+            children.append(child)
+        if child.tail and child.tail.strip():
+            has_text = True
+    return children, has_text
@@ -0,0 +1,469 @@
+"""Downscale and recompress images before and after Pandoc conversion.
+
+Full-resolution screenshots make DOCX files that are slow to write, insert
+and save. Images wider than the configured limit are resized (Word scales
+them to the page width anyway) after applying their EXIF orientation. JPEGs
+stay JPEG; PNGs are re-encoded optimized, and photographic content without
+transparency becomes JPEG when that is much smaller. Work is spread over a process pool and results are cached by the
+SHA-256 of the input, so the same screenshot is only optimized once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from lxml import etree
+from PIL import Image, ImageOps
+
+from ..config.paths import get_cache_dir
+from .blob_store import BlobStore
+from .logging import log
+
+# 可处理的图片扩展名（GIF 可能是动画，SVG/EMF 为矢量，均不处理）
+OPTIMIZABLE_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "bmp", "tif", "tiff", "webp"})
+
+_MEDIA_PREFIX = "word/media/"
+_CONTENT_TYPES_PART = "[Content_Types].xml"
+_CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+_IMAGE_CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg"}
+
+# 缩略图中颜色数超过该值视为照片类内容（截图的颜色通常少得多）
+_PHOTO_MIN_COLORS = 4096
+# 照片类内容的 JPEG 至少比 PNG 小一半时才改用 JPEG
+_JPEG_MAX_RATIO = 0.5
+# 未缩放时，重新编码至少减小 10% 才替换原图
+_MIN_SAVING_RATIO = 0.9
+# 缓存中「原图已是最优」的标记文件扩展名
+_KEEP_MARKER = "keep"
+
+# Markdown 图片目标与内嵌 HTML 的 src
+_MARKDOWN_IMAGE_RE = re.compile(r"(!\[[^\]]*\]\(\s*<?)([^)\s>]+)")
+_HTML_IMG_SRC_RE = re.compile(r"(<img\b[^>]*?\bsrc\s*=\s*[\"'])([^\"']+)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ImageOptimizeOptions:
+    """
+    图片优化参数
+
+    Attributes:
+        max_width: 宽度上限（像素），超出时等比缩小
+        jpeg_quality: 转为 JPEG 时的质量
+        min_bytes: 小于该大小的图片不处理
+    """
+    max_width: int = 1600
+    jpeg_quality: int = 85
+    min_bytes: int = 64 * 1024
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "ImageOptimizeOptions":
+        return cls(
+            max_width=max(1, int(settings.get("max_width_px", cls.max_width))),
+            jpeg_quality=min(95, max(1, int(settings.get("jpeg_quality", cls.jpeg_quality)))),
+            min_bytes=max(0, int(float(settings.get("min_kb", cls.min_bytes // 1024)) * 1024)),
+        )
+
+    @property
+    def signature(self) -> str:
+        """参与缓存键的参数（min_bytes 不影响结果）"""
+        return f"w{self.max_width}q{self.jpeg_quality}"
+
+
+def _extension(name: str) -> str:
+    return os.path.splitext(name)[1].lstrip(".").lower()
+
+
+def _is_opaque(image: Image.Image) -> bool:
+    if image.mode in ("RGBA", "LA"):
+        return image.getchannel("A").getextrema()[0] == 255
+    if image.mode == "P" and "transparency" in image.info:
+        return _is_opaque(image.convert("RGBA"))
+    return True
+
+
+def _is_photographic(image: Image.Image) -> bool:
+    thumbnail = image.convert("RGB")
+    thumbnail.thumbnail((256, 256))
+    return thumbnail.getcolors(maxcolors=_PHOTO_MIN_COLORS) is None
+
+
+def optimize_image_bytes(data: bytes, extension: str, options: ImageOptimizeOptions) -> Optional[Tuple[bytes, str]]:
+    """
+    缩放并重新编码一张图片（在进程池的工作进程中执行，不写日志）
+
+    先按 EXIF 方向旋转再判断宽度。JPEG 只在缩放时以 JPEG 重新编码（不转为 PNG，
+    未缩放时不重新编码，避免二次有损压缩）；其他格式编码为 PNG，照片类内容的
+    JPEG 明显更小时改用 JPEG。结果不比原图小时不替换。
+
+    Returns:
+        (新图片字节, 新扩展名)；没有明显收益时返回 None
+
+    Raises:
+        Exception: 图片无法解码等（由调用方记录）
+    """
+    is_jpeg = extension in ("jpg", "jpeg")
+    with Image.open(io.BytesIO(data)) as source:
+        if getattr(source, "is_animated", False):
+            return None
+        source.load()
+        dpi = source.info.get("dpi")
+        image: Image.Image = ImageOps.exif_transpose(source)
+        resized = image.width > options.max_width
+        if not resized and is_jpeg:
+            return None
+        if resized:
+            height = max(1, round(image.height * options.max_width / image.width))
+            image = image.resize((options.max_width, height), Image.LANCZOS)
+
+        save_options = {"dpi": dpi} if dpi else {}
+        if is_jpeg:
+            jpeg = io.BytesIO()
+            image.convert("RGB").save(
+                jpeg, "JPEG", quality=options.jpeg_quality, optimize=True, **save_options
+            )
+            result, result_ext = jpeg.getvalue(), "jpg"
+        else:
+            if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            png = io.BytesIO()
+            image.save(png, "PNG", optimize=True, **save_options)
+            result, result_ext = png.getvalue(), "png"
+
+            if _is_opaque(image) and _is_photographic(image):
+                jpeg = io.BytesIO()
+                image.convert("RGB").save(
+                    jpeg, "JPEG", quality=options.jpeg_quality, optimize=True, **save_options
+                )
+                if jpeg.tell() <= len(result) * _JPEG_MAX_RATIO:
+                    result, result_ext = jpeg.getvalue(), "jpg"
+
+    limit = len(data) if resized else len(data) * _MIN_SAVING_RATIO
+    if len(result) >= limit:
+        return None
+    return result, result_ext
+
+
+def _optimize_job(
+    data: bytes, extension: str, options: ImageOptimizeOptions
+) -> Tuple[Optional[Tuple[bytes, str]], Optional[str]]:
+    """进程池任务：返回 (优化结果, 错误信息)，错误由主进程记录"""
+    try:
+        return optimize_image_bytes(data, extension, options), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class ImageOptimizer:
+    """
+    图片优化服务：缓存 + 进程池
+
+    缓存以 <输入 SHA-256>-<参数签名> 为键：优化结果保存为同名图片，没有收益的图片
+    保存一个 .keep 标记，下次直接跳过。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self._cache_dir = cache_dir
+        self._cache: Optional[BlobStore] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_workers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self) -> BlobStore:
+        if self._cache is None:
+            self._cache = BlobStore(self._cache_dir or get_cache_dir("optimized_images"))
+        return self._cache
+
+    def _get_pool(self, workers: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None or self._pool_workers != workers:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(max_workers=workers)
+                self._pool_workers = workers
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        """(是否命中, 优化结果路径)；命中 .keep 标记时路径为 None"""
+        if self.cache.get(f"{key}.{_KEEP_MARKER}"):
+            return True, None
+        for extension in _IMAGE_CONTENT_TYPES:
+            path = self.cache.get(f"{key}.{extension}")
+            if path:
+                return True, path
+        return False, None
+
+    def optimize_many(
+        self, items: Sequence[Tuple[bytes, str]], options: ImageOptimizeOptions, max_workers: int = 0
+    ) -> List[Optional[str]]:
+        """
+        优化一组图片
+
+        Args:
+            items: (图片字节, 扩展名) 列表
+            options: 优化参数
+            max_workers: 进程数，0 表示按 CPU 核数（最多 4 个）；1 表示在当前进程执行
+
+        Returns:
+            与 items 对应的优化结果路径（位于缓存目录）；不需要优化的为 None
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        pending: List[Tuple[int, str, bytes, str]] = []
+        # 同一批中内容相同的图片只处理一次
+        duplicates: Dict[str, List[int]] = {}
+        for index, (data, extension) in enumerate(items):
+            extension = extension.lower()
+            if extension not in OPTIMIZABLE_EXTENSIONS or len(data) < options.min_bytes:
+                continue
+            key = f"{hashlib.sha256(data).hexdigest()}-{options.signature}"
+            if key in duplicates:
+                duplicates[key].append(index)
+                continue
+            hit, path = self._lookup(key)
+            if hit:
+                results[index] = path
+            else:
+                duplicates[key] = []
+                pending.append((index, key, data, extension))
+        if not pending:
+            return results
+
+        start = time.perf_counter()
+        workers = max_workers if max_workers > 0 else min(4, os.cpu_count() or 1)
+        jobs: List[Tuple[Optional[Tuple[bytes, str]], Optional[str]]]
+        if workers > 1 and len(pending) > 1:
+            try:
+                pool = self._get_pool(workers)
+                jobs = list(pool.map(
+                    _optimize_job,
+                    [data for _, _, data, _ in pending],
+                    [extension for _, _, _, extension in pending],
+                    [options] * len(pending),
+                ))
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                log(f"Image optimization process pool failed, running in-process: {e}")
+                self._reset_pool()
+                jobs = [_optimize_job(data, extension, options) for _, _, data, extension in pending]
+        else:
+            jobs = [_optimize_job(data, extension, options) for _, _, data, extension in pending]
+        outputs = [output for output, _ in jobs]
+        for _, error in jobs:
+            if error:
+                log(f"Image optimization failed: {error}")
+
+        size_in = size_out = 0
+        for (index, key, data, _), output in zip(pending, outputs):
+            size_in += len(data)
+            try:
+                if output is None:
+                    self.cache.put_bytes(f"{key}.{_KEEP_MARKER}", b"")
+                    size_out += len(data)
+                    continue
+                results[index] = self.cache.put_bytes(f"{key}.{output[1]}", output[0])
+                size_out += len(output[0])
+            except OSError as e:
+                log(f"Failed to cache optimized image: {e}")
+        for key, indexes in duplicates.items():
+            for index in indexes:
+                results[index] = next(results[i] for i, k, _, _ in pending if k == key)
+        log(
+            f"Optimized {sum(o is not None for o in outputs)}/{len(pending)} images "
+            f"({size_in} -> {size_out} bytes) in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return results
+
+    def optimize_files(
+        self, paths: Sequence[str], options: ImageOptimizeOptions, max_workers: int = 0
+    ) -> Dict[str, str]:
+        """优化本地图片文件，返回 {原路径: 优化结果路径}（只包含有优化结果的文件）"""
+        items: List[Tuple[bytes, str]] = []
+        readable: List[str] = []
+        for path in paths:
+            if _extension(path) not in OPTIMIZABLE_EXTENSIONS:
+                continue
+            try:
+                if os.path.getsize(path) < options.min_bytes:
+                    continue
+                with open(path, "rb") as f:
+                    items.append((f.read(), _extension(path)))
+            except OSError:
+                continue
+            readable.append(path)
+        results = self.optimize_many(items, options, max_workers)
+        return {path: result for path, result in zip(readable, results) if result}
+
+    def optimize_docx_media(self, docx_bytes: bytes, options: ImageOptimizeOptions, max_workers: int = 0) -> bytes:
+        """
+        优化 DOCX 中 word/media 下的图片
+
+        图片格式改变时（PNG → JPEG）同时重命名部件，更新关系文件中的引用，
+        并在 [Content_Types].xml 中补充扩展名的默认类型。文档中的显示尺寸（EMU）不变。
+        失败时返回原字节流。
+        """
+        try:
+            with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin:
+                media = [
+                    info for info in zin.infolist()
+                    if info.filename.startswith(_MEDIA_PREFIX)
+                    and _extension(info.filename) in OPTIMIZABLE_EXTENSIONS
+                    and info.file_size >= options.min_bytes
+                ]
+                if not media:
+                    return docx_bytes
+                results = self.optimize_many(
+                    [(zin.read(info), _extension(info.filename)) for info in media], options, max_workers
+                )
+                replacements: Dict[str, Tuple[str, str]] = {}
+                names = set(zin.namelist())
+                for info, result in zip(media, results):
+                    if not result:
+                        continue
+                    new_name = f"{os.path.splitext(info.filename)[0]}.{_extension(result)}"
+                    if new_name != info.filename and new_name in names:
+                        new_name = f"{os.path.splitext(info.filename)[0]}_opt.{_extension(result)}"
+                    names.add(new_name)
+                    replacements[info.filename] = (new_name, result)
+                if not replacements:
+                    return docx_bytes
+                return self._rewrite_docx(zin, replacements)
+        except Exception as e:
+            log(f"Failed to optimize DOCX media: {type(e).__name__}: {e}")
+            return docx_bytes
+
+    @staticmethod
+    def _rewrite_docx(zin: zipfile.ZipFile, replacements: Dict[str, Tuple[str, str]]) -> bytes:
+        # 关系文件中的 Target 相对于 word/ 目录
+        renames = {
+            old[len("word/"):]: new[len("word/"):]
+            for old, (new, _) in replacements.items()
+            if old != new
+        }
+        extensions = {_extension(new) for new, _ in replacements.values()}
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                name = info.filename
+                if name in replacements:
+                    new_name, path = replacements[name]
+                    with open(path, "rb") as f:
+                        # 图片本身已压缩，不再 deflate
+                        zout.writestr(zipfile.ZipInfo(new_name, date_time=info.date_time), f.read())
+                    continue
+                data = zin.read(info)
+                if renames and name.endswith(".rels"):
+                    text = data.decode("utf-8")
+                    for old, new in renames.items():
+                        text = text.replace(f'"{old}"', f'"{new}"').replace(f'"/word/{old}"', f'"/word/{new}"')
+                    data = text.encode("utf-8")
+                elif name == _CONTENT_TYPES_PART:
+                    data = _ensure_default_content_types(data, extensions)
+                zout.writestr(info, data)
+        return output.getvalue()
+
+
+def _ensure_default_content_types(data: bytes, extensions: set) -> bytes:
+    """在 [Content_Types].xml 中补充缺少的扩展名默认类型"""
+    root = etree.fromstring(data)
+    existing = {(d.get("Extension") or "").lower() for d in root.iter(f"{{{_CT_NS}}}Default")}
+    missing = [ext for ext in sorted(extensions) if ext not in existing and ext in _IMAGE_CONTENT_TYPES]
+    if not missing:
+        return data
+    for extension in missing:
+        element = etree.Element(
+            f"{{{_CT_NS}}}Default", Extension=extension, ContentType=_IMAGE_CONTENT_TYPES[extension]
+        )
+        root.insert(0, element)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def resolve_local_image(src: str, search_dirs: Sequence[str]) -> Optional[str]:
+    """
+    把图片引用解析为本地文件路径（与 Pandoc 的 --resource-path 查找顺序一致）
+
+    远程 URL 与 data URI 返回 None；file:// URL 与绝对路径直接检查；
+    相对路径依次在 search_dirs 中查找。
+    """
+    if not src or src.startswith("data:"):
+        return None
+    parsed = urlparse(src)
+    if parsed.scheme == "file":
+        path = url2pathname(parsed.path)
+    elif parsed.scheme and len(parsed.scheme) > 1:
+        # 单字母的 scheme 是 Windows 盘符
+        return None
+    else:
+        path = unquote(src)
+    if os.path.isabs(path):
+        return path if os.path.isfile(path) else None
+    for directory in search_dirs:
+        candidate = os.path.join(directory, path)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def replace_markdown_image_targets(text: str, replace: Callable[[str], Optional[str]]) -> str:
+    """
+    替换 Markdown 中图片的目标（![..](目标) 与内嵌 <img src>），代码块内不处理
+
+    replace 返回 None 时保持原样。
+    """
+    def substitute(match: "re.Match[str]") -> str:
+        return match.group(1) + (replace(match.group(2)) or match.group(2))
+
+    lines = text.split("\n")
+    fence = ""
+    changed = False
+    for index, line in enumerate(lines):
+        stripped = line.lstrip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            if not fence:
+                fence = stripped[:3]
+            elif stripped.startswith(fence):
+                fence = ""
+            continue
+        if fence or ("![" not in line and "<img" not in line.lower()):
+            continue
+        new_line = _HTML_IMG_SRC_RE.sub(substitute, _MARKDOWN_IMAGE_RE.sub(substitute, line))
+        if new_line != line:
+            lines[index] = new_line
+            changed = True
+    return "\n".join(lines) if changed else text
+
+
+_default_optimizer: Optional[ImageOptimizer] = None
+_default_lock = threading.Lock()
+
+
+def get_image_optimizer() -> ImageOptimizer:
+    """进程内共享的 ImageOptimizer（进程池在第一次需要并行时创建）"""
+    global _default_optimizer
+    with _default_lock:
+        if _default_optimizer is None:
+            _default_optimizer = ImageOptimizer()
+        return _default_optimizer
+
+
+def image_optimization_settings(config: dict) -> dict:
+    """config["image_optimization"]（缺失或格式错误时为空字典）"""
+    settings = config.get("image_optimization")
+    return settings if isinstance(settings, dict) else {}
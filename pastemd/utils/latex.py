@@ -1,6 +1,10 @@
 """LaTeX formula conversion utilities."""
 
 import re
+from bisect import bisect_right
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Tuple
+
+from .md_pipeline import LineContext, LineStage, MarkdownLine, run_line_pipeline, track_code_fences
 
 
 def convert_latex_delimiters(text: str, fix_single_dollar_block: bool = True) -> str:
@@ -14,18 +18,25 @@ def convert_latex_delimiters(text: str, fix_single_dollar_block: bool = True) ->
     Returns:
         转换后的文本
     """
-    # 1. (弃用) 标准 LaTeX 分隔符转换（\[...\] -> $$...$$）
-    # 目前此功能被注释掉，若启用需解开 _convert_standard_latex_delimiters 内部注释
-    text = _convert_standard_latex_delimiters(text)
+    return run_line_pipeline(text, latex_line_stages(fix_single_dollar_block))
+
+
+def latex_line_stages(fix_single_dollar_block: bool = True) -> List[LineStage]:
+    """
+    返回 LaTeX 预处理的行流阶段，可与其他阶段串联在同一条流水线中
     
-    if fix_single_dollar_block:
-        # 2. 修复行内公式中 $ 两侧的多余空格 ($  L  $ -> $L$)
-        text = _fix_inline_math_spaces(text)
-        
-        # 3. 将单独一行的 $ ... $ 块级公式转换为 $$ ... $$
-        text = _fix_single_dollar_blocks(text)
-        
-    return text
+    Note:
+        (弃用) 标准 LaTeX 分隔符转换（\\[...\\] -> $$...$$）目前被注释掉，
+        不在流水线中；若启用需将 _convert_standard_latex_delimiters 改写为行流阶段
+    """
+    if not fix_single_dollar_block:
+        return []
+    return [
+        # 跳过代码块，然后按公式区间修复：
+        # 行内公式 $ 两侧的多余空格 ($  L  $ -> $L$)、单独一行的 $ 块公式 -> $$
+        track_code_fences,
+        fix_math_spans,
+    ]
 
 
 def _convert_standard_latex_delimiters(text: str) -> str:
@@ -51,72 +62,363 @@ def _convert_standard_latex_delimiters(text: str) -> str:
     return text
 
 
-def _fix_inline_math_spaces(text: str) -> str:
+MATH_INLINE = "inline"          # $...$
+MATH_DISPLAY = "display"        # $$...$$
+MATH_PAREN = "paren"            # \(...\)
+MATH_BRACKET = "bracket"        # \[...\]
+MATH_DOLLAR_BLOCK = "dollar_block"  # 单独一行的 $ 包围的块
+CODE_SPAN = "code"              # `...`
+CODE_FENCE = "fence"            # ``` / ~~~ 代码块
+
+# 公式内容：反斜杠转义或非 $ 字符（$$ 公式内允许单个 $）
+_INLINE_BODY = r"(?:\\.|[^$\\])*"
+_DISPLAY_BODY = r"(?:\\.|[^$\\]|\$(?!\$))*?"
+
+# 行内区间，从左到右、先出现者优先：
+# \(...\)、\[...\]（可延续到行尾）、反斜杠转义、行内代码、$$...$$（可延续到行尾）、$...$
+_SPAN_RE = re.compile(
+    r"\\\((?P<paren>.*?)\\\)"
+    r"|\\\[(?P<bracket>.*?)(?P<bracket_end>\\\]|$)"
+    r"|\\."
+    r"|(?<!`)(?P<ticks>`+)(?!`).*?(?<!`)(?P=ticks)(?!`)"
+    r"|\$\$(?P<display>" + _DISPLAY_BODY + r")(?P<display_end>\$\$|$)"
+    r"|\$(?P<math>" + _INLINE_BODY + r")\$"
+)
+
+# 不可能配对的 \( 的占位：与 \( 等长，仍被当作反斜杠转义消耗
+_UNPAIRED_PAREN = "\\\0"
+
+# 跨行区间在后续行中的结束位置
+_BLOCK_END_RE = {
+    MATH_DISPLAY: re.compile(_DISPLAY_BODY + r"\$\$"),
+    MATH_BRACKET: re.compile(r".*?\\\]"),
+}
+
+# Pandoc 不允许 $ 内侧出现的水平空白
+_HSPACE = (" ", "\t")
+
+
+class MathSpan(NamedTuple):
+    """扫描到的一个区间：[start, end) 为字符偏移（含定界符）"""
+    kind: str
+    start: int
+    end: int
+
+
+class MathSpanScanner:
     """
-    修复行内公式中 $ 后面的空格和 $ 前面的空格
-    
-    Pandoc tex_math_dollars 要求 $ 后不能有空格，$ 前不能有空格
-    例如：$  L  $ -> $L$
+    线性扫描公式与代码区间
+
+    按行调用 scan_line，每行由正则一次扫描得到全部区间，普通文本在 C 层跳过。
+    行内代码中的 $ 不构成公式，公式中的反引号也不构成代码；
+    $$ / \\[ / 单独一行的 $ 可以跨行但不能跨空行（与 Pandoc 一致），
+    $ / \\( / 行内代码只在单行内配对，未配对的定界符按普通文本处理。
+    """
+
+    def __init__(self) -> None:
+        # 跨行未闭合的区间类型与起始偏移
+        self.open_kind = ""
+        self.open_start = 0
+        # 区间打开后读到的行 (文本, 偏移)：区间在空行前未闭合时重新扫描
+        self._held: List[Tuple[str, int]] = []
+        # 重新扫描时已确定在空行前不会闭合的定界符类型
+        self._unclosed: FrozenSet[str] = frozenset()
+
+    @property
+    def in_block(self) -> bool:
+        """当前是否处于跨行的块级公式内"""
+        return bool(self.open_kind)
+
+    def is_dollar_delimiter(self, text: str) -> bool:
+        """该行是否为单独一行的 $（块公式分隔符）"""
+        if self.open_kind == MATH_DOLLAR_BLOCK:
+            return text.strip() == "$"
+        return not self.open_kind and MATH_DOLLAR_BLOCK not in self._unclosed and text.strip() == "$"
+
+    def scan_line(self, text: str, offset: int = 0) -> List[MathSpan]:
+        """
+        扫描一行（不含换行符）
+
+        Args:
+            text: 行文本
+            offset: 行首在全文中的偏移
+
+        Returns:
+            在本行结束的区间（跨行区间的 start 为起始行中的偏移）；
+            空行结束未闭合的区间时，还包括重新扫描此前各行得到的区间
+        """
+        kind = self.open_kind
+        if kind and not text.strip():
+            return self.close_open_block()
+
+        if self.is_dollar_delimiter(text):
+            if kind:
+                span = MathSpan(MATH_DOLLAR_BLOCK, self.open_start, offset + len(text))
+                self.open_kind = ""
+                self._held = []
+                return [span]
+            self._open(MATH_DOLLAR_BLOCK, offset + text.find("$"), text, offset)
+            return []
+        if kind == MATH_DOLLAR_BLOCK:
+            self._held.append((text, offset))
+            return []
+
+        spans: List[MathSpan] = []
+        pos = 0
+        if kind:
+            m = _BLOCK_END_RE[kind].match(text)
+            if m is None:
+                self._held.append((text, offset))
+                return spans
+            spans.append(MathSpan(kind, self.open_start, offset + m.end()))
+            self.open_kind = ""
+            self._held = []
+            pos = m.end()
+        self._scan_spans(text, offset, pos, spans)
+        return spans
+
+    def close_open_block(self) -> List[MathSpan]:
+        """
+        在空行、代码块或文末结束未闭合的跨行区间
+
+        起始定界符按普通文本处理，其后的内容重新扫描（其中同类的起始定界符同样不会闭合）。
+        每类定界符最多重新扫描一次，总代价仍为线性。
+
+        Returns:
+            重新扫描得到的区间
+        """
+        spans: List[MathSpan] = []
+        unclosed = set(self._unclosed)
+        while self.open_kind:
+            kind, start, held = self.open_kind, self.open_start, self._held
+            self.open_kind = ""
+            self._held = []
+            unclosed.add(kind)
+            self._unclosed = frozenset(unclosed)
+            text, offset = held[0]
+            if kind != MATH_DOLLAR_BLOCK:
+                # 跳过起始定界符（$$ 与 \[ 都是两个字符）
+                self._scan_spans(text, offset, start - offset + 2, spans)
+            for text, offset in held[1:]:
+                spans.extend(self.scan_line(text, offset))
+        self._unclosed = frozenset()
+        return spans
+
+    def _open(self, kind: str, start: int, text: str, offset: int) -> None:
+        self.open_kind = kind
+        self.open_start = start
+        self._held = [(text, offset)]
+
+    def _scan_spans(self, text: str, offset: int, pos: int, spans: List[MathSpan]) -> None:
+        """从 pos 起扫描一行中的区间追加到 spans；行尾未闭合的 $$ / \\[ 打开跨行区间"""
+        scan_text = _span_scan_text(text)
+        while True:
+            m = _SPAN_RE.search(scan_text, pos)
+            if m is None:
+                return
+            pos = m.end()
+            group = m.lastgroup
+            if group == "math":
+                kind = MATH_INLINE
+            elif group == "ticks":
+                kind = CODE_SPAN
+            elif group == "paren":
+                kind = MATH_PAREN
+            elif group in ("bracket_end", "display_end"):
+                kind = MATH_BRACKET if group == "bracket_end" else MATH_DISPLAY
+                if not m.group(group):
+                    if kind in self._unclosed:
+                        # 已确定不会闭合：定界符按普通文本处理
+                        pos = m.start() + 2
+                        continue
+                    # 行尾仍未闭合：延续到后续行
+                    self._open(kind, offset + m.start(), text, offset)
+                    return
+            else:
+                continue
+            spans.append(MathSpan(kind, offset + m.start(), offset + m.end()))
+
+
+def index_math_spans(text: str) -> List[MathSpan]:
     """
-    def fix_inline_spaces(match):
-        content = match.group(1)
-        return f"${content.strip()}$"
+    单次扫描全文，返回代码块、行内代码与各类公式区间（按结束位置排序）
 
-    # 匹配 $ + 空格 + 内容 + 空格 + $
-    # 排除 $$ 的情况
-    # 使用 [ \t]+ 仅匹配水平空白，避免误伤多行块级公式
-    return re.sub(r'(?<!\$)\$(?!\$)[ \t]+([^\n$]+?)[ \t]+(?<!\$)\$(?!\$)', fix_inline_spaces, text)
+    Args:
+        text: Markdown 文本
 
+    Returns:
+        MathSpan 列表；未闭合的定界符按普通文本处理
+    """
+    spans: List[MathSpan] = []
+    scanner = MathSpanScanner()
+    ctx = LineContext(text)
+    lines = (MarkdownLine(line) for line in text.split("\n"))
+    offset = 0
+    fence_start = -1
+    for line in track_code_fences(lines, ctx):
+        if line.in_code:
+            if scanner.in_block:
+                spans.extend(scanner.close_open_block())
+            if line.is_fence:
+                if fence_start < 0:
+                    fence_start = offset
+                else:
+                    spans.append(MathSpan(CODE_FENCE, fence_start, offset + len(line.text)))
+                    fence_start = -1
+        else:
+            spans.extend(scanner.scan_line(line.text, offset))
+        offset += len(line.text) + 1
+    spans.extend(scanner.close_open_block())
+    return spans
 
-def _fix_single_dollar_blocks(text: str) -> str:
+
+def fix_math_spans(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
     """
-    将单独一行的 $ ... $ 块级公式转换为 $$ ... $$
-    规则：如果某一行去除首尾空白后只有 $，则视为块公式的分隔符
-    注意要跳过代码块
+    按扫描到的区间修复公式，需在 track_code_fences 之后运行以跳过代码块
+
+    1. 行内公式 $ 两侧的多余空格：$  L  $ -> $L$
+       （Pandoc tex_math_dollars 要求 $ 后、$ 前不能有空格）
+    2. 单独一行的 $ ... $ 块级公式转换为 $$ ... $$，保留原有缩进
+
+    行内代码、块级公式与代码块中的内容不做修改；没有修改的行原样保留，
+    有修改的行只替换公式区间，其余部分按切片复制。跨行区间打开后的行暂存到
+    区间闭合或遇到空行为止：未闭合的起始定界符按普通文本处理，暂存的行按重新扫描的结果修复。
     """
-    lines = text.split('\n')
-    new_lines = []
-    in_code_block = False
-    code_fence_char = ""
-    in_dollar_block = False
-    
+    scanner = MathSpanScanner()
+    pending: List[Tuple[MarkdownLine, int]] = []
+    pending_spans: List[MathSpan] = []
+    offset = 0
     for line in lines:
-        stripped = line.strip()
-        
-        # 1. 代码块检测
-        if stripped.startswith('```') or stripped.startswith('~~~'):
-            fence = stripped[:3]
-            if not in_code_block:
-                in_code_block = True
-                code_fence_char = fence
-                new_lines.append(line)
+        text = line.text
+        line_offset = offset
+        offset += len(text) + 1
+        if pending and (line.in_code or not text.strip()):
+            pending_spans.extend(scanner.close_open_block())
+            yield from _flush_pending(pending, pending_spans)
+            ctx.in_math_block = False
+        if line.in_code:
+            yield line
+            continue
+
+        if not pending:
+            if "$" not in text and "\\" not in text:
+                yield line
                 continue
-            elif stripped.startswith(code_fence_char):
-                in_code_block = False
-                code_fence_char = ""
-                new_lines.append(line)
+            if "$$" not in text and "\\[" not in text and text.strip() != "$":
+                # 不会打开跨行区间的行：$ 内侧没有空白时无需修复
+                if "$ " in text or "$\t" in text:
+                    if "`" in text or "\\" in text:
+                        line.text = _fix_inline_spans(text)
+                    else:
+                        line.text = _fix_plain_line(text)
+                yield line
                 continue
-            
-        if in_code_block:
-            new_lines.append(line)
+
+        pending.append((line, line_offset))
+        pending_spans.extend(scanner.scan_line(text, line_offset))
+        ctx.in_math_block = scanner.in_block
+        if not scanner.in_block:
+            yield from _flush_pending(pending, pending_spans)
+
+    if pending:
+        pending_spans.extend(scanner.close_open_block())
+        ctx.in_math_block = False
+        yield from _flush_pending(pending, pending_spans)
+
+
+def _flush_pending(pending: List[Tuple[MarkdownLine, int]], spans: List[MathSpan]) -> Iterator[MarkdownLine]:
+    """按区间修复暂存的行并依次输出，然后清空 pending 与 spans"""
+    offsets = [line_offset for _, line_offset in pending]
+    inline: Dict[int, List[MathSpan]] = {}
+    # 跨行公式覆盖的行（差分数组）：$$ / \[ 公式与 $ 块公式分别统计
+    formula = [0] * (len(pending) + 1)
+    dollar_block = [0] * (len(pending) + 1)
+    for span in spans:
+        first = bisect_right(offsets, span.start) - 1
+        if span.kind == MATH_INLINE:
+            inline.setdefault(first, []).append(span)
             continue
-            
-        # 2. 单行 $ 检测
-        # 匹配仅包含 $ 的行（允许缩进）
-        if re.match(r'^\s*\$\s*$', line):
-            # 这是一个潜在的块公式分隔符
-            if not in_dollar_block:
-                # 块开始：替换为 $$
-                # 尽量保留原有的缩进
-                prefix = line[:line.find('$')]
-                new_lines.append(f"{prefix}$$")
-                in_dollar_block = True
-            else:
-                # 块结束：替换为 $$
-                prefix = line[:line.find('$')]
-                new_lines.append(f"{prefix}$$")
-                in_dollar_block = False
-        else:
-            new_lines.append(line)
-            
-    return '\n'.join(new_lines)
+        coverage = formula if span.kind in (MATH_DISPLAY, MATH_BRACKET) else dollar_block
+        if coverage is dollar_block and span.kind != MATH_DOLLAR_BLOCK:
+            continue
+        last = bisect_right(offsets, span.end - 1) - 1
+        if last > first:
+            coverage[first] += 1
+            coverage[last + 1] -= 1
+
+    in_formula = in_dollar_block = 0
+    for i, (line, line_offset) in enumerate(pending):
+        in_formula += formula[i]
+        in_dollar_block += dollar_block[i]
+        text = line.text
+        if not in_formula and text.strip() == "$":
+            # 块公式分隔行：$ -> $$（未闭合时同样转换，与逐行处理时一致）
+            line.text = f"{text[:text.find('$')]}$$"
+        elif i in inline:
+            line.text = _fix_inline_math(text, line_offset, inline[i])
+        line.in_math = bool(in_formula or in_dollar_block)
+        yield line
+    pending.clear()
+    spans.clear()
+
+
+def _fix_inline_math(text: str, offset: int, spans: List[MathSpan]) -> str:
+    """去掉一行中各行内公式 $ 内侧的空白（spans 为该行的 MATH_INLINE 区间）"""
+    pieces = []
+    last = 0
+    for span in spans:
+        start, end = span.start - offset, span.end - offset
+        content = text[start + 1:end - 1]
+        if content[:1] in _HSPACE and content[-1:] in _HSPACE and content.strip():
+            pieces.append(text[last:start])
+            pieces.append(f"${content.strip()}$")
+            last = end
+    if not pieces:
+        return text
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def _span_scan_text(text: str) -> str:
+    """
+    供 _SPAN_RE 扫描的文本（与原文等长，区间偏移不变）
+
+    最后一个 \\) 之后的 \\( 不可能配对，但正则仍会为每个这样的 \\( 向后扫描到行尾，
+    大量未配对的 \\( 使扫描退化为二次。这些 \\( 替换为占位后只按转义处理，结果不变。
+    匹配到的内容须按偏移从原文切片。
+    """
+    close = text.rfind("\\)")
+    cut = close + 2 if close >= 0 else 0
+    if text.find("\\(", cut) < 0:
+        return text
+    return text[:cut] + text[cut:].replace("\\(", _UNPAIRED_PAREN)
+
+
+def _fix_inline_spans(text: str) -> str:
+    """修复一行中 $ 内侧的空白（不会打开跨行区间的行）"""
+    pieces = []
+    last = 0
+    for m in _SPAN_RE.finditer(_span_scan_text(text)):
+        if m.lastgroup != "math":
+            continue
+        content = text[m.start("math"):m.end("math")]
+        if content[:1] in _HSPACE and content[-1:] in _HSPACE and content.strip():
+            pieces.append(text[last:m.start()])
+            pieces.append(f"${content.strip()}$")
+            last = m.end()
+    if not pieces:
+        return text
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def _fix_plain_line(text: str) -> str:
+    """没有反引号与反斜杠的行：按 $ 切分后从左到右两两配对，只替换公式内容"""
+    pieces = text.split("$")
+    changed = False
+    for i in range(1, len(pieces) - 1, 2):
+        content = pieces[i]
+        if content[:1] in _HSPACE and content[-1:] in _HSPACE and content.strip():
+            pieces[i] = content.strip()
+            changed = True
+    return "$".join(pieces) if changed else text
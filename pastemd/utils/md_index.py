@@ -0,0 +1,258 @@
+"""Single-pass Markdown block index.
+
+The index is built once per job and records the kind and position of
+headings, code fences, tables, math blocks, lists and raw HTML blocks, plus
+per-kind counts. Routing, file naming and conversion planning read from it
+instead of rescanning the text.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+BLOCK_HEADING = "heading"
+BLOCK_FENCE = "fence"
+BLOCK_TABLE = "table"
+BLOCK_MATH = "math"
+BLOCK_LIST = "list"
+BLOCK_HTML = "html"
+
+BLOCK_KINDS = (BLOCK_HEADING, BLOCK_FENCE, BLOCK_TABLE, BLOCK_MATH, BLOCK_LIST, BLOCK_HTML)
+
+# 与 extract_title_from_markdown 一致：行首去空白后 1~6 个 # 加空白
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)$")
+# 与 parse_markdown_table 一致的分隔行
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*[-:]+\s*(\|\s*[-:]+\s*)+\|?\s*$")
+_LIST_ITEM_RE = re.compile(r"^(?:[-*+]|\d+[.)])\s")
+_HTML_BLOCK_RE = re.compile(r"^(?:<!--|</?[A-Za-z][\w-]*(?:[\s/>]|$))")
+# 行内公式定界符：$$、\[、\(、以及单独的 $（成对计数）
+_INLINE_MATH_RE = re.compile(r"\$\$|\\\[|\\\(|(?<![\\$])\$(?!\$)")
+
+
+@dataclass(frozen=True)
+class MarkdownBlock:
+    """
+    索引中的一个块
+
+    Attributes:
+        kind: 块类型（BLOCK_* 常量）
+        start: 起始字符偏移
+        end: 结束字符偏移（不含，不包含末尾换行符）
+        line_start: 起始行号（从 0 开始）
+        line_end: 结束行号（不含）
+        level: 标题级别（仅标题）
+        text: 标题文本 / 代码块信息串
+    """
+    kind: str
+    start: int
+    end: int
+    line_start: int
+    line_end: int
+    level: int = 0
+    text: str = ""
+
+
+class MarkdownIndex:
+    """
+    Markdown 文本的块索引（只读）
+
+    Attributes:
+        text: 原始文本
+        lines: 按 \\n 切分的行
+        blocks: 按出现顺序排列的块
+        counts: 各类型块的数量
+        inline_math: 正文中的行内公式数量（按定界符成对估算）
+        first_content_line: 第一个非空行（去除首尾空白），没有则为空串
+        has_table_separator: 是否存在表格分隔行（表格解析的快速排除条件）
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines: List[str] = text.split("\n")
+        self.blocks: List[MarkdownBlock] = []
+        self.counts: Dict[str, int] = {kind: 0 for kind in BLOCK_KINDS}
+        self.inline_math = 0
+        self.first_content_line = ""
+        self.has_table_separator = False
+        self._derived: Dict[str, Any] = {}
+
+    def blocks_of(self, kind: str) -> List[MarkdownBlock]:
+        """返回某一类型的全部块"""
+        return [block for block in self.blocks if block.kind == kind]
+
+    @property
+    def headings(self) -> List[MarkdownBlock]:
+        return self.blocks_of(BLOCK_HEADING)
+
+    def derived(self, key: str, compute: Callable[["MarkdownIndex"], Any]) -> Any:
+        """
+        缓存基于索引计算的结果（如表格解析），同一作业内只计算一次
+
+        Args:
+            key: 缓存键
+            compute: (index) -> 结果
+        """
+        if key not in self._derived:
+            self._derived[key] = compute(self)
+        return self._derived[key]
+
+
+def _fence_marker(stripped: str) -> str:
+    if stripped.startswith("```") or stripped.startswith("~~~"):
+        return stripped[:3]
+    return ""
+
+
+def _math_block_closer(stripped: str) -> Optional[str]:
+    """块级公式的起始行返回对应的结束标记，单行公式返回空串，其他返回 None"""
+    if stripped == "$":
+        return "$"
+    if stripped.startswith("$$"):
+        rest = stripped[2:]
+        return "" if rest.rstrip().endswith("$$") else "$$"
+    if stripped.startswith("\\["):
+        return "" if stripped.endswith("\\]") and len(stripped) > 2 else "\\]"
+    return None
+
+
+def build_markdown_index(text: str) -> MarkdownIndex:
+    """
+    单次扫描构建块索引
+
+    代码块内的内容不参与其他块的识别；表格/列表/HTML 块为连续行，遇到空行结束。
+    公式块同样遇到空行结束，未闭合时不形成块（与 Pandoc 一致）。
+
+    Args:
+        text: Markdown 文本
+
+    Returns:
+        MarkdownIndex
+    """
+    index = MarkdownIndex(text)
+    blocks = index.blocks
+    counts = index.counts
+    lines = index.lines
+
+    offset = 0
+    # 当前连续块：(类型, 起始行, 起始偏移)
+    run_kind = ""
+    run_line = 0
+    run_start = 0
+    run_has_separator = False
+    # 多行块（代码块/公式块）的结束标记
+    fence = ""
+    math_closer = ""
+    open_line = 0
+    open_start = 0
+    fence_info = ""
+    inline_delimiters = 0
+    prev_end = 0
+
+    def close_run(line_no: int, end: int) -> None:
+        nonlocal run_kind
+        if run_kind and (run_kind != BLOCK_TABLE or run_has_separator):
+            blocks.append(MarkdownBlock(run_kind, run_start, end, run_line, line_no))
+            counts[run_kind] += 1
+        run_kind = ""
+
+    for line_no, line in enumerate(lines):
+        start = offset
+        end = offset + len(line)
+        offset = end + 1
+        stripped = line.strip()
+
+        if stripped and not index.first_content_line:
+            index.first_content_line = stripped
+        if not index.has_table_separator and "|" in stripped and "-" in stripped:
+            if TABLE_SEPARATOR_RE.match(stripped):
+                index.has_table_separator = True
+
+        # 多行块内部
+        if fence:
+            if stripped.startswith(fence):
+                blocks.append(MarkdownBlock(BLOCK_FENCE, open_start, end, open_line, line_no + 1, text=fence_info))
+                counts[BLOCK_FENCE] += 1
+                fence = ""
+            prev_end = end
+            continue
+        if math_closer:
+            if not stripped:
+                # 与 Pandoc 一致：公式块不能跨空行，未闭合的定界符按普通文本处理
+                math_closer = ""
+            else:
+                if stripped.endswith(math_closer) and (line_no > open_line):
+                    blocks.append(MarkdownBlock(BLOCK_MATH, open_start, end, open_line, line_no + 1))
+                    counts[BLOCK_MATH] += 1
+                    math_closer = ""
+                prev_end = end
+                continue
+
+        if not stripped:
+            close_run(line_no, prev_end)
+            prev_end = end
+            continue
+
+        marker = _fence_marker(stripped)
+        if marker:
+            close_run(line_no, prev_end)
+            fence, fence_info = marker, stripped[3:].strip()
+            open_line, open_start = line_no, start
+            prev_end = end
+            continue
+
+        closer = _math_block_closer(stripped)
+        if closer is not None:
+            close_run(line_no, prev_end)
+            if closer:
+                math_closer = closer
+                open_line, open_start = line_no, start
+            else:
+                blocks.append(MarkdownBlock(BLOCK_MATH, start, end, line_no, line_no + 1))
+                counts[BLOCK_MATH] += 1
+            prev_end = end
+            continue
+
+        heading = _HEADING_RE.match(stripped) if stripped[0] == "#" else None
+        if heading:
+            close_run(line_no, prev_end)
+            blocks.append(MarkdownBlock(
+                BLOCK_HEADING, start, end, line_no, line_no + 1,
+                level=len(heading.group(1)), text=heading.group(2).strip(),
+            ))
+            counts[BLOCK_HEADING] += 1
+            prev_end = end
+            continue
+
+        if "|" in stripped:
+            kind = BLOCK_TABLE
+        elif _LIST_ITEM_RE.match(stripped) or (run_kind == BLOCK_LIST and line[:1] in (" ", "\t")):
+            kind = BLOCK_LIST
+        elif stripped[0] == "<" and _HTML_BLOCK_RE.match(stripped):
+            kind = BLOCK_HTML
+        elif run_kind == BLOCK_HTML:
+            kind = BLOCK_HTML
+        else:
+            kind = ""
+
+        if kind != run_kind:
+            close_run(line_no, prev_end)
+            if kind:
+                run_kind, run_line, run_start = kind, line_no, start
+                run_has_separator = False
+        if kind == BLOCK_TABLE and line_no > run_line and TABLE_SEPARATOR_RE.match(stripped):
+            run_has_separator = True
+
+        if "$" in line or "\\" in line:
+            inline_delimiters += len(_INLINE_MATH_RE.findall(line))
+        prev_end = end
+
+    close_run(len(lines), prev_end)
+    # 未闭合的代码块延伸到文末；未闭合的公式块不计入
+    if fence:
+        blocks.append(MarkdownBlock(BLOCK_FENCE, open_start, prev_end, open_line, len(lines), text=fence_info))
+        counts[BLOCK_FENCE] += 1
+
+    index.inline_math = inline_delimiters // 2
+    return index
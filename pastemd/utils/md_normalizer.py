@@ -1,6 +1,26 @@
 """Markdown 格式规范化工具 - 处理不同来源的 Markdown 格式差异"""
 
 import re
+from typing import Iterator
+
+from .md_pipeline import (
+    LineContext,
+    MarkdownLine,
+    collapse_blank_lines,
+    run_line_pipeline,
+    split_carriage_returns,
+)
+
+# 行类型分类，按优先级排列：代码块边界、标题、表格、分隔线、列表、引用
+# 分组名即行类型；均不匹配时为 text
+_LINE_TYPE_RE = re.compile(
+    r'(?P<code>```)'
+    r'|(?P<heading>#{1,6}\s)'
+    r'|(?P<table>\|(?:.*\|)?$)'
+    r'|(?P<hr>\s*[-*_]{3,}\s*$)'
+    r'|(?P<list>[-*+]\s|\d+\.\s)'
+    r'|(?P<quote>>)'
+)
 
 
 def normalize_markdown(md_text: str) -> str:
@@ -19,96 +39,69 @@ def normalize_markdown(md_text: str) -> str:
     Returns:
         规范化后的 Markdown 文本
     """
-    # 统一换行符为 \n
-    text = md_text.replace('\r\n', '\n').replace('\r', '\n')
-    lines = text.split('\n')
+    return run_line_pipeline(md_text, NORMALIZE_STAGES)
+
+
+def normalize_lines(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+    """
+    规范化阶段（行流版本）：在块级元素前后补空行
+
+    需要先经过 split_carriage_returns，之后接 collapse_blank_lines；
+    输入为 CRLF 时拼接结果恢复为 CRLF。
+
+    Note:
+        代码块状态沿用原有规则（行首 ``` 切换），与 track_code_fences 的规则不同，
+        以保证输出与历史版本逐字节一致。
+    """
+    if '\r\n' in ctx.source:
+        ctx.newline = '\r\n'
     
-    result = []
     in_code_block = False
-    in_table = False
     prev_line_type = 'start'  # start, empty, text, heading, code, table, list, quote, hr
+    last_text = ''  # 最近输出的一行，用于判断前面是否已有空行
+    blank_after = False  # 上一行后是否需要空行（下一行非空时）
     
-    for i, line in enumerate(lines):
-        current_type = _get_line_type(line, in_code_block, in_table)
-        
-        # 代码块状态切换
-        if line.startswith('```'):
-            in_code_block = not in_code_block
+    for line in lines:
+        text = line.text
+        is_blank = not text.strip()
         
-        # 表格状态检测
-        if current_type == 'table':
-            in_table = True
-        elif in_table and current_type not in ('table', 'empty'):
-            in_table = False
+        # 上一行后的空行
+        if blank_after and not is_blank:
+            yield MarkdownLine('')
+            last_text = ''
         
-        # 决定是否需要在当前行前添加空行
-        need_blank_before = _should_add_blank_line(prev_line_type, current_type)
-        
-        if need_blank_before and result and result[-1].strip():
-            result.append('')
+        current_type = 'empty' if is_blank else _get_line_type(text, in_code_block)
         
-        result.append(line)
+        # 代码块状态切换（增量维护，无需回看之前的行）
+        is_fence = text.startswith('```')
+        if is_fence:
+            in_code_block = not in_code_block
         
-        # 决定是否需要在当前行后添加空行
-        need_blank_after = _should_add_blank_after(current_type, i, lines)
+        # 决定是否需要在当前行前添加空行
+        if _should_add_blank_line(prev_line_type, current_type) and last_text.strip():
+            yield MarkdownLine('')
         
-        if need_blank_after and i + 1 < len(lines) and lines[i + 1].strip():
-            result.append('')
+        yield line
+        last_text = text
         
-        # 更新前一行类型
-        prev_line_type = current_type if line.strip() else 'empty'
-    
-    text = '\n'.join(result)
-    
-    # 清理多余的连续空行（超过2个连续换行符压缩为2个）
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # 恢复原始换行符风格
-    if '\r\n' in md_text:
-        text = text.replace('\n', '\r\n')
-    
-    return text
+        blank_after = _should_add_blank_after(current_type, is_fence and in_code_block)
+        prev_line_type = current_type
 
 
-def _get_line_type(line: str, in_code_block: bool, in_table: bool) -> str:
-    """判断行的类型"""
-    stripped = line.strip()
-    
-    if not stripped:
+# 完整的规范化流程：统一换行 + 补空行 + 压缩多余空行
+NORMALIZE_STAGES = (split_carriage_returns, normalize_lines, collapse_blank_lines)
+
+
+def _get_line_type(line: str, in_code_block: bool) -> str:
+    """判断行的类型（一次组合正则匹配完成分类）"""
+    if not line.strip():
         return 'empty'
     
     if in_code_block:
         return 'code'
     
-    # 代码块边界
-    if line.startswith('```'):
-        return 'code'
-    
-    # 标题
-    if re.match(r'^#{1,6}\s+', line):
-        return 'heading'
-    
-    # 表格
-    if line.startswith('|') and line.endswith('|'):
-        return 'table'
-    
-    # 分隔线
-    if re.match(r'^[-*_]{3,}$', stripped):
-        return 'hr'
-    
-    # 列表（无序）
-    if re.match(r'^[-*+]\s', line):
-        return 'list'
-    
-    # 列表（有序）
-    if re.match(r'^\d+\.\s', line):
-        return 'list'
-    
-    # 引用
-    if line.startswith('>'):
-        return 'quote'
-    
-    return 'text'
+    match = _LINE_TYPE_RE.match(line)
+    return match.lastgroup if match else 'text'
 
 
 def _should_add_blank_line(prev_type: str, current_type: str) -> bool:
@@ -121,62 +114,25 @@ def _should_add_blank_line(prev_type: str, current_type: str) -> bool:
     if current_type == 'empty':
         return False
     
-    # 标题前需要空行（除非前面是标题）
-    if current_type == 'heading':
-        return prev_type not in ('heading',)
-    
-    # 代码块前需要空行
-    if current_type == 'code' and prev_type != 'code':
-        return True
-    
-    # 表格前需要空行
-    if current_type == 'table' and prev_type not in ('table',):
-        return True
-    
-    # 列表前需要空行（除非前面是列表）
-    if current_type == 'list' and prev_type not in ('list',):
-        return True
-    
-    # 引用前需要空行
-    if current_type == 'quote' and prev_type not in ('quote',):
-        return True
+    # 标题、表格、列表、引用前需要空行（除非前一行是同类型）
+    if current_type in ('heading', 'code', 'table', 'list', 'quote'):
+        return prev_type != current_type
     
     # 分隔线前需要空行
-    if current_type == 'hr':
-        return True
-    
-    return False
+    return current_type == 'hr'
 
 
-def _should_add_blank_after(current_type: str, index: int, lines: list) -> bool:
-    """判断当前行后是否需要空行"""
-    # 最后一行不需要
-    if index >= len(lines) - 1:
-        return False
-    
-    next_line = lines[index + 1].strip()
-    
-    # 下一行已经是空行，不需要
-    if not next_line:
-        return False
-    
-    # 标题后需要空行
-    if current_type == 'heading':
-        return True
-    
-    # 代码块结束后需要空行
-    if current_type == 'code' and lines[index].startswith('```'):
-        # 检查是结束标记
-        in_code = False
-        for i in range(index):
-            if lines[i].startswith('```'):
-                in_code = not in_code
-        if not in_code:  # 结束标记
-            return True
+def _should_add_blank_after(current_type: str, opens_code_block: bool) -> bool:
+    """
+    判断当前行后是否需要空行（调用方保证下一行非空）
     
-    # 分隔线后需要空行
-    if current_type == 'hr':
+    Args:
+        current_type: 当前行类型
+        opens_code_block: 当前行是否为打开代码块的 ``` 行
+    """
+    # 标题、分隔线后需要空行
+    if current_type in ('heading', 'hr'):
         return True
     
-    return False
-
+    # 代码块边界：沿用原有行为，在打开代码块的 ``` 行后添加空行
+    return current_type == 'code' and opens_code_block
@@ -0,0 +1,148 @@
+"""Line-stream pipeline for Markdown preprocessing.
+
+The text is split into lines once, every stage is a generator that consumes
+and yields lines, and the result is joined once at the end. Stages share
+per-document state through the pipeline context and per-line tags, so
+adding a stage does not add another full pass over the document.
+"""
+
+from typing import Callable, Iterable, Iterator, List
+
+
+class MarkdownLine:
+    """
+    流水线中的一行
+
+    Attributes:
+        text: 行文本（不含换行符）
+        in_code: 是否位于代码块内（含 ``` / ~~~ 边界行），由 track_code_fences 标记
+        is_fence: 是否为代码块边界行
+        in_math: 是否位于块级公式内（含分隔行），由公式相关阶段标记
+    """
+
+    __slots__ = ("text", "in_code", "is_fence", "in_math")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.in_code = False
+        self.is_fence = False
+        self.in_math = False
+
+
+class LineContext:
+    """
+    一次流水线运行的共享状态
+
+    Attributes:
+        source: 原始文本
+        newline: 最终拼接使用的换行符
+        in_code: 当前是否处于代码块内
+        code_fence: 当前代码块的围栏标记（``` 或 ~~~）
+        in_math_block: 当前是否处于块级公式内
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.newline = "\n"
+        self.in_code = False
+        self.code_fence = ""
+        self.in_math_block = False
+
+
+LineStage = Callable[[Iterator[MarkdownLine], LineContext], Iterator[MarkdownLine]]
+
+
+def run_line_pipeline(text: str, stages: Iterable[LineStage]) -> str:
+    """
+    按顺序串联各阶段处理文本：只切分一次、只拼接一次
+
+    Args:
+        text: 原始文本（按 \\n 切分，\\r 的处理由各阶段自行决定）
+        stages: 阶段列表，每个阶段是 (lines, ctx) -> lines 的生成器函数
+
+    Returns:
+        处理后的文本
+    """
+    stages = list(stages)
+    if not stages:
+        return text
+
+    ctx = LineContext(text)
+    lines: Iterator[MarkdownLine] = (MarkdownLine(line) for line in text.split("\n"))
+    for stage in stages:
+        lines = stage(lines, ctx)
+    # 先消费完所有行，再读取 ctx.newline（可能由阶段在运行中设置）
+    texts: List[str] = [line.text for line in lines]
+    return ctx.newline.join(texts)
+
+
+def track_code_fences(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+    """
+    标记代码块：以 ``` 或 ~~~ 开头（允许缩进）的行打开代码块，
+    以相同标记开头的行关闭代码块
+    """
+    for line in lines:
+        stripped = line.text.strip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            if not ctx.in_code:
+                ctx.in_code = True
+                ctx.code_fence = stripped[:3]
+                line.is_fence = True
+            elif stripped.startswith(ctx.code_fence):
+                ctx.in_code = False
+                ctx.code_fence = ""
+                line.is_fence = True
+        line.in_code = ctx.in_code or line.is_fence
+        yield line
+
+
+def collapse_blank_lines(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+    """
+    压缩连续空行，与对拼接结果执行 re.sub(r'\\n{3,}', '\\n\\n') 等价
+
+    正文之间最多保留 1 个空行；文档开头/结尾最多保留 2 个空行。
+    """
+    pending: List[MarkdownLine] = []
+    seen_content = False
+    for line in lines:
+        if line.text == "":
+            pending.append(line)
+            continue
+        keep = 1 if seen_content else 2
+        yield from pending[:keep]
+        pending.clear()
+        seen_content = True
+        yield line
+
+    # 结尾空行；整篇都是空行时最多保留 3 行（即 2 个换行符）
+    yield from pending[:2 if seen_content else 3]
+
+
+def split_carriage_returns(lines: Iterator[MarkdownLine], ctx: LineContext) -> Iterator[MarkdownLine]:
+    """
+    将 \r\n 与单独的 \r 视为换行（配合按 \n 的切分）
+
+    行尾的 \r 只有在其后还有 \n（即不是最后一行）时才属于 \r\n。
+    """
+    if "\r" not in ctx.source:
+        yield from lines
+        return
+
+    previous = None
+    for line in lines:
+        if previous is not None:
+            yield from _split_line_on_cr(previous, followed_by_newline=True)
+        previous = line
+    if previous is not None:
+        yield from _split_line_on_cr(previous, followed_by_newline=False)
+
+
+def _split_line_on_cr(line: MarkdownLine, followed_by_newline: bool) -> Iterator[MarkdownLine]:
+    text = line.text
+    if "\r" not in text:
+        yield line
+        return
+    if followed_by_newline and text.endswith("\r"):
+        text = text[:-1]
+    for piece in text.split("\r"):
+        yield MarkdownLine(piece)
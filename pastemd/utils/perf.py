@@ -0,0 +1,84 @@
+"""Lightweight instrumentation for per-stage timing and size accounting."""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .logging import log
+
+
+@dataclass
+class StageSample:
+    """
+    一次阶段执行的测量结果（大小按字符计）
+
+    大小为 None 表示无法单独测量（如在同一棵树上执行的 HTML 阶段），不计入累计大小。
+    """
+    category: str
+    name: str
+    elapsed_ms: float = 0.0
+    size_in: Optional[int] = None
+    size_out: Optional[int] = None
+    skipped: bool = False
+
+    def describe(self) -> str:
+        if self.skipped:
+            return f"{self.name} skipped"
+        if self.size_in is None and self.size_out is None:
+            return f"{self.name} {self.elapsed_ms:.1f}ms"
+        return f"{self.name} {self.elapsed_ms:.1f}ms ({self.size_in}->{self.size_out})"
+
+
+@dataclass
+class StageStats:
+    """阶段的累计统计"""
+    runs: int = 0
+    skips: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    size_in: int = 0
+    size_out: int = 0
+
+
+_lock = threading.Lock()
+_stats: Dict[str, StageStats] = {}
+
+
+def record_stage(sample: StageSample) -> None:
+    """记录一次阶段执行（跳过的阶段只计数）"""
+    key = f"{sample.category}.{sample.name}"
+    with _lock:
+        stats = _stats.setdefault(key, StageStats())
+        if sample.skipped:
+            stats.skips += 1
+            return
+        stats.runs += 1
+        stats.total_ms += sample.elapsed_ms
+        stats.max_ms = max(stats.max_ms, sample.elapsed_ms)
+        stats.size_in += sample.size_in or 0
+        stats.size_out += sample.size_out or 0
+
+
+def report_stages(category: str, samples: List[StageSample], total_ms: Optional[float] = None) -> None:
+    """记录一组阶段并输出一行汇总日志"""
+    for sample in samples:
+        record_stage(sample)
+    if not samples:
+        return
+    summary = ", ".join(sample.describe() for sample in samples)
+    total = f" total {total_ms:.1f}ms;" if total_ms is not None else ""
+    log(f"Perf [{category}]{total} {summary}")
+
+
+def get_stage_stats() -> Dict[str, StageStats]:
+    """返回累计统计的快照，键为 "类别.阶段名" """
+    with _lock:
+        return {key: StageStats(**vars(stats)) for key, stats in _stats.items()}
+
+
+def reset_stage_stats() -> None:
+    """清空累计统计"""
+    with _lock:
+        _stats.clear()
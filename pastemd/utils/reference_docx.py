@@ -0,0 +1,300 @@
+"""Slimmed, content-addressed copies of the Pandoc reference DOCX.
+
+Pandoc only needs the style-related parts of ``--reference-doc`` (styles,
+numbering, theme, settings, font table, footnote separators, and the final
+section properties with their headers/footers). Corporate templates often
+carry embedded fonts, body content, logos and thumbnails as well, which pandoc
+re-reads and copies into every output. This module builds, once per template
+content hash, a derivative that keeps only what pandoc uses.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import posixpath
+import threading
+import zipfile
+from typing import Dict, Optional, Set, Tuple
+
+from lxml import etree
+
+from ..config.paths import get_cache_dir
+from .logging import log
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+# 文档级关系中始终保留的类型（按 Type URI 末段匹配）
+_KEEP_DOCUMENT_REL_TYPES = {
+    "styles",
+    "stylesWithEffects",
+    "numbering",
+    "theme",
+    "settings",
+    "webSettings",
+    "fontTable",
+    "footnotes",
+    "endnotes",
+}
+
+# 包级关系中保留的类型（丢弃缩略图等）
+_KEEP_PACKAGE_REL_TYPES = {
+    "officeDocument",
+    "core-properties",
+    "extended-properties",
+    "custom-properties",
+}
+
+# 字体表与设置中与嵌入字体相关的元素
+_FONT_EMBED_TAGS = {
+    f"{{{W_NS}}}embedRegular",
+    f"{{{W_NS}}}embedBold",
+    f"{{{W_NS}}}embedItalic",
+    f"{{{W_NS}}}embedBoldItalic",
+}
+_SETTINGS_DROP_TAGS = {
+    f"{{{W_NS}}}embedTrueTypeFonts",
+    f"{{{W_NS}}}embedSystemFonts",
+    f"{{{W_NS}}}saveSubsetFonts",
+}
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _rel_type_suffix(rel) -> str:
+    return (rel.get("Type") or "").rsplit("/", 1)[-1]
+
+
+def _rels_path_for(part_name: str) -> str:
+    """word/document.xml -> word/_rels/document.xml.rels"""
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def _resolve_target(source_part: str, target: str) -> str:
+    """将关系 Target 解析为包内部件名"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def _serialize(root) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _slim_document_xml(xml_bytes: bytes) -> Tuple[bytes, Set[str]]:
+    """
+    只保留 body 末尾的 sectPr（及页面背景），返回 (新 XML, 引用到的关系 ID)
+    """
+    root = etree.fromstring(xml_bytes)
+    body = root.find(f"{{{W_NS}}}body")
+    referenced: Set[str] = set()
+    if body is None:
+        return xml_bytes, referenced
+
+    sect_pr = None
+    for child in reversed(body):
+        if child.tag == f"{{{W_NS}}}sectPr":
+            sect_pr = child
+            break
+
+    for child in list(body):
+        if child is not sect_pr:
+            body.remove(child)
+
+    for elem in root.iter():
+        for attr, value in elem.attrib.items():
+            if attr.startswith(f"{{{R_NS}}}"):
+                referenced.add(value)
+
+    return _serialize(root), referenced
+
+
+def _filter_rels(xml_bytes: bytes, keep) -> Tuple[bytes, Dict[str, str]]:
+    """
+    按 keep(rel) 过滤关系文件，返回 (新 XML, {Id: Target})（仅内部关系）
+    """
+    root = etree.fromstring(xml_bytes)
+    kept: Dict[str, str] = {}
+    for rel in list(root):
+        if not keep(rel):
+            root.remove(rel)
+            continue
+        if rel.get("TargetMode") != "External":
+            kept[rel.get("Id", "")] = rel.get("Target", "")
+    return _serialize(root), kept
+
+
+def _strip_elements(xml_bytes: bytes, tags: Set[str]) -> bytes:
+    root = etree.fromstring(xml_bytes)
+    removed = False
+    for elem in list(root.iter(*tags)):
+        elem.getparent().remove(elem)
+        removed = True
+    return _serialize(root) if removed else xml_bytes
+
+
+def slim_reference_docx(src_path: str, dst_path: str) -> None:
+    """
+    生成精简版参考文档
+
+    保留：样式、编号、主题、设置、字体表（去除嵌入字体）、脚注/尾注分隔符、
+    最后一个 sectPr 及其引用的页眉页脚（连同页眉页脚里的图片）、文档属性。
+    丢弃：正文内容、嵌入字体、正文图片、缩略图、customXml、词汇表等。
+
+    Args:
+        src_path: 原始参考文档路径
+        dst_path: 精简文档输出路径
+
+    Raises:
+        Exception: 源文件不是有效 DOCX 时（由调用方决定是否回退）
+    """
+    with zipfile.ZipFile(src_path) as zin:
+        names = set(zin.namelist())
+        output: Dict[str, bytes] = {}
+
+        # 1. 包级关系：丢弃缩略图等
+        pkg_rels, pkg_targets = _filter_rels(
+            zin.read("_rels/.rels"),
+            lambda rel: _rel_type_suffix(rel) in _KEEP_PACKAGE_REL_TYPES,
+        )
+        output["_rels/.rels"] = pkg_rels
+
+        main_part = "word/document.xml"
+        for target in pkg_targets.values():
+            part = _resolve_target("", target)
+            if part.endswith("document.xml"):
+                main_part = part
+            elif part in names:
+                output[part] = zin.read(part)
+
+        # 2. 主文档：只保留 sectPr
+        document_xml, referenced_ids = _slim_document_xml(zin.read(main_part))
+        output[main_part] = document_xml
+
+        # 3. 从主文档出发，保留样式类部件和 sectPr 引用的部件（递归其关系）
+        pending = [main_part]
+        visited: Set[str] = set()
+        while pending:
+            part = pending.pop()
+            if part in visited:
+                continue
+            visited.add(part)
+
+            rels_path = _rels_path_for(part)
+            if rels_path not in names:
+                continue
+
+            if part == main_part:
+                def keep(rel, _ids=referenced_ids):
+                    return (
+                        _rel_type_suffix(rel) in _KEEP_DOCUMENT_REL_TYPES
+                        or rel.get("Id") in _ids
+                    )
+            elif part.endswith("fontTable.xml"):
+                def keep(rel):
+                    return _rel_type_suffix(rel) != "font"
+            else:
+                def keep(rel):
+                    return True
+
+            rels_xml, targets = _filter_rels(zin.read(rels_path), keep)
+            output[rels_path] = rels_xml
+
+            for target in targets.values():
+                target_part = _resolve_target(part, target)
+                if target_part not in names or target_part in output:
+                    continue
+                data = zin.read(target_part)
+                if target_part.endswith("fontTable.xml"):
+                    data = _strip_elements(data, _FONT_EMBED_TAGS)
+                elif target_part.endswith("settings.xml"):
+                    data = _strip_elements(data, _SETTINGS_DROP_TAGS)
+                output[target_part] = data
+                pending.append(target_part)
+
+        # 4. 内容类型：删除已丢弃部件的 Override
+        ct_root = etree.fromstring(zin.read("[Content_Types].xml"))
+        for override in list(ct_root.iter(f"{{{CT_NS}}}Override")):
+            part_name = (override.get("PartName") or "").lstrip("/")
+            if part_name not in output:
+                ct_root.remove(override)
+        output["[Content_Types].xml"] = _serialize(ct_root)
+
+    tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+        # [Content_Types].xml 习惯上放在第一个
+        zout.writestr("[Content_Types].xml", output.pop("[Content_Types].xml"))
+        for name, data in output.items():
+            zout.writestr(name, data)
+    os.replace(tmp_path, dst_path)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReferenceDocxCache:
+    """
+    精简参考文档缓存
+
+    以模板内容的 SHA-256 为键缓存精简文档；进程内再以 (路径, mtime, 大小)
+    记忆哈希结果，模板未变化时每次粘贴只需一次 stat。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self._cache_dir = cache_dir
+        self._memo: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = get_cache_dir("reference_docx")
+        else:
+            os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    def resolve(self, reference_docx: Optional[str]) -> Optional[str]:
+        """
+        返回应传给 Pandoc 的 --reference-doc 路径
+
+        精简失败（文件不存在、不是有效 DOCX 等）时返回原路径，由 Pandoc 照常处理或报错。
+        """
+        if not reference_docx:
+            return reference_docx
+
+        path = os.path.expandvars(reference_docx)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return reference_docx
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            memo = self._memo.get(path)
+            if memo and memo[0] == signature and (memo[1] == reference_docx or os.path.isfile(memo[1])):
+                return memo[1]
+
+            try:
+                digest = _hash_file(path)
+                slim_path = os.path.join(self.cache_dir, f"{digest}.docx")
+                if not os.path.isfile(slim_path):
+                    slim_reference_docx(path, slim_path)
+                    log(
+                        f"Built slim reference docx: {path} ({stat.st_size} bytes) -> "
+                        f"{slim_path} ({os.path.getsize(slim_path)} bytes)"
+                    )
+            except Exception as e:
+                log(f"Failed to slim reference docx, using original: {type(e).__name__}: {e}")
+                # 记住失败结果，模板未修改前不再重复尝试
+                slim_path = reference_docx
+
+            self._memo[path] = (signature, slim_path)
+            return slim_path
@@ -0,0 +1,51 @@
+"""Tests for blob store cleanup."""
+
+import os
+import time
+
+from pastemd.utils.blob_store import BlobStore
+
+
+def _put(store, name, size, age_s):
+    path = store.put_bytes(name, b"x" * size)
+    mtime = time.time() - age_s
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_size_eviction_removes_oldest(tmp_path):
+    store = BlobStore(str(tmp_path))
+    old = _put(store, "old.png", 600 * 1024, 3 * 3600)
+    older = _put(store, "older.png", 600 * 1024, 4 * 3600)
+    assert store.cleanup(max_age_days=7, max_total_mb=1) == 1
+    assert os.path.exists(old)
+    assert not os.path.exists(older)
+
+
+def test_size_eviction_keeps_recent_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    # 刚写入（本次转换）与刚使用过（并发转换）的文件即使超出上限也保留
+    just_written = store.put_bytes("new.png", b"x" * (2 * 1024 * 1024))
+    in_use = _put(store, "in_use.png", 1024 * 1024, 2 * 3600)
+    assert store.get("in_use.png") == in_use
+    stale = _put(store, "stale.png", 1024, 2 * 3600)
+
+    store.cleanup(max_age_days=7, max_total_mb=1)
+    assert os.path.exists(just_written)
+    assert os.path.exists(in_use)
+    assert not os.path.exists(stale)
+
+
+def test_age_expiry_still_applies(tmp_path):
+    store = BlobStore(str(tmp_path))
+    expired = _put(store, "expired.png", 10, 8 * 86400)
+    assert store.cleanup(max_age_days=7, max_total_mb=512) == 1
+    assert not os.path.exists(expired)
+
+
+def test_data_uri_round_trip(tmp_path):
+    store = BlobStore(str(tmp_path))
+    name = store.put_data_uri("data:image/png;base64,aGVsbG8=")
+    assert name.endswith(".png")
+    with open(store.path(name), "rb") as f:
+        assert f.read() == b"hello"
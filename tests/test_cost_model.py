@@ -0,0 +1,56 @@
+"""Tests for the conversion cost model's degradation planning."""
+
+from pastemd.service.document.cost_model import (
+    DEGRADE_SKIP_HIGHLIGHT,
+    FEATURE_NAMES,
+    ConversionCostModel,
+    ConversionPlan,
+)
+
+_HIGHLIGHT = FEATURE_NAMES.index("highlight")
+
+
+def _features(size_kb, code_blocks, highlight=True):
+    return [1.0, size_kb, 0.0, 0.0, float(code_blocks), 1.0, 1.0 if highlight else 0.0]
+
+
+def _train(model, samples, highlight=True):
+    for i in range(samples):
+        size_kb = 50 + 10 * i
+        plan = ConversionPlan(features=_features(size_kb, code_blocks=i % 4), highlight=highlight)
+        # 高亮每次固定多花 200ms
+        model.record(plan, 500 + 4 * size_kb + (200 if highlight else 0), None)
+
+
+def test_no_highlight_degradation_before_it_is_observed(tmp_path):
+    model = ConversionCostModel(str(tmp_path / "model.json"))
+    _train(model, 20)
+    # 曾因岭回归把常数项分给高亮特征，凭空预测出约 180ms 的节省并关闭高亮
+    plan = model.plan(_features(100, code_blocks=3), target_ms=950, min_samples=5, allow_postprocess_skip=False)
+    assert plan.predicted_ms is not None
+    assert plan.degradations == []
+    assert plan.highlight
+
+
+def test_highlight_degradation_after_both_values_observed(tmp_path):
+    model = ConversionCostModel(str(tmp_path / "model.json"))
+    _train(model, 20)
+    _train(model, 5, highlight=False)
+    plan = model.plan(_features(100, code_blocks=3), target_ms=950, min_samples=5, allow_postprocess_skip=False)
+    assert plan.degradations == [DEGRADE_SKIP_HIGHLIGHT]
+    assert not plan.highlight
+    assert abs(plan.predicted_ms - 900) < 20
+
+
+def test_observation_counts_survive_reload(tmp_path):
+    path = str(tmp_path / "model.json")
+    model = ConversionCostModel(path)
+    _train(model, 6)
+    _train(model, 5, highlight=False)
+    model.flush()
+
+    reloaded = ConversionCostModel(path)
+    reloaded._ensure_loaded()
+    assert reloaded._pandoc.samples == 11
+    assert reloaded._pandoc.zero_samples[_HIGHLIGHT] == 5
+    assert reloaded._pandoc.identified(_HIGHLIGHT, 5)
@@ -0,0 +1,45 @@
+"""Tests for hotkey debouncing and the exclusive run used by explicit actions."""
+
+import threading
+import time
+
+from pastemd.core.state import app_state
+from pastemd.service.hotkey.debounce import DebounceManager
+
+
+def _wait_idle(timeout=2.0):
+    deadline = time.time() + timeout
+    while app_state.is_running() and time.time() < deadline:
+        time.sleep(0.01)
+    assert not app_state.is_running()
+
+
+def test_run_exclusive_ignores_debounce_window():
+    manager = DebounceManager()
+    done = threading.Event()
+    app_state.last_fire = time.time()  # 刚触发过热键
+    assert manager.run_exclusive(done.set)
+    assert done.wait(2.0)
+    _wait_idle()
+
+
+def test_run_exclusive_reports_busy():
+    manager = DebounceManager()
+    release = threading.Event()
+    assert manager.run_exclusive(lambda: release.wait(2.0))
+    # 互斥在调用线程中生效：第二次调用立即得知忙碌
+    assert not manager.run_exclusive(lambda: None)
+    release.set()
+    _wait_idle()
+    assert manager.run_exclusive(lambda: None)
+    _wait_idle()
+
+
+def test_trigger_async_debounces():
+    manager = DebounceManager()
+    calls = []
+    app_state.last_fire = 0.0
+    manager.trigger_async(lambda: calls.append(1))
+    manager.trigger_async(lambda: calls.append(2))
+    _wait_idle()
+    assert calls == [1]
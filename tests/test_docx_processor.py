@@ -0,0 +1,138 @@
+"""XML-level tests for the streaming DOCX post-processor."""
+
+import io
+import zipfile
+
+from lxml import etree
+
+from pastemd.utils.docx_processor import (
+    DOCUMENT_PART,
+    M_NS,
+    STYLES_PART,
+    W_NS,
+    DocxProcessor,
+)
+
+NS = {"w": W_NS, "m": M_NS}
+
+STYLES_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W_NS}">
+  <w:style w:type="paragraph" w:styleId="FirstParagraph"><w:name w:val="First Paragraph"/></w:style>
+  <w:style w:type="paragraph" w:styleId="BodyText"><w:name w:val="Body Text"/></w:style>
+  <w:style w:type="paragraph" w:styleId="SourceCode"><w:name w:val="Source Code"/></w:style>
+  <w:style w:type="character" w:styleId="VerbatimChar"><w:name w:val="Verbatim Char"/></w:style>
+</w:styles>"""
+
+DOCUMENT_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="{W_NS}" xmlns:m="{M_NS}">
+  <w:body>
+    <w:p><w:pPr><w:pStyle w:val="FirstParagraph"/></w:pPr><w:r><w:t>Intro</w:t></w:r></w:p>
+    <w:p><w:pPr><w:pStyle w:val="BodyText"/></w:pPr>
+      <w:r><w:t>prose </w:t></w:r>
+      <w:r><w:rPr><w:rStyle w:val="VerbatimChar"/><w:color w:val="FF0000"/></w:rPr><w:t>code()</w:t></w:r>
+    </w:p>
+    <w:p><w:pPr><w:pStyle w:val="SourceCode"/></w:pPr><w:r><w:t>print(1)</w:t></w:r></w:p>
+    <w:tbl><w:tr><w:tc><w:p><w:r><w:t>cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl>
+    <w:p><m:oMath><m:r><m:rPr><m:sty m:val="p"/></m:rPr><m:t>x</m:t></m:r></m:oMath></w:p>
+    <w:sectPr/>
+  </w:body>
+</w:document>"""
+
+
+def _docx(document_xml=DOCUMENT_XML, styles_xml=STYLES_XML):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+        zf.writestr(DOCUMENT_PART, document_xml)
+        zf.writestr(STYLES_PART, styles_xml)
+    return buffer.getvalue()
+
+
+def _parts(docx_bytes):
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def _document(docx_bytes):
+    return etree.fromstring(_parts(docx_bytes)[DOCUMENT_PART])
+
+
+def _marked_texts(root):
+    """带 w:noProof 的 run 的文本"""
+    texts = []
+    for run in root.iter(f"{{{W_NS}}}r", f"{{{M_NS}}}r"):
+        if run.find("w:rPr/w:noProof", NS) is not None:
+            texts.append("".join(run.itertext()))
+    return sorted(texts)
+
+
+def test_first_paragraph_style_replaced():
+    root = _document(DocxProcessor.apply_custom_processing(_docx(), disable_first_para_indent=True))
+    styles = [p.get(f"{{{W_NS}}}val") for p in root.iterfind("w:body/w:p/w:pPr/w:pStyle", NS)]
+    assert styles == ["BodyText", "BodyText", "SourceCode"]
+
+
+def test_styles_part_copied_unchanged():
+    out = DocxProcessor.apply_custom_processing(_docx(), disable_first_para_indent=True)
+    assert _parts(out)[STYLES_PART] == STYLES_XML.encode("utf-8")
+
+
+def test_no_proof_marks_code_tables_and_math():
+    out = DocxProcessor.apply_custom_processing(
+        _docx(), no_proof={"code": True, "tables": True, "math": True}
+    )
+    root = _document(out)
+    assert _marked_texts(root) == ["cell", "code()", "print(1)", "x"]
+
+
+def test_no_proof_follows_rpr_schema_order():
+    out = DocxProcessor.apply_custom_processing(_docx(), no_proof={"code": True})
+    root = _document(out)
+    rpr = next(
+        r for r in root.iterfind(".//w:r/w:rPr", NS)
+        if r.find("w:rStyle", NS) is not None
+    )
+    # CT_RPr：rStyle 在前，noProof 排在 color 之前
+    assert [etree.QName(child).localname for child in rpr] == ["rStyle", "noProof", "color"]
+
+
+def test_no_proof_rpr_position_in_runs():
+    root = _document(DocxProcessor.apply_custom_processing(_docx(), no_proof={"all": True}))
+    for run in root.iter(f"{{{W_NS}}}r"):
+        assert etree.QName(run[0]).localname == "rPr"
+    math_run = root.find(".//m:r", NS)
+    # m:r 中 w:rPr 排在 m:rPr 之后
+    assert [etree.QName(child).localname for child in math_run] == ["rPr", "rPr", "t"]
+    assert math_run[0].tag == f"{{{M_NS}}}rPr"
+    assert math_run[1].tag == f"{{{W_NS}}}rPr"
+
+
+def test_no_proof_selected_types_only():
+    root = _document(DocxProcessor.apply_custom_processing(_docx(), no_proof={
+        "code": False, "tables": True, "math": False,
+    }))
+    assert _marked_texts(root) == ["cell"]
+
+
+def test_no_proof_idempotent():
+    once = DocxProcessor.apply_custom_processing(_docx(), no_proof={"all": True})
+    twice = DocxProcessor.apply_custom_processing(once, no_proof={"all": True})
+    root = _document(twice)
+    for rpr in root.iter(f"{{{W_NS}}}rPr"):
+        assert len(rpr.findall("w:noProof", NS)) <= 1
+    assert _parts(once)[DOCUMENT_PART] == _parts(twice)[DOCUMENT_PART]
+
+
+def test_namespaces_declared_once():
+    out = DocxProcessor.apply_custom_processing(_docx(), no_proof={"all": True})
+    xml = _parts(out)[DOCUMENT_PART]
+    assert xml.count(f'xmlns:w="{W_NS}"'.encode()) == 1
+    assert xml.startswith(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>')
+    # 结构完整：sectPr 仍是 body 的最后一个子元素
+    body = etree.fromstring(xml).find("w:body", NS)
+    assert etree.QName(body[-1]).localname == "sectPr"
+
+
+def test_no_transforms_returns_input():
+    data = _docx()
+    assert DocxProcessor.apply_custom_processing(data) is data
@@ -0,0 +1,278 @@
+"""Tests for append-only session documents, their rollback journal and DOCX merging."""
+
+import io
+import os
+import zipfile
+
+import pytest
+from lxml import etree
+
+from pastemd.utils import docx_session
+from pastemd.utils.docx_session import (
+    SessionDocument,
+    append_session_docx,
+    create_session_docx,
+    merge_docx_documents,
+    recover_session_docx,
+)
+from pastemd.utils.reference_docx import CT_NS, R_NS, W_NS
+
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+REL_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+NS = {"w": W_NS, "r": R_NS, "wp": WP_NS, "a": A_NS, "pr": PR_NS}
+
+NUMBERING_XML = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:numbering xmlns:w="{W_NS}">
+  <w:abstractNum w:abstractNumId="0"><w:nsid w:val="0000ABCD"/>
+    <w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="decimal"/></w:lvl>
+  </w:abstractNum>
+  <w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>
+</w:numbering>"""
+
+
+def _docx(*paragraphs, image=None, numbered=()):
+    """
+    最小 DOCX：paragraphs 为段落文本；image 为图片字节（加在最后一段之后）；
+    numbered 中的文本作为编号列表项（numId 1）
+    """
+    body = [f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs]
+    body += [
+        '<w:p><w:pPr><w:numPr><w:ilvl w:val="0"/><w:numId w:val="1"/></w:numPr></w:pPr>'
+        f"<w:r><w:t>{text}</w:t></w:r></w:p>"
+        for text in numbered
+    ]
+    rels = []
+    overrides = ['<Override PartName="/word/document.xml" ContentType="application/'
+                 'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>']
+    if image is not None:
+        body.append(
+            '<w:p><w:r><w:drawing><wp:inline><wp:docPr id="1" name="Picture"/>'
+            '<a:graphic><a:graphicData><a:blip r:embed="rId5"/></a:graphicData></a:graphic>'
+            "</wp:inline></w:drawing></w:r></w:p>"
+        )
+        rels.append(f'<Relationship Id="rId5" Type="{REL_BASE}image" Target="media/image1.png"/>')
+    if numbered:
+        rels.append(f'<Relationship Id="rId2" Type="{REL_BASE}numbering" Target="numbering.xml"/>')
+        overrides.append('<Override PartName="/word/numbering.xml" ContentType="application/'
+                         'vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", (
+            f'<Types xmlns="{CT_NS}"><Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" '
+            'ContentType="application/xml"/><Default Extension="png" ContentType="image/png"/>'
+            + "".join(overrides) + "</Types>"
+        ))
+        zf.writestr("_rels/.rels", (
+            f'<Relationships xmlns="{PR_NS}"><Relationship Id="rId1" '
+            f'Type="{REL_BASE}officeDocument" Target="word/document.xml"/></Relationships>'
+        ))
+        zf.writestr("word/document.xml", (
+            f'<w:document xmlns:w="{W_NS}" xmlns:r="{R_NS}" xmlns:wp="{WP_NS}" xmlns:a="{A_NS}">'
+            f"<w:body>{''.join(body)}<w:sectPr/></w:body></w:document>"
+        ))
+        zf.writestr("word/_rels/document.xml.rels", f'<Relationships xmlns="{PR_NS}">{"".join(rels)}</Relationships>')
+        if image is not None:
+            zf.writestr("word/media/image1.png", image)
+        if numbered:
+            zf.writestr("word/numbering.xml", NUMBERING_XML)
+    return buffer.getvalue()
+
+
+def _parts(source):
+    with zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source)) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def _document(parts):
+    return etree.fromstring(parts["word/document.xml"])
+
+
+def _texts(source):
+    root = _document(_parts(source))
+    return [text for text in ("".join(p.itertext()) for p in root.iterfind("w:body/w:p", NS)) if text]
+
+
+def _images(source):
+    """按正文顺序返回各图片关系指向的部件内容"""
+    parts = _parts(source)
+    rels = etree.fromstring(parts["word/_rels/document.xml.rels"])
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+    return [
+        parts["word/" + targets[blip.get(f"{{{R_NS}}}embed")]]
+        for blip in _document(parts).iter(f"{{{A_NS}}}blip")
+    ]
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_append_keeps_valid_document(tmp_path):
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx("one"))
+    state = append_session_docx(path, state, _docx("two"))
+    append_session_docx(path, state, _docx("three"))
+    assert _texts(path) == ["one", "two", "three"]
+    assert not os.path.exists(path + docx_session._JOURNAL_SUFFIX)
+
+
+def test_media_written_into_gap_without_moving_body(tmp_path):
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx("one"))
+    # 第一次带图片的追加后移正文并预留空隙
+    state = append_session_docx(path, state, _docx("pic 1", image=b"image-1"))
+    doc_offset = state.doc_header_offset
+    assert state.doc_header_offset - state.gap_offset >= docx_session._MIN_MEDIA_GAP
+
+    journaled = []
+    save = docx_session._RollbackJournal.save
+
+    def record(self, f, ranges):
+        save(self, f, ranges)
+        journaled.append(sum(len(data) for _, data in self.segments))
+
+    docx_session._RollbackJournal.save = record
+    try:
+        for i in (2, 3):
+            state = append_session_docx(path, state, _docx(f"pic {i}", image=f"image-{i}".encode()))
+    finally:
+        docx_session._RollbackJournal.save = save
+
+    assert state.doc_header_offset == doc_offset
+    # 只记录被覆盖的字节：媒体写入的空隙、文件头字段与正文之后的小部件
+    assert all(size < 4096 for size in journaled), journaled
+    assert _texts(path) == ["one", "pic 1", "pic 2", "pic 3"]
+    assert _images(path) == [b"image-1", b"image-2", b"image-3"]
+
+
+def test_body_moves_when_gap_is_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(docx_session, "_MIN_MEDIA_GAP", 64)
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx(*[f"line {i}" for i in range(200)]))
+    for i in range(5):
+        state = append_session_docx(path, state, _docx(f"pic {i}", image=os.urandom(200)))
+    texts = _texts(path)
+    assert texts[:200] == [f"line {i}" for i in range(200)]
+    assert texts[200:] == [f"pic {i}" for i in range(5)]
+    assert len(_images(path)) == 5
+
+
+def test_failed_append_restores_original(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx("one"))
+    before = _read(path)
+
+    def fail(f, entries):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(docx_session, "_write_central_directory", fail)
+    with pytest.raises(OSError):
+        append_session_docx(path, state, _docx("two"))
+    assert _read(path) == before
+    assert not os.path.exists(path + docx_session._JOURNAL_SUFFIX)
+
+
+def test_interrupted_append_recovered_from_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx("one"))
+    before = _read(path)
+
+    def crash(f, entries):
+        f.write(b"x" * 100)
+        raise SystemExit  # 模拟进程在写入中途终止：不执行进程内回滚
+    monkeypatch.setattr(docx_session, "_write_central_directory", crash)
+    monkeypatch.setattr(docx_session._RollbackJournal, "rollback", lambda self, f: None)
+    with pytest.raises(SystemExit):
+        append_session_docx(path, state, _docx("two"))
+    assert _read(path) != before
+    assert os.path.exists(path + docx_session._JOURNAL_SUFFIX)
+
+    assert recover_session_docx(path)
+    assert _read(path) == before
+    assert not os.path.exists(path + docx_session._JOURNAL_SUFFIX)
+
+
+def test_session_document_recovers_before_append(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.docx")
+    session = SessionDocument(path, state_dir=str(tmp_path))
+    session.append(_docx("one"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(docx_session, "_write_central_directory", lambda f, entries: (_ for _ in ()).throw(SystemExit))
+        patch.setattr(docx_session._RollbackJournal, "rollback", lambda self, f: None)
+        with pytest.raises(SystemExit):
+            session.append(_docx("lost"))
+
+    session.append(_docx("two"))
+    assert _texts(path) == ["one", "two"]
+
+
+def test_incomplete_journal_is_discarded(tmp_path):
+    path = str(tmp_path / "session.docx")
+    create_session_docx(path, _docx("one"))
+    before = _read(path)
+    with open(path + docx_session._JOURNAL_SUFFIX, "wb") as f:
+        f.write(docx_session._JOURNAL_MAGIC[:3])
+    assert not recover_session_docx(path)
+    assert _read(path) == before
+    assert not os.path.exists(path + docx_session._JOURNAL_SUFFIX)
+
+
+@pytest.mark.parametrize("moved", [False, True])
+def test_failed_append_with_media_restores_original(tmp_path, monkeypatch, moved):
+    path = str(tmp_path / "session.docx")
+    state = create_session_docx(path, _docx("one"))
+    if not moved:
+        # 先预留空隙：下一次追加的媒体写入空隙
+        state = append_session_docx(path, state, _docx("first", image=b"first"))
+    before = _read(path)
+    offset = state.doc_header_offset
+
+    def fail(f, entries):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(docx_session, "_write_central_directory", fail)
+        with pytest.raises(OSError):
+            append_session_docx(path, state, _docx("pic", image=b"pic"))
+    assert _read(path) == before
+    assert state.doc_header_offset == offset
+
+    append_session_docx(path, state, _docx("pic", image=b"pic"))
+    assert _texts(path)[-1] == "pic"
+
+
+def test_merge_keeps_order_numbering_and_images():
+    merged = merge_docx_documents([
+        _docx("chunk 1", numbered=["a1", "a2"], image=b"image-1"),
+        _docx("chunk 2", numbered=["b1"], image=b"image-2"),
+        _docx("chunk 3"),
+    ])
+    assert _texts(merged) == ["chunk 1", "a1", "a2", "chunk 2", "b1", "chunk 3"]
+    assert _images(merged) == [b"image-1", b"image-2"]
+
+    parts = _parts(merged)
+    root = _document(parts)
+    # 每个文档的列表使用独立的编号定义，各自从 1 开始
+    num_ids = [n.get(f"{{{W_NS}}}val") for n in root.iter(f"{{{W_NS}}}numId")]
+    assert num_ids[0] == num_ids[1] != num_ids[2]
+    numbering = etree.fromstring(parts["word/numbering.xml"])
+    nums = {n.get(f"{{{W_NS}}}numId") for n in numbering.iterfind("w:num", NS)}
+    assert set(num_ids) <= nums
+    nsids = [n.get(f"{{{W_NS}}}val") for n in numbering.iterfind("w:abstractNum/w:nsid", NS)]
+    assert len(set(nsids)) == len(nsids) == 2
+    # 绘图对象 ID 唯一
+    doc_pr_ids = [p.get("id") for p in root.iter(f"{{{WP_NS}}}docPr")]
+    assert len(set(doc_pr_ids)) == len(doc_pr_ids) == 2
+
+
+def test_merge_single_document_is_unchanged():
+    document = _docx("only")
+    assert merge_docx_documents([document]) is document
@@ -0,0 +1,29 @@
+"""Footnote detection used to keep chunked HTML conversion safe."""
+
+import pytest
+
+from pastemd.utils.html_document import HtmlDocument
+
+
+@pytest.mark.parametrize("html", [
+    # Pandoc / markdown-it
+    '<p>Text<sup><a href="#fn1" class="footnote-ref" id="fnref1">1</a></sup></p>'
+    '<section class="footnotes"><ol><li id="fn1">Note</li></ol></section>',
+    # 维基百科
+    '<p>Claim<sup class="reference"><a href="#cite_note-3">[3]</a></sup></p>',
+    # DPUB-ARIA 角色
+    '<p>A<a role="doc-noteref" href="#n1">1</a></p><ol role="doc-endnotes"><li id="n1">B</li></ol>',
+    # EPUB 语义
+    '<p>A<a epub:type="noteref" href="#n1">1</a></p><aside epub:type="footnote" id="n1">B</aside>',
+])
+def test_detects_footnotes(html):
+    assert HtmlDocument(html).has_footnotes()
+
+
+@pytest.mark.parametrize("html", [
+    '<p>Plain <a href="#top">link</a> and <sup>2</sup></p>',
+    '<div class="note"><p>Not a footnote</p></div>',
+    "",
+])
+def test_plain_html_has_no_footnotes(html):
+    assert not HtmlDocument(html).has_footnotes()
@@ -0,0 +1,152 @@
+"""Tests for HTML formatter transforms."""
+
+import lxml.html
+import pytest
+from lxml import etree
+
+from pastemd.utils.html_formatter import (
+    KATEX_BR_CLEANUP,
+    MINIFY_HTML,
+    PROTECT_TASK_LIST,
+    REMOVE_SVG,
+    STRIKETHROUGH_TO_DEL,
+    postprocess_pandoc_html_macwps,
+)
+from pastemd.utils.html_transform import apply_transforms
+
+
+def _apply(html, *transforms):
+    root = lxml.html.fromstring(f"<html><body>{html}</body></html>")
+    apply_transforms(root, transforms)
+    body = root.find("body")
+    return "".join(etree.tostring(child, encoding="unicode") for child in body)
+
+
+def test_minify_drops_presentation_attributes():
+    out = _apply('<p style="color: red" data-x="1" class="foo" _ngcontent-a="">text</p>', MINIFY_HTML)
+    assert out == "<p>text</p>"
+
+
+def test_minify_keeps_table_alignment_and_widths():
+    out = _apply(
+        '<table><colgroup><col style="width: 30%; color: red"></colgroup>'
+        '<tr><td style="text-align: right; padding: 4px">1</td></tr></table>',
+        MINIFY_HTML,
+    )
+    assert 'style="width: 30%"' in out
+    assert 'style="text-align: right"' in out
+
+
+def test_minify_keeps_ordered_list_style_type():
+    out = _apply('<ol style="margin: 0; list-style-type: lower-roman"><li>a</li></ol>', MINIFY_HTML)
+    assert out.startswith('<ol style="list-style-type: lower-roman">')
+
+
+def test_minify_keeps_small_caps():
+    out = _apply('<span style="font-variant: small-caps; color: #333">Caps</span>', MINIFY_HTML)
+    assert out == '<span style="font-variant: small-caps">Caps</span>'
+
+
+def test_minify_drops_other_span_styles():
+    assert _apply('<span style="color: red">x</span>', MINIFY_HTML) == "<span>x</span>"
+
+
+def _code(html):
+    from pastemd.utils.html_formatter import FLATTEN_CODE_BLOCKS
+
+    root = lxml.html.fromstring(f"<html><body>{html}</body></html>")
+    apply_transforms(root, [FLATTEN_CODE_BLOCKS])
+    pre = root.find(".//pre")
+    return "".join(pre.itertext())
+
+
+def test_code_blank_line_div_is_single_newline():
+    assert _code("<pre><div>a</div><div><br></div><div>b</div></pre>") == "a\n\nb\n"
+
+
+def test_code_br_lines():
+    assert _code("<pre><code>a<br>b<br>c</code></pre>") == "a\nb\nc"
+
+
+def test_code_paragraph_lines():
+    assert _code("<pre><p>x</p><p>y</p></pre>") == "x\ny\n"
+
+
+def test_code_nested_line_blocks():
+    assert _code("<pre><div><div>a</div></div><div><div>b</div></div></pre>") == "a\nb\n"
+
+
+def test_code_line_ending_in_br():
+    assert _code("<pre><div>a<br></div><div>b</div></pre>") == "a\nb\n"
+
+
+def test_code_empty_inline_child_at_line_end():
+    assert _code("<pre><div>a<span></span></div><div>b<!-- c --></div></pre>") == "a\nb\n"
+
+
+def test_code_existing_newlines_kept():
+    assert _code("<pre><div>a\n</div><div>b</div></pre>") == "a\nb\n"
+
+
+# ---- 清理变换语料（除代码中的删除线外，与改为 lxml 变换之前的 BeautifulSoup 实现输出一致） ----
+
+@pytest.mark.parametrize("html, expected", [
+    ('<p>a<svg><path d="M0"/></svg>b</p>', "<p>ab</p>"),
+    ('<p>a<img src="x.SVG">b<img src="y.png"></p>', '<p>ab<img src="y.png"/></p>'),
+])
+def test_remove_svg(html, expected):
+    assert _apply(html, REMOVE_SVG) == expected
+
+
+def test_katex_br_removed_only_inside_formula():
+    out = _apply(
+        '<p>x<br><span class="katex-display"><span class="katex">a<br>b<span>c<br>d</span></span></span>y<br>z</p>',
+        KATEX_BR_CLEANUP,
+    )
+    assert out == '<p>x<br/><span class="katex-display"><span class="katex">ab<span>cd</span></span></span>y<br/>z</p>'
+
+
+@pytest.mark.parametrize("html, expected", [
+    ("<p>~~x~~</p>", "<p><del>x</del></p>"),
+    # 元素 tail 中的删除线
+    ("<p><b>b</b> tail ~~gone~~ and ~~two~~ end</p>", "<p><b>b</b> tail <del>gone</del> and <del>two</del> end</p>"),
+    # 代码中的 ~~ 是代码本身，不转换（旧实现会转换）
+    ("<p>in <code>a ~~b~~ c</code></p>", "<p>in <code>a ~~b~~ c</code></p>"),
+    ("<pre>x ~~y\nz~~</pre>", "<pre>x ~~y\nz~~</pre>"),
+])
+def test_strikethrough_to_del(html, expected):
+    assert _apply(html, STRIKETHROUGH_TO_DEL) == expected
+
+
+def test_protect_task_list():
+    out = _apply("<ul><li>[x] done</li><li>[ ] todo <b>[x]</b></li></ul>", PROTECT_TASK_LIST)
+    assert out == (
+        "<ul><li>{{TASK_CHECKED}} done</li>"
+        "<li>{{TASK_UNCHECKED}} todo <b>{{TASK_CHECKED}}</b></li></ul>"
+    )
+
+
+def test_macwps_postprocess_chain():
+    out = postprocess_pandoc_html_macwps(
+        '<ul><li><p>a <del>d</del></p></li>'
+        '<li><input type="checkbox" checked="">done</li><li><input type="checkbox">todo</li></ul>'
+        "<p><strong><em>bi</em></strong> <em><strong>ib</strong></em></p>"
+        '<div class="sourceCode"><pre class="sourceCode"><code><span>x = 1</span>\n<span>y</span></code></pre></div>'
+        "<p><code>{.python} def f():    return 1</code></p>"
+    )
+    span = '<span style="font-weight: bold; font-style: italic;">'
+    assert out == (
+        "<ul><li>a <s>d</s></li><li>[x] done</li><li>[ ] todo</li></ul>"
+        f"<p>{span}bi</span> {span}ib</span></p>"
+        '<pre style="white-space: pre-wrap;"><code>x = 1\ny</code></pre>'
+        '<pre style="white-space: pre-wrap;"><code>def f():\n    return 1</code></pre>'
+    )
+
+
+def test_engine_times_each_transform_by_name():
+    timings = {}
+    root = lxml.html.fromstring("<html><body><p>~~a~~</p><svg></svg><p>b</p></body></html>")
+    apply_transforms(root, [REMOVE_SVG, STRIKETHROUGH_TO_DEL, MINIFY_HTML], timings)
+    assert set(timings) == {REMOVE_SVG.name, STRIKETHROUGH_TO_DEL.name, MINIFY_HTML.name}
+    assert all(ms >= 0 for ms in timings.values())
+    assert root.find(".//del").text == "a"
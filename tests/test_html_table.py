@@ -0,0 +1,56 @@
+"""HTML tables read straight into the spreadsheet grid."""
+
+import pytest
+
+from pastemd.service.spreadsheet.formatting import CellFormat
+from pastemd.service.spreadsheet.html_table import parse_html_table
+
+
+@pytest.mark.parametrize("html, expected", [
+    # rowspan 覆盖最后一列：后续行末尾补空位
+    (
+        "<table><tr><td rowspan=2>a</td><td>b</td><td rowspan=3>c</td></tr>"
+        "<tr><td>d</td></tr><tr><td>e</td><td>f</td></tr></table>",
+        [["a", "b", "c"], ["", "d", ""], ["e", "f", ""]],
+    ),
+    (
+        "<table><tr><td>a</td><td rowspan=2>b</td></tr><tr><td>c</td></tr></table>",
+        [["a", "b"], ["c", ""]],
+    ),
+    # colspan 与 rowspan 同时使用
+    (
+        "<table><tr><td colspan=2 rowspan=2>a</td><td>b</td></tr>"
+        "<tr><td>c</td></tr><tr><td>d</td><td>e</td><td>f</td></tr></table>",
+        [["a", "", "b"], ["", "", "c"], ["d", "e", "f"]],
+    ),
+    # 嵌套表格作为所在单元格的文本
+    (
+        "<table><tr><td>x<table><tr><td>n1</td><td>n2</td></tr></table></td><td>y</td></tr>"
+        "<tr><td>z</td><td>w</td></tr></table>",
+        [["x<br>n1 n2", "y"], ["z", "w"]],
+    ),
+    # 第一个表格为空时取下一个有内容的表格
+    (
+        "<table><tr><td> </td></tr></table><p>text</p><table><tr><td>real</td></tr></table>",
+        [["real"]],
+    ),
+    # CellFormat 语法中的特殊字符被转义
+    (
+        "<table><tr><td>a*b_c[d]</td><td><b>x_y</b></td></tr></table>",
+        [[r"a\*b\_c\[d\]", r"**x\_y**"]],
+    ),
+])
+def test_parse_html_table(html, expected):
+    assert parse_html_table(html) == expected
+
+
+def test_escaped_text_round_trips_through_cell_format():
+    (value,), = parse_html_table("<table><tr><td>*a* _b_ [c](d)</td></tr></table>")
+    cell = CellFormat(value)
+    assert cell.parse() == "*a* _b_ [c](d)"
+    assert not any(s.bold or s.italic or s.hyperlink_url for s in cell.segments)
+
+
+@pytest.mark.parametrize("html", ["", "<p>no table</p>", "<table><tr><td></td></tr></table>"])
+def test_no_table(html):
+    assert parse_html_table(html) is None
@@ -0,0 +1,82 @@
+"""Tests for image downscaling and recompression."""
+
+import io
+import os
+
+from PIL import Image
+
+from pastemd.utils.image_optimizer import (
+    ImageOptimizeOptions,
+    ImageOptimizer,
+    _optimize_job,
+    optimize_image_bytes,
+)
+
+OPTIONS = ImageOptimizeOptions(max_width=400, jpeg_quality=85, min_bytes=0)
+
+
+def _encode(image, fmt, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def _noise(width, height):
+    return Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+
+
+def _flat(width, height):
+    # 截图类内容：颜色很少
+    image = Image.new("RGB", (width, height), "white")
+    image.paste((30, 30, 200), (0, 0, width // 2, height // 2))
+    return image
+
+
+def test_jpeg_source_stays_jpeg():
+    data = _encode(_flat(1200, 600), "JPEG", quality=95)
+    result = optimize_image_bytes(data, "jpg", OPTIONS)
+    assert result is not None
+    assert result[1] == "jpg"
+    assert Image.open(io.BytesIO(result[0])).format == "JPEG"
+
+
+def test_small_jpeg_is_not_reencoded():
+    data = _encode(_noise(300, 200), "JPEG", quality=95)
+    assert optimize_image_bytes(data, "jpg", OPTIONS) is None
+
+
+def test_png_screenshot_stays_png():
+    data = _encode(_flat(1200, 600), "PNG")
+    result = optimize_image_bytes(data, "png", OPTIONS)
+    assert result is not None and result[1] == "png"
+    assert Image.open(io.BytesIO(result[0])).size == (400, 200)
+
+
+def test_photographic_png_becomes_jpeg_when_much_smaller():
+    data = _encode(_noise(800, 400), "PNG")
+    result = optimize_image_bytes(data, "png", OPTIONS)
+    assert result is not None and result[1] == "jpg"
+
+
+def test_exif_orientation_applied_before_resize():
+    image = _flat(300, 900)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # 顺时针旋转 90°：显示为 900 x 300
+    data = _encode(image, "PNG", exif=exif)
+    result = optimize_image_bytes(data, "png", OPTIONS)
+    assert result is not None
+    assert Image.open(io.BytesIO(result[0])).size == (400, 133)
+
+
+def test_worker_job_reports_errors_instead_of_logging():
+    output, error = _optimize_job(b"not an image", "png", OPTIONS)
+    assert output is None
+    assert error and "Error" in error
+
+
+def test_optimize_many_skips_undecodable_images(tmp_path):
+    optimizer = ImageOptimizer(str(tmp_path))
+    good = _encode(_flat(1200, 600), "PNG")
+    results = optimizer.optimize_many([(b"broken", "png"), (good, "png")], OPTIONS, max_workers=1)
+    assert results[0] is None
+    assert results[1] is not None and results[1].endswith(".png")
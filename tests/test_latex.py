@@ -0,0 +1,91 @@
+"""Tests for the LaTeX span scanner, including pathological-input benchmarks."""
+
+import time
+
+from pastemd.utils.latex import (
+    CODE_SPAN,
+    MATH_DISPLAY,
+    MATH_INLINE,
+    MATH_PAREN,
+    convert_latex_delimiters,
+    index_math_spans,
+)
+
+
+def _kinds(text):
+    return [span.kind for span in index_math_spans(text)]
+
+
+def test_paren_pairs_with_next_closer():
+    assert _kinds(r"a \( x \) b") == [MATH_PAREN]
+    assert _kinds(r"\( a \( b \)") == [MATH_PAREN]
+
+
+def test_unpaired_paren_is_text():
+    text = r"\( x \) then $ y $ and \( open"
+    assert _kinds(text) == [MATH_PAREN, MATH_INLINE]
+    assert convert_latex_delimiters(text) == r"\( x \) then $y$ and \( open"
+
+
+def test_unpaired_paren_does_not_hide_spans():
+    assert _kinds(r"\( `code` $m$") == [CODE_SPAN, MATH_INLINE]
+    assert convert_latex_delimiters(r"`c` \( $ m $") == r"`c` \( $m$"
+
+
+def test_unclosed_block_ends_at_blank_line():
+    # 转义的引用 \[1] 不能把后续段落当作公式隐藏
+    text = "See \\[1] for details.\n\nThe value $ x $ here."
+    assert convert_latex_delimiters(text) == "See \\[1] for details.\n\nThe value $x$ here."
+    assert _kinds(text) == [MATH_INLINE]
+
+
+def test_unclosed_opener_is_text_within_paragraph():
+    # 未闭合的 $$ 之后、空行之前的内容同样按普通文本扫描
+    text = "$$ a $ b $\nnext $ c $\n\n$ d $"
+    assert convert_latex_delimiters(text) == "$$ a $b$\nnext $c$\n\n$d$"
+    assert convert_latex_delimiters("See \\[1] and $ y $") == "See \\[1] and $y$"
+
+
+def test_multiline_block_still_spans_lines():
+    text = "$$\na $ b $\n$$\n$ c $"
+    assert convert_latex_delimiters(text) == "$$\na $ b $\n$$\n$c$"
+    assert _kinds(text) == [MATH_DISPLAY, MATH_INLINE]
+
+
+def test_many_unclosed_blocks_are_linear():
+    def best(text):
+        result = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            convert_latex_delimiters(text)
+            result = min(result, time.perf_counter() - start)
+        return result
+
+    small = best("\\[ see\n" + "$ x $ and $$ q\n" * 5000)
+    large = best("\\[ see\n" + "$ x $ and $$ q\n" * 20000)
+    assert large / small < 8, (small, large)
+
+
+def test_many_unpaired_openers_are_linear():
+    # 曾经每个未配对的 \( 都向后扫描到行尾：40000 个约需 50 秒
+    text = r"$ x $ \( a " * 40000
+    start = time.perf_counter()
+    convert_latex_delimiters(text)
+    spans = index_math_spans(text)
+    elapsed = time.perf_counter() - start
+    assert len(spans) == 40000
+    assert elapsed < 2.0, elapsed
+
+
+def test_unpaired_openers_scale_linearly():
+    def best(text):
+        result = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            index_math_spans(text)
+            result = min(result, time.perf_counter() - start)
+        return result
+
+    small = best(r"\( a \) " * 500 + r"\( b " * 10000)
+    large = best(r"\( a \) " * 2000 + r"\( b " * 40000)
+    assert large / small < 8, (small, large)
@@ -0,0 +1,55 @@
+"""Tests for the single-pass Markdown block index."""
+
+from pastemd.utils.fs import extract_title_from_markdown
+from pastemd.utils.md_index import (
+    BLOCK_FENCE,
+    BLOCK_HEADING,
+    BLOCK_MATH,
+    BLOCK_TABLE,
+    build_markdown_index,
+)
+
+
+def _heading_texts(text):
+    return [block.text for block in build_markdown_index(text).headings]
+
+
+def test_blocks_and_counts():
+    index = build_markdown_index(
+        "# Title\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n```py\n# not a heading\n```\n\n$$\nx\n$$\n"
+    )
+    assert [block.kind for block in index.blocks] == [BLOCK_HEADING, BLOCK_TABLE, BLOCK_FENCE, BLOCK_MATH]
+    assert index.counts[BLOCK_HEADING] == 1
+    assert index.has_table_separator
+
+
+def test_closed_math_block_hides_inner_lines():
+    assert _heading_texts("$$\n# x\n$$\n\n## After") == ["After"]
+
+
+def test_unclosed_display_math_stops_at_blank_line():
+    text = "$$\na + b\n\n# Heading\n\ntext\n\n## Second"
+    index = build_markdown_index(text)
+    assert _heading_texts(text) == ["Heading", "Second"]
+    assert index.counts[BLOCK_MATH] == 0
+
+
+def test_unclosed_bracket_math_stops_at_blank_line():
+    assert _heading_texts("\\[\nx\n\n# Heading") == ["Heading"]
+
+
+def test_unclosed_math_at_eof_is_not_a_block():
+    index = build_markdown_index("text\n\n$$\nx = 1")
+    assert index.counts[BLOCK_MATH] == 0
+
+
+def test_unclosed_fence_runs_to_eof():
+    index = build_markdown_index("```\ncode\n\n# not a heading")
+    assert index.counts[BLOCK_FENCE] == 1
+    assert index.counts[BLOCK_HEADING] == 0
+
+
+def test_title_from_shared_index():
+    text = "intro\n\n## Sub\n\n# Main"
+    index = build_markdown_index(text)
+    assert extract_title_from_markdown("", md_index=index) == "Main"
@@ -0,0 +1,49 @@
+"""Tests for the Markdown normalizer, including a linear-scaling benchmark."""
+
+import time
+
+from pastemd.utils.md_normalizer import normalize_markdown
+
+# 覆盖各种行类型的片段，重复拼接得到不同规模的输入
+_BLOCK = (
+    "# Title\n"
+    "text line\n"
+    "```python\n"
+    "print(1)\n"
+    "```\n"
+    "- item\n"
+    "> quote\n"
+    "| a | b |\n"
+    "|---|---|\n"
+    "| 1 | 2 |\n"
+    "---\n"
+    "\n\n\n"
+)
+
+
+def _best_time(text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        normalize_markdown(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_blank_lines_inserted_around_blocks():
+    assert normalize_markdown("text\n# Title\nmore") == "text\n\n# Title\n\nmore"
+
+
+def test_output_stable_across_sizes():
+    single = normalize_markdown(_BLOCK)
+    assert normalize_markdown(_BLOCK * 3).startswith(single.rstrip("\n"))
+
+
+def test_scales_linearly():
+    small = _BLOCK * 2000
+    large = _BLOCK * 8000
+    normalize_markdown(small)  # 预热
+    t_small = _best_time(small)
+    t_large = _best_time(large)
+    # 输入扩大 4 倍：线性约为 4 倍，二次则约为 16 倍
+    assert t_large / t_small < 8, (t_small, t_large)
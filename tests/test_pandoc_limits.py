@@ -0,0 +1,33 @@
+"""Classification of Pandoc processes stopped by resource limits."""
+
+import signal
+
+import pytest
+
+from pastemd.integrations.pandoc import PandocIntegration
+
+LIMITS = {"max_memory_mb": 2048, "max_cpu_seconds": 60}
+describe = PandocIntegration._describe_limit_breach
+
+posix_only = pytest.mark.skipif(not hasattr(signal, "SIGXCPU"), reason="POSIX signals")
+
+
+@posix_only
+def test_sigxcpu_is_cpu_breach():
+    assert "CPU" in describe(-signal.SIGXCPU, "", LIMITS, 1.0)
+
+
+@posix_only
+def test_sigkill_is_cpu_breach_only_at_the_limit():
+    assert "CPU" in describe(-signal.SIGKILL, "", LIMITS, 65.0)
+    # OOM killer / 用户终止：CPU 时间未达上限
+    assert describe(-signal.SIGKILL, "", LIMITS, 3.0) is None
+    assert describe(-signal.SIGKILL, "", LIMITS, None) is None
+
+
+def test_heap_exhausted_is_memory_breach():
+    assert "memory" in describe(251, "pandoc: Heap exhausted;", LIMITS)
+
+
+def test_no_limits_no_breach():
+    assert describe(-9, "heap exhausted", {}) is None
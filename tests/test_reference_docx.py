@@ -0,0 +1,161 @@
+"""Tests for slimmed reference DOCX copies and their cache."""
+
+import os
+import zipfile
+
+import pytest
+from lxml import etree
+
+from pastemd.utils import reference_docx
+from pastemd.utils.reference_docx import CT_NS, R_NS, W_NS, ReferenceDocxCache, slim_reference_docx
+
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+PKG_REL_BASE = "http://schemas.openxmlformats.org/package/2006/relationships/metadata/"
+
+STYLES_XML = f'<w:styles xmlns:w="{W_NS}"><w:style w:styleId="Heading1"/></w:styles>'.encode()
+NUMBERING_XML = f'<w:numbering xmlns:w="{W_NS}"><w:num w:numId="1"/></w:numbering>'.encode()
+
+
+def _rels(*rels):
+    return f'<Relationships xmlns="{PR_NS}">' + "".join(
+        f'<Relationship Id="{rid}" Type="{rtype}" Target="{target}"/>' for rid, rtype, target in rels
+    ) + "</Relationships>"
+
+
+def _template(path, styles=STYLES_XML):
+    """带正文、嵌入字体、缩略图、customXml 与页眉图片的参考文档"""
+    overrides = {
+        "/word/document.xml": "document.main+xml", "/word/styles.xml": "styles+xml",
+        "/word/numbering.xml": "numbering+xml", "/word/settings.xml": "settings+xml",
+        "/word/fontTable.xml": "fontTable+xml", "/word/header1.xml": "header+xml",
+        "/customXml/item1.xml": "customXmlProperties+xml",
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", f'<Types xmlns="{CT_NS}">' + "".join(
+            f'<Override PartName="{name}" ContentType="application/'
+            f'vnd.openxmlformats-officedocument.wordprocessingml.{ctype}"/>'
+            for name, ctype in overrides.items()
+        ) + "</Types>")
+        zf.writestr("_rels/.rels", _rels(
+            ("rId1", REL_BASE + "officeDocument", "word/document.xml"),
+            ("rId2", PKG_REL_BASE + "core-properties", "docProps/core.xml"),
+            ("rId3", PKG_REL_BASE + "thumbnail", "docProps/thumbnail.jpeg"),
+        ))
+        zf.writestr("docProps/core.xml", "<coreProperties/>")
+        zf.writestr("docProps/thumbnail.jpeg", b"thumbnail")
+        zf.writestr("word/document.xml", (
+            f'<w:document xmlns:w="{W_NS}" xmlns:r="{R_NS}"><w:body>'
+            "<w:p><w:r><w:t>Template body</w:t></w:r></w:p>"
+            '<w:p><w:r><w:drawing><blip r:embed="rId9"/></w:drawing></w:r></w:p>'
+            '<w:sectPr><w:headerReference w:type="default" r:id="rId7"/></w:sectPr>'
+            "</w:body></w:document>"
+        ))
+        zf.writestr("word/_rels/document.xml.rels", _rels(
+            ("rId1", REL_BASE + "styles", "styles.xml"),
+            ("rId2", REL_BASE + "numbering", "numbering.xml"),
+            ("rId3", REL_BASE + "settings", "settings.xml"),
+            ("rId4", REL_BASE + "fontTable", "fontTable.xml"),
+            ("rId7", REL_BASE + "header", "header1.xml"),
+            ("rId9", REL_BASE + "image", "media/body.png"),
+            ("rId10", REL_BASE + "customXml", "../customXml/item1.xml"),
+        ))
+        zf.writestr("word/styles.xml", styles)
+        zf.writestr("word/numbering.xml", NUMBERING_XML)
+        zf.writestr("word/settings.xml", (
+            f'<w:settings xmlns:w="{W_NS}"><w:zoom w:percent="100"/><w:embedTrueTypeFonts/></w:settings>'
+        ))
+        zf.writestr("word/fontTable.xml", (
+            f'<w:fonts xmlns:w="{W_NS}" xmlns:r="{R_NS}"><w:font w:name="Corp">'
+            '<w:embedRegular r:id="rId1"/></w:font></w:fonts>'
+        ))
+        zf.writestr("word/_rels/fontTable.xml.rels", _rels(("rId1", REL_BASE + "font", "fonts/font1.odttf")))
+        zf.writestr("word/fonts/font1.odttf", b"font" * 1000)
+        zf.writestr("word/header1.xml", f'<w:hdr xmlns:w="{W_NS}" xmlns:r="{R_NS}"><blip r:embed="rId1"/></w:hdr>')
+        zf.writestr("word/_rels/header1.xml.rels", _rels(("rId1", REL_BASE + "image", "media/logo.png")))
+        zf.writestr("word/media/logo.png", b"logo")
+        zf.writestr("word/media/body.png", b"body image")
+        zf.writestr("customXml/item1.xml", "<item/>")
+    return str(path)
+
+
+@pytest.fixture
+def slim_parts(tmp_path):
+    slim = tmp_path / "slim.docx"
+    slim_reference_docx(_template(tmp_path / "template.docx"), str(slim))
+    with zipfile.ZipFile(slim) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def test_slim_drops_unused_parts(slim_parts):
+    for name in ("word/media/body.png", "word/fonts/font1.odttf", "docProps/thumbnail.jpeg", "customXml/item1.xml"):
+        assert name not in slim_parts
+    body = etree.fromstring(slim_parts["word/document.xml"]).find(f"{{{W_NS}}}body")
+    assert [child.tag for child in body] == [f"{{{W_NS}}}sectPr"]
+    assert b"embedRegular" not in slim_parts["word/fontTable.xml"]
+    assert b"embedTrueTypeFonts" not in slim_parts["word/settings.xml"]
+    overrides = {
+        o.get("PartName") for o in etree.fromstring(slim_parts["[Content_Types].xml"]).iter(f"{{{CT_NS}}}Override")
+    }
+    assert "/customXml/item1.xml" not in overrides
+    rels = slim_parts["word/_rels/document.xml.rels"]
+    assert b"media/body.png" not in rels and b"customXml" not in rels
+
+
+def test_slim_keeps_style_parts(slim_parts):
+    assert slim_parts["word/styles.xml"] == STYLES_XML
+    assert slim_parts["word/numbering.xml"] == NUMBERING_XML
+    assert b"w:zoom" in slim_parts["word/settings.xml"]
+    # sectPr 引用的页眉及其图片
+    assert slim_parts["word/media/logo.png"] == b"logo"
+    assert "word/header1.xml" in slim_parts
+    assert "docProps/core.xml" in slim_parts
+    assert b"fontTable.xml" in slim_parts["word/_rels/document.xml.rels"]
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    calls = []
+    hash_file = reference_docx._hash_file
+
+    def counting(path):
+        calls.append(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(reference_docx, "_hash_file", counting)
+    return calls
+
+
+def test_cache_reuses_slim_copy_until_template_changes(tmp_path, hash_calls):
+    template = _template(tmp_path / "template.docx")
+    cache = ReferenceDocxCache(str(tmp_path / "cache"))
+
+    slim = cache.resolve(template)
+    assert os.path.dirname(slim) == str(tmp_path / "cache")
+    assert cache.resolve(template) == slim
+    assert len(hash_calls) == 1
+
+    # 只改 mtime：重新计算哈希，内容相同仍使用同一份精简文档
+    stat = os.stat(template)
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+    assert cache.resolve(template) == slim
+    assert len(hash_calls) == 2
+
+    # 内容改变：生成新的精简文档
+    _template(tmp_path / "template.docx", styles=STYLES_XML.replace(b"Heading1", b"Title"))
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 20_000_000_000))
+    changed = cache.resolve(template)
+    assert changed != slim and os.path.isfile(changed)
+    with zipfile.ZipFile(changed) as zf:
+        assert b"Title" in zf.read("word/styles.xml")
+
+
+def test_cache_falls_back_to_original(tmp_path):
+    cache = ReferenceDocxCache(str(tmp_path / "cache"))
+    broken = tmp_path / "broken.docx"
+    broken.write_bytes(b"not a zip")
+    assert cache.resolve(str(broken)) == str(broken)
+    missing = str(tmp_path / "missing.docx")
+    assert cache.resolve(missing) == missing
+    assert cache.resolve(None) is None
@@ -0,0 +1,75 @@
+"""Corpus accuracy test for source-dialect fingerprinting."""
+
+import pytest
+
+from pastemd.service.preprocessor import MarkdownPreprocessor
+from pastemd.service.preprocessor.sources import (
+    SOURCE_CHATGPT,
+    SOURCE_CLAUDE,
+    SOURCE_GEMINI,
+    SOURCE_GENERIC,
+    SOURCE_NOTION,
+    SOURCE_OBSIDIAN,
+    SOURCE_ZHIPU,
+    detect_source,
+)
+
+# (期望来源, 类别, 内容)
+CORPUS = [
+    # ---- 各来源的典型片段 ----
+    (SOURCE_CHATGPT, "html",
+     '<div data-message-author-role="assistant"><div class="markdown prose w-full">'
+     '<p data-start="0" data-end="12">Hello</p></div></div>'),
+    (SOURCE_CLAUDE, "html",
+     '<div class="font-claude-response"><div class="standard-markdown grid-cols-1">'
+     '<p class="whitespace-pre-wrap break-words">Hi</p></div></div>'),
+    (SOURCE_GEMINI, "html",
+     '<message-content _ngcontent-ng-c123="" class="model-response-text">'
+     '<div class="markdown markdown-main-panel"><p>Hi</p></div></message-content>'),
+    (SOURCE_ZHIPU, "html", '<div class="chatglm-answer markdown-body"><p>你好</p></div>'),
+    (SOURCE_NOTION, "html", '<!-- notionvc: 0b1c --><div class="notion-text-block">Text</div>'),
+    (SOURCE_NOTION, "html", '<div class="notion-page-content"><div class="notion-text">A</div></div>'),
+    (SOURCE_OBSIDIAN, "html",
+     '<div class="markdown-preview-view"><a class="internal-link" href="Note">Note</a></div>'),
+    (SOURCE_CHATGPT, "markdown", "Answer :contentReference[oaicite:0]{index=0}"),
+    (SOURCE_GEMINI, "markdown", "Result [cite_start]text [cite: 1]"),
+    (SOURCE_NOTION, "markdown", "See [Page](Page%20" + "0123456789abcdef" * 2 + ".md)"),
+    (SOURCE_NOTION, "markdown", "<aside>\n💡 Tip\n</aside>\n\n[Spec](https://www.notion.so/team/Spec)"),
+    (SOURCE_OBSIDIAN, "markdown", "Link to [[Other Note]] and ![[image.png]]"),
+    (SOURCE_ZHIPU, "markdown", "来源 [智谱清言](https://chatglm.cn/main)\n$\nx\n$"),
+    # ---- 正文提到同样的词，不应误判 ----
+    (SOURCE_GENERIC, "html",
+     "<p>Our notion-style sidebar links to notion.so/ pages.</p>"),
+    (SOURCE_GENERIC, "html",
+     "<p>Angular adds attributes like _ngcontent-abc to every element.</p>"),
+    (SOURCE_GENERIC, "html",
+     "<pre><code>&lt;div class=&quot;notion-page&quot; data-start=&quot;1&quot;&gt;</code></pre>"),
+    (SOURCE_GENERIC, "html",
+     '<p title="font-claude-response markdown-main-panel">tooltip only</p>'),
+    (SOURCE_GENERIC, "html",
+     '<div class="notionish markdown-bodywork"><p>Similar class names</p></div>'),
+    (SOURCE_GENERIC, "markdown",
+     "I moved from notion.so/ to plain files, see notion-export tips."),
+    (SOURCE_GENERIC, "markdown", "Comparing chatglm and other models.\n\nUse `<aside>` for notes."),
+    (SOURCE_GENERIC, "markdown", "# Title\n\nPlain paragraph with a [link](https://example.com)."),
+    # ---- 聊天回答中引用 Notion 页面，不应按 Notion 导出处理 ----
+    (SOURCE_GENERIC, "markdown", "智谱回答如下：\n## 步骤\n参考 [文档](https://www.notion.so/abc/Page)"),
+    (SOURCE_GENERIC, "markdown", "Here is the note:\n<aside>\nTip\n</aside>\nDone."),
+]
+
+
+@pytest.mark.parametrize("expected,category,text", CORPUS)
+def test_detect_source(expected, category, text):
+    assert detect_source(text, category) == expected
+
+
+def test_corpus_accuracy():
+    correct = sum(detect_source(text, category) == expected for expected, category, text in CORPUS)
+    assert correct == len(CORPUS)
+
+
+def test_notion_link_keeps_normalize():
+    text = "智谱回答如下：\n## 步骤\n参考 [文档](https://www.notion.so/abc/Page)"
+    assert MarkdownPreprocessor().process(text, {}) == (
+        "智谱回答如下：\n\n## 步骤\n\n参考 [文档](https://www.notion.so/abc/Page)"
+    )